@@ -0,0 +1,129 @@
+"""
+离线端到端基准测试
+
+在进程内启动 OpenAI 兼容的 LLM 桩服务（evaluation/llm_stub_server.py），把 Agent 指向它，
+对 extract_data 完整流程计时。回放模式下不需要 API Key 和网络，结果确定，可在 CI 中运行。
+
+输出每轮：
+    - 墙钟耗时
+    - LLM 请求数、回放未命中数
+    - LLM 忙碌时间（至少有一个请求在处理中的时长，即流程在等待模型的时间）
+    - 编排开销 = 墙钟耗时 - LLM 忙碌时间（HTML 精简、解析器执行、文件读写、调度等本地开销）
+
+用法示例：
+    # 1. 用真实 API 录制 input_html 样本的响应（只需一次）
+    python evaluation/benchmark_offline.py --mode record \\
+        --upstream https://api.openai.com/v1 --upstream-key $OPENAI_API_KEY
+
+    # 2. 离线回放，模拟中位数 800ms 的长尾延迟
+    python evaluation/benchmark_offline.py --latency lognormal --latency-ms 800 --latency-sigma 0.6 --runs 3
+
+    # 3. 不加延迟，只测编排本身的开销
+    python evaluation/benchmark_offline.py --latency none
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+# 必须在导入 web2json 之前设置，确保配置读取到桩服务地址
+os.environ.setdefault("OPENAI_API_KEY", "offline-stub")
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from evaluation.llm_stub_server import LATENCY_MODES, LatencyModel, StubState, start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端基准测试（extract_data + LLM 桩服务）")
+    parser.add_argument("--html-dir", default="input_html", help="HTML 样本目录")
+    parser.add_argument("--fixtures", default="evaluation/fixtures/input_html.jsonl", help="fixture 文件路径（JSONL）")
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay", help="桩服务模式")
+    parser.add_argument("--upstream", help="record 模式下转发的真实服务地址")
+    parser.add_argument("--upstream-key", help="真实服务的 API Key")
+    parser.add_argument("--iteration-rounds", type=int, default=3, help="学习样本数量")
+    parser.add_argument("--runs", type=int, default=1, help="重复运行次数")
+    parser.add_argument("--latency", choices=LATENCY_MODES, default="none", help="人为延迟分布")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="固定延迟/均值/中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="对数正态分布的对数标准差")
+    parser.add_argument("--latency-max-ms", type=float, default=0.0, help="延迟上限（毫秒，0 表示不限制）")
+    parser.add_argument("--seed", type=int, default=42, help="延迟采样随机种子")
+    parser.add_argument("--output", help="结果保存为 JSON 文件（可选）")
+    args = parser.parse_args()
+
+    if args.mode == "replay" and not Path(args.fixtures).exists():
+        print(f"fixture 文件不存在: {args.fixtures}（先用 --mode record 录制，见 evaluation/USAGE.md）")
+        return
+
+    state = StubState(
+        args.fixtures,
+        mode=args.mode,
+        latency=LatencyModel(args.latency, args.latency_ms, args.latency_sigma, args.latency_max_ms, args.seed),
+        upstream=args.upstream,
+        upstream_key=args.upstream_key,
+    )
+    server = start_stub_server(state)
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    from web2json.config.settings import settings
+    from web2json.simple import Web2JsonConfig, extract_data
+    from web2json.utils.llm_client import LLMClient
+
+    # 指向桩服务，关闭响应缓存，避免多轮运行之间互相命中
+    os.environ["OPENAI_API_BASE"] = base_url
+    settings.openai_api_base = base_url
+    settings.llm_cache_mode = "off"
+
+    print(f"LLM 桩服务: {base_url}（模式: {args.mode}，已加载 {len(state.store.entries)} 条 fixture）")
+
+    results = []
+    for run in range(1, args.runs + 1):
+        before = state.stats.snapshot()
+        LLMClient.reset_usage()
+
+        start = time.perf_counter()
+        error = None
+        try:
+            extract_data(Web2JsonConfig(
+                name=f"offline_benchmark_{run}",
+                html_path=args.html_dir,
+                iteration_rounds=args.iteration_rounds,
+            ))
+        except Exception as e:
+            error = str(e)
+        wall = time.perf_counter() - start
+
+        after = state.stats.snapshot()
+        busy = after["llm_busy_seconds"] - before["llm_busy_seconds"]
+        row = {
+            "run": run,
+            "success": error is None,
+            "error": error,
+            "wall_seconds": round(wall, 3),
+            "llm_requests": after["requests"] - before["requests"],
+            "fixture_misses": after["misses"] - before["misses"],
+            "llm_busy_seconds": round(busy, 3),
+            "orchestration_seconds": round(wall - busy, 3),
+        }
+        results.append(row)
+
+    print(f"\n{'run':>4} {'ok':>3} {'wall(s)':>9} {'requests':>9} {'misses':>7} {'llm(s)':>8} {'overhead(s)':>12}")
+    for row in results:
+        print(f"{row['run']:>4} {'✓' if row['success'] else '✗':>3} {row['wall_seconds']:>9.3f} "
+              f"{row['llm_requests']:>9} {row['fixture_misses']:>7} {row['llm_busy_seconds']:>8.3f} "
+              f"{row['orchestration_seconds']:>12.3f}")
+        if row["error"]:
+            print(f"     错误: {row['error']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+OpenAI 兼容的本地 LLM 桩服务（record / replay）
+
+用于在没有 API Key、没有网络的环境下确定性地运行完整流程（如 CI 和离线基准测试）：
+
+    replay  从 fixture 文件按请求消息查找已录制的响应返回（默认）
+    record  把请求转发给真实服务（--upstream），返回响应的同时写入 fixture 文件
+
+fixture 为 JSONL 文件，每行一条记录：
+    {"key": "<消息哈希>", "model": "...", "messages": [...],
+     "response": {"content": "...", "usage": {"prompt_tokens": 0, "completion_tokens": 0}},
+     "latency_ms": 1234.5}
+
+键只由消息内容决定（不含模型名和温度），因此更换模型配置后仍可回放同一组样本。
+请求带 "stream": true 时以 SSE 分片返回（客户端提前结束读取时直接断开即可）。
+
+可注入人为延迟，模拟服务端延迟分布：
+    none       不加延迟
+    fixed      固定 --latency-ms
+    uniform    [0, 2 * --latency-ms] 均匀分布
+    lognormal  中位数 --latency-ms、对数标准差 --latency-sigma 的对数正态分布（长尾）
+    recorded   使用录制时的真实延迟
+
+用法示例：
+    # 录制：把 Agent 指向桩服务，桩服务转发到真实 API 并保存响应
+    python evaluation/llm_stub_server.py --mode record --fixtures evaluation/fixtures/input_html.jsonl \\
+        --upstream https://api.openai.com/v1 --upstream-key $OPENAI_API_KEY
+    OPENAI_API_BASE=http://127.0.0.1:8765/v1 python demo.py
+
+    # 回放：离线运行，不需要真实 API Key
+    python evaluation/llm_stub_server.py --fixtures evaluation/fixtures/input_html.jsonl \\
+        --latency lognormal --latency-ms 800 --latency-sigma 0.6
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+LATENCY_MODES = ("none", "fixed", "uniform", "lognormal", "recorded")
+
+
+def fixture_key(messages: List[Dict[str, Any]]) -> str:
+    """计算 fixture 键（只由消息的 role/content 决定）"""
+    normalized = [{"role": m.get("role"), "content": m.get("content")} for m in messages]
+    raw = json.dumps(normalized, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class LatencyModel:
+    """人为延迟分布"""
+
+    def __init__(self, mode: str = "none", latency_ms: float = 0.0, sigma: float = 0.5,
+                 max_ms: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            mode: none / fixed / uniform / lognormal / recorded
+            latency_ms: 固定延迟、均匀分布均值或对数正态分布中位数（毫秒）
+            sigma: 对数正态分布的对数标准差（越大尾部越长）
+            max_ms: 延迟上限（毫秒，0 表示不限制）
+            seed: 随机种子（便于复现）
+        """
+        if mode not in LATENCY_MODES:
+            raise ValueError(f"不支持的延迟模式: {mode}，可选: {', '.join(LATENCY_MODES)}")
+        self.mode = mode
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.max_ms = max_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, recorded_ms: Optional[float] = None) -> float:
+        """采样一次延迟（秒）"""
+        with self._lock:
+            if self.mode == "fixed":
+                ms = self.latency_ms
+            elif self.mode == "uniform":
+                ms = self._rng.uniform(0, 2 * self.latency_ms)
+            elif self.mode == "lognormal":
+                ms = self._rng.lognormvariate(math.log(max(self.latency_ms, 1e-3)), self.sigma)
+            elif self.mode == "recorded":
+                ms = recorded_ms or 0.0
+            else:
+                ms = 0.0
+        if self.max_ms:
+            ms = min(ms, self.max_ms)
+        return max(ms, 0.0) / 1000.0
+
+
+class FixtureStore:
+    """JSONL fixture 读写（线程安全）"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            if entry["key"] in self.entries:
+                return
+            self.entries[entry["key"]] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class StubStats:
+    """桩服务统计：请求数、未命中数，以及至少有一个请求在处理中的总时长（流程等待 LLM 的墙钟时间）"""
+
+    def __init__(self):
+        self.requests = 0
+        self.misses = 0
+        self.simulated_latency = 0.0
+        self.busy_seconds = 0.0
+        self._in_flight = 0
+        self._busy_since = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.requests += 1
+            if self._in_flight == 0:
+                self._busy_since = time.perf_counter()
+            self._in_flight += 1
+
+    def end(self):
+        with self._lock:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self.busy_seconds += time.perf_counter() - self._busy_since
+
+    def add_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def add_latency(self, seconds: float):
+        with self._lock:
+            self.simulated_latency += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "misses": self.misses,
+                "simulated_latency_seconds": round(self.simulated_latency, 3),
+                "llm_busy_seconds": round(self.busy_seconds, 3),
+            }
+
+
+class StubState:
+    """桩服务配置与状态"""
+
+    def __init__(self, fixtures: str, mode: str = "replay", latency: Optional[LatencyModel] = None,
+                 upstream: Optional[str] = None, upstream_key: Optional[str] = None, on_miss: str = "error"):
+        if mode not in ("replay", "record"):
+            raise ValueError(f"不支持的模式: {mode}")
+        if mode == "record" and not upstream:
+            raise ValueError("record 模式需要指定 --upstream")
+        self.store = FixtureStore(fixtures)
+        self.mode = mode
+        self.latency = latency or LatencyModel()
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.upstream_key = upstream_key
+        self.on_miss = on_miss
+        self.stats = StubStats()
+        self._http = None
+
+    def forward(self, body: Dict[str, Any], authorization: Optional[str] = None) -> Dict[str, Any]:
+        """把请求转发给真实服务（record 模式）
+
+        Args:
+            body: 请求体
+            authorization: 客户端请求的 Authorization 头（未指定 --upstream-key 时透传）
+        """
+        import httpx
+
+        if self._http is None:
+            self._http = httpx.Client(timeout=600)
+        body = {**body, "stream": False}
+        body.pop("stream_options", None)
+        headers = {}
+        if self.upstream_key:
+            headers["Authorization"] = f"Bearer {self.upstream_key}"
+        elif authorization:
+            headers["Authorization"] = authorization
+        response = self._http.post(f"{self.upstream}/chat/completions", json=body, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+
+def _completion_payload(model: str, content: str, usage: Dict[str, int]) -> Dict[str, Any]:
+    prompt_tokens = int(usage.get("prompt_tokens", 0))
+    completion_tokens = int(usage.get("completion_tokens", 0))
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            # 录制时服务端返回的前缀缓存命中信息原样回放
+            **({"prompt_tokens_details": usage["prompt_tokens_details"]} if usage.get("prompt_tokens_details") else {}),
+        },
+    }
+
+
+# 流式返回时每个分片的字符数
+STREAM_CHUNK_CHARS = 32
+
+
+def _stream_chunks(model: str, content: str, usage: Dict[str, int], include_usage: bool) -> List[Dict[str, Any]]:
+    """把完整响应拆成 chat.completion.chunk 分片"""
+    chunk_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    chunks = [chunk({"role": "assistant", "content": ""})]
+    for i in range(0, len(content), STREAM_CHUNK_CHARS):
+        chunks.append(chunk({"content": content[i:i + STREAM_CHUNK_CHARS]}))
+    chunks.append(chunk({}, "stop"))
+    if include_usage:
+        usage_payload = _completion_payload(model, "", usage)["usage"]
+        chunks.append({**chunk({}), "choices": [], "usage": usage_payload})
+    return chunks
+
+
+def make_handler(state: StubState):
+    """构建请求处理类"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_completion(self, body: Dict[str, Any], content: str, usage: Dict[str, int]):
+            model = body.get("model", "stub")
+            if not body.get("stream"):
+                self._send_json(200, _completion_payload(model, content, usage))
+                return
+
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for chunk in _stream_chunks(model, content, usage, include_usage):
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # 客户端提前结束读取
+                pass
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._send_json(200, {"object": "list", "data": []})
+            elif self.path.rstrip("/").endswith("/stats"):
+                self._send_json(200, state.stats.snapshot())
+            else:
+                self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "not_found"}})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"未知路径: {self.path}", "type": "not_found"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            messages = body.get("messages", [])
+            model = body.get("model", "stub")
+            key = fixture_key(messages)
+
+            state.stats.begin()
+            try:
+                entry = state.store.get(key)
+                if entry is None and state.mode == "record":
+                    start = time.perf_counter()
+                    upstream = state.forward(body, self.headers.get("Authorization"))
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    entry = {
+                        "key": key,
+                        "model": model,
+                        "messages": messages,
+                        "response": {
+                            "content": upstream["choices"][0]["message"].get("content") or "",
+                            "usage": upstream.get("usage") or {},
+                        },
+                        "latency_ms": round(latency_ms, 1),
+                    }
+                    state.store.add(entry)
+                    self._send_completion(body, entry["response"]["content"], entry["response"]["usage"])
+                    return
+
+                if entry is None:
+                    state.stats.add_miss()
+                    if state.on_miss == "empty":
+                        entry = {"response": {"content": "{}", "usage": {}}}
+                    else:
+                        self._send_json(404, {"error": {
+                            "message": f"fixture 中没有该请求的录制响应: {key[:12]}",
+                            "type": "fixture_miss",
+                        }})
+                        return
+
+                delay = state.latency.sample(entry.get("latency_ms"))
+                if delay:
+                    time.sleep(delay)
+                    state.stats.add_latency(delay)
+
+                self._send_completion(body, entry["response"]["content"], entry["response"].get("usage", {}))
+            except Exception as e:
+                self._send_json(502, {"error": {"message": f"桩服务处理失败: {e}", "type": "stub_error"}})
+            finally:
+                state.stats.end()
+
+    return StubHandler
+
+
+def start_stub_server(state: StubState, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """在后台线程启动桩服务
+
+    Args:
+        state: 桩服务配置与状态
+        host: 监听地址
+        port: 监听端口（0 表示随机可用端口）
+
+    Returns:
+        服务器对象，base_url 为 http://{host}:{server.server_port}/v1
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地 LLM 桩服务（record / replay）")
+    parser.add_argument("--fixtures", required=True, help="fixture 文件路径（JSONL）")
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay", help="运行模式")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--upstream", help="record 模式下转发的真实服务地址（如 https://api.openai.com/v1）")
+    parser.add_argument("--upstream-key", help="真实服务的 API Key")
+    parser.add_argument("--on-miss", choices=["error", "empty"], default="error",
+                        help="回放未命中时返回错误（默认）或空 JSON 对象")
+    parser.add_argument("--latency", choices=LATENCY_MODES, default="none", help="人为延迟分布")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="固定延迟/均值/中位数（毫秒）")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="对数正态分布的对数标准差")
+    parser.add_argument("--latency-max-ms", type=float, default=0.0, help="延迟上限（毫秒，0 表示不限制）")
+    parser.add_argument("--seed", type=int, default=None, help="延迟采样随机种子")
+    args = parser.parse_args()
+
+    state = StubState(
+        args.fixtures,
+        mode=args.mode,
+        latency=LatencyModel(args.latency, args.latency_ms, args.latency_sigma, args.latency_max_ms, args.seed),
+        upstream=args.upstream,
+        upstream_key=args.upstream_key,
+        on_miss=args.on_miss,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"LLM 桩服务已启动: http://{args.host}:{server.server_port}/v1 "
+          f"（模式: {args.mode}，fixture: {args.fixtures}，已加载 {len(state.store.entries)} 条）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"统计: {state.stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
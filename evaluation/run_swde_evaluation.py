@@ -9,7 +9,7 @@ import sys
 import argparse
 import subprocess
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional
 import json
 from datetime import datetime
 from tqdm import tqdm
@@ -256,6 +256,9 @@ class SWDEEvaluationRunner:
             'errors': results['statistics']['errors'],
             'attribute_metrics': results['attribute_metrics']
         }
+        llm_usage = self._load_llm_usage(vertical, website)
+        if llm_usage:
+            self.global_summary['verticals'][vertical]['websites'][website]['llm_usage'] = llm_usage
 
         # Update vertical metrics (average across all completed websites)
         vertical_data = self.global_summary['verticals'][vertical]
@@ -278,6 +281,9 @@ class SWDEEvaluationRunner:
                 completed_websites += 1
 
         if all_results:
+            self.global_summary['overall']['llm_usage'] = self._sum_llm_usage(
+                [r['llm_usage'] for r in all_results if r.get('llm_usage')]
+            )
             self.global_summary['overall']['precision'] = sum(r['precision'] for r in all_results) / len(all_results)
             self.global_summary['overall']['recall'] = sum(r['recall'] for r in all_results) / len(all_results)
             self.global_summary['overall']['f1'] = sum(r['f1'] for r in all_results) / len(all_results)
@@ -290,6 +296,57 @@ class SWDEEvaluationRunner:
         # Save to file
         self._save_global_summary()
 
+    def _load_llm_usage(self, vertical: str, website: str) -> Optional[Dict]:
+        """
+        Load the per-phase LLM usage recorded by the agent run (llm_usage.json).
+
+        Returns:
+            {'total': {...}, 'by_phase': {...}, 'cascade': {...}} or None if the run did not record usage
+        """
+        usage_file = self.output_root / vertical / website / "llm_usage.json"
+        if not usage_file.exists():
+            return None
+        try:
+            with open(usage_file, 'r', encoding='utf-8') as f:
+                usage = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return {
+            'total': usage.get('total', {}),
+            'by_phase': usage.get('by_phase', {}),
+            'cascade': usage.get('cascade', {}),
+        }
+
+    @staticmethod
+    def _sum_llm_usage(usages: List[Dict]) -> Dict:
+        """Sum per-website LLM usage into overall totals, per-phase totals and per-phase cascade escalations."""
+        def add(target: Dict, stats: Dict) -> None:
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and key != 'prompt_cache_hit_rate':
+                    target[key] = round(target.get(key, 0) + value, 3)
+
+        def with_hit_rate(stats: Dict) -> Dict:
+            prompt_tokens = stats.get('prompt_tokens', 0)
+            rate = stats.get('cached_tokens', 0) / prompt_tokens if prompt_tokens else 0.0
+            return {**stats, 'prompt_cache_hit_rate': round(rate, 4)}
+
+        total, by_phase, cascade = {}, {}, {}
+        for usage in usages:
+            add(total, usage.get('total', {}))
+            for phase, stats in usage.get('by_phase', {}).items():
+                add(by_phase.setdefault(phase, {}), stats)
+            for phase, stats in usage.get('cascade', {}).items():
+                target = cascade.setdefault(phase, {'calls': 0, 'escalations': 0})
+                target['calls'] += stats.get('calls', 0)
+                target['escalations'] += stats.get('escalations', 0)
+        for stats in cascade.values():
+            stats['escalation_rate'] = round(stats['escalations'] / stats['calls'], 4) if stats['calls'] else 0.0
+        return {
+            'total': with_hit_rate(total),
+            'by_phase': {phase: with_hit_rate(stats) for phase, stats in by_phase.items()},
+            'cascade': cascade,
+        }
+
     def _is_agent_completed(self, vertical: str, website: str) -> bool:
         """
         Check if agent has already generated results for a website.
@@ -389,6 +446,15 @@ class SWDEEvaluationRunner:
             print(f"  Precision: {overall['precision']:.2%}")
             print(f"  Recall:    {overall['recall']:.2%}")
             print(f"  F1 Score:  {overall['f1']:.2%}")
+        llm_total = overall.get('llm_usage', {}).get('total')
+        if llm_total:
+            print(f"LLM Usage: {llm_total.get('calls', 0)} calls, {llm_total.get('total_tokens', 0)} tokens, "
+                  f"prompt cache hit rate {llm_total.get('prompt_cache_hit_rate', 0):.1%}")
+            for phase, stats in overall['llm_usage'].get('by_phase', {}).items():
+                print(f"  {phase}: {stats.get('total_tokens', 0)} tokens, {stats.get('latency_seconds', 0):.1f}s")
+            for phase, stats in overall['llm_usage'].get('cascade', {}).items():
+                print(f"  {phase} cascade: {stats['escalations']}/{stats['calls']} escalated "
+                      f"({stats['escalation_rate']:.1%})")
         print(f"{'='*80}\n")
 
     def get_html_directory(self, vertical: str, website: str) -> Path:
@@ -496,11 +562,18 @@ class SWDEEvaluationRunner:
                 result = agent.generate_parser(
                     html_files=html_files,
                     domain=website,
-                    iteration_rounds=3
+                    iteration_rounds=3,
                     # schema_mode and schema_template already set in agent initialization
+                    # In resume mode, phases completed by an interrupted run are reused (checkpoint.json)
+                    resume=self.resume
                 )
 
                 print("-" * 80)
+                # Persist per-phase LLM usage (the CLI path writes the same file)
+                if result.get('llm_usage'):
+                    with open(output_dir / "llm_usage.json", 'w', encoding='utf-8') as f:
+                        json.dump(result['llm_usage'], f, indent=2, ensure_ascii=False)
+
                 if not result.get('success'):
                     error_msg = result.get('error', 'Unknown error')
                     print(f"Error: Agent failed - {error_msg}")
@@ -528,6 +601,9 @@ class SWDEEvaluationRunner:
                 "-o", str(output_dir),
                 "--domain", website
             ]
+            if self.resume:
+                # Reuse phases completed by an interrupted run (checkpoint.json in the output dir)
+                cmd.append("--resume")
 
             print(f"Command: {' '.join(cmd)}")
             print("Running agent (this may take a while)...")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""聚类质量 / 速度基准测试
+
+在带标签的页面集合上（如 SWDE 多个站点混合，站点即真实标签）运行所有聚类策略，
+随语料规模增长统计：
+    - ARI（adjusted Rand index，噪声点各自视为单独一类）
+    - 噪声比例
+    - 耗时（wall time）
+    - 峰值内存（tracemalloc，仅统计主进程的 Python/NumPy 分配，单独一轮运行以免影响计时）
+
+用法示例：
+    python tests/benchmark_cluster.py --dataset evaluationSet/book --sizes 100 500 2000
+    python tests/benchmark_cluster.py --dataset evaluationSet/book --strategies knn bucketed --output bench.json
+
+数据集目录结构：每个子目录是一个站点（标签），子目录下为 .htm/.html 文件，例如
+    evaluationSet/book/book-abebooks(2000)/0000.htm
+
+策略：
+    exact     cluster_html_layouts，逐对 similarity + DBSCAN（O(n^2)，超过 --exact-max 时跳过）
+    fused     cluster_html_layouts_optimized，融合向量 + 全量相似度矩阵
+    knn       cluster_html_layouts_optimized(use_knn_graph=True)，kNN 近似 DBSCAN
+    files     cluster_html_files，按文件流式提取特征（计时包含读文件）
+    bucketed  cluster_html_files(bucketed=True)，粗签名分桶 + 桶内细聚类
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from sklearn.metrics import adjusted_rand_score
+
+from web2json.tools.cluster import (
+    cluster_html_files,
+    cluster_html_layouts,
+    cluster_html_layouts_optimized,
+)
+
+
+STRATEGIES = ["exact", "fused", "knn", "files", "bucketed"]
+
+
+def load_labeled_paths(dataset_dir: Path) -> Dict[str, List[Path]]:
+    """读取数据集目录，返回 {站点名: 文件路径列表}"""
+    sites = {}
+    for site_dir in sorted(p for p in dataset_dir.iterdir() if p.is_dir()):
+        files = sorted(list(site_dir.glob("*.htm")) + list(site_dir.glob("*.html")))
+        if files:
+            sites[site_dir.name] = files
+    return sites
+
+
+def sample_corpus(sites: Dict[str, List[Path]], size: int, seed: int) -> Tuple[List[Path], List[int]]:
+    """从各站点均匀取样，混合成指定规模的语料
+
+    Returns:
+        (文件路径列表, 站点标签列表)，顺序已打乱
+    """
+    rng = random.Random(seed)
+    names = list(sites)
+    per_site = max(1, size // len(names))
+
+    items = []
+    for label, name in enumerate(names):
+        files = sites[name]
+        chosen = rng.sample(files, min(per_site, len(files)))
+        items.extend((path, label) for path in chosen)
+
+    rng.shuffle(items)
+    items = items[:size]
+    return [p for p, _ in items], [l for _, l in items]
+
+
+def score(labels_true: List[int], labels_pred) -> Tuple[float, float, int]:
+    """计算 ARI、噪声比例和簇数量（噪声点各自作为单独一类参与 ARI）"""
+    labels_pred = np.asarray(labels_pred)
+    pred = labels_pred.copy()
+    noise = np.flatnonzero(pred == -1)
+    pred[noise] = pred.max(initial=-1) + 1 + np.arange(len(noise))
+
+    ari = adjusted_rand_score(labels_true, pred)
+    noise_ratio = len(noise) / len(labels_pred) if len(labels_pred) else 0.0
+    n_clusters = len(set(labels_pred.tolist()) - {-1})
+    return ari, noise_ratio, n_clusters
+
+
+def build_runner(strategy: str, args, paths: List[Path], html_list: List[str]) -> Callable:
+    """构建某个策略的执行函数，返回 labels"""
+    threshold = args.threshold
+    common = dict(threshold=threshold, min_samples=args.min_samples, n_jobs=args.n_jobs, cache_dir="")
+
+    if strategy == "exact":
+        return lambda: cluster_html_layouts(
+            html_list, eps=1.0 - threshold, min_samples=args.min_samples, n_jobs=args.n_jobs, cache_dir=""
+        )[0]
+    if strategy == "fused":
+        return lambda: cluster_html_layouts_optimized(html_list, use_knn_graph=False, **common)[0]
+    if strategy == "knn":
+        return lambda: cluster_html_layouts_optimized(
+            html_list, use_knn_graph=True, n_neighbors=args.n_neighbors, **common
+        )[0]
+    if strategy == "files":
+        return lambda: cluster_html_files(paths, bucketed=False, n_neighbors=args.n_neighbors, **common)[0]
+    if strategy == "bucketed":
+        return lambda: cluster_html_files(paths, bucketed=True, n_neighbors=args.n_neighbors, **common)[0]
+    raise ValueError(f"未知策略: {strategy}")
+
+
+def measure(runner: Callable, track_memory: bool) -> Dict:
+    """运行一次并统计耗时；track_memory 时再单独运行一次统计峰值内存"""
+    gc.collect()
+    start = time.perf_counter()
+    labels = runner()
+    elapsed = time.perf_counter() - start
+
+    peak_mb = None
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        runner()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 1024 / 1024
+
+    return {"labels": labels, "seconds": elapsed, "peak_mb": peak_mb}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTML布局聚类质量/速度基准测试")
+    parser.add_argument("--dataset", default="evaluationSet/book", help="数据集目录（每个子目录为一个站点）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2000], help="语料规模列表")
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES, help="参与对比的策略")
+    parser.add_argument("--threshold", type=float, default=0.9, help="相似度阈值（exact 策略使用 eps=1-threshold）")
+    parser.add_argument("--min-samples", type=int, default=3, help="DBSCAN min_samples")
+    parser.add_argument("--n-neighbors", type=int, default=50, help="kNN 近似的近邻个数")
+    parser.add_argument("--n-jobs", type=int, default=1, help="特征提取进程数（默认串行，便于公平计时和统计内存）")
+    parser.add_argument("--exact-max", type=int, default=500, help="exact 策略允许的最大规模")
+    parser.add_argument("--skip-memory", action="store_true", help="不统计峰值内存（省去额外一轮运行）")
+    parser.add_argument("--seed", type=int, default=42, help="取样随机种子")
+    parser.add_argument("--output", help="结果保存为 JSON 文件（可选）")
+    args = parser.parse_args()
+
+    dataset_dir = Path(args.dataset)
+    if not dataset_dir.exists():
+        print(f"数据集目录不存在: {dataset_dir}（SWDE 评测集准备方式见 tests/README.md）")
+        return
+
+    sites = load_labeled_paths(dataset_dir)
+    if len(sites) < 2:
+        print(f"至少需要2个站点子目录，当前: {list(sites)}")
+        return
+    print(f"数据集: {dataset_dir}，{len(sites)} 个站点，共 {sum(len(v) for v in sites.values())} 个文件")
+
+    results = []
+    header = f"{'size':>6} {'strategy':<10} {'ARI':>7} {'noise':>7} {'clusters':>8} {'time(s)':>9} {'peak(MB)':>9}"
+    print(f"\n{header}\n{'-' * len(header)}")
+
+    for size in args.sizes:
+        paths, labels_true = sample_corpus(sites, size, args.seed)
+        html_list = [p.read_text(encoding="utf-8", errors="ignore") for p in paths]
+
+        for strategy in args.strategies:
+            if strategy == "exact" and len(paths) > args.exact_max:
+                print(f"{len(paths):>6} {strategy:<10} {'skipped (> --exact-max)':>45}")
+                continue
+
+            runner = build_runner(strategy, args, paths, html_list)
+            run = measure(runner, track_memory=not args.skip_memory)
+            ari, noise_ratio, n_clusters = score(labels_true, run["labels"])
+
+            row = {
+                "size": len(paths),
+                "strategy": strategy,
+                "ari": round(ari, 4),
+                "noise_ratio": round(noise_ratio, 4),
+                "n_clusters": n_clusters,
+                "seconds": round(run["seconds"], 3),
+                "peak_mb": round(run["peak_mb"], 1) if run["peak_mb"] is not None else None,
+            }
+            results.append(row)
+
+            peak = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "-"
+            print(f"{row['size']:>6} {strategy:<10} {row['ari']:>7.4f} {row['noise_ratio']:>7.2%} "
+                  f"{n_clusters:>8} {row['seconds']:>9.3f} {peak:>9}")
+
+        del html_list
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"dataset": str(dataset_dir), "args": vars(args), "results": results}, f, indent=2)
+        print(f"\n结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+中间产物存储的单元测试
+"""
+import pytest
+
+from web2json.utils.artifact_store import FileSystemArtifactStore, InMemoryArtifactStore
+
+
+class TestArtifactStore:
+    """落盘策略与读写测试类"""
+
+    @pytest.mark.unit
+    def test_filesystem_store(self, tmp_path):
+        """测试: 默认全部落盘，路径和 key 均可读取，写入不留下临时文件"""
+        store = FileSystemArtifactStore(tmp_path / "out")
+        assert not (tmp_path / "out").exists()
+
+        path = store.put_json("schemas/final_schema.json", {"title": "标题"})
+        assert path == str(tmp_path / "out" / "schemas" / "final_schema.json")
+        assert "标题" in (tmp_path / "out" / "schemas" / "final_schema.json").read_text(encoding="utf-8")
+        assert store.get_json(path) == store.get_json("schemas/final_schema.json") == {"title": "标题"}
+        assert store.keys() == ["schemas/final_schema.json"]
+        assert store.get_text("missing.txt") is None
+        assert store.get_text(tmp_path / "elsewhere.txt") is None
+
+    @pytest.mark.unit
+    def test_persist_patterns(self, tmp_path):
+        """测试: 指定 persist 时只有 fnmatch 匹配的 key 落盘，其余只保存在内存中"""
+        store = FileSystemArtifactStore(tmp_path, persist=["schemas/final_schema.json", "result/*"])
+        store.put_text("schemas/final_schema.json", "{}")
+        store.put_text("schemas/schema_round_1.json", "{}")
+        store.put_text("result/page_1.json", "{}")
+        store.put_text("html_simplified/page_1.html", "<html></html>")
+
+        on_disk = sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("*") if p.is_file())
+        assert on_disk == ["result/page_1.json", "schemas/final_schema.json"]
+        assert store.get_text("html_simplified/page_1.html") == "<html></html>"
+        assert store.exists("schemas/schema_round_1.json")
+        assert store.keys("schemas/") == ["schemas/final_schema.json", "schemas/schema_round_1.json"]
+
+        # 新的存储只能看到已落盘的内容
+        reopened = FileSystemArtifactStore(tmp_path, persist=["schemas/final_schema.json", "result/*"])
+        assert reopened.keys() == ["result/page_1.json", "schemas/final_schema.json"]
+        assert not reopened.exists("schemas/schema_round_1.json")
+
+    @pytest.mark.unit
+    def test_in_memory_store(self, tmp_path):
+        """测试: 内存存储不读写磁盘"""
+        store = InMemoryArtifactStore(tmp_path / "out")
+        path = store.put_text("parsers/final_parser.py", "class WebPageParser: ...")
+
+        assert path == str(tmp_path / "out" / "parsers" / "final_parser.py")
+        assert store.get_text(path) == "class WebPageParser: ..."
+        assert store.keys("parsers/") == ["parsers/final_parser.py"]
+        assert not (tmp_path / "out").exists()
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,85 @@
+"""
+阶段级断点清单的单元测试
+"""
+import pytest
+
+from web2json.agent.checkpoint import CheckpointManifest, settings_snapshot
+from web2json.agent.phases import CodePhase
+from web2json.agent.processors import CodeProcessor
+from web2json.config.settings import settings
+from web2json.tools.template_diff import PLACEHOLDER
+from web2json.utils.artifact_store import InMemoryArtifactStore
+
+NAV = "<nav>" + "".join(f"<a href='/c/{i}'>Category number {i}</a>" for i in range(20)) + "</nav>"
+
+
+class TestCheckpoint:
+    """输入指纹失效和输出文件检查测试类"""
+
+    @pytest.fixture
+    def store(self):
+        return InMemoryArtifactStore("out")
+
+    @pytest.mark.unit
+    def test_load_recorded_step(self, store):
+        """测试: 输入和配置未变化、输出文件存在时复用记录的输出"""
+        store.put_text("schemas/final_schema.json", "{}")
+        manifest = CheckpointManifest(store)
+        inputs_hash = manifest.inputs_hash("schema_phase", {"samples": [["a.html", "abc"]]})
+        manifest.record("schema_phase", inputs_hash, {"success": True}, ["schemas/final_schema.json"])
+
+        reloaded = CheckpointManifest(store)
+        assert reloaded.load("schema_phase", inputs_hash) == {"success": True}
+        assert reloaded.load("code_phase", inputs_hash) is None
+
+    @pytest.mark.unit
+    def test_hash_invalidation(self, store, monkeypatch):
+        """测试: 样本内容或影响输出的配置变化时指纹不同，步骤重新执行"""
+        manifest = CheckpointManifest(store)
+        inputs = {"samples": [["a.html", "abc"]]}
+        inputs_hash = manifest.inputs_hash("code_phase", inputs)
+        manifest.record("code_phase", inputs_hash, {"success": True}, [])
+
+        assert manifest.inputs_hash("code_phase", {"samples": [["a.html", "abd"]]}) != inputs_hash
+        for key, value in [("code_gen_max_tokens", 123), ("agent_cascade_model", "small-model"),
+                           ("cascade_min_field_fill_rate", 0.01), ("sample_selection_strategy", "random")]:
+            assert key in settings_snapshot()
+            with monkeypatch.context() as patch:
+                patch.setattr(settings, key, value)
+                assert manifest.load("code_phase", manifest.inputs_hash("code_phase", inputs)) is None
+
+        # 并发等不影响输出的配置不参与指纹
+        monkeypatch.setattr(settings, "max_concurrent_extractions", 99)
+        assert manifest.inputs_hash("code_phase", inputs) == inputs_hash
+
+    @pytest.mark.unit
+    def test_missing_files(self, store):
+        """测试: 记录的输出文件缺失时视为未完成"""
+        manifest = CheckpointManifest(store)
+        inputs_hash = manifest.inputs_hash("code_phase", {})
+        manifest.record("code_phase", inputs_hash, {"success": True}, ["parsers/final_parser.py", None])
+        assert manifest.load("code_phase", inputs_hash) is None
+
+        store.put_text("parsers/final_parser.py", "class WebPageParser: ...")
+        assert manifest.load("code_phase", inputs_hash) == {"success": True}
+
+    @pytest.mark.unit
+    def test_resume_rederives_prompt_html(self, store, monkeypatch):
+        """测试: 续跑时清单中没有 Prompt HTML，代码阶段从存储读取精简 HTML 后重新折叠模板区域"""
+        monkeypatch.setattr(settings, "template_diff_enabled", True)
+        monkeypatch.setattr(settings, "template_min_region_chars", 100)
+        rounds = []
+        for i in (1, 2):
+            html_path = store.put_text(
+                f"html_simplified/schema_round_{i}.html",
+                f"<html><body>{NAV}<h1>Item {i}</h1></body></html>",
+            )
+            rounds.append({"round": i, "success": True, "html_path": html_path, "groundtruth_schema": {}})
+
+        samples = CodePhase(CodeProcessor(store), output_dir=None)._load_samples(rounds)
+
+        assert [sample["round"] for sample in samples] == [1, 2]
+        for sample in samples:
+            assert "Category number" in sample["html_content"]
+            assert PLACEHOLDER in sample["prompt_html"]
+            assert "Category number" not in sample["prompt_html"]
@@ -6,6 +6,7 @@ import time
 from pathlib import Path
 from typing import List
 
+import numpy as np
 import pytest
 
 from web2json.tools import cluster_html_layouts, get_feature
@@ -296,6 +297,241 @@ class TestCluster:
         assert sim_mat.shape == (1, 1)
         assert sim_mat[0, 0] == 1.0
 
+    @staticmethod
+    def _synthetic_layouts(n_per_layout: int = 4) -> List[str]:
+        """构造两种布局（列表页/详情页）的合成HTML"""
+        list_page = (
+            '<html><body><div class="header"><ul class="nav"><li>a</li><li>b</li></ul></div>'
+            '<div class="list">' + ''.join(f'<div class="item"><a href="/{i}">item</a></div>' for i in range(5)) +
+            '</div><div class="footer"><p>footer</p></div></body></html>'
+        )
+        detail_page = (
+            '<html><body><table class="main"><tr><td><h1>title</h1></td></tr>'
+            '<tr><td><span class="price">1</span><span class="author">x</span></td></tr></table>'
+            '<form id="search"><input type="text"/></form></body></html>'
+        )
+        return [list_page] * n_per_layout + [detail_page] * n_per_layout
+
+    @pytest.mark.unit
+    def test_layout_model_assign(self):
+        """测试: 布局模型将已知布局路由到原簇，陌生布局标记为新布局"""
+        from web2json.tools import fit_layout_model
+
+        html_list = self._synthetic_layouts()
+        model, labels = fit_layout_model(html_list, min_samples=2)
+
+        assert model.n_clusters == 2
+        for html, lbl in zip(html_list, labels):
+            label, sim = model.assign(html)
+            assert label == lbl
+            assert sim == pytest.approx(1.0, abs=1e-5)
+
+        novel = '<html><body><section><article><p>a</p></article></section><aside><nav>x</nav></aside></body></html>'
+        label, _ = model.assign(novel)
+        assert label == -1
+
+    @pytest.mark.unit
+    def test_layout_model_loose_cluster(self):
+        """测试: 成员间相似度低于阈值的松散簇不放宽接受条件，低于阈值的陌生布局仍标记为新布局"""
+        from web2json.tools import LayoutModel
+
+        members = [
+            '<html><body><div><h1>t</h1><p>x</p></div></body></html>',
+            '<html><body><section><article><p>a</p></article></section><aside><nav>x</nav></aside></body></html>',
+        ]
+        model = LayoutModel.fit([get_feature(html) for html in members], np.array([0, 0]), threshold=0.9)
+        assert model.min_similarities[0] < 0.9
+
+        novel = '<html><body><div><h1>t</h1></div><aside><nav>x</nav></aside></body></html>'
+        label, sim = model.assign(novel)
+        assert model.min_similarities[0] < sim < 0.9
+        assert label == -1
+
+    @pytest.mark.unit
+    def test_layout_model_save_load(self, tmp_path):
+        """测试: 布局模型保存后重新加载，路由结果保持一致"""
+        from web2json.tools import LayoutModel, fit_layout_model
+
+        html_list = self._synthetic_layouts()
+        model, _ = fit_layout_model(html_list, min_samples=2)
+        path = model.save(tmp_path / "layout_model.json")
+        loaded = LayoutModel.load(path)
+
+        assert loaded.layer_n == model.layer_n
+        assert loaded.cluster_labels == model.cluster_labels
+        for html in html_list:
+            assert loaded.assign(html) == pytest.approx(model.assign(html))
+
+
+    @pytest.mark.unit
+    def test_feature_cache_and_sweep(self, tmp_path):
+        """测试: 特征缓存命中结果与直接提取一致，参数扫描复用同一近邻图"""
+        from web2json.tools import sweep_cluster_params
+        from web2json.tools.cluster import _compute_features
+
+        html_list = self._synthetic_layouts() + ["<html><body></body></html>"]
+        cache_dir = str(tmp_path / "cache")
+
+        first = _compute_features(html_list, n_jobs=1, cache_dir=cache_dir)
+        second = _compute_features(html_list, n_jobs=1, cache_dir=cache_dir)
+        assert first == second == [get_feature(html) for html in html_list]
+
+        html_list = html_list[:-1]
+        results = sweep_cluster_params(
+            html_list, eps_values=[0.05, 0.1], min_samples_values=[2, 10], cache_dir=cache_dir
+        )
+        assert [(r["eps"], r["min_samples"]) for r in results] == [(0.05, 2), (0.05, 10), (0.1, 2), (0.1, 10)]
+        assert results[0]["n_clusters"] == 2
+        assert results[0]["noise_ratio"] == 0.0
+        assert results[1]["n_clusters"] == 0
+        assert results[1]["noise_ratio"] == 1.0
+        assert list((tmp_path / "cache").rglob("*.npz"))
+
+
+    @pytest.mark.unit
+    def test_cluster_html_files(self, tmp_path):
+        """测试: 按文件路径聚类与按HTML字符串聚类结果一致，簇以路径返回"""
+        from web2json.tools import cluster_html_files
+        from web2json.tools.cluster import cluster_html_layouts_optimized
+
+        html_list = self._synthetic_layouts()
+        paths = []
+        for i, html in enumerate(html_list):
+            path = tmp_path / f"page_{i}.html"
+            path.write_text(html, encoding="utf-8")
+            paths.append(path)
+
+        labels, clusters = cluster_html_files(iter(paths), min_samples=2, n_jobs=1, cache_dir="")
+        expected, _, _ = cluster_html_layouts_optimized(html_list, min_samples=2, use_knn_graph=True, cache_dir="")
+
+        assert labels.tolist() == expected.tolist()
+        assert sorted(sum(clusters, [])) == sorted(str(p) for p in paths)
+        assert all(isinstance(p, str) for cluster in clusters for p in cluster)
+
+
+    @pytest.mark.unit
+    def test_cluster_bucketed(self):
+        """测试: 两阶段分桶聚类与单阶段聚类划分一致，各桶标签全局唯一"""
+        from sklearn.metrics import adjusted_rand_score
+        from web2json.tools.cluster import (
+            _compute_features,
+            cluster_features_bucketed,
+            cluster_features_optimized,
+        )
+
+        html_list = self._synthetic_layouts()
+        names = [f"list_{i}.html" for i in range(4)] + [f"detail_{i}.html" for i in range(4)]
+        features = _compute_features(html_list, n_jobs=1, cache_dir="")
+
+        expected, _ = cluster_features_optimized(features, min_samples=2)
+        labels = cluster_features_bucketed(features, names=names, min_samples=2, n_jobs=1)
+
+        assert adjusted_rand_score(expected, labels) == 1.0
+        assert sorted(set(labels.tolist())) == [0, 1]
+
+
+    @pytest.mark.unit
+    def test_select_diverse_samples(self, tmp_path):
+        """测试: 多样性样本选择剔除近似重复页面，并覆盖不同布局"""
+        from web2json.tools.sample_selector import select_diverse_samples
+
+        list_page, detail_page = self._synthetic_layouts(1)
+        pages = [list_page] * 3 + [
+            detail_page.replace("title", f"title {word}").replace(">x<", f">{word} author<")
+            for word in ["alpha beta gamma", "delta epsilon zeta", "eta theta iota"]
+        ]
+        paths = []
+        for i, html in enumerate(pages):
+            path = tmp_path / f"page_{i}.html"
+            path.write_text(html, encoding="utf-8")
+            paths.append(str(path))
+
+        samples = select_diverse_samples(paths, n=3)
+
+        assert len(samples) == 3
+        assert len(set(samples)) == 3
+        assert sum(1 for p in samples if p in paths[:3]) == 1  # 三个完全相同的列表页只保留一个
+
+    @pytest.mark.unit
+    def test_select_samples_same_template(self, tmp_path):
+        """测试: 同一模板的详情页只因导航、页脚等模板文本相同时不被当作重复；完全相同的页面不足时按距离补足"""
+        from web2json.tools.sample_selector import select_samples
+
+        nav = "<nav>" + " ".join(f"<a href='/c/{i}'>Category {i} shoes bags watches</a>" for i in range(30)) + "</nav>"
+        footer = "<footer>" + "Copyright Example Shop, all rights reserved, contact us, privacy policy. " * 5 + "</footer>"
+        names = ["Camera", "Lens", "Tripod", "Flash", "Bag", "Strap", "Filter", "Battery", "Charger", "Drone"]
+        paths = []
+        for i, name in enumerate(names):
+            path = tmp_path / f"page_{i}.html"
+            path.write_text(
+                f"<html><body>{nav}<div class='main'><h1>{name} model {i}</h1>"
+                f"<span class='price'>${i * 100 + 99}</span></div>{footer}</body></html>",
+                encoding="utf-8",
+            )
+            paths.append(str(path))
+
+        samples = select_samples(paths, 5, strategy="diverse")
+        assert len(samples) == 5 and len(set(samples)) == 5
+
+        duplicates = []
+        for i in range(4):
+            path = tmp_path / f"duplicate_{i}.html"
+            path.write_text(Path(paths[0]).read_text(encoding="utf-8"), encoding="utf-8")
+            duplicates.append(str(path))
+        samples = select_samples(duplicates + paths[1:2], 3, strategy="diverse")
+        assert len(samples) == 3 and paths[1] in samples[:2]
+
+    @pytest.mark.unit
+    def test_non_utf8_files(self, tmp_path):
+        """测试: 非 UTF-8 编码的文件按替换字符读取，特征提取和样本选择不跳过该页面"""
+        from web2json.tools.cluster import _compute_features
+        from web2json.tools.sample_selector import select_diverse_samples
+
+        list_page, detail_page = self._synthetic_layouts(1)
+        gbk_path = tmp_path / "gbk.html"
+        gbk_path.write_bytes(detail_page.replace("title", "商品标题").encode("gbk"))
+        utf8_path = tmp_path / "utf8.html"
+        utf8_path.write_text(list_page, encoding="utf-8")
+        paths = [str(gbk_path), str(utf8_path)]
+
+        features = _compute_features(paths, n_jobs=1, from_files=True)
+        assert features[0] and features[0] == get_feature(gbk_path.read_text(encoding="utf-8", errors="replace"))
+        assert sorted(select_diverse_samples(paths, n=2)) == sorted(paths)
+
+    @pytest.mark.unit
+    def test_text_simhash_without_text(self):
+        """测试: 无正文页面按标签结构计算指纹，不同结构的页面不被当作重复"""
+        from web2json.tools.sample_selector import hamming_distance, text_simhash
+
+        gallery = "<html><body><div class='gallery'>" + "".join(
+            f"<img src='/img/{i}.jpg'>" for i in range(10)) + "</div></body></html>"
+        video = "<html><body><section id='player'><video src='/v/1.mp4'></video>" \
+                "<canvas width='640'></canvas></section></body></html>"
+
+        assert text_simhash(gallery) != 0 and text_simhash(video) != 0
+        assert hamming_distance(text_simhash(gallery), text_simhash(video)) > 3
+        assert text_simhash(gallery) == text_simhash(gallery)
+
+
+    @pytest.mark.unit
+    def test_compact_feature_vectors(self):
+        """测试: CompactFeature 直接构建的 CSR 向量与字典特征向量化的相似度一致"""
+        import pickle
+
+        import numpy as np
+        from sklearn.feature_extraction import DictVectorizer
+        from sklearn.metrics.pairwise import cosine_similarity
+        from web2json.tools.html_layout_cosin import fuse_feature_dicts, fuse_features_sparse, to_compact
+
+        features = [get_feature(html) for html in self._synthetic_layouts(2)]
+        compact = [pickle.loads(pickle.dumps(to_compact(f))) for f in features]
+
+        for layer_n in (1, 2, 3, 5):
+            expected = DictVectorizer(sparse=False).fit_transform(fuse_feature_dicts(features, layer_n=layer_n))
+            vecs = fuse_features_sparse(compact, layer_n=layer_n)
+            assert vecs.shape == expected.shape
+            np.testing.assert_allclose(cosine_similarity(vecs), cosine_similarity(expected), atol=1e-6)
+
 
 if __name__ == "__main__":
     # 允许直接运行测试文件
@@ -0,0 +1,141 @@
+"""
+代码阶段（逐轮校验、并行候选）的单元测试
+模型调用以本地函数替代，不访问网络
+"""
+import threading
+import time
+
+import pytest
+
+import web2json.utils.llm_cascade as llm_cascade
+from web2json.agent.phases import CodePhase
+from web2json.agent.processors import CodeProcessor
+from web2json.config.settings import settings
+from web2json.utils.artifact_store import InMemoryArtifactStore
+
+GOOD_CODE = '''
+from lxml import html
+
+class WebPageParser:
+    def parse(self, html_content):
+        tree = html.fromstring(html_content)
+        return {"title": tree.findtext(".//h1"), "price": tree.findtext(".//span")}
+'''
+
+PARTIAL_CODE = '''
+from lxml import html
+
+class WebPageParser:
+    def parse(self, html_content):
+        return {"title": html.fromstring(html_content).findtext(".//h1"), "price": None}
+'''
+
+POSITIONAL_CODE = '''
+from lxml import html
+
+class WebPageParser:
+    def parse(self, html_content):
+        tree = html.fromstring(html_content)
+        return {"title": "".join(tree.xpath("/html/body/h1/text()")) or None,
+                "price": "".join(tree.xpath("/html/body/span/text()")) or None}
+'''
+
+FINAL_SCHEMA = {"title": {"type": "string"}, "price": {"type": "string"}}
+
+
+def _rounds(count: int):
+    rounds = []
+    for i in range(1, count + 1):
+        html_content = f"<html><body><h1>Item {i}</h1><span>${i},299</span></body></html>"
+        rounds.append({
+            "round": i,
+            "url": f"page_{i}.html",
+            "success": True,
+            "html_path": f"html_simplified/schema_round_{i}.html",
+            "html_content": html_content,
+            "groundtruth_schema": {"title": {"value_sample": f"Item {i}"}, "price": {"value_sample": f"${i},299"}},
+        })
+    return rounds
+
+
+class TestCodePhase:
+    """代码阶段测试类"""
+
+    @pytest.fixture
+    def store(self):
+        return InMemoryArtifactStore("out")
+
+    @pytest.mark.unit
+    def test_sequential_validation_early_stop(self, store, monkeypatch):
+        """测试: 第二轮解析器在所有样本上通过后提前结束"""
+        replies = [PARTIAL_CODE, GOOD_CODE]
+
+        def fake_cascade(scenario, messages, parse, check=None, **kwargs):
+            return None, parse(replies.pop(0))
+
+        monkeypatch.setattr(llm_cascade, "cascade_completion", fake_cascade)
+        monkeypatch.setattr(settings, "code_parallel_candidates", 0)
+        monkeypatch.setattr(settings, "code_iteration_validation", True)
+
+        result = CodePhase(CodeProcessor(store), output_dir=None).execute(FINAL_SCHEMA, _rounds(3))
+
+        assert result["success"] and result["early_stopped"]
+        assert len(result["rounds"]) == 2
+        assert result["validation"]["passed_samples"] == 3
+        assert store.get_text("parsers/final_parser.py").strip() == GOOD_CODE.strip()
+
+    @pytest.mark.unit
+    def test_parallel_candidates(self, store, monkeypatch):
+        """测试: 并行候选受并发上限约束，不写共享文件，选出校验失败最少的候选"""
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+
+        def fake_cascade(scenario, messages, parse, check=None, temperature=None, **kwargs):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            # 第二遍循环样本时温度升高，返回正确的解析器
+            return None, parse(GOOD_CODE if temperature > settings.code_gen_temperature else PARTIAL_CODE)
+
+        monkeypatch.setattr(llm_cascade, "cascade_completion", fake_cascade)
+        monkeypatch.setattr(settings, "code_parallel_candidates", 4)
+        monkeypatch.setattr(settings, "code_candidate_refine", False)
+        monkeypatch.setattr(settings, "max_concurrent_extractions", 2)
+
+        result = CodePhase(CodeProcessor(store), output_dir=None).execute(FINAL_SCHEMA, _rounds(2))
+
+        assert result["success"]
+        assert state["peak"] <= 2
+        assert len(result["rounds"]) == 4
+        assert result["validation"]["passed_samples"] == 2
+        assert store.get_text("parsers/final_parser.py").strip() == GOOD_CODE.strip()
+        assert not store.exists("parsers/generated_parser.py")
+        assert not store.exists("parsers/schema.json")
+        assert store.keys("parsers/parser_candidate_") == [f"parsers/parser_candidate_{i}.py" for i in range(1, 5)]
+
+    @pytest.mark.unit
+    def test_validate_on_original_html(self, store, monkeypatch):
+        """测试: 解析器在原始 HTML 上校验，只在精简 HTML 上有效的解析器不被采用"""
+        replies = [POSITIONAL_CODE, GOOD_CODE]
+
+        def fake_cascade(scenario, messages, parse, check=None, **kwargs):
+            return None, parse(replies.pop(0))
+
+        monkeypatch.setattr(llm_cascade, "cascade_completion", fake_cascade)
+        monkeypatch.setattr(settings, "code_parallel_candidates", 0)
+        monkeypatch.setattr(settings, "code_iteration_validation", True)
+
+        rounds = _rounds(3)
+        for r in rounds:
+            # 原始页面多一层容器，精简时被去掉
+            original = r["html_content"].replace("<body>", "<body><div class='page'>").replace("</body>", "</div></body>")
+            r["html_original_path"] = store.put_text(f"html_original/schema_round_{r['round']}.html", original)
+
+        result = CodePhase(CodeProcessor(store), output_dir=None).execute(FINAL_SCHEMA, rounds)
+
+        assert result["success"] and result["early_stopped"]
+        assert len(result["rounds"]) == 2
+        assert store.get_text("parsers/final_parser.py").strip() == GOOD_CODE.strip()
@@ -0,0 +1,114 @@
+"""
+LLM 响应磁盘缓存的单元测试
+"""
+import os
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from web2json.config.settings import settings
+from web2json.utils import llm_cache, llm_client
+from web2json.utils.llm_cache import LLMCache, LLMCacheMiss, make_cache_key
+from web2json.utils.llm_client import LLMClient
+
+MESSAGES = [{"role": "system", "content": "你是网页解析助手"}, {"role": "user", "content": "<html></html>"}]
+
+
+class FakeChatModel:
+    """记录调用次数的模型，不访问网络"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        self.calls += 1
+        return llm_client._StreamedResponse('{"title": "a"}')
+
+
+class TestLlmCache:
+    """缓存键、TTL、回放模式和容量淘汰测试类"""
+
+    @pytest.mark.unit
+    def test_cache_key(self):
+        """测试: 缓存键只由模型、温度、消息内容、Prompt 版本和附加参数决定"""
+        key = make_cache_key("gpt-4", 0.3, MESSAGES, "v1")
+
+        assert key == make_cache_key("gpt-4", 0.3, [dict(m) for m in MESSAGES], "v1")
+        # LangChain 消息对象按 (type, content) 计算，与对象实例无关
+        lc_messages = [SystemMessage(content="你是网页解析助手"), HumanMessage(content="<html></html>")]
+        assert make_cache_key("gpt-4", 0.3, lc_messages, "v1") == make_cache_key(
+            "gpt-4", 0.3, [SystemMessage(content="你是网页解析助手"), HumanMessage(content="<html></html>")], "v1"
+        )
+        assert key != make_cache_key("gpt-4o", 0.3, MESSAGES, "v1")
+        assert key != make_cache_key("gpt-4", 0.0, MESSAGES, "v1")
+        assert key != make_cache_key("gpt-4", 0.3, MESSAGES, "v2")
+        assert key != make_cache_key("gpt-4", 0.3, MESSAGES, "v1", extra={"max_tokens": 100})
+        assert key != make_cache_key("gpt-4", 0.3, MESSAGES[:1], "v1")
+
+    @pytest.mark.unit
+    def test_readwrite_and_ttl(self, tmp_path, monkeypatch):
+        """测试: 写入后命中，超过 TTL 的条目读取时删除"""
+        cache = LLMCache(str(tmp_path), mode="readwrite", ttl_seconds=60)
+        key = make_cache_key("gpt-4", 0.3, MESSAGES)
+        assert cache.get(key) is None
+
+        cache.put(key, "{}", usage={"total_tokens": 10})
+        assert cache.get(key)["response"] == "{}"
+        assert cache.stats() == {"hits": 1, "misses": 1}
+
+        now = time.time()
+        monkeypatch.setattr("web2json.utils.llm_cache.time.time", lambda: now + 61)
+        assert cache.get(key) is None
+        assert not cache._path(key).exists()
+
+    @pytest.mark.unit
+    def test_replay_mode_is_read_only(self, tmp_path):
+        """测试: replay 模式只读已有条目，不写入新条目；不支持的模式报错"""
+        key = make_cache_key("gpt-4", 0.3, MESSAGES)
+        LLMCache(str(tmp_path)).put(key, "cached")
+
+        replay = LLMCache(str(tmp_path), mode="replay")
+        assert replay.get(key)["response"] == "cached"
+        other = make_cache_key("gpt-4", 0.3, MESSAGES[:1])
+        replay.put(other, "new")
+        assert replay.get(other) is None
+
+        with pytest.raises(ValueError):
+            LLMCache(str(tmp_path), mode="write-only")
+
+    @pytest.mark.unit
+    def test_replay_miss_does_not_call_model(self, tmp_path, monkeypatch):
+        """测试: replay 模式下命中直接返回，未命中抛出 LLMCacheMiss 且不请求模型"""
+        monkeypatch.setattr(llm_client, "_load_default_tokenizer", llm_client._ApproxTokenizer)
+        monkeypatch.setattr(LLMClient, "_instances", {})
+        monkeypatch.setattr(llm_cache, "_cache_instance", None)
+        monkeypatch.setattr(settings, "llm_cache_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "llm_streaming", False)
+        monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+        client = LLMClient(api_key="test", model="cache-test-model")
+        model = FakeChatModel()
+        monkeypatch.setattr(client, "client", model)
+
+        monkeypatch.setattr(settings, "llm_cache_mode", "readwrite")
+        assert client.chat_completion(MESSAGES) == '{"title": "a"}'
+        monkeypatch.setattr(settings, "llm_cache_mode", "replay")
+        assert client.chat_completion(MESSAGES) == '{"title": "a"}'
+        with pytest.raises(LLMCacheMiss):
+            client.chat_completion(MESSAGES[:1])
+
+        assert model.calls == 1
+
+    @pytest.mark.unit
+    def test_evict_oldest_when_over_size(self, tmp_path):
+        """测试: 超过容量上限时按最近访问时间淘汰最旧的条目"""
+        cache = LLMCache(str(tmp_path), max_size_bytes=0)
+        keys = [make_cache_key("gpt-4", 0.3, [{"role": "user", "content": str(i)}]) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, "x" * 100)
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        cache.max_size_bytes = sum(cache._path(key).stat().st_size for key in keys[1:])
+
+        assert cache.evict() == 1
+        assert not cache._path(keys[0]).exists()
+        assert cache._path(keys[1]).exists() and cache._path(keys[2]).exists()
@@ -0,0 +1,123 @@
+"""
+模型级联的单元测试
+模型客户端以本地对象替代，不访问网络
+"""
+import json
+
+import pytest
+
+from web2json.config.settings import settings
+from web2json.tools.code_generator import generate_parser_code
+from web2json.tools.schema_extraction import extract_schema_from_html
+from web2json.tools.template_diff import PLACEHOLDER
+from web2json.utils.artifact_store import InMemoryArtifactStore
+from web2json.utils.llm_cascade import cascade_completion
+from web2json.utils.llm_client import LLMClient
+from web2json.utils.usage_tracker import llm_phase, track_usage
+
+
+class FakeClient:
+    """按预设回复返回的模型客户端"""
+
+    def __init__(self, model: str, reply: str):
+        self.model = model
+        self.reply = reply
+        self.calls = 0
+
+    def chat_completion(self, messages, temperature=None, validator=None, **kwargs):
+        self.calls += 1
+        return self.reply
+
+
+NAV = "<nav><a class='brand'>Acme</a><a class='category'>Cameras</a></nav>"
+FULL_HTML = f"<html><body>{NAV}<h1>Camera X100</h1></body></html>"
+# 折叠模板区域后的 Prompt HTML，导航的内容被替换为占位注释
+PROMPT_HTML = FULL_HTML.replace(NAV, f"<nav><!--{PLACEHOLDER}--></nav>")
+
+NAV_CODE = '''
+from lxml import html
+
+class WebPageParser:
+    def parse(self, html_content):
+        tree = html.fromstring(html_content)
+        return {"title": tree.findtext(".//h1"), "brand": tree.findtext(".//a[@class='brand']"),
+                "category": tree.findtext(".//a[@class='category']")}
+'''
+
+NAV_SCHEMA = json.dumps({
+    "title": {"type": "string", "xpath": "//h1/text()"},
+    "brand": {"type": "string", "xpath": "//a[@class='brand']/text()"},
+    "category": {"type": "string", "xpath": "//a[@class='category']/text()"},
+})
+
+
+def _check_fields(result):
+    if not result.get("title"):
+        raise ValueError("缺少 title")
+
+
+class TestLlmCascade:
+    """廉价模型采用、升级和统计测试类"""
+
+    def _use_clients(self, monkeypatch, *clients):
+        monkeypatch.setattr(LLMClient, "cascade_for_scenario", classmethod(lambda cls, scenario: list(clients)))
+
+    @pytest.mark.unit
+    def test_cheap_model_accepted(self, monkeypatch):
+        """测试: 廉价模型输出通过校验时直接采用，不调用主模型"""
+        cheap, main = FakeClient("mini", '{"title": "a"}'), FakeClient("main", '{"title": "b"}')
+        self._use_clients(monkeypatch, cheap, main)
+
+        with track_usage() as tracker, llm_phase("schema_extraction"):
+            content, result = cascade_completion("default", [], json.loads, _check_fields)
+
+        assert result == {"title": "a"} and main.calls == 0
+        assert tracker.summary()["cascade"]["schema_extraction"]["escalations"] == 0
+
+    @pytest.mark.unit
+    def test_escalate_on_failed_check(self, monkeypatch):
+        """测试: 廉价模型输出无法解析或未通过校验时升级，主模型输出只需解析成功"""
+        cheap, main = FakeClient("mini", '{"title": ""}'), FakeClient("main", '{"title": ""}')
+        self._use_clients(monkeypatch, cheap, main)
+
+        with track_usage() as tracker, llm_phase("code_iteration"):
+            _, result = cascade_completion("code_gen", [], json.loads, _check_fields)
+            cheap.reply = "not json"
+            cascade_completion("code_gen", [], json.loads, _check_fields)
+
+        assert result == {"title": ""}
+        assert cheap.calls == 2 and main.calls == 2
+        assert tracker.summary()["cascade"]["code_iteration"]["escalation_rate"] == 1.0
+
+    @pytest.mark.unit
+    def test_single_model(self, monkeypatch):
+        """测试: 未配置廉价模型时等同于直接调用主模型，失败时抛出异常且不记录级联"""
+        main = FakeClient("main", "not json")
+        self._use_clients(monkeypatch, main)
+
+        with track_usage() as tracker:
+            with pytest.raises(ValueError):
+                cascade_completion("default", [], json.loads, _check_fields)
+            main.reply = '{"title": ""}'
+            assert cascade_completion("default", [], json.loads, _check_fields)[1] == {"title": ""}
+
+        assert "cascade" not in tracker.summary()
+
+    @pytest.mark.unit
+    def test_check_on_full_html(self, monkeypatch):
+        """测试: Prompt 使用折叠后的 HTML 时，级联校验在完整页面上运行，取自被折叠区域的字段不触发升级"""
+        monkeypatch.setattr(settings, "schema_node_id_mode", False)
+        cheap, main = FakeClient("mini", NAV_CODE), FakeClient("main", NAV_CODE)
+        self._use_clients(monkeypatch, cheap, main)
+        target = {"title": "string", "brand": "string", "category": "string"}
+
+        generate_parser_code(PROMPT_HTML, target, store=InMemoryArtifactStore("out"), full_html=FULL_HTML)
+        assert cheap.calls == 1 and main.calls == 0
+        generate_parser_code(PROMPT_HTML, target, store=InMemoryArtifactStore("out"))
+        assert main.calls == 1
+
+        cheap.reply = main.reply = NAV_SCHEMA
+        extract_schema_from_html(PROMPT_HTML, full_html=FULL_HTML)
+        assert cheap.calls == 3 and main.calls == 1
+        extract_schema_from_html(PROMPT_HTML)
+        assert main.calls == 2
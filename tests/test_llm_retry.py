@@ -0,0 +1,139 @@
+"""
+LLM 调用重试、截止时间与对冲请求的单元测试
+"""
+import asyncio
+import threading
+
+import httpx
+import openai
+import pytest
+
+import web2json.utils.llm_retry as llm_retry
+from web2json.config.settings import settings
+from web2json.utils.llm_retry import (
+    LLMDeadlineExceeded,
+    LLMTelemetry,
+    acall_with_retry,
+    call_with_retry,
+    is_retryable,
+    retry_delay,
+)
+
+
+def _status_error(cls, status: int, headers=None):
+    response = httpx.Response(status, headers=headers, request=httpx.Request("POST", "http://llm.test/v1"))
+    return cls("error", response=response, body=None)
+
+
+class Flaky:
+    """前 failures 次调用抛出 error，之后返回 'ok'"""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.calls = []
+
+    def __call__(self, timeout):
+        self.calls.append(timeout)
+        if len(self.calls) <= self.failures:
+            raise self.error
+        return "ok"
+
+
+class TestLlmRetry:
+    """重试判断、退避、截止时间和对冲测试类"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, monkeypatch):
+        LLMTelemetry.reset()
+        self.sleeps = []
+        monkeypatch.setattr(llm_retry.time, "sleep", self.sleeps.append)
+        monkeypatch.setattr(settings, "llm_max_retries", 3)
+        monkeypatch.setattr(settings, "llm_retry_base_delay", 1.0)
+        monkeypatch.setattr(settings, "llm_retry_max_delay", 30.0)
+        monkeypatch.setattr(settings, "llm_call_deadline", 0)
+        monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+        yield
+        LLMTelemetry.reset()
+
+    @pytest.mark.unit
+    def test_is_retryable(self):
+        """测试: 限流、5xx、超时和连接错误可重试，4xx 和普通异常不重试"""
+        assert is_retryable(_status_error(openai.RateLimitError, 429))
+        assert is_retryable(_status_error(openai.InternalServerError, 503))
+        assert is_retryable(httpx.ReadTimeout("timeout"))
+        assert is_retryable(ConnectionError())
+        assert not is_retryable(_status_error(openai.BadRequestError, 400))
+        assert not is_retryable(ValueError("bad json"))
+        assert not is_retryable(LLMDeadlineExceeded())
+
+    @pytest.mark.unit
+    def test_retry_delay(self):
+        """测试: 优先使用 Retry-After（不超过最大延迟），否则为带抖动的指数退避"""
+        assert retry_delay(0, _status_error(openai.RateLimitError, 429, {"retry-after": "7"})) == 7.0
+        assert retry_delay(0, _status_error(openai.RateLimitError, 429, {"retry-after": "120"})) == 30.0
+        for attempt in range(8):
+            assert 0 <= retry_delay(attempt) <= min(30.0, 2 ** attempt)
+
+    @pytest.mark.unit
+    def test_call_with_retry(self):
+        """测试: 可重试错误重试到成功，超过最大次数或不可重试时抛出原异常"""
+        flaky = Flaky(2, httpx.ConnectError("refused"))
+        assert call_with_retry(flaky, "gpt-4") == "ok"
+        assert len(flaky.calls) == 3 and len(self.sleeps) == 2
+        assert LLMTelemetry.snapshot()["retries"] == 2
+
+        with pytest.raises(httpx.ConnectError):
+            call_with_retry(Flaky(10, httpx.ConnectError("refused")), "gpt-4")
+
+        bad_request = Flaky(1, _status_error(openai.BadRequestError, 400))
+        with pytest.raises(openai.BadRequestError):
+            call_with_retry(bad_request, "gpt-4")
+        assert len(bad_request.calls) == 1
+
+    @pytest.mark.unit
+    def test_deadline(self):
+        """测试: 每次尝试的超时不超过剩余时间，等待会越过截止时间时不再重试"""
+        flaky = Flaky(1, _status_error(openai.RateLimitError, 429, {"retry-after": "20"}))
+        with pytest.raises(openai.RateLimitError):
+            call_with_retry(flaky, "gpt-4", deadline=5)
+        assert len(flaky.calls) == 1 and 0 < flaky.calls[0] <= 5
+        assert LLMTelemetry.snapshot()["deadline_exceeded"] == 1
+
+    @pytest.mark.unit
+    def test_hedged_call(self, monkeypatch):
+        """测试: 请求超过近期延迟分位数时发出对冲请求，取先返回的结果"""
+        monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+        monkeypatch.setattr(settings, "llm_hedge_quantile", 0.95)
+        monkeypatch.setattr(settings, "llm_hedge_min_samples", 1)
+        LLMTelemetry.record_latency("gpt-4", 0.05)
+
+        calls = []
+        release = threading.Event()
+
+        def attempt(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                release.wait(5)
+                return "slow"
+            return "hedge"
+
+        assert call_with_retry(attempt, "gpt-4") == "hedge"
+        stats = LLMTelemetry.snapshot()
+        assert stats["hedges"] == 1 and stats["hedges_won"] == 1
+        release.set()
+
+    @pytest.mark.unit
+    def test_async_call_with_retry(self, monkeypatch):
+        """测试: 异步版本同样按退避重试"""
+        async def no_sleep(delay):
+            self.sleeps.append(delay)
+
+        monkeypatch.setattr(llm_retry.asyncio, "sleep", no_sleep)
+        flaky = Flaky(1, httpx.ReadTimeout("timeout"))
+
+        async def attempt(timeout):
+            return flaky(timeout)
+
+        assert asyncio.run(acall_with_retry(attempt, "gpt-4")) == "ok"
+        assert len(flaky.calls) == 2 and len(self.sleeps) == 1
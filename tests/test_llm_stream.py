@@ -0,0 +1,45 @@
+"""
+流式响应提前结束判断的单元测试
+"""
+import pytest
+
+from web2json.utils.llm_stream import code_block_complete, get_stop_detector, json_object_complete
+
+
+class TestLlmStream:
+    """代码块/JSON 对象完整性判断测试类"""
+
+    @pytest.mark.unit
+    def test_code_block_complete(self):
+        """测试: 代码块闭合后才结束，代码块前允许有说明文字"""
+        assert code_block_complete("```python\nx = 1\n```")
+        assert code_block_complete("Here is the code:\n```python\nx = 1\n```\nsome notes")
+        assert not code_block_complete("```python\nx = 1\n")
+        assert not code_block_complete("Here is the code:\n```python")
+        assert not code_block_complete("x = 1")
+
+    @pytest.mark.unit
+    def test_json_object_complete(self):
+        """测试: 以 { 或 ```json 开头的完整 JSON 对象才结束，字符串中的括号不计入"""
+        assert json_object_complete('{"a": 1}')
+        assert json_object_complete('  {"a": {"b": "}{"}} trailing text')
+        assert json_object_complete('```json\n{"a": [1, 2]}')
+        assert not json_object_complete('{"a": {"b": 1}')
+        assert not json_object_complete('{"a": "}"')
+
+    @pytest.mark.unit
+    def test_json_object_requires_leading_object(self):
+        """测试: 说明文字中的花括号不会导致提前结束"""
+        assert not json_object_complete('Sure, the field {name} is below:\n{"a":1')
+        assert not json_object_complete('Sure, the field {name} is below:\n{"a":1}')
+        # 括号配平但不是合法 JSON 时继续读取
+        assert not json_object_complete("{name}")
+
+    @pytest.mark.unit
+    def test_get_stop_detector(self):
+        """测试: 按名称获取判断函数，未知名称报错"""
+        assert get_stop_detector(None) is None
+        assert get_stop_detector("code") is code_block_complete
+        assert get_stop_detector("json") is json_object_complete
+        with pytest.raises(ValueError):
+            get_stop_detector("xml")
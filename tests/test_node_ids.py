@@ -0,0 +1,104 @@
+"""
+节点编号模式的单元测试
+"""
+import pytest
+
+from web2json.tools.node_ids import NODE_ID_ATTR, annotate_html, schema_from_node_ids
+from web2json.tools.xpath_repair import parse_pages
+
+PAGE = (
+    "<html><body><div class='product'>"
+    "<h1 class='title'>Camera X100</h1>"
+    "<table><tr><th>Price</th><td>$1,299</td></tr></table>"
+    "<img src='/img/x100.jpg'>"
+    "<ul class='tags'><li class='tag'>photo</li><li class='tag'>compact</li><li class='tag'>retro</li></ul>"
+    "<div class='empty'><span></span></div>"
+    "</div></body></html>"
+)
+
+
+def _node_id(tree, xpath: str) -> int:
+    return int(tree.xpath(xpath)[0].get(NODE_ID_ATTR))
+
+
+class TestNodeIds:
+    """节点编号与 xpath 构造测试类"""
+
+    @pytest.fixture
+    def annotated(self):
+        return annotate_html(PAGE)
+
+    @pytest.mark.unit
+    def test_annotate_content_nodes(self, annotated):
+        """测试: 只为有直接文本或取值属性的元素编号"""
+        html_content, tree = annotated
+        assert f'{NODE_ID_ATTR}="' in html_content
+        assert tree.xpath("//h1")[0].get(NODE_ID_ATTR) is not None
+        assert tree.xpath("//img")[0].get(NODE_ID_ATTR) is not None
+        assert tree.xpath("//div[@class='empty']")[0].get(NODE_ID_ATTR) is None
+        assert tree.xpath("//ul")[0].get(NODE_ID_ATTR) is None
+
+    @pytest.mark.unit
+    def test_schema_from_node_ids(self, annotated):
+        """测试: 编号转换为不引用编号属性的 xpath，value_sample 取自节点实际内容"""
+        _, tree = annotated
+        result = {
+            "title": {"type": "string", "description": "标题", "node_ids": [_node_id(tree, "//h1")]},
+            "price": {"type": "string", "node_ids": [str(_node_id(tree, "//td"))]},
+            "image": {"type": "string", "node_ids": _node_id(tree, "//img")},
+            "tags": {"type": "array", "node_ids": [_node_id(tree, f"//li[{i}]") for i in (1, 2, 3)]},
+            "missing": {"type": "string", "node_ids": [9999]},
+        }
+        schema = schema_from_node_ids(result, tree, original_html=PAGE)
+
+        assert set(schema) == {"title", "price", "image", "tags"}
+        assert schema["title"]["description"] == "标题"
+        assert "node_ids" not in schema["title"]
+        original = parse_pages([PAGE])[0]
+        for name, expected in [("title", ["Camera X100"]), ("price", ["$1,299"]), ("image", ["/img/x100.jpg"])]:
+            assert NODE_ID_ATTR not in schema[name]["xpath"]
+            assert [str(v).strip() for v in original.xpath(schema[name]["xpath"])] == expected
+            assert schema[name]["value_sample"] == expected[0]
+        assert schema["tags"]["value_sample"] == ["photo", "compact", "retro"]
+        assert len(original.xpath(schema["tags"]["xpath"])) == 3
+
+    @pytest.mark.unit
+    def test_predefined_template(self, annotated):
+        """测试: 预定义模式保留模板字段和定义，找不到节点的字段 xpath 为空"""
+        _, tree = annotated
+        template = {"title": {"type": "string", "description": "标题", "xpaths": ["//old"]},
+                    "brand": {"type": "string", "xpath": "//old"}}
+        schema = schema_from_node_ids({"title": [_node_id(tree, "//h1")], "brand": []}, tree, template)
+
+        assert schema["title"]["xpaths"] and schema["title"]["description"] == "标题"
+        assert schema["brand"] == {"type": "string", "value_sample": None, "xpath": ""}
+        with pytest.raises(ValueError):
+            schema_from_node_ids(["title"], tree)
+
+    @pytest.mark.unit
+    def test_single_node_requires_unique_match(self):
+        """测试: 单个节点的 xpath 必须只选中该节点，不接受目标只是第一个匹配的写法"""
+        page = ("<html><body><div class='info'><span>Title One</span><span>Author A</span>"
+                "<span>2020</span><span>Pub X</span></div></body></html>")
+        _, tree = annotate_html(page)
+        spans = tree.xpath("//span")
+        result = {name: [span.get(NODE_ID_ATTR)] for name, span in zip(["title", "author"], spans)}
+
+        schema = schema_from_node_ids(result, tree, original_html=page)
+
+        other = parse_pages([page.replace("Title One", "Title Two").replace("Author A", "Author B")])[0]
+        assert other.xpath(schema["title"]["xpath"]) == ["Title Two"]
+        assert other.xpath(schema["author"]["xpath"]) == ["Author B"]
+
+    @pytest.mark.unit
+    def test_value_nodes_not_used_as_labels(self):
+        """测试: 其他字段选中的取值节点不作为相邻的标签文字"""
+        page = "<html><body><dl class='meta'><dt>Title One</dt><dd>Author A</dd></dl></body></html>"
+        _, tree = annotate_html(page)
+        result = {"title": [_node_id(tree, "//dt")], "author": [_node_id(tree, "//dd")]}
+
+        schema = schema_from_node_ids(result, tree)
+
+        assert "Title One" not in schema["author"]["xpath"]
+        other = parse_pages([page.replace("Title One", "Title Two").replace("Author A", "Author B")])[0]
+        assert other.xpath(schema["author"]["xpath"]) == ["Author B"]
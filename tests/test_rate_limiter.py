@@ -0,0 +1,86 @@
+"""
+LLM 令牌桶限流器的单元测试
+时钟以可控的 monotonic 替代，不实际等待
+"""
+import asyncio
+
+import pytest
+
+import web2json.utils.rate_limiter as rate_limiter
+from web2json.utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """可手动推进的 monotonic 时钟，sleep 时直接推进"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter:
+    """令牌桶补充、预留校正和在途限制测试类"""
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+        monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+        return clock
+
+    @pytest.mark.unit
+    def test_request_bucket_refill(self, clock):
+        """测试: 请求桶用完后按 rpm/60 每秒补充，补充不超过容量"""
+        limiter = RateLimiter(rpm=60)
+        for _ in range(60):
+            limiter.acquire()
+            limiter.release()
+        assert clock.slept == []
+
+        limiter.acquire()
+        assert clock.slept == [pytest.approx(1.0)]
+        assert limiter.stats()["throttled_count"] == 1
+
+        clock.now += 3600
+        limiter._refill(clock.now)
+        assert limiter._requests == 60
+
+    @pytest.mark.unit
+    def test_token_bucket_refill_and_correction(self, clock):
+        """测试: token 不足时按缺口等待，请求结束后按实际用量校正"""
+        limiter = RateLimiter(tpm=600)
+        reserved = limiter.acquire(500)
+        limiter.release(reserved, actual_tokens=200)
+        assert limiter._tokens == pytest.approx(400)
+
+        # 缺 100 个 token，按 600/60=10 个每秒补充需要等待 10 秒
+        limiter.acquire(500)
+        assert clock.slept == [pytest.approx(10.0)]
+
+        # 单次预留超过容量时按容量计，不会永远等待
+        assert limiter._reserve_size(5000) == 600
+
+    @pytest.mark.unit
+    def test_in_flight_limit(self, clock):
+        """测试: 在途请求达到上限时等待，释放后可继续"""
+        limiter = RateLimiter(max_in_flight=1)
+        limiter.acquire()
+        assert limiter._try_acquire(0) == rate_limiter.IN_FLIGHT_POLL_INTERVAL
+        limiter.release()
+        assert limiter._try_acquire(0) == 0
+        assert limiter.stats()["in_flight"] == 1
+
+    @pytest.mark.unit
+    def test_async_acquire_shares_counts(self, clock):
+        """测试: 异步预留与同步调用共用同一组计数"""
+        limiter = RateLimiter(rpm=1)
+        reserved = asyncio.run(limiter.aacquire(100))
+        assert reserved == 100 and limiter._requests == 0
+        assert limiter._try_acquire(0) == pytest.approx(60.0)
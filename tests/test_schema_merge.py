@@ -0,0 +1,74 @@
+"""
+本地 Schema 合并的单元测试
+"""
+import pytest
+
+from web2json.tools.schema_merge import group_fields, merge_schemas_locally, resolve_locally
+
+
+def _page(title: str, price: str, extra: str = "") -> str:
+    return (
+        "<html><body><div class='site'>Example Shop</div>"
+        f"<h1 class='title'>{title}</h1><span class='price'>{price}</span>{extra}</body></html>"
+    )
+
+
+PAGES = [_page("Camera X100", "$1,299"), _page("Lens 50mm", "$399"), _page("Tripod", "$89", "<em>Sale</em>")]
+
+
+class TestSchemaMerge:
+    """字段分组、xpath 投票和歧义判断测试类"""
+
+    @pytest.mark.unit
+    def test_group_fields_by_key_and_xpath(self):
+        """测试: key 相同（忽略大小写）或 xpath 重叠的字段归为同一组"""
+        schemas = [
+            {"Title": {"xpath": "//h1/text()"}, "price": {"xpath": "//span/text()"}},
+            {"title ": {"xpath": "//h1[@class='title']/text()"}, "cost": {"xpath": "//span/text()"}},
+        ]
+        groups = group_fields(schemas)
+
+        assert [group.keys for group in groups] == [["Title", "title "], ["price", "cost"]]
+        assert groups[1].samples == {0, 1}
+
+    @pytest.mark.unit
+    def test_merge_votes_xpaths(self):
+        """测试: 合并后的 xpaths 只保留取到值的写法，按命中页面数排序"""
+        schemas = [
+            {"title": {"type": "string", "xpath": "//h1[@class='title']/text()", "value_sample": "Camera X100"}},
+            {"title": {"type": "str", "description": "商品标题", "xpath": "//div[@id='none']/text()",
+                       "value_sample": "Lens 50mm"}},
+            {"title": {"type": "string", "xpath": "//h1/text()", "value_sample": "Tripod"}},
+        ]
+        result = merge_schemas_locally(schemas, PAGES)
+
+        assert not result.ambiguous
+        merged = result.schema["title"]
+        assert merged["xpaths"] == ["//h1[@class='title']/text()", "//h1/text()"]
+        assert merged["type"] == "string"
+        assert merged["description"] == "商品标题"
+        assert merged["value_sample"] == "Camera X100"
+
+    @pytest.mark.unit
+    def test_ambiguous_groups(self):
+        """测试: 字段名不一致、xpath 全部失效、单样本噪音、各样本取值相同的字段交给 LLM"""
+        schemas = [
+            {"price": {"xpath": "//span/text()", "value_sample": "$1,299"},
+             "site": {"xpath": "//div[@class='site']/text()", "value_sample": "Example Shop"},
+             "rating": {"xpath": "//div[@id='rating']/text()", "value_sample": "5"}},
+            {"cost": {"xpath": "//span/text()", "value_sample": "$399"},
+             "site": {"xpath": "//div[@class='site']/text()", "value_sample": "Example Shop"}},
+            {"badge": {"xpath": "//em/text()", "value_sample": "Sale"}},
+        ]
+        result = merge_schemas_locally(schemas, PAGES)
+        reasons = {tuple(group.keys): group.reason for group in result.ambiguous}
+
+        assert result.schema == {}
+        assert set(reasons) == {("price", "cost"), ("site",), ("rating",), ("badge",)}
+        assert "模板" in reasons[("site",)]
+        assert "一个样本" in reasons[("badge",)]
+
+        # LLM 不可用时的兜底：取出现最多的 key，没有可用 xpath 的组丢弃
+        resolved = {tuple(group.keys): resolve_locally(group) for group in result.ambiguous}
+        assert resolved[("rating",)] is None
+        assert resolved[("price", "cost")][1]["xpaths"] == ["//span/text()"]
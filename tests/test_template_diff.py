@@ -0,0 +1,54 @@
+"""
+模板区域识别与折叠的单元测试
+"""
+import pytest
+from lxml import html as lxml_html
+
+from web2json.tools.template_diff import PLACEHOLDER, collapse_template_regions, find_template_regions
+
+NAV = "<nav class='menu'>" + "".join(f"<a href='/c/{i}'>Category number {i}</a>" for i in range(20)) + "</nav>"
+FOOTER = "<footer><p>Copyright Example Shop. All rights reserved.</p></footer>"
+
+
+def _page(title: str, price: str) -> str:
+    return (
+        f"<html><body>{NAV}<div class='main'><h1>{title}</h1>"
+        f"<table><tr><th>Price</th><td>{price}</td></tr></table></div>{FOOTER}</body></html>"
+    )
+
+
+PAGES = [_page("Camera X100", "$1,299"), _page("Lens 50mm", "$399")]
+
+
+class TestTemplateDiff:
+    """模板区域折叠测试类"""
+
+    @pytest.mark.unit
+    def test_collapse_shared_regions(self):
+        """测试: 足够大的公共子树折叠为注释，可变区域和较小的公共子树保持完整"""
+        collapsed = collapse_template_regions(PAGES, min_chars=100)
+
+        for page, title in zip(collapsed, ["Camera X100", "Lens 50mm"]):
+            assert PLACEHOLDER in page
+            assert "Category number" not in page
+            assert title in page
+            assert "<th>Price</th>" in page
+            # 较小的页脚不折叠
+            assert "Copyright Example Shop" in page
+        assert len(collapsed[0]) < len(PAGES[0])
+
+    @pytest.mark.unit
+    def test_xpaths_still_valid(self):
+        """测试: 折叠后的元素留在原位置，指向可变区域的 xpath 在完整页面上取到相同的值"""
+        collapsed = collapse_template_regions(PAGES, min_chars=100)
+        for full, prompt in zip(PAGES, collapsed):
+            xpath = "/html/body/div[1]/table/tr/td/text()"
+            assert lxml_html.fromstring(prompt).xpath(xpath) == lxml_html.fromstring(full).xpath(xpath)
+            assert lxml_html.fromstring(prompt).xpath("//nav[@class='menu']")
+
+    @pytest.mark.unit
+    def test_no_template_regions(self):
+        """测试: 样本少于 2 个或没有足够大的公共区域时原样返回"""
+        assert find_template_regions(PAGES[:1]) is None
+        assert collapse_template_regions(PAGES[:1], min_chars=100) == PAGES[:1]
+        assert collapse_template_regions(PAGES + ["", None], min_chars=100000)[:2] == PAGES
@@ -0,0 +1,75 @@
+"""
+LLM 用量统计的单元测试
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from web2json.utils.llm_context import submit_with_context
+from web2json.utils.usage_tracker import (
+    UNKNOWN_PHASE,
+    llm_phase,
+    record_cascade,
+    record_llm_call,
+    track_usage,
+)
+
+
+class TestUsageTracker:
+    """按阶段/模型汇总、上下文隔离和级联升级率测试类"""
+
+    @pytest.mark.unit
+    def test_summary_by_phase_and_model(self):
+        """测试: 调用按阶段、轮次、模型汇总，统计缓存命中和前缀缓存命中率"""
+        started_at = time.monotonic()
+        with track_usage() as tracker:
+            record_llm_call("gpt-4", 100, 20, started_at)
+            with llm_phase("schema_extraction", round=1):
+                record_llm_call("gpt-4", 1000, 200, started_at, cached_tokens=500)
+                record_llm_call("gpt-4o-mini", 300, 0, started_at, cache_hit=True)
+            with llm_phase("code_iteration", round=2):
+                record_llm_call("gpt-4", 400, 100, started_at, success=False)
+
+        summary = tracker.summary()
+        assert summary["total"]["calls"] == 4
+        assert summary["total"]["total_tokens"] == 2120
+        assert summary["total"]["failed_calls"] == 1
+        assert summary["by_phase"]["schema_extraction"]["cache_hits"] == 1
+        assert summary["by_phase"]["schema_extraction"]["prompt_cache_hit_rate"] == pytest.approx(500 / 1300, abs=1e-4)
+        assert summary["by_model"]["gpt-4"]["prompt_tokens"] == 1500
+        assert [call["phase"] for call in summary["calls"]] == [
+            UNKNOWN_PHASE, "schema_extraction", "schema_extraction", "code_iteration"
+        ]
+        assert [call["round"] for call in summary["calls"]] == [None, 1, 1, 2]
+        assert "cascade" not in summary
+
+    @pytest.mark.unit
+    def test_context_isolation(self):
+        """测试: 未启用统计时忽略记录，线程池中通过 submit_with_context 传递当前统计对象和阶段"""
+        record_llm_call("gpt-4", 10, 10, time.monotonic())
+
+        with track_usage() as first, ThreadPoolExecutor(max_workers=2) as executor:
+            with llm_phase("schema_merge"):
+                future = submit_with_context(executor, record_llm_call, "gpt-4", 10, 5, time.monotonic())
+            future.result()
+            with track_usage() as second:
+                record_llm_call("gpt-4", 1, 1, time.monotonic())
+
+        assert [r.phase for r in first.records()] == ["schema_merge"]
+        assert len(second.records()) == 1
+
+    @pytest.mark.unit
+    def test_cascade_escalation_rate(self):
+        """测试: 按阶段统计模型级联的升级率"""
+        with track_usage() as tracker:
+            with llm_phase("schema_extraction"):
+                for escalated in (False, False, True, False):
+                    record_cascade(escalated)
+            with llm_phase("code_iteration"):
+                record_cascade(True)
+
+        assert tracker.summary()["cascade"] == {
+            "schema_extraction": {"calls": 4, "escalations": 1, "escalation_rate": 0.25},
+            "code_iteration": {"calls": 1, "escalations": 1, "escalation_rate": 1.0},
+        }
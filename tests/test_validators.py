@@ -0,0 +1,91 @@
+"""
+LLM 输出本地校验的单元测试
+"""
+import pytest
+
+from web2json.tools.validators import (
+    ValidationFailed,
+    clean_generated_code,
+    compare_to_value_samples,
+    run_parser_code,
+    validate_parser_code,
+    validate_parser_on_samples,
+    validate_schema,
+    value_matches,
+)
+
+PARSER_CODE = '''
+from lxml import html
+
+class WebPageParser:
+    def parse(self, html_content):
+        tree = html.fromstring(html_content)
+        return {
+            "title": tree.findtext(".//h1"),
+            "price": tree.findtext(".//span"),
+        }
+'''
+
+PAGE = "<html><body><h1>Camera X100</h1><span>$1,299</span></body></html>"
+
+
+class TestValidators:
+    """value_sample 比较与解析代码校验测试类"""
+
+    @pytest.mark.unit
+    def test_value_matches_truncated_sample(self):
+        """测试: 被截断的 value_sample 包含在解析结果中时相符"""
+        assert value_matches("A very long product description text", "A very long product...")
+        assert value_matches(["Alice", "Bob", "Carol"], ["Alice", "Bob"])
+        assert value_matches("  $1,299 ", "$1,299")
+
+    @pytest.mark.unit
+    def test_value_matches_partial_value(self):
+        """测试: 解析结果只是 value_sample 的一部分时不相符"""
+        assert not value_matches("299", "$1,299")
+        assert not value_matches("1", "$1,299")
+
+    @pytest.mark.unit
+    def test_value_matches_empty_value(self):
+        """测试: 解析结果为空时不相符，value_sample 为空时不做检查"""
+        assert not value_matches(None, "$1,299")
+        assert not value_matches("", "$1,299")
+        assert value_matches("anything", None)
+
+    @pytest.mark.unit
+    def test_validate_parser_on_samples(self):
+        """测试: 在所有样本上逐字段比较 value_sample，报告未通过的字段"""
+        samples = [
+            {"round": 1, "html_content": PAGE,
+             "schema": {"title": {"value_sample": "Camera X100"}, "price": {"value_sample": "$1,299"}}},
+            {"round": 2, "html_content": PAGE,
+             "schema": {"title": {"value_sample": "Camera X200"}, "price": {"value_sample": None}}},
+        ]
+        reports = validate_parser_on_samples(PARSER_CODE, samples, ["title", "price"])
+
+        assert reports[0]["passed"] and reports[0]["checked_fields"] == 2
+        assert not reports[1]["passed"] and reports[1]["checked_fields"] == 1
+        assert list(reports[1]["failed_fields"]) == ["title"]
+        assert compare_to_value_samples({"price": "299"}, {"price": {"value_sample": "$1,299"}}, ["price"])
+
+    @pytest.mark.unit
+    def test_run_parser_code_errors(self):
+        """测试: 无法执行、缺少 WebPageParser 的代码抛出 ValidationFailed"""
+        assert run_parser_code(PARSER_CODE, PAGE) == {"title": "Camera X100", "price": "$1,299"}
+        with pytest.raises(ValidationFailed):
+            run_parser_code("def broken(:\n", PAGE)
+        with pytest.raises(ValidationFailed):
+            run_parser_code("x = 1", PAGE)
+
+    @pytest.mark.unit
+    def test_validate_parser_code_and_schema(self):
+        """测试: 字段填充率和 xpath 命中率低于阈值时校验不通过"""
+        code = clean_generated_code("```python\n" + PARSER_CODE + "\n```")
+        validate_parser_code(code, PAGE, {"title": {}, "price": {}}, min_fill_rate=1.0)
+        with pytest.raises(ValidationFailed):
+            validate_parser_code(code, PAGE, {"title": {}, "author": {}}, min_fill_rate=1.0)
+
+        schema = {"title": {"xpath": "//h1/text()"}, "author": {"xpath": "//p[@class='author']/text()"}}
+        validate_schema(schema, PAGE, min_hit_rate=0.5)
+        with pytest.raises(ValidationFailed):
+            validate_schema(schema, PAGE, min_hit_rate=1.0)
@@ -0,0 +1,112 @@
+"""
+Schema xpath 本地校验与修复的单元测试
+"""
+import pytest
+
+from web2json.tools.xpath_repair import parse_pages, relaxed_xpaths, repair_schema_xpaths, repair_xpath
+
+ITEMS = "".join(f"<li>Accessory item number {i} with a long description</li>" for i in range(10)) + "<li>$1,299</li>"
+PAGE = (
+    "<html><body><div class='product'><table><tbody>"
+    "<tr><th>Price</th><td class='price value'>$1,299</td></tr>"
+    "<tr><th>Brand</th><td>Acme</td></tr>"
+    f"</tbody></table><ul>{ITEMS}</ul></div></body></html>"
+)
+
+
+class TestXpathRepair:
+    """xpath 修复与丢弃测试类"""
+
+    @pytest.fixture
+    def tree(self):
+        return parse_pages([PAGE])[0]
+
+    @pytest.mark.unit
+    def test_valid_xpath_kept(self, tree):
+        """测试: 取到 value_sample 的 xpath 原样保留"""
+        assert repair_xpath("//td[@class='price value']/text()", [(tree, "$1,299")]) == (
+            "//td[@class='price value']/text()", "valid"
+        )
+
+    @pytest.mark.unit
+    def test_relaxed_repair(self, tree):
+        """测试: 错误的位置下标、tbody 差异通过放宽写法修复"""
+        xpath, status = repair_xpath("//table/tr[1]/td[3]/text()", [(tree, "$1,299")])
+        assert status == "repaired"
+        assert tree.xpath(xpath) == ["$1,299"]
+        assert "//table/tr/td/text()" in relaxed_xpaths("//table/tbody/tr[1]/td[3]/text()")
+
+    @pytest.mark.unit
+    def test_anchored_repair(self, tree):
+        """测试: 放宽无效时以相邻标签文字或 class 为锚点重新构造"""
+        xpath, status = repair_xpath("//div[@id='missing']/td/text()", [(tree, "Acme")])
+        assert status == "repaired"
+        assert tree.xpath(xpath) == ["Acme"]
+        # 只考虑与原 xpath 目标标签相同的节点，不换到恰好含相同文字的其他元素
+        assert repair_xpath("//div[@id='missing']/span/text()", [(tree, "Acme")]) == (None, "dropped")
+
+    @pytest.mark.unit
+    def test_over_broad_candidate_dropped(self, tree):
+        """测试: 放宽后选中整列的 xpath 不被接受（value_sample 只是列表中的一项）"""
+        list_tree = parse_pages([f"<html><body><ul>{ITEMS}</ul></body></html>"])[0]
+        assert "//ul/li/text()" in relaxed_xpaths("//ul/li[25]/text()")
+        assert repair_xpath("//ul/li[25]/text()", [(list_tree, "$1,299")]) == (None, "dropped")
+        # 没有 value_sample 时不放宽成选中多个节点
+        assert repair_xpath("//ul/li[25]/text()", [(tree, None)]) == (None, "dropped")
+
+    @pytest.mark.unit
+    def test_repair_schema_xpaths(self):
+        """测试: 整个 Schema 的修复统计，xpaths 列表只保留通过校验的写法"""
+        schema = {
+            "price": {"xpath": "//td[@class='price value']/text()", "value_sample": "$1,299"},
+            "brand": {"xpaths": ["//table/tr[2]/td[5]/text()", "//p/text()"], "value_sample": "Acme"},
+            "missing": {"xpath": "//p[@class='none']/text()", "value_sample": "nothing here"},
+        }
+        stats = repair_schema_xpaths(schema, [PAGE])
+
+        # brand 的第一个 xpath 修复，第二个指向的 p 元素在页面上不存在
+        assert stats == {"valid": 1, "repaired": 1, "dropped": 2}
+        assert len(schema["brand"]["xpaths"]) == 1
+        assert schema["missing"]["xpath"] == ""
+
+    @pytest.mark.unit
+    def test_anchor_on_labels_only(self):
+        """测试: 只以 th/dt/label 或以冒号结尾的文字为锚点，不以相邻的数据值为锚点"""
+        page = (
+            "<html><body><div><a href='/s/1'>The College of New Jersey</a><a href='/c/2'>Ewing</a></div>"
+            "<p><span>Phone:</span><b>609-771-1855</b></p></body></html>"
+        )
+        tree = parse_pages([page])[0]
+        assert repair_xpath("//section/a[5]/text()", [(tree, "Ewing")]) == (None, "dropped")
+
+        xpath, status = repair_xpath("//p/b[3]/text()", [(tree, "609-771-1855")])
+        assert status == "repaired"
+        assert tree.xpath(xpath) == ["609-771-1855"]
+
+    @pytest.mark.unit
+    def test_cross_sample_check(self):
+        """测试: 修复得到的 xpath 需在其他样本上也取到值；以记录编号 id 为锚点的写法不被采用"""
+        def page(name, city):
+            return (f"<html><body><dl><dt>Name</dt><dd><a id='5'>{name}</a></dd></dl>"
+                    f"<ul><li>{city}</li></ul></body></html>")
+
+        tree, other = parse_pages([page("Alpha", "Ewing"), page("Beta", "Trenton")])
+        xpath, status = repair_xpath("//dd/b/a/text()", [(tree, "Alpha")], others=[other])
+        assert status == "repaired" and "@id" not in xpath
+        assert other.xpath(xpath) == ["Beta"]
+
+        # 其他样本上取不到值的写法不采用
+        empty = parse_pages(["<html><body><p>nothing</p></body></html>"])[0]
+        assert repair_xpath("//dd/b/a/text()", [(tree, "Alpha")], others=[empty]) == (None, "dropped")
+
+    @pytest.mark.unit
+    def test_keep_xpath_valid_on_simplified(self):
+        """测试: 在精简 HTML 上通过的 xpath 不因在原始 HTML 上取不到值而丢弃"""
+        simplified = "<html><body><div><h1>Camera X100</h1></div></body></html>"
+        original = "<html><body><div><div class='wrap'><h1>Camera X100</h1></div></div></body></html>"
+        schema = {"title": {"xpath": "/html/body/div/h1/text()", "value_sample": "Camera X100"}}
+
+        stats = repair_schema_xpaths(schema, [simplified, original])
+
+        assert stats == {"valid": 1, "repaired": 0, "dropped": 0}
+        assert schema["title"]["xpath"] == "/html/body/div/h1/text()"
@@ -0,0 +1,159 @@
+"""
+阶段级断点清单
+在输出目录中记录每个已完成步骤的输入指纹、相关配置和输出，重新运行时（resume=True）
+跳过输入未变化的步骤，例如代码阶段因服务商故障失败后，无需重复 HTML 精简、各样本的 Schema 提取和合并。
+
+清单通过中间产物存储保存为 output_dir/checkpoint.json：
+{
+  "version": 1,
+  "steps": {
+    "schema_phase": {"inputs_hash": ..., "settings": {...}, "files": [...], "outputs": {...}, "completed_at": ...},
+    "code_phase": {...}
+  }
+}
+输入指纹包含步骤输入（样本文件内容、Schema 模式和模板、上一步的输出等）和影响输出的配置；
+记录的输出文件任一缺失（存储中不存在）时视为未完成。
+"""
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from web2json.config.settings import settings
+from web2json.utils.artifact_store import ArtifactStore
+
+MANIFEST_NAME = "checkpoint.json"
+MANIFEST_VERSION = 1
+
+# 影响步骤输出的配置项（API 密钥、并发、超时等不影响结果的配置不参与指纹）
+_SETTINGS_KEYS = (
+    "default_model",
+    "agent_model",
+    "code_gen_model",
+    "default_temperature",
+    "agent_temperature",
+    "code_gen_temperature",
+    "code_gen_max_tokens",
+    "code_gen_prompt_version",
+    "code_iteration_validation",
+    "code_parallel_candidates",
+    "code_candidate_refine",
+    "llm_cascade_enabled",
+    "default_cascade_model",
+    "agent_cascade_model",
+    "code_gen_cascade_model",
+    "cascade_min_xpath_hit_rate",
+    "cascade_min_field_fill_rate",
+    "disable_thinking_mode",
+    "sample_selection_strategy",
+    "sample_candidate_pool",
+    "html_simplify_mode",
+    "html_keep_attrs",
+    "xpath_repair_enabled",
+    "schema_node_id_mode",
+    "template_diff_enabled",
+    "template_min_region_chars",
+    "schema_merge_mode",
+)
+
+
+def settings_snapshot() -> Dict[str, Any]:
+    """当前影响步骤输出的配置"""
+    return {key: getattr(settings, key, None) for key in _SETTINGS_KEYS}
+
+
+def fingerprint(value: Any) -> str:
+    """任意可序列化内容的 sha256 指纹（字典按 key 排序）"""
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """文件内容的 sha256 指纹；文件不存在时返回 None"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class CheckpointManifest:
+    """输出目录中的断点清单"""
+
+    def __init__(self, store: ArtifactStore):
+        """
+        Args:
+            store: 任务的中间产物存储
+        """
+        self.store = store
+        self.path = store.path(MANIFEST_NAME)
+        self.data = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            data = self.store.get_json(MANIFEST_NAME)
+        except ValueError as e:
+            logger.warning(f"断点清单读取失败，忽略已有记录: {e}")
+            return {"version": MANIFEST_VERSION, "steps": {}}
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION \
+                or not isinstance(data.get("steps"), dict):
+            return {"version": MANIFEST_VERSION, "steps": {}}
+        return data
+
+    def _save(self):
+        self.store.put_json(MANIFEST_NAME, self.data)
+
+    @staticmethod
+    def inputs_hash(step: str, inputs: Any) -> str:
+        """步骤输入和当前配置的指纹"""
+        return fingerprint({"step": step, "inputs": inputs, "settings": settings_snapshot()})
+
+    def load(self, step: str, inputs_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        取出已完成步骤的输出
+
+        Args:
+            step: 步骤名
+            inputs_hash: 本次运行的输入指纹
+
+        Returns:
+            步骤输出；未完成、输入已变化或输出文件缺失时返回 None
+        """
+        entry = self.data["steps"].get(step)
+        if not entry:
+            return None
+        if entry.get("inputs_hash") != inputs_hash:
+            logger.info(f"断点续跑: 步骤 {step} 的输入或配置已变化，重新执行")
+            return None
+        missing = [path for path in entry.get("files", []) if not self.store.exists(path)]
+        if missing:
+            logger.info(f"断点续跑: 步骤 {step} 的输出文件缺失（{missing[0]} 等 {len(missing)} 个），重新执行")
+            return None
+        return entry.get("outputs")
+
+    def record(self, step: str, inputs_hash: str, outputs: Dict[str, Any], files: List[str]):
+        """
+        记录已完成的步骤（写入失败只记录警告，不影响本次运行）
+
+        Args:
+            step: 步骤名
+            inputs_hash: 输入指纹
+            outputs: 步骤输出（需可 JSON 序列化）
+            files: 步骤输出依赖的文件，续跑时要求全部存在
+        """
+        self.data["steps"][step] = {
+            "inputs_hash": inputs_hash,
+            "settings": settings_snapshot(),
+            "files": [str(path) for path in files if path],
+            "outputs": outputs,
+            "completed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        try:
+            self._save()
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"断点清单写入失败: {e}")
@@ -3,7 +3,7 @@ Agent 执行器
 负责阶段编排和流程控制
 """
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from loguru import logger
 
@@ -14,13 +14,15 @@ from .processors import (
     ParserProcessor,
 )
 from .phases import SchemaPhase, CodePhase
+from .checkpoint import CheckpointManifest, file_digest, fingerprint
+from web2json.utils.artifact_store import ArtifactStore, FileSystemArtifactStore
 from web2json.utils.schema_editor import SchemaEditor
 
 
 class AgentExecutor:
     """Agent 执行器 - 负责阶段编排"""
 
-    def __init__(self, output_dir: str = "output", schema_mode: str = "auto", schema_template: Dict = None, enable_schema_edit: bool = False, progress_callback=None, save_to_disk: bool = True, remove_null_fields: bool = True):
+    def __init__(self, output_dir: str = "output", schema_mode: str = "auto", schema_template: Dict = None, enable_schema_edit: bool = False, progress_callback=None, save_to_disk: bool = True, remove_null_fields: bool = True, artifact_store: Optional[ArtifactStore] = None):
         """
         初始化执行器
 
@@ -32,9 +34,10 @@ class AgentExecutor:
             progress_callback: 进度回调函数 callback(phase, step, percentage)
             save_to_disk: 批量解析时是否保存到磁盘（默认True）
             remove_null_fields: 是否清除值为null的字段（默认True）
+            artifact_store: 中间产物存储（可选，默认全部写入 output_dir；目录在首次写入时才创建）
         """
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.store = artifact_store if artifact_store is not None else FileSystemArtifactStore(self.output_dir)
         self.schema_mode = schema_mode
         self.schema_template = schema_template
         self.enable_schema_edit = enable_schema_edit
@@ -42,7 +45,7 @@ class AgentExecutor:
         self.save_to_disk = save_to_disk
         self.remove_null_fields = remove_null_fields
 
-        # 创建子目录
+        # 输出子目录
         self._setup_directories()
 
         # 初始化处理器
@@ -58,41 +61,27 @@ class AgentExecutor:
             logger.info(f"  - 预定义Schema字段: {list(self.schema_template.keys())}")
 
     def _setup_directories(self):
-        """创建输出子目录"""
+        """输出子目录的路径（由存储在首次写入时创建，不落盘的运行不创建任何目录）"""
         self.parsers_dir = self.output_dir / "parsers"
         self.html_original_dir = self.output_dir / "html_original"
         self.html_simplified_dir = self.output_dir / "html_simplified"
         self.result_dir = self.output_dir / "result"
         self.schemas_dir = self.output_dir / "schemas"
 
-        for dir_path in [
-            self.parsers_dir,
-            self.html_original_dir,
-            self.html_simplified_dir,
-            self.result_dir,
-            self.schemas_dir,
-        ]:
-            dir_path.mkdir(exist_ok=True)
-
     def _init_processors(self):
         """初始化所有处理器"""
-        self.html_processor = HtmlProcessor(
-            html_original_dir=self.html_original_dir,
-            html_simplified_dir=self.html_simplified_dir,
-        )
+        self.html_processor = HtmlProcessor(store=self.store)
 
         self.schema_processor = SchemaProcessor(
-            schemas_dir=self.schemas_dir,
+            store=self.store,
             schema_mode=self.schema_mode,
             schema_template=self.schema_template,
         )
 
-        self.code_processor = CodeProcessor(
-            parsers_dir=self.parsers_dir,
-        )
+        self.code_processor = CodeProcessor(store=self.store)
 
         self.parser_processor = ParserProcessor(
-            result_dir=self.result_dir,
+            store=self.store,
             save_to_disk=self.save_to_disk,
             remove_null_fields=self.remove_null_fields,
         )
@@ -112,7 +101,7 @@ class AgentExecutor:
             progress_callback=self.progress_callback,
         )
 
-    def execute_plan(self, plan: Dict) -> Dict:
+    def execute_plan(self, plan: Dict, resume: bool = False) -> Dict:
         """
         执行计划 - 两阶段迭代
 
@@ -120,8 +109,11 @@ class AgentExecutor:
         阶段1.5: Schema编辑（可选）- 用户手动编辑schema
         阶段2: 代码迭代（前N个URL）- 基于最终Schema生成代码 -> 验证 -> 优化代码
 
+        每个阶段完成后记录到输出目录的断点清单（checkpoint.json）。
+
         Args:
             plan: 执行计划
+            resume: 是否断点续跑，跳过输入和配置未变化的已完成阶段
 
         Returns:
             执行结果
@@ -139,7 +131,7 @@ class AgentExecutor:
         sample_urls = plan['sample_urls']
 
         # ============ 阶段 1: Schema 迭代 ============
-        schema_result = self.schema_phase.execute(sample_urls)
+        schema_result = self.run_schema_phase(sample_urls, resume=resume)
         results['schema_phase'] = schema_result
 
         if not schema_result['success']:
@@ -160,10 +152,7 @@ class AgentExecutor:
             results['schema_phase']['final_schema'] = final_schema
 
         # ============ 阶段 2: 代码迭代 ============
-        code_result = self.code_phase.execute(
-            final_schema=final_schema,
-            schema_phase_rounds=schema_result['rounds']
-        )
+        code_result = self.run_code_phase(final_schema, schema_result['rounds'], resume=resume)
         results['code_phase'] = code_result
 
         if code_result['success']:
@@ -174,6 +163,85 @@ class AgentExecutor:
 
         return results
 
+    def run_schema_phase(self, sample_urls: List[str], resume: bool = False) -> Dict:
+        """
+        执行 Schema 阶段并记录断点；resume 时样本内容、Schema 模式/模板和配置均未变化则直接复用上次的输出
+
+        Args:
+            sample_urls: 样本 HTML 文件路径
+            resume: 是否断点续跑
+
+        Returns:
+            Schema 阶段结果（见 SchemaPhase.execute）
+        """
+        inputs = {
+            'samples': [[str(path), file_digest(str(path))] for path in sample_urls],
+            'schema_mode': self.schema_processor.schema_mode,
+            'schema_template': self.schema_processor.schema_template,
+        }
+
+        def checkpoint_outputs(result: Dict) -> Dict:
+            # 精简 HTML 和折叠模板后的 Prompt HTML 不写入清单，代码阶段会按 html_path 从存储读取并重新折叠
+            rounds = [
+                {k: v for k, v in r.items() if k not in ('html_content', 'html_prompt_content')}
+                for r in result['rounds']
+            ]
+            return {**result, 'rounds': rounds}
+
+        def checkpoint_files(result: Dict) -> List[str]:
+            files = [result.get('final_schema_path')]
+            for r in result['rounds']:
+                files.extend([r.get('html_path'), r.get('schema_path')])
+            return files
+
+        return self._run_step(
+            'schema_phase', inputs, lambda: self.schema_phase.execute(sample_urls),
+            resume, checkpoint_outputs, checkpoint_files,
+        )
+
+    def run_code_phase(self, final_schema: Dict, schema_phase_rounds: List[Dict], resume: bool = False) -> Dict:
+        """
+        执行代码阶段并记录断点；resume 时最终 Schema、各样本 Schema 和配置均未变化则直接复用上次的解析器
+
+        Args:
+            final_schema: 最终 Schema
+            schema_phase_rounds: Schema 阶段各轮结果
+            resume: 是否断点续跑
+
+        Returns:
+            代码阶段结果（见 CodePhase.execute）
+        """
+        inputs = {
+            'final_schema': final_schema,
+            'samples': fingerprint([
+                [r.get('html_path'), r.get('groundtruth_schema')] for r in schema_phase_rounds if r.get('success')
+            ]),
+        }
+
+        def checkpoint_files(result: Dict) -> List[str]:
+            return [(result.get('final_parser') or {}).get('parser_path')]
+
+        return self._run_step(
+            'code_phase', inputs,
+            lambda: self.code_phase.execute(final_schema=final_schema, schema_phase_rounds=schema_phase_rounds),
+            resume, lambda result: result, checkpoint_files,
+        )
+
+    def _run_step(self, step: str, inputs: Dict, run, resume: bool, checkpoint_outputs, checkpoint_files) -> Dict:
+        """执行一个阶段：resume 时优先复用断点清单中的输出，成功后写入清单"""
+        checkpoint = CheckpointManifest(self.store)
+        inputs_hash = checkpoint.inputs_hash(step, inputs)
+        if resume:
+            outputs = checkpoint.load(step, inputs_hash)
+            if outputs is not None:
+                logger.info(f"断点续跑: 步骤 {step} 已完成且输入未变化，跳过")
+                return {**outputs, 'resumed': True}
+
+        result = run()
+        if result.get('success'):
+            checkpoint.record(step, inputs_hash, checkpoint_outputs(result), checkpoint_files(result))
+        return result
+
     def _handle_schema_editing(self, original_schema: Dict, schema_path: str, sample_urls: List[str]) -> Dict:
         """
         处理Schema编辑流程
@@ -228,13 +296,14 @@ class AgentExecutor:
             logger.info("\n未检测到新增字段，直接使用编辑后的schema进入代码迭代阶段")
             return edited_schema
 
-    def parse_all_html_files(self, html_files: List[str], parser_path: str) -> Dict:
+    def parse_all_html_files(self, html_files: List[str], parser_path: str, parser_code: Optional[str] = None) -> Dict:
         """
         使用生成的解析器批量解析所有HTML文件
 
         Args:
             html_files: 所有HTML文件路径列表
             parser_path: 解析器文件路径
+            parser_code: 解析器代码（可选，提供时不再读取 parser_path）
 
         Returns:
             批量解析结果
@@ -242,4 +311,5 @@ class AgentExecutor:
         return self.parser_processor.process({
             'html_files': html_files,
             'parser_path': parser_path,
+            'parser_code': parser_code,
         })
@@ -9,6 +9,8 @@ from loguru import logger
 from .planner import AgentPlanner
 from .executor import AgentExecutor
 from web2json.config.settings import settings
+from web2json.utils.artifact_store import ArtifactStore
+from web2json.utils.usage_tracker import get_current_tracker, track_usage
 
 
 class ParserAgent:
@@ -18,7 +20,7 @@ class ParserAgent:
     通过给定一组HTML文件，自动生成能够解析这些页面的Python代码
     """
 
-    def __init__(self, output_dir: str = "output", schema_mode: str = None, schema_template: Dict = None, enable_schema_edit: bool = None, progress_callback=None, save_to_disk: bool = True, remove_null_fields: bool = True):
+    def __init__(self, output_dir: str = "output", schema_mode: str = None, schema_template: Dict = None, enable_schema_edit: bool = None, progress_callback=None, save_to_disk: bool = True, remove_null_fields: bool = True, artifact_store: Optional[ArtifactStore] = None):
         """
         初始化Agent
 
@@ -30,6 +32,7 @@ class ParserAgent:
             progress_callback: 进度回调函数 callback(phase, step, percentage)
             save_to_disk: 批量解析时是否保存到磁盘（默认True）
             remove_null_fields: 是否清除值为null的字段（默认True）
+            artifact_store: 中间产物存储（可选，默认全部写入 output_dir；InMemoryArtifactStore 不读写磁盘）
         """
         self.planner = AgentPlanner()
         self.schema_mode = schema_mode or settings.schema_mode
@@ -43,7 +46,8 @@ class ParserAgent:
             enable_schema_edit=self.enable_schema_edit,
             progress_callback=progress_callback,
             save_to_disk=save_to_disk,
-            remove_null_fields=remove_null_fields
+            remove_null_fields=remove_null_fields,
+            artifact_store=artifact_store,
         )
         self.output_dir = Path(output_dir)
 
@@ -56,7 +60,39 @@ class ParserAgent:
         schema_mode: str = None,
         schema_template: str = None,
         enable_schema_edit: bool = None,
-        auto_parse: bool = True
+        auto_parse: bool = True,
+        resume: bool = False
+    ) -> Dict:
+        """
+        生成解析器，参数与返回值见 _generate_parser
+
+        返回结果中的 llm_usage 为本次任务按阶段汇总的 LLM 用量（调用方已通过 track_usage
+        启用统计时沿用调用方的统计对象）。
+        """
+        with track_usage(get_current_tracker()) as tracker:
+            result = self._generate_parser(
+                html_files=html_files,
+                domain=domain,
+                iteration_rounds=iteration_rounds,
+                schema_mode=schema_mode,
+                schema_template=schema_template,
+                enable_schema_edit=enable_schema_edit,
+                auto_parse=auto_parse,
+                resume=resume,
+            )
+        result['llm_usage'] = tracker.summary()
+        return result
+
+    def _generate_parser(
+        self,
+        html_files: List[str],
+        domain: str = None,
+        iteration_rounds: int = None,
+        schema_mode: str = None,
+        schema_template: str = None,
+        enable_schema_edit: bool = None,
+        auto_parse: bool = True,
+        resume: bool = False
     ) -> Dict:
         """
         生成解析器
@@ -78,6 +114,7 @@ class ParserAgent:
             schema_template: 预定义schema模板文件路径（JSON格式）
             enable_schema_edit: 是否启用Schema手动编辑模式
             auto_parse: 是否自动批量解析所有HTML文件，默认为True
+            resume: 是否断点续跑：跳过输出目录断点清单（checkpoint.json）中输入和配置未变化的已完成阶段
 
         Returns:
             生成结果
@@ -137,7 +174,7 @@ class ParserAgent:
         logger.info("\n[步骤 2/4] 执行计划 - 两阶段迭代")
         if self.progress_callback:
             self.progress_callback("execution", "开始两阶段迭代", 10)
-        execution_result = self.executor.execute_plan(plan)
+        execution_result = self.executor.execute_plan(plan, resume=resume)
 
         if not execution_result['success']:
             logger.error("执行失败，无法生成解析器")
@@ -158,7 +195,8 @@ class ParserAgent:
 
             parse_result = self.executor.parse_all_html_files(
                 html_files=all_html_files,
-                parser_path=parser_path
+                parser_path=parser_path,
+                parser_code=execution_result['final_parser'].get('code'),
             )
         else:
             logger.info("\n[步骤 3/4] 跳过批量解析（auto_parse=False）")
@@ -208,11 +246,12 @@ class ParserAgent:
             for schema_line in schema_json.split('\n'):
                 lines.append(f"    {schema_line}")
         elif schema_phase.get('final_schema_path'):
-            # 如果没有 final_schema 但有路径，读取文件
+            # 如果没有 final_schema 但有路径，从中间产物存储读取
             final_schema_path = schema_phase['final_schema_path']
             try:
-                with open(final_schema_path, 'r', encoding='utf-8') as f:
-                    final_schema = json.load(f)
+                final_schema = self.executor.store.get_json(final_schema_path)
+                if final_schema is None:
+                    raise FileNotFoundError(final_schema_path)
                 lines.append(f"  最终Schema字段数: {len(final_schema)}")
                 lines.append(f"  最终Schema内容:")
                 schema_json = json.dumps(final_schema, ensure_ascii=False, indent=4)
@@ -222,11 +261,21 @@ class ParserAgent:
                 logger.warning(f"无法读取Schema文件: {e}")
                 lines.append(f"  最终Schema路径: {final_schema_path}")
 
+        resumed = [name for name in ('schema_phase', 'code_phase') if execution_result.get(name, {}).get('resumed')]
+        if resumed:
+            lines.append(f"\n断点续跑: 复用已完成的阶段 {', '.join(resumed)}")
+
         # 代码迭代阶段结果
         code_phase = execution_result.get('code_phase', {})
         code_rounds = code_phase.get('rounds', [])
         code_success_rounds = [r for r in code_rounds if r.get('success')]
         lines.append(f"\n代码迭代阶段: {len(code_success_rounds)}/{len(code_rounds)} 轮成功")
+        validation = code_phase.get('validation')
+        if validation:
+            lines.append(
+                f"  样本校验: {validation['passed_samples']}/{validation['total_samples']} 个样本通过"
+                + ("（全部通过，提前结束）" if code_phase.get('early_stopped') else "")
+            )
 
         # 解析器生成结果
         if execution_result.get('final_parser'):
@@ -243,6 +292,43 @@ class ParserAgent:
             if output_dir:
                 lines.append(f"  结果保存目录: {output_dir}")
 
+        # LLM 调用统计（重试、对冲、截止时间、延迟分位数）
+        try:
+            from web2json.utils.llm_retry import LLMTelemetry
+            telemetry = LLMTelemetry.snapshot()
+        except Exception:
+            telemetry = {}
+        if telemetry.get('attempts'):
+            lines.append(f"\nLLM调用:")
+            lines.append(
+                f"  请求: {telemetry.get('attempts', 0)} 次，重试: {telemetry.get('retries', 0)} 次，"
+                f"对冲: {telemetry.get('hedges', 0)} 次（对冲胜出 {telemetry.get('hedges_won', 0)} 次），"
+                f"超过截止时间: {telemetry.get('deadline_exceeded', 0)} 次"
+            )
+            for model, latency in telemetry.get('latency', {}).items():
+                lines.append(f"  {model} 延迟: p50={latency['p50']}s, p95={latency['p95']}s")
+
+        # 本次任务按阶段的 LLM 用量
+        tracker = get_current_tracker()
+        usage = tracker.summary() if tracker else {}
+        if usage.get('by_phase'):
+            total = usage['total']
+            lines.append(
+                f"\nLLM用量: {total['calls']} 次调用，{total['total_tokens']} tokens"
+                f"（输入 {total['prompt_tokens']}，输出 {total['completion_tokens']}），"
+                f"缓存命中 {total['cache_hits']} 次，前缀缓存命中率 {total['prompt_cache_hit_rate']:.1%}"
+            )
+            for phase, stats in usage['by_phase'].items():
+                lines.append(
+                    f"  {phase}: {stats['calls']} 次，{stats['total_tokens']} tokens，"
+                    f"前缀缓存命中率 {stats['prompt_cache_hit_rate']:.1%}，累计耗时 {stats['latency_seconds']:.1f}s"
+                )
+            for phase, stats in usage.get('cascade', {}).items():
+                lines.append(
+                    f"  {phase} 模型级联: {stats['calls']} 次，升级到主模型 {stats['escalations']} 次"
+                    f"（升级率 {stats['escalation_rate']:.1%}）"
+                )
+
         lines.append("="*70)
 
         summary = "\n".join(lines)
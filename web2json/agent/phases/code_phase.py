@@ -2,12 +2,19 @@
 代码迭代阶段管理器
 负责协调解析器代码的生成和优化流程
 """
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from loguru import logger
 
 from web2json.agent.processors import CodeProcessor
+from web2json.config.settings import settings
+from web2json.tools.template_diff import collapse_template_regions
+from web2json.tools.validators import clean_generated_code, validate_parser_on_samples
+from web2json.tools.webpage_source import get_html_from_file
+from web2json.utils.llm_context import submit_with_context
+from web2json.utils.usage_tracker import llm_phase
 
 from .base_phase import BasePhase
 
@@ -40,6 +47,11 @@ class CodePhase(BasePhase):
         第一轮：基于最终 Schema 生成初始解析代码
         后续轮：基于验证结果优化代码
 
+        开启 CODE_ITERATION_VALIDATION 时，每轮生成的解析器都会在所有样本上运行，
+        并与各样本 Schema 的 value_sample 逐字段比较：全部通过即提前结束；
+        否则下一轮针对未通过的样本，只要求修正未通过的字段。轮数上限仍为样本数。
+        CODE_PARALLEL_CANDIDATES > 1 时改为并行生成候选解析器并本地打分（见 _execute_parallel）。
+
         Args:
             final_schema: 来自 Schema 迭代阶段的最终 Schema
             schema_phase_rounds: Schema 阶段的轮次数据（包含 HTML）
@@ -50,12 +62,16 @@ class CodePhase(BasePhase):
                 'rounds': List[Dict],      # 每轮的详细结果
                 'parsers': List[Dict],     # 所有生成的解析器
                 'final_parser': Dict,      # 最终解析器
+                'validation': Dict,        # 最终解析器的样本校验结果（未开启校验时为 None）
+                'early_stopped': bool,     # 是否因所有样本通过而提前结束
             }
         """
         result = {
             'rounds': [],
             'parsers': [],
             'final_parser': None,
+            'validation': None,
+            'early_stopped': False,
             'success': False,
         }
 
@@ -64,22 +80,38 @@ class CodePhase(BasePhase):
             logger.error("Schema阶段没有可用的数据")
             return result
 
+        samples = self._load_samples(schema_phase_rounds)
+        if not samples:
+            logger.error("Schema阶段没有可用的样本HTML")
+            return result
+
+        if settings.code_parallel_candidates > 1:
+            return self._execute_parallel(final_schema, samples, result)
+
+        validate = settings.code_iteration_validation
+        total_rounds = len(samples)
+
         logger.info(f"\n{'='*70}")
-        logger.info(f"阶段2: 代码迭代（使用Schema阶段的{len(schema_phase_rounds)}个HTML，{len(schema_phase_rounds)}轮迭代）")
+        logger.info(f"阶段2: 代码迭代（使用Schema阶段的{total_rounds}个HTML，最多{total_rounds}轮迭代）")
         logger.info(f"{'='*70}")
 
         current_parser_code = None
         current_parser_path = None
+        # 当前解析器在各样本上的校验结果，以及迄今最好的解析器（校验失败字段最少）
+        reports: Optional[List[Dict]] = None
+        best = None
+        targeted = set()
 
-        # 使用 Schema 阶段的轮次数据
-        total_rounds = len(schema_phase_rounds)
-        for idx, schema_round in enumerate(schema_phase_rounds, 1):
-            if not schema_round.get('success'):
-                logger.warning(f"Schema阶段第 {idx} 轮失败，跳过代码生成")
-                continue
+        for idx in range(1, total_rounds + 1):
+            if validate and reports is not None:
+                sample = self._pick_target(samples, reports, targeted)
+            else:
+                sample = samples[idx - 1]
+            targeted.add(sample['round'])
+            sample_report = next((r for r in reports or [] if r['round'] == sample['round']), None)
 
             logger.info(f"\n{'─'*70}")
-            logger.info(f"代码迭代 - 第 {idx}/{len(schema_phase_rounds)} 轮")
+            logger.info(f"代码迭代 - 第 {idx}/{total_rounds} 轮（样本 {sample['round']}）")
             logger.info(f"{'─'*70}")
 
             # 更新代码迭代进度：35-80%，每轮分配15%
@@ -90,38 +122,31 @@ class CodePhase(BasePhase):
                 self.progress_callback("code_iteration", f"代码迭代第 {idx}/{total_rounds} 轮", start_progress)
 
             try:
-                # 优先使用内存中的HTML内容（减少磁盘I/O）
-                html_content = schema_round.get('html_content')
-                html_path = schema_round.get('html_path')  # 总是获取路径（用于记录）
-
-                # 降级方案：如果内存中没有（向后兼容），再从磁盘读取
-                if not html_content:
-                    if not html_path:
-                        logger.error(f"  ✗ Schema阶段第 {idx} 轮缺少HTML数据（内存和磁盘都无法获取）")
-                        continue
-
-                    with open(html_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    logger.debug(f"  从磁盘读取HTML: {html_path}")
-                else:
-                    logger.debug(f"  使用内存中的HTML内容")
-
                 # 生成或优化解析代码
-                if idx == 1:
+                if current_parser_code is None:
                     logger.info(f"  生成初始解析代码...")
+                elif sample_report:
+                    logger.info(
+                        f"  优化解析代码（基于第 {idx-1} 轮，修正样本 {sample['round']} 上未通过的 "
+                        f"{len(sample_report['failed_fields'])} 个字段）..."
+                    )
                 else:
                     logger.info(f"  优化解析代码（基于第 {idx-1} 轮）...")
-                code_result = self.code_processor.process({
-                    'html_content': html_content,
-                    'target_json': final_schema,
-                    'idx': idx,
-                    'previous_parser_code': current_parser_code,
-                    'previous_parser_path': current_parser_path,
-                })
+                with llm_phase("code_iteration", round=idx):
+                    code_result = self.code_processor.process({
+                        'html_content': sample['prompt_html'],
+                        'full_html': sample['original_html'] or sample['html_content'],
+                        'target_json': final_schema,
+                        'idx': idx,
+                        'previous_parser_code': current_parser_code,
+                        'previous_parser_path': current_parser_path,
+                        'extraction_result': sample_report['result'] if sample_report else None,
+                        'failed_fields': sample_report['failed_fields'] if sample_report else None,
+                    })
 
                 if not code_result['success']:
                     logger.error(f"  ✗ 代码生成失败")
-                    if idx == 1:
+                    if current_parser_code is None:
                         return result
                     continue
 
@@ -132,9 +157,10 @@ class CodePhase(BasePhase):
                 # 记录本轮结果（复用 Schema 阶段的数据）
                 round_result = {
                     'round': idx,
-                    'url': schema_round['url'],
-                    'html_path': html_path,
-                    'groundtruth_schema': schema_round.get('groundtruth_schema'),
+                    'sample_round': sample['round'],
+                    'url': sample['url'],
+                    'html_path': sample['html_path'],
+                    'groundtruth_schema': sample['schema'],
                     'parser_path': current_parser_path,
                     'parser_code': current_parser_code,
                     'parser_result': code_result,
@@ -149,6 +175,29 @@ class CodePhase(BasePhase):
                     end_progress = base_progress + idx * progress_per_round
                     self.progress_callback("code_iteration", f"代码迭代第 {idx}/{total_rounds} 轮完成", end_progress)
 
+                if not validate:
+                    continue
+
+                reports = validate_parser_on_samples(
+                    clean_generated_code(current_parser_code), samples, list(final_schema)
+                )
+                round_result['validation'] = self._summarize(reports)
+                self._log_validation(reports)
+
+                failures = self._count_failures(reports)
+                if best is None or failures <= best['failures']:
+                    best = {'failures': failures, 'code': current_parser_code,
+                            'path': current_parser_path, 'reports': reports}
+                else:
+                    # 本轮比之前更差：回退到最好的解析器，下一轮在其基础上继续修正
+                    logger.warning(f"  第 {idx} 轮解析器的校验结果不如之前（{failures} > {best['failures']} 处失败），回退")
+                    current_parser_code, current_parser_path, reports = best['code'], best['path'], best['reports']
+
+                if failures == 0:
+                    logger.success(f"  ✓ 解析器在全部 {len(samples)} 个样本上通过校验，提前结束代码迭代")
+                    result['early_stopped'] = idx < total_rounds
+                    break
+
             except Exception as e:
                 logger.error(f"代码迭代第 {idx} 轮失败: {str(e)}")
                 import traceback
@@ -156,13 +205,14 @@ class CodePhase(BasePhase):
 
                 round_result = {
                     'round': idx,
-                    'url': schema_round.get('url'),
+                    'sample_round': sample['round'],
+                    'url': sample.get('url'),
                     'error': str(e),
                     'success': False,
                 }
                 result['rounds'].append(round_result)
 
-                if idx == 1:
+                if current_parser_code is None:
                     # 第一轮失败则退出
                     return result
 
@@ -174,6 +224,280 @@ class CodePhase(BasePhase):
                 config=final_schema
             )
             result['final_parser'] = final_parser
+            result['validation'] = self._summarize(reports) if reports is not None else None
             result['success'] = True
 
         return result
+
+    def _execute_parallel(self, final_schema: Dict, samples: List[Dict], result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        并行生成 K 个候选解析器，在所有样本上打分，保留最优者
+
+        候选 i 使用第 i 个样本（样本用完后循环使用，并逐步提高温度以拉开差异）；
+        最优候选未通过全部样本且开启 CODE_CANDIDATE_REFINE 时，再针对失败的样本和字段优化一轮。
+
+        Args:
+            final_schema: 最终 Schema
+            samples: _load_samples 的结果
+            result: execute 初始化的结果字典
+
+        Returns:
+            与 execute 相同
+        """
+        total = settings.code_parallel_candidates
+        fields = list(final_schema)
+
+        logger.info(f"\n{'='*70}")
+        logger.info(f"阶段2: 代码生成（并行生成 {total} 个候选解析器，在 {len(samples)} 个样本上打分）")
+        logger.info(f"{'='*70}")
+        if self.progress_callback:
+            self.progress_callback("code_iteration", f"并行生成 {total} 个候选解析器", 35)
+
+        # 并发数受 MAX_CONCURRENT_EXTRACTIONS 限制（与 Schema 阶段的并行调用一致）
+        candidates = []
+        with ThreadPoolExecutor(max_workers=max(1, min(total, settings.max_concurrent_extractions))) as executor:
+            futures = []
+            for index in range(1, total + 1):
+                sample = samples[(index - 1) % len(samples)]
+                temperature = self._candidate_temperature(index, len(samples))
+                futures.append((index, sample, temperature, submit_with_context(
+                    executor, self._generate_candidate, final_schema, sample, index, temperature
+                )))
+            for index, sample, temperature, future in futures:
+                try:
+                    code_result = future.result()
+                except Exception as e:
+                    code_result = {'success': False, 'error': str(e)}
+                candidates.append((index, sample, temperature, code_result))
+
+        best = None
+        for index, sample, temperature, code_result in candidates:
+            round_result = {
+                'round': index,
+                'candidate': index,
+                'sample_round': sample['round'],
+                'temperature': temperature,
+                'url': sample['url'],
+                'success': code_result['success'],
+            }
+            result['rounds'].append(round_result)
+            if not code_result['success']:
+                round_result['error'] = code_result.get('error')
+                logger.warning(f"  候选 {index} 生成失败: {code_result.get('error')}")
+                continue
+
+            reports = validate_parser_on_samples(clean_generated_code(code_result['code']), samples, fields)
+            failures = self._count_failures(reports)
+            round_result.update({
+                'html_path': sample['html_path'],
+                'groundtruth_schema': sample['schema'],
+                'parser_path': code_result['parser_path'],
+                'parser_code': code_result['code'],
+                'parser_result': code_result,
+                'validation': self._summarize(reports),
+            })
+            result['parsers'].append(code_result)
+            passed = sum(1 for r in reports if r['passed'])
+            logger.info(f"  候选 {index}（样本 {sample['round']}，温度 {temperature}）: "
+                        f"{passed}/{len(samples)} 个样本通过，{failures} 处失败")
+            if best is None or failures < best['failures']:
+                best = {'index': index, 'failures': failures, 'code': code_result['code'],
+                        'path': code_result['parser_path'], 'reports': reports}
+
+        if best is None:
+            logger.error("所有候选解析器均生成失败")
+            return result
+
+        logger.success(f"✓ 选择候选 {best['index']}（{best['failures']} 处失败）")
+        if self.progress_callback:
+            self.progress_callback("code_iteration", f"已选择候选 {best['index']}", 70)
+
+        if best['failures'] and settings.code_candidate_refine:
+            best = self._refine_candidate(final_schema, samples, best, total + 1, result)
+
+        result['final_parser'] = self.code_processor.save_final_parser(
+            code=best['code'],
+            output_dir=self.output_dir,
+            config=final_schema
+        )
+        result['validation'] = self._summarize(best['reports'])
+        result['success'] = True
+        if self.progress_callback:
+            self.progress_callback("code_iteration", "代码生成完成", 80)
+        return result
+
+    def _generate_candidate(self, final_schema: Dict, sample: Dict, index: int, temperature: float) -> Dict:
+        """在线程池中生成一个候选解析器（LLM 用量按候选序号记为轮次）"""
+        with llm_phase("code_iteration", round=index):
+            return self.code_processor.process({
+                'html_content': sample['prompt_html'],
+                'full_html': sample['original_html'] or sample['html_content'],
+                'target_json': final_schema,
+                'idx': index,
+                'temperature': temperature,
+                'parser_name': f"parser_candidate_{index}.py",
+                # 各候选并发生成，不写共享的 generated_parser.py/schema.json
+                'save_generated': False,
+            })
+
+    @staticmethod
+    def _candidate_temperature(index: int, sample_count: int) -> float:
+        """第一遍使用配置的温度，之后每多循环一遍样本提高 0.2（上限 1.0）"""
+        return round(min(1.0, settings.code_gen_temperature + 0.2 * ((index - 1) // sample_count)), 2)
+
+    def _refine_candidate(
+        self,
+        final_schema: Dict,
+        samples: List[Dict],
+        best: Dict,
+        idx: int,
+        result: Dict[str, Any],
+    ) -> Dict:
+        """针对最优候选未通过的样本和字段优化一轮，结果不差于原候选时采用"""
+        sample = self._pick_target(samples, best['reports'], set())
+        sample_report = next(r for r in best['reports'] if r['round'] == sample['round'])
+        logger.info(f"  优化候选 {best['index']}（修正样本 {sample['round']} 上未通过的 "
+                    f"{len(sample_report['failed_fields'])} 个字段）...")
+
+        with llm_phase("code_iteration", round=idx):
+            code_result = self.code_processor.process({
+                'html_content': sample['prompt_html'],
+                'full_html': sample['original_html'] or sample['html_content'],
+                'target_json': final_schema,
+                'idx': idx,
+                'previous_parser_code': best['code'],
+                'previous_parser_path': best['path'],
+                'extraction_result': sample_report['result'],
+                'failed_fields': sample_report['failed_fields'],
+            })
+        round_result = {'round': idx, 'sample_round': sample['round'], 'url': sample['url'],
+                        'success': code_result['success']}
+        result['rounds'].append(round_result)
+        if not code_result['success']:
+            round_result['error'] = code_result.get('error')
+            return best
+
+        reports = validate_parser_on_samples(clean_generated_code(code_result['code']), samples, list(final_schema))
+        failures = self._count_failures(reports)
+        round_result.update({
+            'html_path': sample['html_path'],
+            'groundtruth_schema': sample['schema'],
+            'parser_path': code_result['parser_path'],
+            'parser_code': code_result['code'],
+            'parser_result': code_result,
+            'validation': self._summarize(reports),
+        })
+        result['parsers'].append(code_result)
+        self._log_validation(reports)
+        if failures > best['failures']:
+            logger.warning(f"  优化后的解析器校验结果更差（{failures} > {best['failures']} 处失败），保留原候选")
+            return best
+        return {**best, 'failures': failures, 'code': code_result['code'],
+                'path': code_result['parser_path'], 'reports': reports}
+
+    def _load_samples(self, schema_phase_rounds: List[Dict]) -> List[Dict]:
+        """
+        取出 Schema 阶段各成功轮次的 HTML 和样本 Schema
+
+        Returns:
+            [{'round', 'url', 'html_path', 'html_content', 'prompt_html', 'original_html', 'schema'}]
+            prompt_html 为折叠模板区域后用于 Prompt 的 HTML（未开启 TEMPLATE_DIFF_ENABLED 时与 html_content 相同）；
+            original_html 为原始 HTML，校验解析器时使用（与最终批量解析的输入一致），无法读取时为 None
+        """
+        samples = []
+        for idx, schema_round in enumerate(schema_phase_rounds, 1):
+            if not schema_round.get('success'):
+                logger.warning(f"Schema阶段第 {idx} 轮失败，跳过代码生成")
+                continue
+
+            # 优先使用内存中的HTML内容（减少磁盘I/O）
+            html_content = schema_round.get('html_content')
+            html_path = schema_round.get('html_path')  # 总是获取路径（用于记录）
+
+            # 降级方案：如果结果中没有（断点续跑、向后兼容），再从中间产物存储读取
+            if not html_content:
+                if not html_path:
+                    logger.error(f"  ✗ Schema阶段第 {idx} 轮缺少HTML数据（内存和存储中都无法获取）")
+                    continue
+                html_content = self.code_processor.store.get_text(html_path)
+                if html_content is None:
+                    logger.error(f"  ✗ 读取Schema阶段第 {idx} 轮的HTML失败: {html_path}")
+                    continue
+                logger.debug(f"  从存储读取HTML: {html_path}")
+
+            samples.append({
+                'round': schema_round.get('round', idx),
+                'url': schema_round.get('url'),
+                'html_path': html_path,
+                'html_content': html_content,
+                'prompt_html': schema_round.get('html_prompt_content') or html_content,
+                'original_html': self._load_original(schema_round),
+                'schema': schema_round.get('groundtruth_schema') or {},
+            })
+
+        # 断点续跑时清单中没有折叠后的 HTML，按存储中的精简 HTML 重新折叠模板区域
+        if settings.template_diff_enabled and len(samples) > 1 \
+                and not all(r.get('html_prompt_content') for r in schema_phase_rounds if r.get('success')):
+            prompt_contents = collapse_template_regions([sample['html_content'] for sample in samples])
+            for sample, prompt_content in zip(samples, prompt_contents):
+                sample['prompt_html'] = prompt_content
+        return samples
+
+    def _load_original(self, schema_round: Dict) -> Optional[str]:
+        """读取样本的原始 HTML：优先从中间产物存储读取，其次读取输入文件"""
+        original_path = schema_round.get('html_original_path')
+        if original_path:
+            html_content = self.code_processor.store.get_text(original_path)
+            if html_content is not None:
+                return html_content
+        html_file = schema_round.get('html_file')
+        if html_file:
+            try:
+                return get_html_from_file(html_file)
+            except Exception as e:
+                logger.debug(f"  读取原始HTML失败: {html_file} ({e})")
+        logger.warning(f"  Schema阶段第 {schema_round.get('round')} 轮缺少原始HTML，改用精简HTML校验解析器")
+        return None
+
+    @staticmethod
+    def _pick_target(samples: List[Dict], reports: List[Dict], targeted: set) -> Dict:
+        """选择下一轮针对的样本：优先尚未针对过的失败样本，其中失败字段最多的优先"""
+        failing = [r for r in reports if not r['passed']] or list(reports)
+        failing.sort(key=lambda r: (r['round'] in targeted, -len(r['failed_fields']), r['round']))
+        return next(s for s in samples if s['round'] == failing[0]['round'])
+
+    @staticmethod
+    def _count_failures(reports: List[Dict]) -> int:
+        """未通过的字段数（运行出错的样本额外计 1 次）"""
+        return sum(len(r['failed_fields']) + (1 if r['error'] else 0) for r in reports)
+
+    @staticmethod
+    def _summarize(reports: List[Dict]) -> Dict[str, Any]:
+        """样本校验结果摘要（不含完整抽取结果）"""
+        return {
+            'passed_samples': sum(1 for r in reports if r['passed']),
+            'total_samples': len(reports),
+            'samples': [
+                {
+                    'round': r['round'],
+                    'passed': r['passed'],
+                    'checked_fields': r['checked_fields'],
+                    'failed_fields': sorted(r['failed_fields']),
+                    'error': r['error'],
+                }
+                for r in reports
+            ],
+        }
+
+    @staticmethod
+    def _log_validation(reports: List[Dict]):
+        passed = sum(1 for r in reports if r['passed'])
+        logger.info(f"  样本校验: {passed}/{len(reports)} 个样本通过")
+        for r in reports:
+            if r['error']:
+                logger.info(f"    样本 {r['round']}: ✗ {r['error']}")
+            elif r['failed_fields']:
+                logger.info(
+                    f"    样本 {r['round']}: ✗ {len(r['failed_fields'])}/{r['checked_fields']} 个字段未通过 "
+                    f"({', '.join(r['failed_fields'])})"
+                )
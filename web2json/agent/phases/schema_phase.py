@@ -10,6 +10,9 @@ from loguru import logger
 
 from web2json.config.settings import settings
 from web2json.agent.processors import HtmlProcessor, SchemaProcessor
+from web2json.tools.template_diff import collapse_template_regions
+from web2json.utils.llm_context import submit_with_context
+from web2json.utils.usage_tracker import llm_phase
 
 from .base_phase import BasePhase
 
@@ -56,6 +59,7 @@ class SchemaPhase(BasePhase):
                 'rounds': List[Dict],        # 每轮的详细结果
                 'final_schema': Dict,        # 最终合并的 Schema
                 'final_schema_path': str,    # 最终 Schema 文件路径
+                'field_coverage': Dict,      # 各字段在样本中的覆盖情况
             }
         """
         result = {
@@ -108,6 +112,12 @@ class SchemaPhase(BasePhase):
         if self.progress_callback:
             self.progress_callback("html_simplification", "HTML简化完成", 20)
 
+        # 折叠各样本相同的模板区域，Prompt 中只完整展示可变区域
+        if settings.template_diff_enabled and len(simplified_data_list) > 1:
+            prompt_contents = collapse_template_regions([data['html_content'] for data in simplified_data_list])
+            for data, prompt_content in zip(simplified_data_list, prompt_contents):
+                data['html_prompt_content'] = prompt_content
+
         # ============ 步骤 2：并行提取/补充 Schema ============
         logger.info(f"\n{'═'*70}")
         if self.schema_mode == "auto":
@@ -125,9 +135,9 @@ class SchemaPhase(BasePhase):
         completed_count = 0
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             future_to_data = {
-                executor.submit(
-                    self.schema_processor.process,
-                    {'html_content': data['html_content'], 'idx': data['idx']}
+                submit_with_context(
+                    executor, self._process_sample, data,
+                    [other['html_content'] for other in simplified_data_list if other is not data],
                 ): data
                 for data in simplified_data_list
             }
@@ -153,6 +163,7 @@ class SchemaPhase(BasePhase):
 
         # ============ 构建轮次结果 ============
         all_schemas = []
+        all_html_contents = []
         for i, simplified in enumerate(simplified_data_list):
             idx = simplified['idx']
             html_file_path = simplified['html_file']
@@ -163,6 +174,7 @@ class SchemaPhase(BasePhase):
             if schema_result:
                 schema = schema_result['schema']
                 all_schemas.append(schema)
+                all_html_contents.append(simplified['html_content'])
 
                 round_result = {
                     'round': idx,
@@ -171,6 +183,7 @@ class SchemaPhase(BasePhase):
                     'html_original_path': simplified['html_original_path'],
                     'html_path': simplified['html_path'],
                     'html_content': simplified['html_content'],
+                    'html_prompt_content': simplified.get('html_prompt_content'),
                     'html_schema': schema.copy(),
                     'html_schema_path': schema_result['schema_path'],
                     'schema': schema.copy(),
@@ -190,12 +203,12 @@ class SchemaPhase(BasePhase):
                 self.progress_callback("schema_merge", "开始合并Schema", 30)
 
             try:
-                final_schema = self.schema_processor.merge_schemas(all_schemas)
+                with llm_phase("schema_merge"):
+                    final_schema = self.schema_processor.merge_schemas(all_schemas, all_html_contents)
 
                 result['final_schema'] = final_schema
-                result['final_schema_path'] = str(
-                    self.schema_processor.schemas_dir / "final_schema.json"
-                )
+                result['final_schema_path'] = self.schema_processor.final_schema_path
+                result['field_coverage'] = self._compute_field_coverage(final_schema, all_schemas)
                 result['success'] = True
 
                 if self.progress_callback:
@@ -207,3 +220,54 @@ class SchemaPhase(BasePhase):
                 logger.debug(traceback.format_exc())
 
         return result
+
+    def _process_sample(self, data: Dict, other_contents: List[str]) -> Dict:
+        """在线程池中提取/补充单个样本的 Schema（LLM 用量按样本序号记为轮次）
+
+        Args:
+            data: 样本的精简结果
+            other_contents: 其他样本的精简 HTML（用于检查修复后的 xpath 是否只在本页有效）
+        """
+        with llm_phase("schema_extraction", round=data['idx']):
+            return self.schema_processor.process({
+                'html_content': data['html_content'],
+                'html_prompt_content': data.get('html_prompt_content'),
+                'html_original_content': data.get('html_original_content'),
+                'html_other_contents': other_contents,
+                'idx': data['idx'],
+            })
+
+    def _compute_field_coverage(self, final_schema: Dict, sample_schemas: List[Dict]) -> Dict[str, Dict]:
+        """
+        统计最终 Schema 中每个字段在各样本 Schema 中出现的比例
+
+        只在部分样本中出现的字段即为可选字段；仅被一个样本覆盖的可选字段
+        说明样本多样性不足以验证它，会在日志中提示。
+
+        Args:
+            final_schema: 合并后的最终 Schema
+            sample_schemas: 各样本提取的 Schema 列表
+
+        Returns:
+            {字段名: {'present': 出现样本数, 'total': 样本总数, 'coverage': 覆盖率}}
+        """
+        total = len(sample_schemas)
+        coverage = {}
+        for field in final_schema or {}:
+            present = sum(1 for schema in sample_schemas if field in schema)
+            coverage[field] = {
+                'present': present,
+                'total': total,
+                'coverage': present / total if total else 0.0,
+            }
+
+        optional = {k: v for k, v in coverage.items() if v['present'] < total}
+        if optional:
+            logger.info(f"可选字段覆盖情况（{len(optional)}/{len(coverage)} 个字段并非所有样本都有）:")
+            for field, info in optional.items():
+                logger.info(f"  - {field}: {info['present']}/{info['total']} 个样本")
+            weak = [k for k, v in optional.items() if v['present'] <= 1]
+            if weak and total > 1:
+                logger.warning(f"以下字段仅在1个样本中出现，解析器可能缺乏验证: {', '.join(weak)}")
+
+        return coverage
@@ -7,6 +7,7 @@ from typing import List, Dict
 from loguru import logger
 
 from web2json.config.settings import settings
+from web2json.tools.sample_selector import select_samples
 
 
 class AgentPlanner:
@@ -39,9 +40,11 @@ class AgentPlanner:
         # 确保迭代轮数不超过总文件数
         iteration_rounds = min(iteration_rounds, len(html_files))
 
-        # 选择用于迭代学习的样本（前N个）
-        sample_files = html_files[:iteration_rounds]
+        # 选择用于迭代学习的样本（默认优先选择差异最大、正文不重复的样本，不足时按距离补足）
+        sample_files = select_samples(html_files, iteration_rounds)
         num_samples = len(sample_files)
+        if num_samples < iteration_rounds:
+            logger.warning(f"仅选出 {num_samples} 个可用样本，迭代轮数调整为 {num_samples}")
 
         # 构建标准执行计划
         plan = {
@@ -51,7 +54,8 @@ class AgentPlanner:
             'sample_files': sample_files,  # 用于迭代学习的样本
             'sample_urls': sample_files,   # 为了兼容性，保留这个字段
             'num_samples': num_samples,
-            'iteration_rounds': iteration_rounds,
+            'iteration_rounds': num_samples,
+            'sample_selection': settings.sample_selection_strategy,
             'phases': [
                 'schema_phase',     # 阶段1: Schema迭代 - HTML处理 + Schema提取/补充 + 合并
                 'code_phase',       # 阶段2: 代码迭代 - 代码生成和优化
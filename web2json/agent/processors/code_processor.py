@@ -8,6 +8,7 @@ from typing import Any, Dict, Optional
 from loguru import logger
 
 from web2json.tools import generate_parser_code
+from web2json.utils.artifact_store import ArtifactStore
 
 from .base_processor import BaseProcessor
 
@@ -15,14 +16,14 @@ from .base_processor import BaseProcessor
 class CodeProcessor(BaseProcessor):
     """代码处理器 - 负责生成和优化解析器代码"""
 
-    def __init__(self, parsers_dir: Path):
+    def __init__(self, store: ArtifactStore):
         """
         初始化代码处理器
 
         Args:
-            parsers_dir: 解析器代码保存目录
+            store: 中间产物存储（解析器代码保存到 parsers/）
         """
-        self.parsers_dir = parsers_dir
+        self.store = store
 
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -30,11 +31,17 @@ class CodeProcessor(BaseProcessor):
 
         Args:
             input_data: {
-                'html_content': str,            # HTML 内容
+                'html_content': str,            # HTML 内容（用于 Prompt）
+                'full_html': str,               # 完整页面 HTML（可选，级联校验使用，默认 html_content）
                 'target_json': Dict,            # 目标 Schema
                 'idx': int,                     # 轮次编号
                 'previous_parser_code': str,    # 上一轮的代码（可选）
                 'previous_parser_path': str,    # 上一轮的路径（可选）
+                'extraction_result': Dict,      # 上一轮代码在本轮HTML上的抽取结果（可选）
+                'failed_fields': Dict,          # 上一轮代码在本轮HTML上未通过校验的字段（可选）
+                'temperature': float,           # 温度参数（可选，默认 CODE_GEN_TEMPERATURE）
+                'parser_name': str,             # 保存的文件名（可选，默认 parser_round_{idx}.py）
+                'save_generated': bool,         # 是否保存 generated_parser.py/schema.json（可选，默认True）
             }
 
         Returns:
@@ -62,7 +69,11 @@ class CodeProcessor(BaseProcessor):
             invoke_params = {
                 "html_content": html_content,
                 "target_json": target_json,
-                "output_dir": str(self.parsers_dir)
+                "output_dir": "parsers",
+                "store": self.store,
+                "save_files": input_data.get('save_generated', True),
+                "temperature": input_data.get('temperature'),
+                "full_html": input_data.get('full_html'),
             }
 
             # 如果是优化模式（有上一轮的代码）
@@ -70,24 +81,24 @@ class CodeProcessor(BaseProcessor):
                 invoke_params.update({
                     "previous_parser_code": previous_parser_code,
                     "previous_parser_path": previous_parser_path,
-                    "round_num": idx
+                    "round_num": idx,
+                    "extraction_result": input_data.get('extraction_result'),
+                    "failed_fields": input_data.get('failed_fields'),
                 })
 
             # 调用代码生成工具
             parser_result = generate_parser_code(**invoke_params)
 
             # 保存解析器代码
-            parser_filename = f"parser_round_{idx}.py"
-            parser_path = self.parsers_dir / parser_filename
-            with open(parser_path, 'w', encoding='utf-8') as f:
-                f.write(parser_result['code'])
+            parser_filename = input_data.get('parser_name') or f"parser_round_{idx}.py"
+            parser_path = self.store.put_text(f"parsers/{parser_filename}", parser_result['code'])
 
             logger.success(f"  ✓ 已生成: {parser_filename}")
 
             result.update({
                 'success': True,
                 'code': parser_result['code'],
-                'parser_path': str(parser_path),
+                'parser_path': parser_path,
             })
 
         except Exception as e:
@@ -108,13 +119,11 @@ class CodeProcessor(BaseProcessor):
         Returns:
             最终解析器信息
         """
-        final_parser_path = self.parsers_dir / "final_parser.py"
-        with open(final_parser_path, 'w', encoding='utf-8') as f:
-            f.write(code)
+        final_parser_path = self.store.put_text("parsers/final_parser.py", code)
         logger.success(f"最终解析器已保存: {final_parser_path}")
 
         return {
-            'parser_path': str(final_parser_path),
+            'parser_path': final_parser_path,
             'code': code,
             'config_path': None,
             'config': config,
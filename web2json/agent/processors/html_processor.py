@@ -2,7 +2,6 @@
 HTML 处理器
 负责 HTML 文件的读取和简化
 """
-from pathlib import Path
 from typing import Any, Dict
 
 from loguru import logger
@@ -10,6 +9,7 @@ from loguru import logger
 from web2json.config.settings import settings
 from web2json.tools import get_html_from_file
 from web2json.tools.html_simplifier import simplify_html
+from web2json.utils.artifact_store import ArtifactStore
 
 from .base_processor import BaseProcessor
 
@@ -17,16 +17,14 @@ from .base_processor import BaseProcessor
 class HtmlProcessor(BaseProcessor):
     """HTML 处理器 - 负责 HTML 读取和简化"""
 
-    def __init__(self, html_original_dir: Path, html_simplified_dir: Path):
+    def __init__(self, store: ArtifactStore):
         """
         初始化 HTML 处理器
 
         Args:
-            html_original_dir: 原始 HTML 保存目录
-            html_simplified_dir: 简化后 HTML 保存目录
+            store: 中间产物存储（原始 HTML 保存到 html_original/，简化后 HTML 保存到 html_simplified/）
         """
-        self.html_original_dir = html_original_dir
-        self.html_simplified_dir = html_simplified_dir
+        self.store = store
 
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -44,6 +42,7 @@ class HtmlProcessor(BaseProcessor):
                 'idx': int,
                 'html_file': str,
                 'html_content': str,          # 处理后的 HTML 内容
+                'html_original_content': str, # 原始 HTML 内容
                 'html_original_path': str,    # 原始 HTML 路径
                 'html_path': str,             # 最终使用的 HTML 路径
                 'error': str,                 # 错误信息（如果失败）
@@ -63,9 +62,7 @@ class HtmlProcessor(BaseProcessor):
             html_content = get_html_from_file(file_path=html_file_path)
 
             # 保存原始 HTML
-            html_original_path = self.html_original_dir / f"schema_round_{idx}.html"
-            with open(html_original_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+            html_original_path = self.store.put_text(f"html_original/schema_round_{idx}.html", html_content)
 
             # 2. 精简 HTML
             try:
@@ -77,9 +74,7 @@ class HtmlProcessor(BaseProcessor):
                     mode=mode,
                     keep_attrs=keep_attrs
                 )
-                html_simplified_path = self.html_simplified_dir / f"schema_round_{idx}.html"
-                with open(html_simplified_path, 'w', encoding='utf-8') as f:
-                    f.write(simplified_html)
+                html_simplified_path = self.store.put_text(f"html_simplified/schema_round_{idx}.html", simplified_html)
 
                 compression_rate = (1 - len(simplified_html) / len(html_content)) * 100
                 logger.success(
@@ -97,8 +92,9 @@ class HtmlProcessor(BaseProcessor):
             result.update({
                 'success': True,
                 'html_content': html_for_processing,
-                'html_original_path': str(html_original_path),
-                'html_path': str(html_path),
+                'html_original_content': html_content,
+                'html_original_path': html_original_path,
+                'html_path': html_path,
             })
 
         except Exception as e:
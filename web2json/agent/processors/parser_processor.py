@@ -2,31 +2,32 @@
 解析器处理器
 负责使用生成的解析器批量解析 HTML 文件
 """
-import importlib.util
-import json
 import sys
+import types
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Optional
 
 from loguru import logger
 from tqdm import tqdm
 
+from web2json.utils.artifact_store import ArtifactStore
+
 from .base_processor import BaseProcessor
 
 
 class ParserProcessor(BaseProcessor):
     """解析器处理器 - 负责批量解析 HTML 文件"""
 
-    def __init__(self, result_dir: Path, save_to_disk: bool = True, remove_null_fields: bool = True):
+    def __init__(self, store: ArtifactStore, save_to_disk: bool = True, remove_null_fields: bool = True):
         """
         初始化解析器处理器
 
         Args:
-            result_dir: 解析结果保存目录
-            save_to_disk: 是否保存到磁盘（默认True，False时仅在内存中处理）
+            store: 中间产物存储（解析结果保存到 result/）
+            save_to_disk: 是否保存解析结果（默认True，False时仅在内存中处理）
             remove_null_fields: 是否清除值为null的字段（默认True）
         """
-        self.result_dir = result_dir
+        self.store = store
         self.save_to_disk = save_to_disk
         self.remove_null_fields = remove_null_fields
 
@@ -38,6 +39,7 @@ class ParserProcessor(BaseProcessor):
             input_data: {
                 'html_files': List[str],  # HTML 文件路径列表
                 'parser_path': str,       # 解析器文件路径
+                'parser_code': str,       # 解析器代码（可选，提供时不再读取 parser_path）
             }
 
         Returns:
@@ -51,7 +53,8 @@ class ParserProcessor(BaseProcessor):
             }
         """
         html_files = input_data['html_files']
-        parser_path = input_data['parser_path']
+        parser_path = input_data.get('parser_path')
+        result_dir = self.store.path("result")
 
         # 只有保存模式才打印详细的阶段信息
         if self.save_to_disk:
@@ -64,13 +67,13 @@ class ParserProcessor(BaseProcessor):
             'total_files': len(html_files),
             'parsed_files': [],
             'failed_files': [],
-            'output_dir': str(self.result_dir) if self.save_to_disk else '',
+            'output_dir': result_dir if self.save_to_disk else '',
             'parsed_data': [],  # 存储解析后的数据（filename + data）
         }
 
         try:
             # 加载解析器
-            parser = self._load_parser(parser_path)
+            parser = self._load_parser(parser_path, input_data.get('parser_code'))
 
             # 使用进度条显示解析进度
             with tqdm(total=len(html_files), desc="解析HTML文件", unit="file") as pbar:
@@ -95,16 +98,11 @@ class ParserProcessor(BaseProcessor):
                         # 根据模式选择处理方式
                         if self.save_to_disk:
                             # 保存模式：写入磁盘
-                            json_filename = html_path.stem + '.json'
-                            json_path = self.result_dir / json_filename
-
-                            # 保存 JSON
-                            with open(json_path, 'w', encoding='utf-8') as f:
-                                json.dump(parsed_data, f, ensure_ascii=False, indent=2)
+                            json_path = self.store.put_json(f"result/{html_path.stem}.json", parsed_data)
 
                             results['parsed_files'].append({
                                 'html_file': str(html_path),
-                                'json_file': str(json_path),
+                                'json_file': json_path,
                                 'fields_count': len(parsed_data),
                             })
                         else:
@@ -145,7 +143,7 @@ class ParserProcessor(BaseProcessor):
                 logger.success(f"成功解析: {len(results['parsed_files'])}/{len(html_files)} 个文件")
                 if results['failed_files']:
                     logger.warning(f"失败: {len(results['failed_files'])} 个文件")
-                logger.info(f"结果保存目录: {self.result_dir}")
+                logger.info(f"结果保存目录: {result_dir}")
                 logger.info(f"{'='*70}\n")
             # 内存模式：不打印保存相关信息（进度条已经显示了解析进度）
 
@@ -239,12 +237,19 @@ class ParserProcessor(BaseProcessor):
         else:
             return data
 
-    def _load_parser(self, parser_path: str):
-        """动态加载解析器类"""
-        spec = importlib.util.spec_from_file_location("parser_module", parser_path)
-        module = importlib.util.module_from_spec(spec)
+    def _load_parser(self, parser_path: Optional[str], parser_code: Optional[str] = None):
+        """动态加载解析器类：优先使用传入的代码，其次从中间产物存储读取，最后读取 parser_path 文件"""
+        if parser_code is None and parser_path:
+            parser_code = self.store.get_text(parser_path)
+            if parser_code is None:
+                parser_code = Path(parser_path).read_text(encoding='utf-8')
+        if not parser_code:
+            raise Exception("未提供解析器代码")
+
+        module = types.ModuleType("parser_module")
+        module.__file__ = parser_path or "<parser>"
         sys.modules["parser_module"] = module
-        spec.loader.exec_module(module)
+        exec(compile(parser_code, module.__file__, "exec"), module.__dict__)
 
         # 获取 WebPageParser 类
         if hasattr(module, 'WebPageParser'):
@@ -2,17 +2,19 @@
 Schema 处理器
 负责 Schema 的提取、补充和合并
 """
-import json
-from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from loguru import logger
 
+from web2json.config.settings import settings
 from web2json.tools import (
     extract_schema_from_html,
     merge_multiple_schemas,
     enrich_schema_with_xpath,
 )
+from web2json.tools.schema_merge import merge_schemas_locally, resolve_locally
+from web2json.tools.xpath_repair import repair_schema_xpaths
+from web2json.utils.artifact_store import ArtifactStore
 
 from .base_processor import BaseProcessor
 
@@ -20,19 +22,26 @@ from .base_processor import BaseProcessor
 class SchemaProcessor(BaseProcessor):
     """Schema 处理器 - 负责 Schema 提取、补充和合并"""
 
-    def __init__(self, schemas_dir: Path, schema_mode: str = 'auto', schema_template: Dict = None):
+    FINAL_SCHEMA_KEY = "schemas/final_schema.json"
+
+    def __init__(self, store: ArtifactStore, schema_mode: str = 'auto', schema_template: Dict = None):
         """
         初始化 Schema 处理器
 
         Args:
-            schemas_dir: Schema 保存目录
+            store: 中间产物存储（Schema 保存到 schemas/）
             schema_mode: Schema 模式 (auto/predefined)
             schema_template: 预定义的 Schema 模板
         """
-        self.schemas_dir = schemas_dir
+        self.store = store
         self.schema_mode = schema_mode
         self.schema_template = schema_template
 
+    @property
+    def final_schema_path(self) -> str:
+        """最终 Schema 的路径"""
+        return self.store.path(self.FINAL_SCHEMA_KEY)
+
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         处理 Schema（提取或补充）
@@ -43,8 +52,11 @@ class SchemaProcessor(BaseProcessor):
 
         Args:
             input_data: {
-                'html_content': str,  # HTML 内容
-                'idx': int,           # 轮次编号
+                'html_content': str,            # HTML 内容（精简后）
+                'html_original_content': str,   # 原始 HTML 内容（可选，用于校验 xpath）
+                'html_prompt_content': str,     # 折叠模板区域后用于 Prompt 的 HTML（可选，默认 html_content）
+                'html_other_contents': list,    # 其他样本的精简 HTML（可选，用于检查修复后的 xpath）
+                'idx': int,                     # 轮次编号
             }
 
         Returns:
@@ -74,18 +86,21 @@ class SchemaProcessor(BaseProcessor):
         }
 
         try:
-            html_schema = extract_schema_from_html(html_content=html_content)
+            html_schema = extract_schema_from_html(
+                html_content=input_data.get('html_prompt_content') or html_content,
+                original_html=input_data.get('html_original_content'),
+                full_html=html_content,
+            )
             logger.success(f"[提取阶段 {idx}] ✓ Schema提取完成（{len(html_schema)} 字段）")
+            self._repair_xpaths(html_schema, input_data)
 
             # 保存 schema
-            schema_path = self.schemas_dir / f"html_schema_round_{idx}.json"
-            with open(schema_path, 'w', encoding='utf-8') as f:
-                json.dump(html_schema, f, ensure_ascii=False, indent=2)
+            schema_path = self.store.put_json(f"schemas/html_schema_round_{idx}.json", html_schema)
 
             result.update({
                 'success': True,
                 'schema': html_schema,
-                'schema_path': str(schema_path),
+                'schema_path': schema_path,
             })
 
         except Exception as e:
@@ -107,19 +122,20 @@ class SchemaProcessor(BaseProcessor):
         try:
             enriched_schema = enrich_schema_with_xpath(
                 schema_template=self.schema_template,
-                html_content=html_content
+                html_content=input_data.get('html_prompt_content') or html_content,
+                original_html=input_data.get('html_original_content'),
+                full_html=html_content,
             )
             logger.success(f"[补充阶段 {idx}] ✓ Schema补充完成（{len(enriched_schema)} 字段）")
+            self._repair_xpaths(enriched_schema, input_data)
 
             # 保存 schema
-            schema_path = self.schemas_dir / f"enriched_schema_round_{idx}.json"
-            with open(schema_path, 'w', encoding='utf-8') as f:
-                json.dump(enriched_schema, f, ensure_ascii=False, indent=2)
+            schema_path = self.store.put_json(f"schemas/enriched_schema_round_{idx}.json", enriched_schema)
 
             result.update({
                 'success': True,
                 'schema': enriched_schema,
-                'schema_path': str(schema_path),
+                'schema_path': schema_path,
             })
 
         except Exception as e:
@@ -128,23 +144,78 @@ class SchemaProcessor(BaseProcessor):
 
         return result
 
-    def merge_schemas(self, schemas: List[Dict]) -> Dict:
+    def _repair_xpaths(self, schema: Dict, input_data: Dict[str, Any]):
+        """在精简 HTML 上校验并修复 xpath（XPATH_REPAIR_ENABLED），只保留通过校验的 xpath
+
+        修复时优先选择在原始 HTML 上也可用的写法，并要求在其他样本的精简 HTML 上也能取到值。
+        """
+        if not settings.xpath_repair_enabled:
+            return
+        idx = input_data['idx']
+        pages = [input_data['html_content'], input_data.get('html_original_content')]
+        try:
+            stats = repair_schema_xpaths(schema, pages, input_data.get('html_other_contents'))
+        except Exception as e:
+            logger.warning(f"[xpath校验 {idx}] 跳过: {e}")
+            return
+        if stats['repaired'] or stats['dropped']:
+            logger.info(
+                f"[xpath校验 {idx}] 通过 {stats['valid']} 个，修复 {stats['repaired']} 个，"
+                f"丢弃 {stats['dropped']} 个未通过校验的xpath"
+            )
+
+    def merge_schemas(self, schemas: List[Dict], html_contents: Optional[List[str]] = None) -> Dict:
         """
         合并多个 Schema
 
+        SCHEMA_MERGE_MODE=local 且提供了样本 HTML 时先在本地合并，只把有歧义的字段组交给 LLM；
+        否则把所有 Schema 交给 LLM 合并。
+
         Args:
             schemas: Schema 列表
+            html_contents: 与 schemas 一一对应的样本 HTML（可选，用于本地合并时的 xpath 投票）
 
         Returns:
             合并后的 Schema
         """
-        final_schema = merge_multiple_schemas(schemas=schemas)
+        if settings.schema_merge_mode == 'local' and html_contents:
+            final_schema = self._merge_locally(schemas, html_contents)
+        else:
+            final_schema = merge_multiple_schemas(schemas=schemas)
         logger.success(f"✓ 合并完成，最终 Schema 包含 {len(final_schema)} 个字段")
 
         # 保存最终 Schema
-        final_schema_path = self.schemas_dir / "final_schema.json"
-        with open(final_schema_path, 'w', encoding='utf-8') as f:
-            json.dump(final_schema, f, ensure_ascii=False, indent=2)
+        final_schema_path = self.store.put_json(self.FINAL_SCHEMA_KEY, final_schema)
         logger.success(f"✓ 最终Schema已保存: {final_schema_path}")
 
         return final_schema
+
+    def _merge_locally(self, schemas: List[Dict], html_contents: List[str]) -> Dict:
+        """本地合并，歧义字段组交给 LLM（只发送这些字段）；LLM 失败时按本地规则兜底"""
+        local = merge_schemas_locally(schemas, html_contents)
+        final_schema = dict(local.schema)
+
+        if not local.ambiguous:
+            logger.info(f"本地合并完成（{len(final_schema)} 个字段），无需调用LLM")
+            return final_schema
+
+        logger.info(f"本地合并 {len(final_schema)} 个字段，{len(local.ambiguous)} 组字段有歧义，交给LLM合并:")
+        for group in local.ambiguous:
+            logger.info(f"  - {', '.join(group.keys)}: {group.reason}")
+
+        try:
+            llm_schema = merge_multiple_schemas(schemas=local.ambiguous_schemas(len(schemas)))
+        except Exception as e:
+            logger.warning(f"LLM合并歧义字段失败，按本地规则兜底: {e}")
+            llm_schema = dict(filter(None, (resolve_locally(group) for group in local.ambiguous)))
+
+        for key, definition in llm_schema.items():
+            if key in final_schema:
+                logger.warning(f"LLM合并的字段 {key} 与本地合并的字段重名，保留本地合并结果")
+                continue
+            final_schema[key] = definition
+
+        if not final_schema:
+            logger.warning("本地合并没有得到任何字段，改为完整的LLM合并")
+            return merge_multiple_schemas(schemas=schemas)
+        return final_schema
@@ -250,6 +250,7 @@ def cmd_generate(args):
             html_files=html_files,
             base_output=args.output,
             domain=args.domain,
+            resume=getattr(args, 'resume', False),
         )
         return
 
@@ -266,7 +267,8 @@ def cmd_generate(args):
         iteration_rounds=getattr(args, 'iteration_rounds', None),
         schema_mode=schema_mode,
         schema_template=schema_template,
-        enable_schema_edit=getattr(args, 'enable_schema_edit', False)
+        enable_schema_edit=getattr(args, 'enable_schema_edit', False),
+        resume=getattr(args, 'resume', False)
     )
 
     # 输出结果
@@ -307,6 +309,9 @@ def main():
   # 使用预定义schema模板文件
   web2json -d input_html/ -o output/blog --schema-mode predefined --schema-template schema.json
 
+  # 上次运行中途失败后断点续跑（跳过已完成的阶段）
+  web2json -d input_html/ -o output/blog --resume
+
 更多信息: https://github.com/ccprocessor/web2json-agent
         """
     )
@@ -377,6 +382,11 @@ def main():
         action='store_true',
         help='是否按布局聚类分别生成解析器（默认: 否，使用全部HTML生成单个解析器）'
     )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='断点续跑：跳过输出目录中已完成且输入未变化的阶段（见 checkpoint.json）'
+    )
 
     # 解析参数
     args = parser.parse_args()
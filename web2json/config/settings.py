@@ -47,18 +47,97 @@ class Settings(BaseModel):
     # 代码生成 Prompt 版本 (v1: 原始版本, v2: SWDE优化版本)
     code_gen_prompt_version: str = Field(default_factory=lambda: os.getenv("CODE_GEN_PROMPT_VERSION", "v2"))
 
+    # 代码迭代时在所有样本上运行每轮解析器并与 value_sample 比较：全部通过即提前结束，
+    # 未通过时下一轮只针对失败的样本和字段优化（关闭则按样本顺序逐轮优化）
+    code_iteration_validation: bool = Field(default_factory=lambda: os.getenv("CODE_ITERATION_VALIDATION", "true").lower() == "true")
+
+    # 并行候选解析器数量（>1 时代替逐轮迭代：同时生成 K 个候选，在所有样本上本地打分取最优；0/1 关闭）
+    code_parallel_candidates: int = Field(default_factory=lambda: int(os.getenv("CODE_PARALLEL_CANDIDATES", "0")))
+    # 最优候选未通过全部样本时，是否针对未通过的样本和字段再优化一轮
+    code_candidate_refine: bool = Field(default_factory=lambda: os.getenv("CODE_CANDIDATE_REFINE", "true").lower() == "true")
+
+    # ============================================
+    # 模型级联（可选）
+    # ============================================
+    # 开启后各场景先用廉价模型，输出在本地校验失败时再升级到该场景的主模型
+    llm_cascade_enabled: bool = Field(default_factory=lambda: os.getenv("LLM_CASCADE_ENABLED", "false").lower() == "true")
+    # 各场景的廉价模型（为空或与主模型相同时该场景不级联）
+    default_cascade_model: str = Field(default_factory=lambda: os.getenv("DEFAULT_CASCADE_MODEL", ""))
+    agent_cascade_model: str = Field(default_factory=lambda: os.getenv("AGENT_CASCADE_MODEL", ""))
+    code_gen_cascade_model: str = Field(default_factory=lambda: os.getenv("CODE_GEN_CASCADE_MODEL", ""))
+    # 校验阈值：Schema 中能在样本上取到值的 xpath 比例、解析器在样本上填充的字段比例
+    cascade_min_xpath_hit_rate: float = Field(default_factory=lambda: float(os.getenv("CASCADE_MIN_XPATH_HIT_RATE", "0.5")))
+    cascade_min_field_fill_rate: float = Field(default_factory=lambda: float(os.getenv("CASCADE_MIN_FIELD_FILL_RATE", "0.5")))
+
     # 是否禁用思考模式（针对intern-s1-pro等支持思考模式的模型）
     disable_thinking_mode: bool = Field(default_factory=lambda: os.getenv("DISABLE_THINKING_MODE", "false").lower() in ("true", "1", "yes"))
 
+    # ============================================
+    # LLM 连接配置
+    # ============================================
+    # 单次请求超时（秒）和建立连接超时（秒）
+    llm_request_timeout: float = Field(default_factory=lambda: float(os.getenv("LLM_REQUEST_TIMEOUT", "600")))
+    llm_connect_timeout: float = Field(default_factory=lambda: float(os.getenv("LLM_CONNECT_TIMEOUT", "10")))
+    # 共享连接池的最大连接数（0 表示按并发配置自动计算）
+    llm_max_connections: int = Field(default_factory=lambda: int(os.getenv("LLM_MAX_CONNECTIONS", "0")))
+
+    # 按模型的全局限流（进程内所有调用共享，0 表示不限制）
+    llm_rpm_limit: int = Field(default_factory=lambda: int(os.getenv("LLM_RPM_LIMIT", "0")))
+    llm_tpm_limit: int = Field(default_factory=lambda: int(os.getenv("LLM_TPM_LIMIT", "0")))
+    llm_max_in_flight: int = Field(default_factory=lambda: int(os.getenv("LLM_MAX_IN_FLIGHT", "0")))
+
+    # 可重试错误（限流、超时、连接错误、5xx）的重试次数及指数退避参数（秒）
+    llm_max_retries: int = Field(default_factory=lambda: int(os.getenv("LLM_MAX_RETRIES", "2")))
+    llm_retry_base_delay: float = Field(default_factory=lambda: float(os.getenv("LLM_RETRY_BASE_DELAY", "1")))
+    llm_retry_max_delay: float = Field(default_factory=lambda: float(os.getenv("LLM_RETRY_MAX_DELAY", "30")))
+    # 单次调用（含重试）的总截止时间（秒，0 表示不限制）
+    llm_call_deadline: float = Field(default_factory=lambda: float(os.getenv("LLM_CALL_DEADLINE", "0")))
+    # 对冲请求：耗时超过近期延迟分位数时发出相同请求，取先返回的结果（会增加 token 消耗）
+    llm_hedge_enabled: bool = Field(default_factory=lambda: os.getenv("LLM_HEDGE_ENABLED", "false").lower() in ("true", "1", "yes"))
+    llm_hedge_quantile: float = Field(default_factory=lambda: float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")))
+    llm_hedge_min_samples: int = Field(default_factory=lambda: int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")))
+    # 流式接收响应（内容完整后提前结束、报告 token 进度、支持取消）
+    llm_streaming: bool = Field(default_factory=lambda: os.getenv("LLM_STREAMING", "false").lower() == "true")
+
+    # ============================================
+    # LLM 响应缓存
+    # ============================================
+    # 缓存模式 (off: 不缓存, readwrite: 读写缓存, replay: 只读回放，未命中不写入)
+    llm_cache_mode: str = Field(default_factory=lambda: os.getenv("LLM_CACHE_MODE", "off"))
+    llm_cache_dir: str = Field(default_factory=lambda: os.getenv("LLM_CACHE_DIR", ".cache/llm"))
+    # 缓存有效期（小时，0 表示永不过期）
+    llm_cache_ttl_hours: float = Field(default_factory=lambda: float(os.getenv("LLM_CACHE_TTL_HOURS", "168")))
+    # 缓存总大小上限（MB，0 表示不限制），超出时淘汰最久未访问的条目
+    llm_cache_max_size_mb: int = Field(default_factory=lambda: int(os.getenv("LLM_CACHE_MAX_SIZE_MB", "1024")))
+
     # ============================================
     # Agent 配置
     # ============================================
     # 默认迭代轮数（用于Schema学习的样本数量）
     default_iteration_rounds: int = Field(default_factory=lambda: int(os.getenv("DEFAULT_ITERATION_ROUNDS", "3")))
 
+    # 学习样本选择策略 (diverse: 中心样本+差异最大样本并剔除近似重复, first: 取前N个文件)
+    sample_selection_strategy: str = Field(default_factory=lambda: os.getenv("SAMPLE_SELECTION_STRATEGY", "diverse"))
+    # 多样性选择时参与计算的候选文件数上限
+    sample_candidate_pool: int = Field(default_factory=lambda: int(os.getenv("SAMPLE_CANDIDATE_POOL", "200")))
+
     # Schema模式 (auto: 自动提取和筛选字段, predefined: 使用预定义schema模板)
     schema_mode: str = Field(default_factory=lambda: os.getenv("SCHEMA_MODE", "auto"))
 
+    # 提取Schema后在精简HTML和原始HTML上校验每个xpath，与value_sample不符时尝试修复，只保留通过校验的xpath
+    xpath_repair_enabled: bool = Field(default_factory=lambda: os.getenv("XPATH_REPAIR_ENABLED", "true").lower() == "true")
+
+    # 节点编号模式：精简HTML中的元素带 data-w2j 编号，模型只回答字段所在的节点编号，xpath 在本地生成
+    schema_node_id_mode: bool = Field(default_factory=lambda: os.getenv("SCHEMA_NODE_ID_MODE", "false").lower() == "true")
+
+    # 模板区域折叠：对齐同一簇样本的精简HTML，各样本相同的子树在Prompt中折叠，只完整展示可变区域
+    template_diff_enabled: bool = Field(default_factory=lambda: os.getenv("TEMPLATE_DIFF_ENABLED", "false").lower() == "true")
+    # 折叠的最小内容长度（字符），较小的公共子树（如字段标签）保持原样
+    template_min_region_chars: int = Field(default_factory=lambda: int(os.getenv("TEMPLATE_MIN_REGION_CHARS", "200")))
+
+    # Schema合并方式 (llm: 全部交给LLM合并, local: 本地按字段名/xpath重叠分组并在样本上投票，只把有歧义的字段交给LLM)
+    schema_merge_mode: str = Field(default_factory=lambda: os.getenv("SCHEMA_MERGE_MODE", "llm"))
+
     # 是否启用Schema手动编辑模式
     enable_schema_edit: bool = Field(default_factory=lambda: os.getenv("ENABLE_SCHEMA_EDIT", "false").lower() in ("true", "1", "yes"))
 
@@ -72,6 +151,12 @@ class Settings(BaseModel):
     # DBSCAN聚类参数
     cluster_eps: float = Field(default_factory=lambda: float(os.getenv("CLUSTER_EPS", "0.05")))
     cluster_min_samples: int = Field(default_factory=lambda: int(os.getenv("CLUSTER_MIN_SAMPLES", "2")))
+    # 特征提取并行进程数（0 表示使用全部CPU核心，1 表示串行）
+    cluster_n_jobs: int = Field(default_factory=lambda: int(os.getenv("CLUSTER_N_JOBS", "0")))
+    # 布局特征缓存目录（为空则不缓存）
+    cluster_feature_cache_dir: str = Field(default_factory=lambda: os.getenv("CLUSTER_FEATURE_CACHE_DIR", ""))
+    # 两阶段聚类：先按粗签名（URL/文件名模板、顶层标签、DOM深度宽度）分桶，再桶内细聚类
+    cluster_bucketing: bool = Field(default_factory=lambda: os.getenv("CLUSTER_BUCKETING", "false").lower() in ("true", "1", "yes"))
 
     # ============================================
     # HTML精简配置
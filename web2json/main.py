@@ -3,12 +3,14 @@ HtmlParserAgent 主程序
 通过给定HTML文件目录，自动生成网页解析代码
 """
 import sys
+import json
 import argparse
 import warnings
 from pathlib import Path
 from loguru import logger
 from web2json.agent import ParserAgent
-from web2json.tools.cluster import cluster_html_layouts, cluster_html_layouts_optimized
+from web2json.tools.cluster import cluster_html_layouts
+from web2json.tools.layout_model import fit_layout_model
 
 # 过滤 LangSmith UUID v7 警告
 warnings.filterwarnings('ignore', message='.*LangSmith now uses UUID v7.*')
@@ -74,6 +76,7 @@ def generate_parsers_by_layout_clusters(
     domain: str | None = None,
     eps: float | None = None,
     min_samples: int | None = None,
+    resume: bool = False,
 ) -> None:
     """按布局聚类后分别为每个簇生成解析器。
 
@@ -83,6 +86,7 @@ def generate_parsers_by_layout_clusters(
         domain: 域名（可选）
         eps: DBSCAN的eps参数，距离 = 1 - similarity，eps越小要求相似度越高（默认使用配置值）
         min_samples: DBSCAN的min_samples参数，形成簇所需的最小样本数（默认使用配置值）
+        resume: 是否断点续跑（各簇输出目录中已完成的阶段不再重复执行）
     """
     from pathlib import Path
     import shutil
@@ -98,23 +102,15 @@ def generate_parsers_by_layout_clusters(
     logger.info("HtmlParserAgent - 按布局聚类生成解析器")
     logger.info("="*70)
 
-    # 读取HTML内容用于聚类
-    logger.info(f"正在读取 {len(html_files)} 个HTML文件...")
-    html_contents = []
-    for file_path in html_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                html_contents.append(f.read())
-        except Exception as e:
-            logger.error(f"读取文件失败 {file_path}: {e}")
-            sys.exit(1)
-
-    # 使用布局相似度聚类HTML
+    # 使用布局相似度聚类HTML（按文件流式提取特征，不在内存中保留HTML）
     logger.info(f"正在进行布局聚类分析 (eps={eps}, min_samples={min_samples})...")
     try:
-        labels, sim_mat, clusters = cluster_html_layouts_optimized(
-            html_contents,
-            use_knn_graph = True
+        layout_model, labels = fit_layout_model(
+            html_files,
+            use_knn_graph = True,
+            show_progress = True,
+            n_jobs = settings.cluster_n_jobs,
+            from_files = True
         )
     except Exception as e:
         logger.error(f"聚类失败: {e}")
@@ -167,6 +163,14 @@ def generate_parsers_by_layout_clusters(
     except Exception as e:
         logger.warning(f"保存聚类信息失败: {e}")
 
+    # 保存布局模型，后续新页面可直接路由到已有簇（及其解析器）
+    layout_model_file = base_output_path.parent / f"{base_output_path.name}_layout_model.json"
+    try:
+        layout_model.save(layout_model_file)
+        logger.info(f"布局模型已保存到: {layout_model_file}")
+    except Exception as e:
+        logger.warning(f"保存布局模型失败: {e}")
+
     # 针对每个簇分别创建 Agent 并生成解析器
     any_failure = False
     successful_clusters = []
@@ -207,6 +211,7 @@ def generate_parsers_by_layout_clusters(
             result = agent.generate_parser(
                 html_files=cluster_files,
                 domain=domain,
+                resume=resume,
             )
 
             if result['success']:
@@ -279,6 +284,11 @@ def main():
         default=3,
         help='迭代轮数（用于Schema学习的样本数量，默认: 3）'
     )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='断点续跑：跳过输出目录中已完成且输入未变化的阶段（见 checkpoint.json）'
+    )
 
     args = parser.parse_args()
 
@@ -294,6 +304,7 @@ def main():
             html_files=html_files,
             base_output=args.output,
             domain=args.domain,
+            resume=args.resume,
         )
         return
 
@@ -304,9 +315,17 @@ def main():
     result = agent.generate_parser(
         html_files=html_files,
         domain=args.domain,
-        iteration_rounds=args.iteration_rounds
+        iteration_rounds=args.iteration_rounds,
+        resume=args.resume
     )
 
+    # 保存本次运行按阶段的 LLM 用量（评估脚本据此汇总成本和耗时）
+    if result.get('llm_usage'):
+        usage_path = Path(args.output) / "llm_usage.json"
+        usage_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(usage_path, 'w', encoding='utf-8') as f:
+            json.dump(result['llm_usage'], f, ensure_ascii=False, indent=2)
+
     # 输出结果
     if not result['success']:
         logger.error("\n✗ 解析器生成失败")
@@ -4,6 +4,7 @@ Prompts 模块
 """
 
 from .code_generator import CodeGeneratorPrompts
+from .formatting import compact_json
 from .schema_extraction import SchemaExtractionPrompts
 from .schema_merge import SchemaMergePrompts
 
@@ -11,4 +12,5 @@ __all__ = [
     'CodeGeneratorPrompts',
     'SchemaExtractionPrompts',
     'SchemaMergePrompts',
+    'compact_json',
 ]
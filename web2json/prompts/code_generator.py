@@ -1,31 +1,70 @@
 """
 代码生成器 Prompt 模板
 用于生成和优化 BeautifulSoup 解析代码
+
+Prompt 按"静态内容在前、可变内容在后"组织，以便命中服务端的前缀缓存（prompt caching）：
+- 系统消息：角色、通用要求、XPath 规范、输出格式、main 函数结构，所有轮次和站点完全相同；
+- 用户消息：先放紧凑序列化的目标结构（同一站点各轮相同），再放任务说明，
+  最后放每轮不同的内容（前一轮代码、抽取结果、HTML 示例、轮次号）。
 """
 import json
 import os
 from typing import Dict
 
+from .formatting import compact_json
 
 class CodeGeneratorPrompts:
     """代码生成器 Prompt 模板类"""
 
+    # main 函数结构（生成与优化共用）
+    MAIN_FUNCTION_TEMPLATE = """```python
+def main():
+    # 获取命令行参数，默认为 'sample.html'
+    input_source = sys.argv[1] if len(sys.argv) > 1 else 'sample.html'
+
+    try:
+        # 判断是 URL 还是文件
+        if input_source.startswith('http://') or input_source.startswith('https://'):
+            # URL 处理：使用 DrissionPage
+            try:
+                from DrissionPage import ChromiumPage
+            except ImportError:
+                print(json.dumps({'error': 'DrissionPage not installed. Install it with: pip install DrissionPage'}))
+                sys.exit(1)
+
+            page = ChromiumPage()
+            page.get(input_source)
+            html_content = page.html
+            page.quit()
+        else:
+            # 文件处理：直接读取
+            html_file = Path(input_source)
+            if not html_file.exists():
+                print(json.dumps({'error': f'File not found: {html_file}'}))
+                sys.exit(1)
+            html_content = html_file.read_text(encoding='utf-8')
+
+        # 解析并输出结果
+        parser = WebPageParser()
+        result = parser.parse(html_content)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
+```"""
+
     @staticmethod
-    def get_initial_generation_prompt(html_content: str, target_json: Dict) -> str:
+    def get_system_message() -> str:
         """
-        获取初始代码生成 Prompt（第一轮）
-
-        Args:
-            html_content: HTML 内容
-            target_json: 目标 JSON 结构
+        获取系统消息（所有轮次共用的静态前缀）
 
         Returns:
-            Prompt 字符串
+            系统消息字符串
         """
-        # 截断过长的HTML
-        if len(html_content) > 30000:
-            html_content = html_content[:30000] + "\n... (截断)"
-
         # 获取prompt版本配置
         prompt_version = os.getenv("CODE_GEN_PROMPT_VERSION", "v2")
 
@@ -33,28 +72,17 @@ class CodeGeneratorPrompts:
         v2_extra_requirements = ""
         if prompt_version == "v2":
             v2_extra_requirements = """
-8. **数据完整性（重要）**：提取字段时，必须保留HTML中的原始格式：
+9. **数据完整性（重要）**：提取字段时，必须保留HTML中的原始格式：
    - 不要只截取元素的部分内容，即使与字段要求无关
    - 必要时，可以使用 .strip() 清理首尾空白
-9. **多策略提取**：每个字段应至少实现2-3种提取策略，提高鲁棒性
-10. **空值处理（重要）**：如果字段值为空（空字符串、空列表等），必须返回None而不是空值
+10. **多策略提取**：每个字段应至少实现2-3种提取策略，提高鲁棒性
 """
 
-        return f"""
-你是一个专业的HTML解析代码生成器。请根据以下信息生成一个Python类，用于解析同类网页。
-
-## 目标结构
-需要提取以下字段（JSON格式）：
-```json
-{json.dumps(target_json, ensure_ascii=False, indent=2)}
-```
+        return f"""你是一个专业的Python代码生成助手，负责生成和优化HTML解析代码，用于解析同类网页。
 
-## HTML示例
-```html
-{html_content}
-```
+用户消息中依次给出：目标结构（需要提取的字段）、本轮任务、前一轮代码（优化时）和HTML示例。
 
-## 要求
+## 通用要求
 1. 生成一个名为 `WebPageParser` 的Python类
 2. 使用 BeautifulSoup 和 lxml 进行解析
 3. 实现 `parse(html: str) -> dict` 方法
@@ -63,7 +91,7 @@ class CodeGeneratorPrompts:
 6. 代码尽量简洁，减少冗余
 7. 添加适当的错误处理
 8. **空值处理（必须）**：如果字段值为空（空字符串、空列表等），必须返回None而不是空值
-
+{v2_extra_requirements}
 ## XPath 书写规范（关键）
 使用 XPath 时必须遵循以下原则，以提高解析的稳定性和准确性：
 
@@ -83,7 +111,7 @@ class CodeGeneratorPrompts:
 - 核心思路：用**语义（label文本）+ 限定范围**，避免位置索引
 - class 匹配一律用 `contains()`
 - 优先在局部容器内搜索，而非全局查找
-{v2_extra_requirements}
+
 ## 输出格式 - 重要！
 **严格要求：**
 1. 直接输出纯Python代码，从 `import` 语句开始
@@ -93,7 +121,7 @@ class CodeGeneratorPrompts:
    - 不要使用任何反引号
 3. 不要包含任何说明文字、注释或解释
 4. 代码必须可以直接保存为.py文件并运行
-5. 确保代码完整，所有方法和函数都要有完整的实现
+5. 确保代码完整，所有方法和函数都要有完整的实现，输出整个完整的WebPageParser类和main部分
 
 **正确示例（直接从import开始）：**
 import sys
@@ -102,50 +130,60 @@ from pathlib import Path
 ...
 
 ## 使用示例要求
-在 `if __name__ == '__main__'` 部分，必须生成一个完整的 main 函数，支持两种输入方式：
+在 `if __name__ == '__main__'` 部分，必须有一个完整的 main 函数，支持两种输入方式（文件路径或URL）。
+生成代码时必须完整实现以下结构，不要省略任何部分；优化已有代码时该部分保持不变，不要修改。
 
 **main 函数结构：**
-```python
-def main():
-    # 获取命令行参数，默认为 'sample.html'
-    input_source = sys.argv[1] if len(sys.argv) > 1 else 'sample.html'
+{CodeGeneratorPrompts.MAIN_FUNCTION_TEMPLATE}
+"""
 
-    try:
-        # 判断是 URL 还是文件
-        if input_source.startswith('http://') or input_source.startswith('https://'):
-            # URL 处理：使用 DrissionPage
-            try:
-                from DrissionPage import ChromiumPage
-            except ImportError:
-                print(json.dumps({{'error': 'DrissionPage not installed. Install it with: pip install DrissionPage'}}))
-                sys.exit(1)
+    @staticmethod
+    def _target_section(target_json: Dict) -> str:
+        """目标结构（紧凑序列化，同一站点各轮字节相同，紧跟在系统消息之后作为缓存前缀）"""
+        return f"""## 目标结构
+需要提取以下字段（JSON格式）：
+```json
+{compact_json(target_json)}
+```
+"""
 
-            page = ChromiumPage()
-            page.get(input_source)
-            html_content = page.html
-            page.quit()
+    @staticmethod
+    def _preview(value, limit: int = 200) -> str:
+        """字段值的单行预览（过长时截断）"""
+        if isinstance(value, str):
+            text = value
         else:
-            # 文件处理：直接读取
-            html_file = Path(input_source)
-            if not html_file.exists():
-                print(json.dumps({{'error': f'File not found: {{html_file}}'}}))
-                sys.exit(1)
-            html_content = html_file.read_text(encoding='utf-8')
+            try:
+                text = compact_json(value)
+            except (TypeError, ValueError):
+                text = str(value)
+        text = " ".join(text.split())
+        return text if len(text) <= limit else text[:limit] + "..."
 
-        # 解析并输出结果
-        parser = WebPageParser()
-        result = parser.parse(html_content)
-        print(json.dumps(result, ensure_ascii=False, indent=2))
-    except Exception as e:
-        print(json.dumps({{'error': str(e)}}))
-        sys.exit(1)
+    @staticmethod
+    def get_initial_generation_prompt(html_content: str, target_json: Dict) -> str:
+        """
+        获取初始代码生成 Prompt（第一轮，用户消息部分）
 
+        Args:
+            html_content: HTML 内容
+            target_json: 目标 JSON 结构
 
-if __name__ == '__main__':
-    main()
-```
+        Returns:
+            Prompt 字符串
+        """
+        # 截断过长的HTML
+        if len(html_content) > 30000:
+            html_content = html_content[:30000] + "\n... (截断)"
+
+        return f"""{CodeGeneratorPrompts._target_section(target_json)}
+## 本轮任务
+根据下面的HTML示例，为目标结构中的每个字段编写提取逻辑，生成完整的解析代码（包括 main 函数）。
 
-**注意：必须完整实现上述结构，不要省略任何部分！**
+## HTML示例
+```html
+{html_content}
+```
 """
 
     @staticmethod
@@ -154,10 +192,11 @@ if __name__ == '__main__':
         target_json: Dict,
         previous_parser_code: str,
         round_num: int,
-        first_round_extraction_result: Dict = None
+        first_round_extraction_result: Dict = None,
+        failed_fields: Dict[str, Dict] = None
     ) -> str:
         """
-        获取代码优化 Prompt（第二轮及以后）
+        获取代码优化 Prompt（第二轮及以后，用户消息部分）
 
         Args:
             html_content: HTML 内容
@@ -165,6 +204,8 @@ if __name__ == '__main__':
             previous_parser_code: 前一轮的解析代码
             round_num: 当前轮次号
             first_round_extraction_result: 第一轮的抽取结果（用于观察空值字段）
+            failed_fields: 前一轮代码在本样本上未通过校验的字段
+                {字段名: {'expected': value_sample, 'actual': 抽取结果}}（可选）
 
         Returns:
             Prompt 字符串
@@ -204,123 +245,42 @@ if __name__ == '__main__':
 - 对于未成功提取的字段，首先判断文中是否明确出现，如果明确出现，则需要尝试新的提取策略（检查表格、列表、脚本标签等），否则继续保留为None
 """
 
-        return f"""
-你是一个专业的HTML解析代码优化师。你需要根据新的HTML样本和更新的字段列表，优化和补充之前生成的解析代码。
+        failed_fields_section = ""
+        if failed_fields:
+            lines = [
+                f"- {field}: 期望 `{CodeGeneratorPrompts._preview(info.get('expected'))}`，"
+                f"实际 `{CodeGeneratorPrompts._preview(info.get('actual'))}`"
+                for field, info in failed_fields.items()
+            ]
+            failed_fields_section = """
+## 校验未通过的字段
+前一轮代码在下面的HTML示例上运行后，以下字段与样本中的实际值不符。只需修正这些字段的提取逻辑，
+其余字段已在所有样本上通过校验，保持其代码不变：
+""" + "\n".join(lines) + "\n"
+
+        return f"""{CodeGeneratorPrompts._target_section(target_json)}
+## 本轮任务
+根据新的HTML样本和目标结构，优化和补充前一轮生成的解析代码：
+1. 保留前一轮代码中已有的、正确的字段提取逻辑（函数形式）
+2. 添加在前一轮中遗漏的新字段提取逻辑
+3. main函数是固定的，不要修改
+
+## 优化建议
+- 检查前一轮代码对新HTML的适配情况
+- 合并两个样本中的选择器策略
+- 确保所有字段都有备选方案
 
 ## 当前轮次信息
 轮次: {round_num}
-任务: 补充和优化现有解析代码
 
 ## 前一轮生成的解析代码
 ```python
 {previous_parser_code[:2000]}
 ...（部分代码）
 ```
-{extraction_result_section}
+{extraction_result_section}{failed_fields_section}
 ## 新的HTML示例
 ```html
 {html_content}
 ```
-
-## 更新的目标结构
-需要提取以下字段（JSON格式）：
-```json
-{json.dumps(target_json, ensure_ascii=False, indent=2)}
-```
-
-## 优化要求
-1. 保留前一轮代码中已有的、正确的字段提取逻辑（函数形式）
-2. 添加在前一轮中遗漏的新字段提取逻辑
-3. 尽量使用类名、ID等稳定属性，避免使用绝对索引
-4. 代码尽量简洁，减少冗余
-5. 添加适当的错误处理
-6. main函数是固定的，不要修改
-7. **空值处理（必须）**：如果字段值为空（空字符串、空列表等），必须返回None而不是空值
-
-## XPath 书写规范（关键）
-使用 XPath 时必须遵循以下原则，以提高解析的稳定性和准确性：
-
-**1. 语义定位优于位置索引**
-- ✅ **推荐**：通过字段名（label）定位值
-  ```python
-  # 示例：通过"建筑年代"标签找对应的值
-  value = soup.xpath("//span[normalize-space()='建筑年代']/following-sibling::span/text()")
-  ```
-- ❌ **避免**：使用硬编码的位置索引
-  ```python
-  # 不要这样：元素顺序变化会导致失败
-  value = soup.xpath("//div[@class='text-item'][1]")
-  ```
-
-**XPath 实践原则总结**：
-- 核心思路：用**语义（label文本）+ 限定范围**，避免位置索引
-- class 匹配一律用 `contains()`
-- 优先在局部容器内搜索，而非全局查找
-## 输出格式 - 重要！
-**严格要求：**
-1. 直接输出纯Python代码，从 `import` 语句开始
-2. **绝对不要**使用任何markdown标记，包括：
-   - 不要使用 ```python
-   - 不要使用 ```
-   - 不要使用任何反引号
-3. 不要包含任何说明文字、注释或解释
-4. 代码必须可以直接保存为.py文件并运行
-5. 确保代码完整，所有方法和函数都要有完整的实现
-6. 输出整个完整的WebPageParser类和main部分
-
-## 优化建议
-- 检查前一轮代码对新HTML的适配情况
-- 合并两个样本中的选择器策略
-- 确保所有字段都有备选方案
-
-
-## 使用示例要求
-在 `if __name__ == '__main__'` 部分，有一个完整的 main 函数，支持两种输入方式，当前已经实现，请勿修改。
-
-**main 函数结构：**
-```python
-def main():
-    # 获取命令行参数，默认为 'sample.html'
-    input_source = sys.argv[1] if len(sys.argv) > 1 else 'sample.html'
-
-    try:
-        # 判断是 URL 还是文件
-        if input_source.startswith('http://') or input_source.startswith('https://'):
-            # URL 处理：使用 DrissionPage
-            try:
-                from DrissionPage import ChromiumPage
-            except ImportError:
-                print(json.dumps({{'error': 'DrissionPage not installed. Install it with: pip install DrissionPage'}}))
-                sys.exit(1)
-
-            page = ChromiumPage()
-            page.get(input_source)
-            html_content = page.html
-            page.quit()
-        else:
-            # 文件处理：直接读取
-            html_file = Path(input_source)
-            if not html_file.exists():
-                print(json.dumps({{'error': f'File not found: {{html_file}}'}}))
-                sys.exit(1)
-            html_content = html_file.read_text(encoding='utf-8')
-
-        # 解析并输出结果
-        parser = WebPageParser()
-        result = parser.parse(html_content)
-        print(json.dumps(result, ensure_ascii=False, indent=2))
-    except Exception as e:
-        print(json.dumps({{'error': str(e)}}))
-        sys.exit(1)
-
-
-if __name__ == '__main__':
-    main()
-```
-
 """
-
-    @staticmethod
-    def get_system_message() -> str:
-        """获取系统消息"""
-        return "你是一个专业的Python代码生成助手。"
@@ -0,0 +1,14 @@
+"""
+Prompt 内容序列化工具
+"""
+import json
+from typing import Any
+
+
+def compact_json(obj: Any) -> str:
+    """紧凑序列化（无缩进和多余空格）
+
+    同一对象每次序列化得到完全相同的字节，放在 Prompt 前缀中可以命中服务端的前缀缓存，
+    同时比 indent=2 节省约 20%-30% 的 token。
+    """
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -1,16 +1,24 @@
 """
 Schema提取的Prompt模板
 用于从HTML中提取Schema
+
+Prompt 全部是静态内容，作为系统消息发送（所有页面共用，可命中服务端前缀缓存），
+Schema模板和HTML等可变内容放在用户消息中。
 """
 
 
 class SchemaExtractionPrompts:
     """Schema提取Prompt模板类"""
 
+    # Prompt 版本（参与 LLM 响应缓存键计算，修改 Prompt 语义或响应解析方式时提升）
+    PROMPT_VERSION = "v1"
+    # 节点编号模式（SCHEMA_NODE_ID_MODE）的 Prompt 版本
+    NODE_ID_PROMPT_VERSION = "node-v1"
+
     @staticmethod
     def get_html_extraction_prompt() -> str:
         """
-        获取从HTML提取Schema的Prompt
+        获取从HTML提取Schema的Prompt（系统消息）
 
         Returns:
             Prompt字符串
@@ -100,7 +108,7 @@ class SchemaExtractionPrompts:
     @staticmethod
     def get_schema_enrichment_prompt() -> str:
         """
-        获取Schema补充XPath的Prompt（预定义模式）
+        获取Schema补充XPath的Prompt（预定义模式，系统消息）
 
         Returns:
             Prompt字符串
@@ -177,3 +185,110 @@ class SchemaExtractionPrompts:
 - 不要添加或删除任何用户预定义的字段
 """
 
+
+    @staticmethod
+    def get_node_id_extraction_prompt() -> str:
+        """
+        获取节点编号模式下从HTML提取Schema的Prompt（系统消息）
+
+        Returns:
+            Prompt字符串
+        """
+        return """你是一个专业的HTML分析专家，擅长从HTML中识别结构化数据字段。
+
+## 任务目标
+
+分析提供的HTML内容，识别核心数据字段，并指出每个字段的值所在的节点。
+HTML中承载内容的元素带有编号属性 data-w2j（如 `<h1 data-w2j="17">`），你只需回答节点编号，不需要编写XPath。
+
+## 核心原则
+
+**仅对网页中的有价值正文信息进行Schema建模**，包括但不限于：
+- 文章标题、文章作者、作者信息、发布时间
+- 文章摘要、完整的正文内容
+- 评论区（如果有多个评论，这是一个列表字段）
+- 其他核心内容元素
+
+## 明确排除
+
+请忽略以下非核心元素：
+- 广告、侧边栏、推荐位、导航栏
+- 页眉、页脚、相关推荐
+- 任何网站通用组件
+
+## 输出格式
+
+请严格按照以下JSON格式输出：
+
+```json
+{
+  "title": {"type": "string", "description": "文章标题", "node_ids": [17]},
+  "author": {"type": "string", "description": "作者姓名", "node_ids": [23]},
+  "publish_time": {"type": "string", "description": "发布时间", "node_ids": [25]},
+  "content": {"type": "string", "description": "文章正文内容", "node_ids": [31]},
+  "comments": {"type": "array", "description": "评论列表", "node_ids": [58, 61, 64]}
+}
+```
+
+## 字段说明
+
+- **type**: 数据类型（string, number, array, object等）
+- **description**: 字段的语义描述
+- **node_ids**: 字段值所在节点的 data-w2j 编号
+
+## 节点选择要求
+
+1. 选择直接包含字段值的节点（如标题文字所在的 h1），而不是外层的大容器
+2. 对于列表字段，给出前几个列表项的编号（2-3个即可），不要给出整个列表的容器
+3. 对于图片、链接等字段，选择带 src、href 属性的节点
+4. 编号必须是HTML中实际存在的 data-w2j 值，不要编造
+
+## 注意事项
+
+- 不要输出XPath和示例值，只输出 type、description、node_ids
+- 如果某个常见字段在HTML中不存在，可以不包含在输出中
+- 确保输出是有效的JSON格式
+"""
+
+    @staticmethod
+    def get_node_id_enrichment_prompt() -> str:
+        """
+        获取节点编号模式下为预定义Schema定位字段的Prompt（系统消息）
+
+        Returns:
+            Prompt字符串
+        """
+        return """你是一个专业的HTML分析专家，擅长在网页中定位预定义Schema字段的值。
+
+## 任务目标
+
+根据用户提供的Schema模板（包含字段key、type、description）和HTML内容，找出每个字段的值所在的节点。
+HTML中承载内容的元素带有编号属性 data-w2j（如 `<h1 data-w2j="17">`），你只需回答节点编号，不需要编写XPath。
+
+## 输出要求
+
+请保持用户定义的所有字段key不变，每个字段只输出节点编号列表，严格按照以下JSON格式输出：
+
+```json
+{
+  "title": [17],
+  "author": [23],
+  "publish_time": [25],
+  "comments": [58, 61, 64]
+}
+```
+
+## 节点选择要求
+
+1. 选择直接包含字段值的节点（如标题文字所在的 h1），而不是外层的大容器
+2. 对于列表字段，给出前几个列表项的编号（2-3个即可），不要给出整个列表的容器
+3. 对于图片、链接等字段，选择带 src、href 属性的节点
+4. 编号必须是HTML中实际存在的 data-w2j 值，不要编造
+5. 如果某个字段在HTML中找不到对应内容，输出空列表 []
+
+## 注意事项
+
+- **必须包含用户定义的所有字段key，不要添加或删除字段**
+- 不要输出XPath、示例值、type或description
+- 确保输出是有效的JSON格式
+"""
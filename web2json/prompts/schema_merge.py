@@ -2,40 +2,31 @@
 Schema合并的Prompt模板
 用于合并单个或多个HTML的Schema
 """
-import json
+from .formatting import compact_json
 
 
 class SchemaMergePrompts:
     """Schema合并Prompt模板类"""
 
+    # Prompt 版本（参与 LLM 响应缓存键计算，修改 Prompt 语义或响应解析方式时提升）
+    PROMPT_VERSION = "v1"
+
     @staticmethod
-    def get_merge_multiple_schemas_prompt(schemas: list) -> str:
+    def get_merge_system_prompt() -> str:
         """
-        获取合并多个HTML的Schema的Prompt
-
-        Args:
-            schemas: 多个HTML的Schema列表
+        获取Schema合并的系统Prompt（静态部分，所有站点共用，作为服务端缓存前缀）
 
         Returns:
             Prompt字符串
         """
-        schemas_str = ""
-        for idx, schema in enumerate(schemas, 1):
-            schema_json = json.dumps(schema, ensure_ascii=False, indent=2)
-            schemas_str += f"\n### HTML {idx} 的Schema\n\n```json\n{schema_json}\n```\n"
-
-        return f"""你是一个专业的数据Schema整合专家。
+        return """你是一个专业的数据Schema整合专家。
 
 ## 任务目标
 
-现在有{len(schemas)}个不同网页的Schema，它们来自同一类型的网页（例如都是博客文章页）。
+用户会提供多个不同网页的Schema，它们来自同一类型的网页（例如都是博客文章页）。
 
 请分析这些Schema，进行筛选、合并和修正，输出一个最终的、鲁棒的Schema。
 
-## 输入的多个Schema
-
-{schemas_str}
-
 ## 整合规则
 
 1. **字段合并**：将多个Schema中的相同字段合并
@@ -60,8 +51,8 @@ class SchemaMergePrompts:
 请输出最终的完整Schema：
 
 ```json
-{{
-  "title": {{
+{
+  "title": {
     "type": "string",
     "description": "文章标题",
     "value_sample": "示例标题",
@@ -69,18 +60,18 @@ class SchemaMergePrompts:
       "//h1[@class='article-title']/text()",
       "//div[@class='title']/text()"
     ]
-  }},
-  "comments": {{
+  },
+  "comments": {
     "type": "array",
     "description": "评论列表",
-    "value_sample": [{{"user": "用户A", "text": "评论内容"}}],
+    "value_sample": [{"user": "用户A", "text": "评论内容"}],
     "xpaths": [
       "//div[@class='comment-list']//div[@class='comment']",
       "//ul[@class='comments']//li"
     ]
-  }},
+  },
   // 其他字段
-}}
+}
 ```
 
 ## 注意事项
@@ -91,3 +82,21 @@ class SchemaMergePrompts:
 4. **输出完整**：必须是完整的、可解析的JSON格式
 5. **保持核心字段**：即使某个字段只在部分Schema中出现，如果它是核心字段（如标题、内容等），也要保留
 """
+
+    @staticmethod
+    def get_merge_multiple_schemas_prompt(schemas: list) -> str:
+        """
+        获取合并多个HTML的Schema的Prompt（用户消息部分，只包含输入的Schema）
+
+        Args:
+            schemas: 多个HTML的Schema列表
+
+        Returns:
+            Prompt字符串
+        """
+        schemas_str = ""
+        for idx, schema in enumerate(schemas, 1):
+            schemas_str += f"\n### HTML {idx} 的Schema\n\n```json\n{compact_json(schema)}\n```\n"
+
+        return f"""## 输入的{len(schemas)}个Schema
+{schemas_str}"""
@@ -6,10 +6,12 @@ import sys
 import json
 from pathlib import Path
 from typing import Optional, Dict, List, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from loguru import logger
 
 from web2json.agent import ParserAgent
+from web2json.utils.artifact_store import ArtifactStore, FileSystemArtifactStore, InMemoryArtifactStore
+from web2json.utils.usage_tracker import UsageTracker
 
 
 @dataclass
@@ -18,6 +20,7 @@ class ExtractDataResult:
     final_schema: Dict                      # 最终Schema
     parser_code: str                        # Parser代码字符串
     parsed_data: List[Dict[str, Any]]       # 所有解析后的数据 [{filename: "xx.html", data: {...}}, ...]
+    usage: Dict = field(default_factory=dict)  # LLM用量 {total, by_phase, by_model, calls}
 
     def to_dict(self) -> Dict:
         """转换为字典（便于序列化到数据库）"""
@@ -25,7 +28,10 @@ class ExtractDataResult:
 
     def get_summary(self) -> str:
         """获取摘要信息"""
-        return f"解析了 {len(self.parsed_data)} 个文件，Schema包含 {len(self.final_schema)} 个字段"
+        summary = f"解析了 {len(self.parsed_data)} 个文件，Schema包含 {len(self.final_schema)} 个字段"
+        if self.usage.get('total'):
+            summary += f"，LLM调用 {self.usage['total']['calls']} 次，共 {self.usage['total']['total_tokens']} tokens"
+        return summary
 
 
 @dataclass
@@ -81,6 +87,7 @@ class ClusterResult:
     labels: List[int]                       # 每个文件的标签
     noise_files: List[str]                  # 噪声点文件列表
     cluster_count: int                      # 聚类数量
+    layout_model_path: Optional[str] = None # 布局模型路径（save包含'model'时）
 
     def to_dict(self) -> Dict:
         """转换为字典"""
@@ -107,6 +114,8 @@ class Web2JsonConfig:
         save: 要保存到本地的内容列表（可选，例如 ['schema', 'code', 'data']）
               为None或空列表时不保存，仅在内存中返回结果
         remove_null_fields: 是否清除值为null的字段（默认True）
+        resume: 是否断点续跑（默认False）。开启后总是使用 output_path/name 目录，
+                执行失败时保留中间结果和断点清单，再次运行时跳过输入和配置未变化的已完成阶段
 
     Example:
         >>> config = Web2JsonConfig(
@@ -128,6 +137,7 @@ class Web2JsonConfig:
     parser_code: Optional[str] = None
     save: Optional[List[str]] = None
     remove_null_fields: bool = True
+    resume: bool = False
 
     def __post_init__(self):
         """验证配置"""
@@ -206,6 +216,61 @@ def _read_html_files(directory_path: str) -> List[str]:
     raise ValueError(f"路径既不是文件也不是目录: {directory_path}")
 
 
+# 各个API支持保存的内容及其对应的文件/目录
+_SAVE_MAPPINGS = {
+    'extract_data': {
+        'schema': ['schemas/final_schema.json'],
+        'code': ['parsers/final_parser.py'],
+        'data': ['result/'],
+    },
+    'extract_schema': {
+        'schema': ['schemas/final_schema.json'],
+    },
+    'infer_code': {
+        'code': ['parsers/final_parser.py'],
+        'schema': ['schemas/final_schema.json'],
+    },
+    'extract_data_with_code': {
+        'data': ['result/'],
+        'code': ['parsers/final_parser.py'],
+    },
+    'classify_html_dir': {
+        'report': ['cluster_report.json', 'cluster_info.txt'],
+        'files': ['clusters/'],
+        'model': ['layout_model.json'],
+    }
+}
+
+
+def _create_artifact_store(config: Web2JsonConfig, output_path: Path, api_type: str) -> ArtifactStore:
+    """
+    按配置创建中间产物存储（按需持久化）
+
+    - resume：全部落盘，供再次运行时复用已完成的阶段；
+    - save：只落盘save列表中指定内容对应的文件，其余中间结果只保存在内存中；
+    - 不保存：全部保存在内存中，不创建任何目录或文件
+
+    Args:
+        config: Web2JsonConfig配置对象
+        output_path: 输出目录路径
+        api_type: API类型，用于确定save列表对应的文件
+
+    Returns:
+        中间产物存储
+    """
+    if config.resume:
+        return FileSystemArtifactStore(output_path)
+    if config.should_save():
+        mapping = _SAVE_MAPPINGS.get(api_type, {})
+        patterns = [
+            f"{path}*" if path.endswith('/') else path
+            for item in config.save
+            for path in mapping.get(item, [])
+        ]
+        return FileSystemArtifactStore(output_path, persist=patterns)
+    return InMemoryArtifactStore(output_path)
+
+
 def _cleanup_unwanted_files(output_path: Path, save_items: List[str], api_type: str = "extract_data"):
     """
     清理不需要保存的文件，只保留save列表中指定的内容
@@ -220,31 +285,7 @@ def _cleanup_unwanted_files(output_path: Path, save_items: List[str], api_type:
     if not output_path.exists():
         return
 
-    # 定义各个API支持保存的内容及其对应的文件/目录
-    save_mappings = {
-        'extract_data': {
-            'schema': ['schemas/final_schema.json'],
-            'code': ['parsers/final_parser.py'],
-            'data': ['result/'],
-        },
-        'extract_schema': {
-            'schema': ['schemas/final_schema.json'],
-        },
-        'infer_code': {
-            'code': ['parsers/final_parser.py'],
-            'schema': ['schemas/final_schema.json'],
-        },
-        'extract_data_with_code': {
-            'data': ['result/'],
-            'code': ['parsers/final_parser.py'],
-        },
-        'classify_html_dir': {
-            'report': ['cluster_report.json', 'cluster_info.txt'],
-            'files': ['clusters/'],
-        }
-    }
-
-    mapping = save_mappings.get(api_type, {})
+    mapping = _SAVE_MAPPINGS.get(api_type, {})
 
     # 第一步：复制需要保留的文件到根目录（方便访问）
     for item in save_items:
@@ -267,6 +308,11 @@ def _cleanup_unwanted_files(output_path: Path, save_items: List[str], api_type:
             shutil.rmtree(dir_path)
             logger.debug(f"  已清理临时目录: {dir_name}/")
 
+    # 中间结果已清理，断点清单随之失效
+    checkpoint_file = output_path / 'checkpoint.json'
+    if checkpoint_file.exists():
+        checkpoint_file.unlink()
+
     # 第三步：清理result目录（如果不需要保留data）
     if 'data' not in save_items:
         result_dir = output_path / 'result'
@@ -339,19 +385,17 @@ def extract_data(config: Web2JsonConfig) -> ExtractDataResult:
     html_files = _read_html_files(config.html_path)
     logger.info(f"找到 {len(html_files)} 个HTML文件")
 
-    # 根据是否需要保存决定使用临时目录还是持久目录
-    import tempfile
-    import shutil
     import os
 
-    use_temp_dir = not config.should_save()
-    if use_temp_dir:
-        temp_output_dir = tempfile.mkdtemp(prefix="web2json_")
-        output_path = Path(temp_output_dir)
-    else:
-        output_path = Path(config.get_full_output_path())
-        output_path.mkdir(parents=True, exist_ok=True)
+    # 中间结果按需持久化：不保存时全部在内存中，不读写输出目录
+    output_path = Path(config.get_full_output_path())
+    store = _create_artifact_store(config, output_path, api_type="extract_data")
 
+    # 统计本次调用各阶段的 LLM 用量
+    usage_tracker = UsageTracker()
+    usage_token = usage_tracker.activate()
+
+    completed = False
     try:
         # 确定schema模式
         if config.is_predefined_mode():
@@ -366,20 +410,20 @@ def extract_data(config: Web2JsonConfig) -> ExtractDataResult:
             logger.info("启用Schema编辑模式，将在当前目录生成schema文件供编辑")
 
             # 步骤1: 先生成schema（不启用编辑）
-            agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields)
+            agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields, artifact_store=store)
             from web2json.agent.planner import AgentPlanner
             planner = AgentPlanner()
             plan = planner.create_plan(html_files, iteration_rounds=config.iteration_rounds)
 
             # 执行schema生成
-            schema_result = agent.executor.schema_phase.execute(plan['sample_urls'])
+            schema_result = agent.executor.run_schema_phase(plan['sample_urls'], resume=config.resume)
             if not schema_result.get('success', False):
                 raise Exception(f"Schema生成失败: {schema_result.get('error', '未知错误')}")
 
-            # 步骤2: 将schema复制到当前目录
-            schema_file = Path(schema_result.get('final_schema_path'))
+            # 步骤2: 将schema写入当前目录
             current_dir_schema = Path.cwd() / "schema_for_edit.json"
-            shutil.copy2(schema_file, current_dir_schema)
+            with open(current_dir_schema, 'w', encoding='utf-8') as f:
+                json.dump(schema_result['final_schema'], f, indent=2, ensure_ascii=False)
 
             # 步骤3: 等待用户编辑
             logger.info("="*70)
@@ -403,19 +447,19 @@ def extract_data(config: Web2JsonConfig) -> ExtractDataResult:
             agent.executor.final_schema = edited_schema
 
             # 执行代码生成阶段
-            code_result = agent.executor.code_phase.execute(
-                final_schema=edited_schema,
-                schema_phase_rounds=schema_result['rounds']
+            code_result = agent.executor.run_code_phase(
+                edited_schema, schema_result['rounds'], resume=config.resume
             )
 
             if not code_result.get('success', False):
                 raise Exception(f"代码生成失败: {code_result.get('error', '未知错误')}")
 
             # 批量解析
-            parser_path = code_result.get('final_parser', {}).get('parser_path')
+            final_parser = code_result.get('final_parser', {})
             parse_result = agent.executor.parse_all_html_files(
                 html_files=html_files,
-                parser_path=parser_path
+                parser_path=final_parser.get('parser_path'),
+                parser_code=final_parser.get('code'),
             )
 
             if not parse_result.get('success', False):
@@ -429,18 +473,21 @@ def extract_data(config: Web2JsonConfig) -> ExtractDataResult:
             # 构造result对象（模拟generate_parser的返回）
             result = {
                 'success': True,
+                'parser_path': final_parser.get('parser_path'),
+                'parse_result': parse_result,
                 'results_dir': parse_result.get('output_dir')
             }
             final_schema = edited_schema
         else:
             # 正常流程：直接调用generate_parser
-            agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields)
+            agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields, artifact_store=store)
             result = agent.generate_parser(
                 html_files=html_files,
                 iteration_rounds=config.iteration_rounds,
                 schema_mode=schema_mode,
                 schema_template=schema_template,
-                enable_schema_edit=False  # 不使用内置的编辑模式
+                enable_schema_edit=False,  # 不使用内置的编辑模式
+                resume=config.resume
             )
 
             if not result['success']:
@@ -448,48 +495,37 @@ def extract_data(config: Web2JsonConfig) -> ExtractDataResult:
                 raise Exception(f"执行失败: {error_msg}")
 
             # 读取final_schema
-            schema_file = output_path / "schemas" / "final_schema.json"
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                final_schema = json.load(f)
+            schema_phase = result['execution_result']['schema_phase']
+            final_schema = schema_phase.get('final_schema') or store.get_json(schema_phase.get('final_schema_path'))
 
-        # 读取生成的文件到内存
-        # 读取parser代码
-        parser_file = output_path / "parsers" / "final_parser.py"
-        with open(parser_file, 'r', encoding='utf-8') as f:
-            parser_code = f.read()
-
-        # 3. 读取所有解析后的JSON数据
-        results_dir = Path(result.get('results_dir'))
-        parsed_data = []
-        if results_dir.exists():
-            for json_file in sorted(results_dir.glob("*.json")):
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    parsed_data.append({
-                        'filename': json_file.name.replace('.json', '.html'),
-                        'data': data
-                    })
+        # 从中间产物存储读取parser代码
+        parser_code = store.get_text(result['parser_path'])
+
+        # 解析后的数据已在批量解析结果中
+        parsed_data = (result.get('parse_result') or {}).get('parsed_data', [])
 
         logger.info("✓ 执行成功")
         logger.info(f"  解析了 {len(parsed_data)} 个文件")
         logger.info(f"  Schema包含 {len(final_schema)} 个字段")
 
         # 返回内存数据对象
+        completed = True
         return ExtractDataResult(
             final_schema=final_schema,
             parser_code=parser_code,
-            parsed_data=parsed_data
+            parsed_data=parsed_data,
+            usage=usage_tracker.summary()
         )
 
     finally:
-        # 根据配置决定清理策略
-        if use_temp_dir:
-            # 临时目录：完全清理
-            if output_path.exists():
-                shutil.rmtree(output_path)
-        else:
+        usage_tracker.deactivate(usage_token)
+        # 根据配置决定清理策略（内存存储没有写入任何文件，无需清理）
+        if config.resume and not completed:
+            # 断点续跑：保留中间结果和断点清单，再次运行时跳过已完成的阶段
+            logger.info(f"执行未完成，已保留中间结果以便断点续跑: {output_path}")
+        elif config.should_save() or config.resume:
             # 持久目录：选择性清理，只保留save列表中的内容
-            _cleanup_unwanted_files(output_path, config.save, api_type="extract_data")
+            _cleanup_unwanted_files(output_path, config.save or [], api_type="extract_data")
             logger.info(f"✓ 结果已保存到: {output_path}")
 
 
@@ -542,22 +578,16 @@ def extract_schema(config: Web2JsonConfig) -> ExtractSchemaResult:
     html_files = _read_html_files(config.html_path)
     logger.info(f"找到 {len(html_files)} 个HTML文件")
 
-    # 根据是否需要保存决定使用临时目录还是持久目录
-    import tempfile
-    import shutil
     import os
 
-    use_temp_dir = not config.should_save()
-    if use_temp_dir:
-        temp_output_dir = tempfile.mkdtemp(prefix="web2json_schema_")
-        output_path = Path(temp_output_dir)
-    else:
-        output_path = Path(config.get_full_output_path())
-        output_path.mkdir(parents=True, exist_ok=True)
+    # 中间结果按需持久化：不保存时全部在内存中，不读写输出目录
+    output_path = Path(config.get_full_output_path())
+    store = _create_artifact_store(config, output_path, api_type="extract_schema")
 
+    completed = False
     try:
         # 创建Agent并只执行Schema学习阶段
-        agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields)
+        agent = ParserAgent(output_dir=str(output_path), remove_null_fields=config.remove_null_fields, artifact_store=store)
 
         # 手动执行Schema阶段
         from web2json.agent.planner import AgentPlanner
@@ -565,17 +595,14 @@ def extract_schema(config: Web2JsonConfig) -> ExtractSchemaResult:
         plan = planner.create_plan(html_files, iteration_rounds=config.iteration_rounds)
 
         # 只执行Schema迭代阶段
-        schema_result = agent.executor.schema_phase.execute(plan['sample_urls'])
+        schema_result = agent.executor.run_schema_phase(plan['sample_urls'], resume=config.resume)
 
         if not schema_result.get('success', False):
             error_msg = schema_result.get('error', '未知错误')
             raise Exception(f"Schema生成失败: {error_msg}")
 
-        schema_path = schema_result.get('final_schema_path')
-
         # 读取最终schema
-        with open(schema_path, 'r', encoding='utf-8') as f:
-            final_schema = json.load(f)
+        final_schema = schema_result.get('final_schema') or store.get_json(schema_result.get('final_schema_path'))
 
         # 如果启用人工编辑模式，将schema复制到当前目录让用户编辑
         if config.enable_schema_edit:
@@ -625,31 +652,28 @@ def extract_schema(config: Web2JsonConfig) -> ExtractSchemaResult:
                 logger.info(f"✓ 已清理临时schema文件")
 
         # 读取所有中间schema
-        intermediate_schemas = []
-        schemas_dir = output_path / "schemas"
-        if schemas_dir.exists():
-            for schema_file in sorted(schemas_dir.glob("merged_schema_round_*.json")):
-                with open(schema_file, 'r', encoding='utf-8') as f:
-                    intermediate_schemas.append(json.load(f))
+        intermediate_schemas = [
+            store.get_json(key) for key in store.keys("schemas/merged_schema_round_")
+        ]
 
         logger.info("✓ Schema提取成功")
         logger.info(f"  Schema包含 {len(final_schema)} 个字段")
         logger.info(f"  经过 {len(intermediate_schemas)} 轮迭代")
 
+        completed = True
         return ExtractSchemaResult(
             final_schema=final_schema,
             intermediate_schemas=intermediate_schemas
         )
 
     finally:
-        # 根据配置决定清理策略
-        if use_temp_dir:
-            # 临时目录：完全清理
-            if output_path.exists():
-                shutil.rmtree(output_path)
-        else:
+        # 根据配置决定清理策略（内存存储没有写入任何文件，无需清理）
+        if config.resume and not completed:
+            # 断点续跑：保留中间结果和断点清单，再次运行时跳过已完成的阶段
+            logger.info(f"执行未完成，已保留中间结果以便断点续跑: {output_path}")
+        elif config.should_save() or config.resume:
             # 持久目录：选择性清理，只保留save列表中的内容
-            _cleanup_unwanted_files(output_path, config.save, api_type="extract_schema")
+            _cleanup_unwanted_files(output_path, config.save or [], api_type="extract_schema")
             logger.info(f"✓ 结果已保存到: {output_path}")
 
 
@@ -724,21 +748,14 @@ def infer_code(config: Web2JsonConfig) -> InferCodeResult:
 
     logger.info(f"找到 {len(html_files)} 个HTML文件")
 
-    # 根据是否需要保存决定使用临时目录还是持久目录
-    import tempfile
-    import shutil
-
-    use_temp_dir = not config.should_save()
-    if use_temp_dir:
-        temp_output_dir = tempfile.mkdtemp(prefix="web2json_code_")
-        output_dir = Path(temp_output_dir)
-    else:
-        output_dir = Path(config.get_full_output_path())
-        output_dir.mkdir(parents=True, exist_ok=True)
+    # 中间结果按需持久化：不保存时全部在内存中，不读写输出目录
+    output_dir = Path(config.get_full_output_path())
+    store = _create_artifact_store(config, output_dir, api_type="infer_code")
 
+    completed = False
     try:
         # 创建Agent
-        agent = ParserAgent(output_dir=str(output_dir), remove_null_fields=config.remove_null_fields)
+        agent = ParserAgent(output_dir=str(output_dir), remove_null_fields=config.remove_null_fields, artifact_store=store)
 
         # 创建执行计划
         from web2json.agent.planner import AgentPlanner
@@ -758,7 +775,7 @@ def infer_code(config: Web2JsonConfig) -> InferCodeResult:
             logger.info(f"使用提供的Schema（跳过Schema提取，仅处理HTML）")
 
             # 运行Schema阶段以处理HTML并构建rounds数据结构
-            schema_result = agent.executor.schema_phase.execute(plan['sample_urls'])
+            schema_result = agent.executor.run_schema_phase(plan['sample_urls'], resume=config.resume)
 
             if not schema_result.get('success', False):
                 error_msg = schema_result.get('error', '未知错误')
@@ -779,17 +796,14 @@ def infer_code(config: Web2JsonConfig) -> InferCodeResult:
             logger.info(f"自动学习Schema（使用{config.iteration_rounds}个样本）")
 
             # 运行Schema阶段，自动生成schema
-            schema_result = agent.executor.schema_phase.execute(plan['sample_urls'])
+            schema_result = agent.executor.run_schema_phase(plan['sample_urls'], resume=config.resume)
 
             if not schema_result.get('success', False):
                 error_msg = schema_result.get('error', '未知错误')
                 raise Exception(f"Schema学习失败: {error_msg}")
 
             # 读取自动生成的schema
-            schema_path = schema_result.get('final_schema_path')
-            with open(schema_path, 'r', encoding='utf-8') as f:
-                import json
-                final_schema = json.load(f)
+            final_schema = schema_result.get('final_schema') or store.get_json(schema_result.get('final_schema_path'))
 
             agent.executor.final_schema = final_schema
             logger.info(f"✓ Schema学习完成，包含 {len(final_schema)} 个字段")
@@ -797,40 +811,39 @@ def infer_code(config: Web2JsonConfig) -> InferCodeResult:
         logger.info(f"开始生成Parser代码...")
 
         # 执行代码生成阶段
-        code_result = agent.executor.code_phase.execute(
-            final_schema=final_schema,
-            schema_phase_rounds=schema_result['rounds']
+        code_result = agent.executor.run_code_phase(
+            final_schema, schema_result['rounds'], resume=config.resume
         )
 
         if not code_result.get('success', False):
             error_msg = code_result.get('error', '未知错误')
             raise Exception(f"代码生成失败: {error_msg}")
 
-        parser_path = code_result.get('final_parser', {}).get('parser_path')
+        final_parser = code_result.get('final_parser') or {}
+        parser_path = final_parser.get('parser_path')
         if not parser_path:
             raise Exception("未能获取到parser路径")
 
-        # 读取parser代码到内存
-        with open(parser_path, 'r', encoding='utf-8') as f:
-            parser_code = f.read()
+        # 读取parser代码
+        parser_code = final_parser.get('code') or store.get_text(parser_path)
 
         logger.info("✓ Parser代码生成成功")
         logger.info(f"  代码长度: {len(parser_code)} 字符")
 
+        completed = True
         return InferCodeResult(
             parser_code=parser_code,
             schema=final_schema
         )
 
     finally:
-        # 根据配置决定清理策略
-        if use_temp_dir:
-            # 临时目录：完全清理
-            if output_dir.exists():
-                shutil.rmtree(output_dir)
-        else:
+        # 根据配置决定清理策略（内存存储没有写入任何文件，无需清理）
+        if config.resume and not completed:
+            # 断点续跑：保留中间结果和断点清单，再次运行时跳过已完成的阶段
+            logger.info(f"执行未完成，已保留中间结果以便断点续跑: {output_dir}")
+        elif config.should_save() or config.resume:
             # 持久目录：选择性清理，只保留save列表中的内容
-            _cleanup_unwanted_files(output_dir, config.save, api_type="infer_code")
+            _cleanup_unwanted_files(output_dir, config.save or [], api_type="infer_code")
             logger.info(f"✓ 结果已保存到: {output_dir}")
 
 
@@ -926,34 +939,19 @@ def extract_data_with_code(config: Web2JsonConfig) -> ParseResult:
     # 确定是否需要保存到磁盘
     should_save = config.should_save()
 
-    # 根据是否需要保存决定使用临时目录还是持久目录
-    import tempfile
-    import shutil
-
-    if should_save:
-        # 保存模式：使用持久目录
-        output_dir = Path(config.get_full_output_path())
-        output_dir.mkdir(parents=True, exist_ok=True)
-        use_temp_dir = False
-    else:
-        # 内存模式：不需要创建任何目录（ParserProcessor 不会写文件）
-        # 只需要一个占位目录路径（实际不会被使用）
-        output_dir = Path(tempfile.gettempdir()) / "web2json_placeholder"
-        use_temp_dir = False
-
-    # 创建临时parser文件
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as tmp_parser:
-        tmp_parser.write(parser_code_content)
-        temp_parser_path = tmp_parser.name
+    # 保存模式只落盘save列表中的内容；内存模式不创建任何目录或文件
+    output_dir = Path(config.get_full_output_path())
+    store = _create_artifact_store(config, output_dir, api_type="extract_data_with_code")
 
     try:
         # 创建Agent并执行批量解析
-        agent = ParserAgent(output_dir=str(output_dir), save_to_disk=should_save, remove_null_fields=config.remove_null_fields)
+        agent = ParserAgent(output_dir=str(output_dir), save_to_disk=should_save, remove_null_fields=config.remove_null_fields, artifact_store=store)
 
-        # 直接调用批量解析方法
+        # 直接调用批量解析方法（解析器代码直接传入，不写临时文件）
         parse_result = agent.executor.parse_all_html_files(
             html_files=html_files,
-            parser_path=temp_parser_path
+            parser_path=None,
+            parser_code=parser_code_content,
         )
 
         if not parse_result.get('success', False):
@@ -977,11 +975,6 @@ def extract_data_with_code(config: Web2JsonConfig) -> ParseResult:
         )
 
     finally:
-        # 清理临时parser文件
-        import os
-        if os.path.exists(temp_parser_path):
-            os.unlink(temp_parser_path)
-
         # 根据配置决定清理策略
         if should_save:
             # 保存模式：选择性清理，只保留save列表中的内容
@@ -1037,24 +1030,16 @@ def classify_html_dir(config: Web2JsonConfig) -> ClusterResult:
     html_files = _read_html_files(config.html_path)
     logger.info(f"找到 {len(html_files)} 个HTML文件")
 
-    # 读取所有HTML内容
-    logger.info("正在读取HTML内容...")
-    html_contents = []
-    for file_path in html_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                html_contents.append(f.read())
-        except Exception as e:
-            raise Exception(f"读取文件失败 {file_path}: {e}")
-
-    # 执行聚类分析
+    # 执行聚类分析（按文件流式提取特征，不在内存中保留HTML；同时构建布局模型，便于后续新页面直接路由）
     logger.info("正在进行布局聚类分析...")
-    from web2json.tools.cluster import cluster_html_layouts_optimized
+    from web2json.tools.layout_model import fit_layout_model
 
     try:
-        labels, sim_mat, clusters = cluster_html_layouts_optimized(
-            html_contents,
-            use_knn_graph=True
+        layout_model, labels = fit_layout_model(
+            html_files,
+            use_knn_graph=True,
+            show_progress=True,
+            from_files=True
         )
     except Exception as e:
         raise Exception(f"聚类失败: {e}")
@@ -1088,6 +1073,7 @@ def classify_html_dir(config: Web2JsonConfig) -> ClusterResult:
     logger.info("✓ 分类完成")
 
     # 如果需要保存，写入文件
+    layout_model_path = None
     if config.should_save():
         import shutil
         output_path = Path(config.get_full_output_path())
@@ -1152,12 +1138,18 @@ def classify_html_dir(config: Web2JsonConfig) -> ClusterResult:
 
             logger.info(f"  ✓ 文件已复制到: {clusters_dir}")
 
+        # 保存布局模型（新页面可通过 LayoutModel.load(path).assign(html) 路由到已有簇）
+        if config.should_save_item('model'):
+            layout_model_path = layout_model.save(output_path / 'layout_model.json')
+            logger.info(f"  ✓ 布局模型已保存: {layout_model_path}")
+
         logger.info(f"✓ 结果已保存到: {output_path}")
 
     return ClusterResult(
         clusters=clusters_dict,
         labels=labels,
         noise_files=noise_files,
-        cluster_count=cluster_count
+        cluster_count=cluster_count,
+        layout_model_path=layout_model_path
     )
 
@@ -9,8 +9,11 @@ from .schema_extraction import (
     merge_multiple_schemas,
     enrich_schema_with_xpath
 )
-from .cluster import cluster_html_layouts
+from .schema_merge import merge_schemas_locally
+from .template_diff import collapse_template_regions
+from .cluster import cluster_html_layouts, cluster_html_files, sweep_cluster_params
 from .html_layout_cosin import get_feature, similarity
+from .layout_model import LayoutModel, fit_layout_model
 
 __all__ = [
     'get_html_from_file',
@@ -18,8 +21,14 @@ __all__ = [
     'extract_schema_from_html',
     'merge_multiple_schemas',
     'enrich_schema_with_xpath',
+    'merge_schemas_locally',
+    'collapse_template_regions',
     'cluster_html_layouts',
+    'cluster_html_files',
+    'sweep_cluster_params',
     'get_feature',
     'similarity',
+    'LayoutModel',
+    'fit_layout_model',
 ]
 
@@ -1,41 +1,167 @@
-from typing import List, Dict, Tuple, Optional
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import re
+from functools import partial
+from typing import Iterable, List, Dict, Tuple, Optional, Sequence
 
 import numpy as np
 from sklearn.cluster import DBSCAN
 
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.neighbors import NearestNeighbors
+from sklearn.neighbors import NearestNeighbors, radius_neighbors_graph
+from scipy import sparse
 
 from tqdm import tqdm
+from loguru import logger
+
+from web2json.config.settings import settings
 
 from .html_layout_cosin import (
     get_feature,
     similarity,
     __get_max_width_layer,
     __parse_valid_layer,
-    fuse_features,
+    fuse_features_sparse,
+    to_compact,
 )
+from .feature_cache import FeatureCache, content_hash
+
 
+# 少于该页面数时进程启动开销大于收益，直接串行提取
+_PARALLEL_MIN_PAGES = 64
+_MAX_CHUNKSIZE = 64
+_MISSING = object()
+RE_DIGITS = re.compile(r'\d+')
 
-def _compute_features(html_list: List[str], show_progress: bool = False) -> List[Dict]:
-    """从 HTML 源码列表中提取布局特征。
+
+def _compute_features(
+    sources: Iterable,
+    show_progress: bool = False,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    from_files: bool = False,
+    return_keys: bool = False,
+    compact: bool = False,
+):
+    """从 HTML 源码（或 HTML 文件路径）中流式提取布局特征。
+
+    每个页面读入后立即提取特征并丢弃 HTML，常驻内存的只有特征本身；
+    传入文件路径时由 worker 自行读文件，主进程不持有任何 HTML。
+    页面数量足够多时使用多进程分块提取（每个 worker 只回传 get_feature 的
+    纯字典/列表结果，不回传 lxml 树），结果顺序与输入一致；进度条按完成的页面更新。
+    启用特征缓存时，按内容哈希命中的页面直接复用缓存，只提取未命中的页面。
 
     Args:
-        html_list: 多个 HTML 源码字符串列表。
+        sources: HTML 源码字符串（或 from_files=True 时为文件路径）的列表/迭代器。
+                 不定长的 HTML 字符串迭代器按串行流式处理。
         show_progress: 是否显示进度条。
+        n_jobs: 并行进程数；None 时读取 settings.cluster_n_jobs，
+                <=0 表示使用全部 CPU 核心，1 表示串行。
+        cache_dir: 特征缓存目录；None 时读取 settings.cluster_feature_cache_dir，
+                   空字符串表示不使用缓存。
+        from_files: sources 是否为 HTML 文件路径。
+        return_keys: 是否同时返回每个页面的内容哈希。
+        compact: 是否在 worker 内直接转换为 CompactFeature（聚类流程使用，内存占用更小）。
 
     Returns:
-        每个 HTML 对应的 feature 字典列表（get_feature 的返回值）。
+        每个 HTML 对应的 feature 字典列表（get_feature 的返回值，compact=True 时为 CompactFeature）；
+        return_keys=True 时返回 (features, keys)。
     """
 
-    features: List[Dict] = []
-    iterator = tqdm(html_list, desc="提取特征", unit="页") if show_progress else html_list
-    for html in iterator:
-        feat = get_feature(html)
-        features.append(feat)
+    if from_files:
+        # 路径本身很小，可以整体持有，便于确定总数和分块
+        sources = [str(p) for p in sources]
+    total = len(sources) if hasattr(sources, '__len__') else None
+
+    if cache_dir is None:
+        cache_dir = settings.cluster_feature_cache_dir
+    task = partial(
+        _feature_task,
+        from_file=from_files,
+        cache_dir=cache_dir or None,
+        with_key=return_keys,
+        compact=compact,
+    )
+
+    results = None
+    n_jobs = _resolve_n_jobs(n_jobs)
+    if n_jobs > 1 and total is not None and total >= _PARALLEL_MIN_PAGES:
+        try:
+            results = _compute_features_parallel(task, sources, total, show_progress, n_jobs)
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"多进程特征提取不可用，回退为串行: {e}")
+
+    if results is None:
+        iterator = tqdm(sources, total=total, desc="提取特征", unit="页") if show_progress else sources
+        results = [task(source) for source in iterator]
+
+    features = [feat for _, feat in results]
+    if return_keys:
+        return features, [key for key, _ in results]
     return features
 
 
+def _feature_task(
+    source: str,
+    from_file: bool,
+    cache_dir: Optional[str],
+    with_key: bool,
+    compact: bool = False,
+) -> Tuple[Optional[str], Optional[Dict]]:
+    """单页特征提取任务（可在子进程中执行）
+
+    Returns:
+        (内容哈希, 特征)；未启用缓存且不需要哈希时内容哈希为 None
+    """
+    if from_file:
+        with open(source, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+    else:
+        html = source
+
+    key = content_hash(html) if (cache_dir or with_key) else None
+    if not cache_dir:
+        feat = get_feature(html)
+    else:
+        cache = FeatureCache(cache_dir)
+        feat = cache.get(key, default=_MISSING)
+        if feat is _MISSING:
+            feat = get_feature(html)
+            cache.put(key, feat)
+    return key, to_compact(feat) if compact else feat
+
+
+def _resolve_cache(cache_dir: Optional[str]) -> Optional[FeatureCache]:
+    """解析特征缓存配置"""
+    if cache_dir is None:
+        cache_dir = settings.cluster_feature_cache_dir
+    return FeatureCache(cache_dir) if cache_dir else None
+
+
+def _resolve_n_jobs(n_jobs: Optional[int]) -> int:
+    """解析并行进程数配置"""
+    if n_jobs is None:
+        n_jobs = settings.cluster_n_jobs
+    if n_jobs <= 0:
+        n_jobs = os.cpu_count() or 1
+    return n_jobs
+
+
+def _compute_features_parallel(task, sources: List[str], total: int, show_progress: bool, n_jobs: int) -> List[Tuple]:
+    """多进程分块执行特征提取任务，保持输入顺序"""
+    n_jobs = min(n_jobs, total)
+    # 每个进程约分到 4 个块，兼顾负载均衡和进程间通信开销
+    chunksize = max(1, min(_MAX_CHUNKSIZE, total // (n_jobs * 4)))
+
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        results = executor.map(task, sources, chunksize=chunksize)
+        if show_progress:
+            results = tqdm(results, total=total, desc=f"提取特征({n_jobs}进程)", unit="页")
+        return list(results)
+
+
 def _build_similarity_matrix(features: List[Dict], show_progress: bool = False) -> np.ndarray:
     """基于 demo 中的相似度计算方式构建成对相似度矩阵。
 
@@ -80,6 +206,8 @@ def cluster_html_layouts(
     eps: float = 0.05,
     min_samples: int = 2,
     show_progress: bool = False,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
 ) -> Tuple[np.ndarray, np.ndarray, List[List[str]]]:
     """对多个 HTML 字符串按布局相似度进行 DBSCAN 聚类。
 
@@ -89,6 +217,8 @@ def cluster_html_layouts(
              因此 eps 越小，要求相似度越高才会划为同一簇。
         min_samples: DBSCAN 中形成簇所需的最小样本数。
         show_progress: 是否显示进度条（默认False）。
+        n_jobs: 特征提取并行进程数，None 时读取 settings.cluster_n_jobs。
+        cache_dir: 特征缓存目录，None 时读取 settings.cluster_feature_cache_dir。
 
     Returns:
         labels: shape (n,)，每个 HTML 对应的簇编号，-1 表示噪声点。
@@ -109,7 +239,7 @@ def cluster_html_layouts(
         print(f"开始聚类分析: {len(html_list)} 个HTML页面")
         print(f"{'='*60}")
 
-    features = _compute_features(html_list, show_progress=show_progress)
+    features = _compute_features(html_list, show_progress=show_progress, n_jobs=n_jobs, cache_dir=cache_dir)
 
     # 2. 计算相似度矩阵（基于 demo 中的 similarity 调用逻辑）
     sim_mat = _build_similarity_matrix(features, show_progress=show_progress)
@@ -149,10 +279,12 @@ def cluster_html_layouts_optimized(
     strategy: str = "dbscan",
     use_knn_graph: bool = False,
     n_neighbors: int = 50,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
 ) -> Tuple[np.ndarray, np.ndarray, List[List[str]]]:
     """基于融合特征向量的布局聚类（索引优化版）。
 
-    使用 ``fuse_features`` 将 DOM 结构和属性融合为单一向量空间索引，
+    使用 ``fuse_features_sparse`` 将 DOM 结构和属性融合为单一（稀疏）向量空间索引，
     再在该向量空间中执行可配置的 DBSCAN 聚类。
 
     Args:
@@ -167,6 +299,8 @@ def cluster_html_layouts_optimized(
         use_knn_graph: 是否使用 k 近邻图近似 DBSCAN，适合大数据量时加速。
         n_neighbors: 构建近邻图时每个点保留的近邻个数，越大越接近精确 DBSCAN，
                      但计算/内存开销也越大。
+        n_jobs: 特征提取并行进程数，None 时读取 settings.cluster_n_jobs。
+        cache_dir: 特征缓存目录，None 时读取 settings.cluster_feature_cache_dir。
 
     Returns:
         labels: shape (n, )，每个 HTML 对应的簇编号，-1 表示噪声点。
@@ -182,21 +316,65 @@ def cluster_html_layouts_optimized(
         )
 
     # 1. 提取布局特征
-    features = _compute_features(html_list)
+    features = _compute_features(html_list, n_jobs=n_jobs, cache_dir=cache_dir, compact=True)
+
+    # 2. 在融合特征空间中聚类
+    labels, sim_mat = cluster_features_optimized(
+        features,
+        threshold=threshold,
+        k=k,
+        layer_n=layer_n,
+        metric=metric,
+        min_samples=min_samples,
+        strategy=strategy,
+        use_knn_graph=use_knn_graph,
+        n_neighbors=n_neighbors,
+    )
+
+    # 3. 按簇重组成 HTML 字符串列表
+    clusters: List[List[str]] = []
+    unique_labels = sorted(set(labels) - {-1})  # 去掉噪声点 -1
+    for lbl in unique_labels:
+        cluster_htmls = [html for html, l in zip(html_list, labels) if l == lbl]
+        clusters.append(cluster_htmls)
+
+    return labels, sim_mat, clusters
+
 
-    # 2. 自动估计合适的层级（除非外部显式指定）
+def cluster_features_optimized(
+    features: List[Dict],
+    threshold: float = 0.9,
+    k: float = 0.7,
+    layer_n: int | None = None,
+    metric: str = "cosine",
+    min_samples: int = 3,
+    strategy: str = "dbscan",
+    use_knn_graph: bool = False,
+    n_neighbors: int = 50,
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """在已提取的布局特征上执行融合向量聚类。
+
+    参数含义与 ``cluster_html_layouts_optimized`` 相同，便于在特征已缓存/已提取时
+    复用聚类逻辑（例如构建可持久化的布局模型）。
+
+    Returns:
+        labels: shape (n, )，每个特征对应的簇编号，-1 表示噪声点。
+        sim_mat: 相似度矩阵；使用 kNN 近似时为 None。
+    """
+
+    if not features:
+        return np.array([], dtype=int), np.zeros((0, 0), dtype=np.float32)
+
+    # 1. 自动估计合适的层级（除非外部显式指定）
     if layer_n is None:
         layer_n = __parse_valid_layer(features)
 
-    # 3. 计算融合特征向量，内部使用 DictVectorizer 构建统一特征空间索引
-    fused_vecs = fuse_features(features, layer_n=layer_n, k=k)
+    # 2. 计算融合特征向量（由哈希特征 id 直接构建 CSR 稀疏矩阵，统一特征空间索引）
+    fused_vecs = fuse_features_sparse(features, layer_n=layer_n, k=k)
 
-    # 3.1 基于融合向量计算 cosine 相似度矩阵（用于返回和部分聚类策略）
-    # 数值误差可能导致相似度略超出 [-1, 1]，这里做一次裁剪
-    
     sim_mat = None
 
-    # 4. 聚类策略：目前仅支持 DBSCAN 及其基于 kNN 图的近似版本
+    # 3. 聚类策略：目前仅支持 DBSCAN 及其基于 kNN 图的近似版本
     if strategy.lower() != "dbscan":
         raise ValueError(f"Unsupported clustering strategy: {strategy}")
 
@@ -219,8 +397,6 @@ def cluster_html_layouts_optimized(
     else:
         # 使用预先计算好的相似度矩阵，转为距离矩阵供 DBSCAN 使用
         sim_mat = cosine_similarity(fused_vecs)
-        # 数值误差可能导致相似度略超出 [-1, 1]，这里做一次裁剪
-        # sim_mat = np.clip(sim_mat, -1.0, 1.0)
         # 自己和自己固定视为完全相似，避免受浮点误差影响
         np.fill_diagonal(sim_mat, 1.0)
 
@@ -230,15 +406,7 @@ def cluster_html_layouts_optimized(
         clustering = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed")
         labels = clustering.fit_predict(dist_mat)
 
-
-    # 5. 按簇重组成 HTML 字符串列表
-    clusters: List[List[str]] = []
-    unique_labels = sorted(set(labels) - {-1})  # 去掉噪声点 -1
-    for lbl in unique_labels:
-        cluster_htmls = [html for html, l in zip(html_list, labels) if l == lbl]
-        clusters.append(cluster_htmls)
-
-    return labels, sim_mat, clusters
+    return labels, sim_mat
 
 
 def _approximate_dbscan_with_knn(
@@ -322,3 +490,318 @@ def _approximate_dbscan_with_knn(
 
     return labels
 
+
+def build_neighbor_graph(
+    fused_vecs,
+    max_eps: float,
+    metric: str = "cosine",
+) -> sparse.csr_matrix:
+    """构建 eps 半径内的稀疏近邻距离图。
+
+    图中只保存距离 <= max_eps 的点对（完全相同的页面以显式 0 保存），
+    DBSCAN(metric="precomputed") 对任意 eps <= max_eps 都可直接复用该图，
+    无需重新计算相似度。
+
+    Args:
+        fused_vecs: fuse_features_sparse 得到的融合特征向量。
+        max_eps: 图的最大半径（调参时取候选 eps 的最大值）。
+        metric: 距离度量方式，默认 "cosine"。
+
+    Returns:
+        shape (n, n) 的 CSR 稀疏距离矩阵。
+    """
+    return radius_neighbors_graph(
+        fused_vecs, radius=max_eps, mode="distance", metric=metric, include_self=False
+    ).tocsr()
+
+
+def sweep_cluster_params(
+    html_list: Iterable[str],
+    eps_values: Sequence[float],
+    min_samples_values: Sequence[int] = (2,),
+    k: float = 0.7,
+    layer_n: int | None = None,
+    metric: str = "cosine",
+    show_progress: bool = False,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    from_files: bool = False,
+) -> List[Dict]:
+    """在一张近邻图上批量评估多组 DBSCAN 参数。
+
+    特征只提取一次（并可命中磁盘缓存），近邻图按最大 eps 只构建一次
+    （启用缓存时同样落盘复用），之后每组 (eps, min_samples) 只需在稀疏图上跑一次 DBSCAN。
+
+    Args:
+        html_list: HTML 源码字符串列表（from_files=True 时为 HTML 文件路径列表）。
+        eps_values: 候选 eps 列表（cosine 距离，等价于 1 - threshold）。
+        min_samples_values: 候选 min_samples 列表。
+        k: tags 和 attrs 权重占比。
+        layer_n: DOM 树层级深度；为 None 时根据样本自动估计。
+        metric: 距离度量方式，默认 "cosine"。
+        show_progress: 是否显示进度条。
+        n_jobs: 特征提取并行进程数，None 时读取 settings.cluster_n_jobs。
+        cache_dir: 特征/近邻图缓存目录，None 时读取 settings.cluster_feature_cache_dir。
+        from_files: html_list 是否为文件路径（按文件流式读取，不在内存中保留 HTML）。
+
+    Returns:
+        每组参数一个字典：
+        {"eps", "min_samples", "n_clusters", "noise_ratio", "labels"}
+    """
+    if not eps_values:
+        return []
+
+    features, keys = _compute_features(
+        html_list,
+        show_progress=show_progress,
+        n_jobs=n_jobs,
+        cache_dir=cache_dir,
+        from_files=from_files,
+        return_keys=True,
+        compact=True,
+    )
+    if not features:
+        return []
+    if layer_n is None:
+        layer_n = __parse_valid_layer(features)
+
+    max_eps = float(max(eps_values))
+    cache = _resolve_cache(cache_dir)
+    graph = None
+    graph_key = None
+    if cache is not None:
+        digest = hashlib.sha1()
+        for key in keys:
+            digest.update(key.encode())
+        digest.update(f"|{layer_n}|{k}|{metric}|{max_eps}".encode())
+        graph_key = digest.hexdigest()
+        graph = cache.load_graph(graph_key)
+
+    if graph is None:
+        fused_vecs = fuse_features_sparse(features, layer_n=layer_n, k=k)
+        graph = build_neighbor_graph(fused_vecs, max_eps=max_eps, metric=metric)
+        if cache is not None:
+            cache.save_graph(graph_key, graph)
+
+    n = len(features)
+    results: List[Dict] = []
+    params = [(float(eps), int(ms)) for eps in sorted(eps_values) for ms in sorted(min_samples_values)]
+    iterator = tqdm(params, desc="参数扫描", unit="组") if show_progress else params
+    for eps, min_samples in iterator:
+        labels = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit_predict(graph)
+        n_noise = int(np.sum(labels == -1))
+        results.append({
+            "eps": eps,
+            "min_samples": min_samples,
+            "n_clusters": len(set(labels.tolist()) - {-1}),
+            "noise_ratio": n_noise / n,
+            "labels": labels,
+        })
+
+    return results
+
+
+def cluster_html_files(
+    paths: Iterable,
+    threshold: float = 0.9,
+    k: float = 0.7,
+    layer_n: int | None = None,
+    min_samples: int = 3,
+    use_knn_graph: bool = True,
+    n_neighbors: int = 50,
+    show_progress: bool = False,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    bucketed: Optional[bool] = None,
+    urls: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, List[List[str]]]:
+    """按文件路径进行布局聚类（内存占用只与特征规模相关）。
+
+    与 ``cluster_html_layouts_optimized`` 使用相同的融合向量聚类逻辑，
+    但逐个文件读取并提取特征后立即丢弃 HTML，返回的簇为文件路径列表而非 HTML 字符串。
+    默认使用 kNN 近似，避免构建 O(n^2) 的相似度矩阵。
+
+    Args:
+        paths: HTML 文件路径列表或迭代器。
+        bucketed: 是否使用两阶段（粗签名分桶 + 桶内细聚类）模式，
+                  None 时读取 settings.cluster_bucketing。
+        urls: 与 paths 一一对应的原始 URL（可选），分桶时用于 URL 路径模板签名，
+              未提供时使用文件名。
+        其余参数含义与 ``cluster_html_layouts_optimized`` 相同。
+
+    Returns:
+        labels: shape (n, )，每个文件对应的簇编号，-1 表示噪声点。
+        clusters: List[List[str]]，按簇分组的文件路径列表（不含噪声点）。
+    """
+    paths = [str(p) for p in paths]
+    features = _compute_features(
+        paths, show_progress=show_progress, n_jobs=n_jobs, cache_dir=cache_dir, from_files=True, compact=True
+    )
+    labels = _cluster_features(
+        features,
+        names=urls if urls is not None else paths,
+        bucketed=bucketed,
+        threshold=threshold,
+        k=k,
+        layer_n=layer_n,
+        min_samples=min_samples,
+        use_knn_graph=use_knn_graph,
+        n_neighbors=n_neighbors,
+        n_jobs=n_jobs,
+    )
+
+    clusters: List[List[str]] = []
+    for lbl in sorted(set(labels) - {-1}):
+        clusters.append([p for p, l in zip(paths, labels) if l == lbl])
+
+    return labels, clusters
+
+
+def coarse_signature(feature: Optional[Dict], name: Optional[str] = None) -> Tuple:
+    """页面粗粒度布局签名（线性时间，用于两阶段聚类的分桶）
+
+    由三部分组成：
+    1. URL 路径/文件名模板（数字串替换为 {n}，如 detail_{n}）；
+    2. body 顶层标签及其属性集合的哈希；
+    3. DOM 深度和总标签量级（与 sum_tags 口径一致，粗粒度分档以容忍列表长短差异）。
+
+    Args:
+        feature: get_feature 的返回值或 CompactFeature。
+        name: 页面的 URL 或文件路径（可选）。
+
+    Returns:
+        可哈希的签名元组，签名相同的页面分入同一个桶。
+    """
+    template = _path_template(name) if name else None
+    if not feature:
+        return (template, None, 0, 0)
+
+    feature = to_compact(feature)
+    layer_sizes = feature.layer_sizes()
+    total = sum(layer_sizes.values())
+    depth_band = len(layer_sizes) // 4
+    width_band = int(np.log2(total + 1)) // 2
+    return (template, feature.top_hash, depth_band, width_band)
+
+
+def _path_template(name: str) -> str:
+    """URL/文件路径模板：取路径部分，去掉扩展名，数字串替换为 {n}"""
+    path = name.split('?', 1)[0].split('#', 1)[0].replace('\\', '/')
+    path = path.split('://', 1)[-1]
+    if '/' in path and '://' in name:
+        # URL：去掉域名，保留路径
+        path = path.split('/', 1)[1]
+    else:
+        # 本地文件：只看文件名
+        path = path.rsplit('/', 1)[-1]
+    stem = path.rsplit('.', 1)[0] if '.' in path.rsplit('/', 1)[-1] else path
+    return RE_DIGITS.sub('{n}', stem)
+
+
+def cluster_features_bucketed(
+    features: List[Dict],
+    names: Optional[Sequence[str]] = None,
+    threshold: float = 0.9,
+    k: float = 0.7,
+    layer_n: int | None = None,
+    metric: str = "cosine",
+    min_samples: int = 3,
+    use_knn_graph: bool = False,
+    n_neighbors: int = 50,
+    n_jobs: Optional[int] = None,
+) -> np.ndarray:
+    """两阶段布局聚类：先按粗签名分桶，再在每个桶内做融合向量 DBSCAN。
+
+    第一阶段线性时间完成，把一个大的二次复杂度问题拆成多个小问题；
+    第二阶段各桶相互独立，按 n_jobs 多进程并行。页面数少于 min_samples 的桶
+    无法单独成簇，会合并为一个"剩余桶"一起细聚类。所有桶共用同一个 layer_n，
+    保证各簇处于同一特征空间（便于构建布局模型）。
+
+    注意：粗签名不同的页面不会被分入同一簇，属于用精度换速度的近似。
+
+    Args:
+        features: get_feature 的返回值列表。
+        names: 与 features 一一对应的 URL 或文件路径（可选，用于路径模板签名）。
+        n_jobs: 桶间并行进程数，None 时读取 settings.cluster_n_jobs。
+        其余参数含义与 ``cluster_features_optimized`` 相同。
+
+    Returns:
+        labels: shape (n, )，每个特征对应的簇编号，-1 表示噪声点。
+    """
+    n = len(features)
+    labels = np.full(n, -1, dtype=int)
+    valid = [i for i, feat in enumerate(features) if feat]
+    if not valid:
+        return labels
+
+    if layer_n is None:
+        layer_n = __parse_valid_layer([features[i] for i in valid])
+
+    # 1. 粗签名分桶（无有效标签的页面直接视为噪声）
+    buckets: Dict[Tuple, List[int]] = {}
+    for i in valid:
+        signature = coarse_signature(features[i], names[i] if names is not None else None)
+        buckets.setdefault(signature, []).append(i)
+
+    groups = [members for members in buckets.values() if len(members) >= min_samples]
+    remainder = sorted(i for members in buckets.values() if len(members) < min_samples for i in members)
+    if len(remainder) >= min_samples:
+        groups.append(remainder)
+    groups.sort(key=lambda members: members[0])
+
+    logger.debug(f"两阶段聚类: {len(buckets)} 个粗签名桶, {len(groups)} 个待细聚类分组")
+
+    # 2. 各桶内细聚类
+    params = dict(
+        threshold=threshold,
+        k=k,
+        layer_n=layer_n,
+        metric=metric,
+        min_samples=min_samples,
+        use_knn_graph=use_knn_graph,
+        n_neighbors=n_neighbors,
+    )
+    tasks = [[features[i] for i in members] for members in groups]
+
+    results = None
+    n_jobs = min(_resolve_n_jobs(n_jobs), len(tasks))
+    if n_jobs > 1 and sum(len(t) for t in tasks) >= _PARALLEL_MIN_PAGES:
+        try:
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(partial(_cluster_bucket, params=params), tasks))
+        except (OSError, BrokenProcessPool) as e:
+            logger.warning(f"多进程分桶聚类不可用，回退为串行: {e}")
+    if results is None:
+        results = [_cluster_bucket(task, params) for task in tasks]
+
+    # 3. 合并各桶标签（按桶顺序加偏移量，保证全局唯一）
+    offset = 0
+    for members, bucket_labels in zip(groups, results):
+        for i, lbl in zip(members, bucket_labels):
+            if lbl != -1:
+                labels[i] = lbl + offset
+        offset += max(bucket_labels.max() + 1, 0)
+
+    return labels
+
+
+def _cluster_bucket(bucket_features: List[Dict], params: Dict) -> np.ndarray:
+    """单个桶内的细聚类（可在子进程中执行）"""
+    labels, _ = cluster_features_optimized(bucket_features, **params)
+    return np.asarray(labels)
+
+
+def _cluster_features(
+    features: List[Dict],
+    names: Optional[Sequence[str]] = None,
+    bucketed: Optional[bool] = None,
+    n_jobs: Optional[int] = None,
+    **params,
+) -> np.ndarray:
+    """按配置选择单阶段或两阶段聚类，返回标签"""
+    if bucketed is None:
+        bucketed = settings.cluster_bucketing
+    if bucketed:
+        return cluster_features_bucketed(features, names=names, n_jobs=n_jobs, **params)
+    labels, _ = cluster_features_optimized(features, **params)
+    return labels
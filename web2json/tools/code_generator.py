@@ -2,13 +2,12 @@
 代码生成工具
 从HTML和JSON Schema生成解析代码
 """
-import json
-import os
-from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 from loguru import logger
 from web2json.config.settings import settings
 from web2json.prompts.code_generator import CodeGeneratorPrompts
+from web2json.tools.validators import clean_generated_code, validate_parser_code
+from web2json.utils.artifact_store import ArtifactStore, FileSystemArtifactStore
 
 
 def generate_parser_code(
@@ -17,7 +16,13 @@ def generate_parser_code(
     output_dir: str = "generated_parsers",
     previous_parser_code: str = None,
     previous_parser_path: str = None,
-    round_num: int = 1
+    round_num: int = 1,
+    extraction_result: Dict = None,
+    failed_fields: Dict[str, Dict] = None,
+    temperature: float = None,
+    store: Optional[ArtifactStore] = None,
+    save_files: bool = True,
+    full_html: Optional[str] = None
 ) -> Dict:
     """
     从HTML和目标JSON生成或优化BeautifulSoup解析代码
@@ -25,10 +30,17 @@ def generate_parser_code(
     Args:
         html_content: HTML内容
         target_json: 目标JSON结构
-        output_dir: 输出目录
+        output_dir: 输出目录（指定 store 时为存储中的 key 前缀）
         previous_parser_code: 前一轮的解析代码（用于优化）
         previous_parser_path: 前一轮的解析器路径（用于更新）
         round_num: 当前轮次号
+        extraction_result: 前一轮代码在本轮HTML上的抽取结果（可选，用于优化）
+        failed_fields: 前一轮代码在本轮HTML上未通过校验的字段（可选，优化时只修正这些字段）
+        temperature: 温度参数（可选，默认 CODE_GEN_TEMPERATURE；并行生成候选解析器时用于拉开差异）
+        store: 中间产物存储（可选，默认直接写入 output_dir）
+        save_files: 是否保存 generated_parser.py 和 schema.json（并行生成候选时关闭，避免多个候选写同一文件）
+        full_html: 完整页面 HTML（可选，默认 html_content）；html_content 为折叠模板区域后的 Prompt HTML 时，
+            级联校验在完整页面上运行，避免被折叠的区域导致字段取不到
 
     Returns:
         生成/优化结果，包括代码路径和配置路径
@@ -39,15 +51,8 @@ def generate_parser_code(
         else:
             logger.info(f"正在基于前一轮代码优化（第 {round_num} 轮）...")
 
-        # 使用封装的 LLMClient 以支持 token 追踪
-        from web2json.utils.llm_client import LLMClient
-
-        llm_client = LLMClient(
-            model=settings.code_gen_model,
-            api_key=os.getenv("OPENAI_API_KEY"),
-            api_base=os.getenv("OPENAI_API_BASE"),
-            temperature=settings.code_gen_temperature
-        )
+        # 使用封装的 LLMClient 以支持 token 追踪（开启模型级联时先用 CODE_GEN_CASCADE_MODEL）
+        from web2json.utils.llm_cascade import cascade_completion
 
         # 使用 Prompt 模块构建提示词
         if round_num == 1:
@@ -60,7 +65,9 @@ def generate_parser_code(
                 html_content,
                 target_json,
                 previous_parser_code,
-                round_num
+                round_num,
+                first_round_extraction_result=extraction_result,
+                failed_fields=failed_fields
             )
 
         # 调用 LLM 生成代码
@@ -69,26 +76,25 @@ def generate_parser_code(
             {"role": "user", "content": prompt}
         ]
 
-        # 使用 LLMClient 的 chat_completion 方法（自动记录 token）
-        generated_code = llm_client.chat_completion(messages)
-
-        # 清理 markdown 标记
-        generated_code = generated_code.strip()
-
-        # 移除 markdown 代码块标记
-        if generated_code.startswith("```python"):
-            generated_code = generated_code[len("```python"):].strip()
-        elif generated_code.startswith("```"):
-            generated_code = generated_code[3:].strip()
-
-        if generated_code.endswith("```"):
-            generated_code = generated_code[:-3].strip()
+        # 级联时廉价模型的代码需要能运行，并在当前样本的完整页面上填充足够比例的字段，否则升级到 CODE_GEN_MODEL
+        check_html = full_html or html_content
+        _, generated_code = cascade_completion(
+            "code_gen",
+            messages,
+            parse=clean_generated_code,
+            check=lambda code: validate_parser_code(code, check_html, target_json),
+            temperature=settings.code_gen_temperature if temperature is None else temperature,
+            max_tokens=settings.code_gen_max_tokens,
+            prompt_version=settings.code_gen_prompt_version,
+            stop_when="code",
+        )
 
         # 保存生成的代码
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
-        parser_path = output_path / "generated_parser.py"
-        parser_path.write_text(generated_code, encoding='utf-8')
+        if store is None:
+            store, prefix = FileSystemArtifactStore(output_dir), ""
+        else:
+            prefix = f"{output_dir.strip('/')}/" if output_dir else ""
+        parser_path = store.put_text(f"{prefix}generated_parser.py", generated_code) if save_files else None
 
         # 生成配置文件
         # 支持两种schema格式：
@@ -128,9 +134,7 @@ def generate_parser_code(
                 'retry': 3
             }
         }
-        config_path = output_path / "schema.json"
-        with open(config_path, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        config_path = store.put_json(f"{prefix}schema.json", config) if save_files else None
 
         if round_num == 1:
             logger.success(f"代码生成完成")
@@ -138,8 +142,8 @@ def generate_parser_code(
             logger.success(f"代码优化完成（第 {round_num} 轮）")
 
         return {
-            'parser_path': str(parser_path),
-            'config_path': str(config_path),
+            'parser_path': parser_path,
+            'config_path': config_path,
             'code': generated_code,
             'config': config,
             'round': round_num
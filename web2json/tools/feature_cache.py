@@ -0,0 +1,110 @@
+"""
+布局特征磁盘缓存
+按 HTML 内容哈希 + 特征提取器版本缓存 get_feature 的结果，
+并缓存一次运行中构建的近邻图，使重复聚类/调参无需重新解析页面。
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from loguru import logger
+from scipy import sparse
+
+from .html_layout_cosin import FEATURE_VERSION
+
+
+def content_hash(html: str) -> str:
+    """计算 HTML 内容哈希（缓存键）"""
+    return hashlib.sha1(html.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+
+class FeatureCache:
+    """布局特征缓存
+
+    目录结构::
+
+        <cache_dir>/v<FEATURE_VERSION>/features/<hash[:2]>/<hash>.json
+        <cache_dir>/v<FEATURE_VERSION>/graphs/<key>.npz
+
+    特征提取逻辑变化时提升 FEATURE_VERSION 即可让旧缓存自然失效。
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化特征缓存
+
+        Args:
+            cache_dir: 缓存根目录
+        """
+        self.root = Path(cache_dir) / f"v{FEATURE_VERSION}"
+        self.features_dir = self.root / "features"
+        self.graphs_dir = self.root / "graphs"
+        self.hits = 0
+        self.misses = 0
+
+    def _feature_path(self, key: str) -> Path:
+        return self.features_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str, default=None) -> Optional[Dict]:
+        """读取缓存的特征，未命中返回 default
+
+        注意 get_feature 对没有有效标签的页面返回 None，它同样会被缓存，
+        因此需要区分"命中 None"和"未命中"时请传入自定义 default。
+        """
+        path = self._feature_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (OSError, ValueError) as e:
+            logger.warning(f"特征缓存读取失败，将重新提取: {path} ({e})")
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return _restore_layers(data['feature'])
+
+    def put(self, key: str, feature: Optional[Dict]):
+        """写入特征缓存（先写临时文件再原子替换，多进程并发写入安全）"""
+        path = self._feature_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'feature': feature}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"特征缓存写入失败: {path} ({e})")
+
+    def load_graph(self, key: str) -> Optional[sparse.csr_matrix]:
+        """读取缓存的近邻图"""
+        path = self.graphs_dir / f"{key}.npz"
+        if not path.exists():
+            return None
+        try:
+            return sparse.load_npz(path).tocsr()
+        except (OSError, ValueError) as e:
+            logger.warning(f"近邻图缓存读取失败: {path} ({e})")
+            return None
+
+    def save_graph(self, key: str, graph: sparse.spmatrix):
+        """保存近邻图"""
+        try:
+            self.graphs_dir.mkdir(parents=True, exist_ok=True)
+            sparse.save_npz(self.graphs_dir / f"{key}.npz", graph.tocsr())
+        except OSError as e:
+            logger.warning(f"近邻图缓存写入失败: {key} ({e})")
+
+
+def _restore_layers(feature: Optional[Dict]) -> Optional[Dict]:
+    """JSON 会把层级整数键转为字符串，这里还原为 int"""
+    if feature is None:
+        return None
+    return {
+        kind: {int(layer): values for layer, values in layers.items()}
+        for kind, layers in feature.items()
+    }
@@ -1,12 +1,15 @@
+import hashlib
 import re
+from array import array
 from collections import Counter, defaultdict
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 from lxml.html import HtmlComment, HtmlElement, HTMLParser, fromstring
 from sklearn.cluster import DBSCAN
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 
 
 TAGS_TO_IGNORE = ['script', 'style', 'meta', 'link', 'br', 'noscript']  # , 'b', 'i', 'strong'
@@ -17,6 +20,9 @@ RE_UUID = re.compile(r'^[a-z0-9]{8}-[a-z0-9]{4}-[a-z0-9]{4}-[a-z0-9]{4}-[a-z0-9]
 RE_TIMESTAMP = re.compile(r'^\d{10,13}$')  # 时间戳属性值
 RE_NUM = re.compile(r'\d+')  # 自定义动态属性值
 
+# 特征提取器版本：get_feature 输出格式或规则变化时递增，用于使特征缓存失效
+FEATURE_VERSION = 1
+
 
 def html_to_element(html_data: str) -> HtmlElement:
     """构建html树.
@@ -263,11 +269,17 @@ def __parse_valid_layer(features: List[Dict]) -> int:
     """
     layer_max_l = []
     for data in features:
+        if isinstance(data, CompactFeature):
+            layer_max_l.append(data.widest_layer())
+            continue
         max_key = int(max(data['tags'], key=lambda k: len(data['tags'][k])))
         layer_max_l.append(max_key)
     counter = Counter(layer_max_l)
     layer_n = counter.most_common(1)[0][0]
-    return layer_n if layer_n > 1 else len(features[0]['tags'])
+    if layer_n > 1:
+        return layer_n
+    first = features[0]
+    return len(first.layers) if isinstance(first, CompactFeature) else len(first['tags'])
 
 
 def cluster_html_struct(sampled_list: List[Dict], threshold=0.95) -> List[Dict]:
@@ -367,25 +379,15 @@ def similarity(feature1: Dict, feature2: Dict, layer_n=5, k=0.7) -> float:
     return round(tag_sim * k + attr_sim * (1 - k), 8)
 
 
-def fuse_features(features: List[Dict], layer_n=5, k=0.7) -> np.ndarray:
-    """计算融合特征向量
+def fuse_feature_dicts(features: List[Dict], layer_n=5, k=0.7) -> List[Dict]:
+    """计算融合特征字典（未向量化）
     Args:
-        features: List[Dict]
-        [
-            {
-                "tags": {1: ["<body>/div"], 2: [...]},
-                "attrs": {1: ["nav", "content", "footer"], 2: [...]}
-            },
-            {...}
-        ]
+        features: List[Dict] get_feature 的返回值列表
         layer_n: 相似度计算DOM树层级深度，默认为5
         k: tags 和 attrs 权重占比，k 表示 tags 权重，(1-k) 为 attrs 权重，默认 0.7:0.3
     Return:
-        np.ndarray: 每个 feature 对应一条融合后的向量
+        List[Dict]: [{'t:0_<body>': 0.7, 'a:0_content': 0.3, ...}, ...]
     """
-    if not features:
-        return np.empty((0, 0), dtype=np.float32)
-
     fused_dicts = []
     for feature in features:
         tags_dict = __simp_tags(feature.get('tags', {}), layer_n)
@@ -403,9 +405,155 @@ def fuse_features(features: List[Dict], layer_n=5, k=0.7) -> np.ndarray:
                 combined[f'a:{key}'] = float(value) * attr_weight
 
         fused_dicts.append(combined)
+    return fused_dicts
+
+
+def fuse_features(features: List, layer_n=5, k=0.7) -> np.ndarray:
+    """计算融合特征向量
+    Args:
+        features: List[Dict] 或 List[CompactFeature]
+        [
+            {
+                "tags": {1: ["<body>/div"], 2: [...]},
+                "attrs": {1: ["nav", "content", "footer"], 2: [...]}
+            },
+            {...}
+        ]
+        layer_n: 相似度计算DOM树层级深度，默认为5
+        k: tags 和 attrs 权重占比，k 表示 tags 权重，(1-k) 为 attrs 权重，默认 0.7:0.3
+    Return:
+        np.ndarray: 每个 feature 对应一条融合后的向量
+    """
+    if not features:
+        return np.empty((0, 0), dtype=np.float32)
 
     # 统一做一次向量化，保证在同一特征空间
-    return __parse_vectors(fused_dicts)
+    return fuse_features_sparse(features, layer_n=layer_n, k=k).toarray()
+
+
+def fuse_features_sparse(features: List, layer_n=5, k=0.7) -> sparse.csr_matrix:
+    """计算融合特征向量（CSR 稀疏矩阵，直接由哈希特征 id 构建）
+
+    与 fuse_feature_dicts + DictVectorizer 得到的向量只差列顺序，cosine 相似度一致。
+
+    Args:
+        features: List[Dict] 或 List[CompactFeature]
+        layer_n: 相似度计算DOM树层级深度，默认为5
+        k: tags 和 attrs 权重占比
+    Return:
+        sparse.csr_matrix: shape (n, 特征维度)
+    """
+    if not features:
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+
+    ids_list = []
+    values_list = []
+    indptr = np.zeros(len(features) + 1, dtype=np.int64)
+    for i, feature in enumerate(features):
+        ids, values = to_compact(feature).weighted_ids(layer_n, k)
+        ids_list.append(ids)
+        values_list.append(values)
+        indptr[i + 1] = indptr[i] + len(ids)
+
+    all_ids = np.concatenate(ids_list)
+    vocabulary, columns = np.unique(all_ids, return_inverse=True)
+    return sparse.csr_matrix(
+        (np.concatenate(values_list), columns.astype(np.int32), indptr),
+        shape=(len(features), len(vocabulary)),
+    )
+
+
+def feature_id(key: str) -> int:
+    """融合特征键（如 't:0_div'）的 64 位哈希 id"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class CompactFeature:
+    """紧凑的页面布局特征
+
+    get_feature 返回的每层字符串列表在转换后只保留：
+    - 每个 (类型, 有效层序号, token) 的 64 位哈希 id（与 fuse_feature_dicts 的键一一对应，
+      同层重复 token 只保留一次），以及其所在 DOM 层级，用于按 layer_n 截取；
+    - 每层原始标签数量（__parse_valid_layer / sum_tags 所需的宽度信息）；
+    - body 顶层标签/属性集合的哈希（粗签名分桶所需）。
+    全部使用 array 存储，可直接 pickle 在进程间传递。
+    """
+
+    __slots__ = ('tag_ids', 'tag_layers', 'attr_ids', 'attr_layers', 'layers', 'widths', 'top_hash')
+
+    def __init__(self, tag_ids, tag_layers, attr_ids, attr_layers, layers, widths, top_hash: int = 0):
+        self.tag_ids = tag_ids
+        self.tag_layers = tag_layers
+        self.attr_ids = attr_ids
+        self.attr_layers = attr_layers
+        self.layers = layers
+        self.widths = widths
+        self.top_hash = top_hash
+
+    @classmethod
+    def from_feature(cls, feature: Dict) -> "CompactFeature":
+        """由 get_feature 的返回值构建"""
+        tags = feature.get('tags', {})
+        attrs = feature.get('attrs', {})
+        tag_ids, tag_layers = cls._hash_layers('t', tags)
+        attr_ids, attr_layers = cls._hash_layers('a', attrs)
+
+        top = '|'.join(sorted(set(tags.get(1, [])))) + '#' + '|'.join(sorted(set(attrs.get(1, []))))
+        return cls(
+            tag_ids=tag_ids,
+            tag_layers=tag_layers,
+            attr_ids=attr_ids,
+            attr_layers=attr_layers,
+            layers=array('H', [int(layer) for layer in tags]),
+            widths=array('I', [len(v) for v in tags.values()]),
+            top_hash=feature_id(top),
+        )
+
+    @staticmethod
+    def _hash_layers(kind: str, layers: Dict) -> Tuple[array, array]:
+        # 与 __simp_tags/__list_to_dict 一致：序号为该层在已有层级中的位置，同层 token 去重
+        ids = array('q')
+        layer_nums = array('H')
+        for pos, (layer, values) in enumerate(layers.items()):
+            for token in dict.fromkeys(values):
+                ids.append(feature_id(f'{kind}:{pos}_{token}'))
+                layer_nums.append(int(layer))
+        return ids, layer_nums
+
+    def weighted_ids(self, layer_n: int, k: float = 0.7) -> Tuple[np.ndarray, np.ndarray]:
+        """取 layer_n 层以内的特征 id 及其权重（tags 为 k，attrs 为 1-k）"""
+        tag_ids = np.frombuffer(self.tag_ids, dtype=np.int64)
+        tag_ids = tag_ids[np.frombuffer(self.tag_layers, dtype=np.uint16) <= layer_n]
+        attr_ids = np.frombuffer(self.attr_ids, dtype=np.int64)
+        attr_ids = attr_ids[np.frombuffer(self.attr_layers, dtype=np.uint16) <= layer_n]
+
+        ids = np.concatenate([tag_ids, attr_ids])
+        values = np.empty(len(ids), dtype=np.float32)
+        values[:len(tag_ids)] = float(k)
+        values[len(tag_ids):] = 1.0 - float(k)
+        return ids, values
+
+    def widest_layer(self) -> int:
+        """原始标签数量最多的层级（并列时取较浅的层）"""
+        return int(self.layers[int(np.argmax(self.widths))]) if len(self.widths) else 0
+
+    def layer_sizes(self) -> Dict[int, int]:
+        """每层原始标签数量，与 sum_tags 的 l_s 一致"""
+        return dict(zip(self.layers, self.widths))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def to_compact(feature) -> Optional[CompactFeature]:
+    """将 get_feature 的返回值转换为 CompactFeature（已是紧凑形式或为 None 时原样返回）"""
+    if feature is None or isinstance(feature, CompactFeature):
+        return feature
+    return CompactFeature.from_feature(feature)
 
 
 def __get_max_width_layer(tags):
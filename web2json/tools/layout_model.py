@@ -0,0 +1,326 @@
+"""
+布局模型
+将一次聚类的结果（特征词表、各簇中心、阈值、layer_n）持久化，
+新页面无需与全量语料重新聚类，即可在 O(簇数) 时间内路由到已有簇或标记为新布局。
+"""
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .cluster import _compute_features, _cluster_features
+from .html_layout_cosin import (
+    get_feature,
+    feature_id,
+    to_compact,
+    __parse_valid_layer as _parse_valid_layer,
+)
+
+
+NOVEL_LABEL = -1
+_EMPTY_WEIGHTED = (np.array([], dtype=np.int64), np.array([], dtype=np.float32))
+
+
+class LayoutModel:
+    """持久化的布局路由模型
+
+    每个簇保存 L2 归一化后的成员均值向量（中心）以及成员到中心的最小相似度，
+    ``assign`` 时新页面与各簇中心计算 cosine 相似度，低于聚类阈值即视为新布局。
+    特征维度使用 CompactFeature 的 64 位哈希 id（升序保存）。
+
+    Example:
+        >>> model, labels = fit_layout_model(html_list)
+        >>> model.save("output/layout_model.json")
+        >>> model = LayoutModel.load("output/layout_model.json")
+        >>> label, sim = model.assign(new_html)
+    """
+
+    VERSION = 2
+
+    def __init__(
+        self,
+        vocabulary: List[int],
+        centroids: np.ndarray,
+        cluster_labels: List[int],
+        cluster_sizes: List[int],
+        min_similarities: List[float],
+        threshold: float,
+        layer_n: int,
+        k: float = 0.7,
+    ):
+        """
+        初始化布局模型
+
+        Args:
+            vocabulary: 升序排列的融合特征哈希 id 列表（下标即向量维度）
+            centroids: shape (n_clusters, n_features) 的簇中心（已 L2 归一化）
+            cluster_labels: 每个中心对应的簇编号
+            cluster_sizes: 每个簇的成员数量
+            min_similarities: 每个簇成员到中心的最小相似度
+            threshold: 聚类时使用的相似度阈值
+            layer_n: 特征使用的 DOM 层级深度
+            k: tags 和 attrs 权重占比
+        """
+        self.vocabulary = np.asarray(vocabulary, dtype=np.int64)
+        self.centroids = np.asarray(centroids, dtype=np.float32).reshape(len(cluster_labels), len(self.vocabulary))
+        self.cluster_labels = [int(l) for l in cluster_labels]
+        self.cluster_sizes = [int(s) for s in cluster_sizes]
+        self.min_similarities = [float(s) for s in min_similarities]
+        self.threshold = float(threshold)
+        self.layer_n = int(layer_n)
+        self.k = float(k)
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.cluster_labels)
+
+    @classmethod
+    def fit(
+        cls,
+        features: List[Dict],
+        labels: np.ndarray,
+        threshold: float = 0.9,
+        layer_n: Optional[int] = None,
+        k: float = 0.7,
+    ) -> "LayoutModel":
+        """根据特征和聚类标签构建模型
+
+        Args:
+            features: get_feature 的返回值（或 CompactFeature）列表
+            labels: 每个特征对应的簇编号，-1 为噪声（不参与建模）
+            threshold: 聚类时使用的相似度阈值
+            layer_n: DOM 层级深度；为 None 时与聚类一样自动估计
+            k: tags 和 attrs 权重占比
+
+        Returns:
+            LayoutModel
+        """
+        if layer_n is None:
+            valid = [f for f in features if f]
+            layer_n = _parse_valid_layer(valid) if valid else 1
+
+        weighted = [
+            to_compact(feature).weighted_ids(layer_n, k) if feature else _EMPTY_WEIGHTED
+            for feature in features
+        ]
+        if weighted:
+            vocabulary = np.unique(np.concatenate([ids for ids, _ in weighted]))
+        else:
+            vocabulary = np.array([], dtype=np.int64)
+
+        labels = np.asarray(labels)
+        cluster_labels = sorted(int(l) for l in set(labels.tolist()) - {-1})
+
+        centroids = np.zeros((len(cluster_labels), len(vocabulary)), dtype=np.float32)
+        cluster_sizes = []
+        min_similarities = []
+        for row, lbl in enumerate(cluster_labels):
+            members = [
+                _normalize(_to_dense(*weighted[i], vocabulary)[0])
+                for i in np.flatnonzero(labels == lbl)
+            ]
+            member_mat = np.vstack(members)
+            centroids[row] = _normalize(member_mat.mean(axis=0))
+            cluster_sizes.append(len(members))
+            min_similarities.append(float(np.min(member_mat @ centroids[row])))
+
+        return cls(
+            vocabulary=vocabulary,
+            centroids=centroids,
+            cluster_labels=cluster_labels,
+            cluster_sizes=cluster_sizes,
+            min_similarities=min_similarities,
+            threshold=threshold,
+            layer_n=layer_n,
+            k=k,
+        )
+
+    def similarities(self, feature: Dict) -> np.ndarray:
+        """计算单个页面特征与所有簇中心的 cosine 相似度
+
+        词表外的特征不落在任何中心所在维度上，但仍计入页面向量的范数，
+        因此含大量新结构的页面相似度会被正确拉低。
+        """
+        if self.n_clusters == 0 or not feature:
+            return np.zeros(self.n_clusters, dtype=np.float32)
+
+        ids, values = to_compact(feature).weighted_ids(self.layer_n, self.k)
+        vec, oov_sq = _to_dense(ids, values, self.vocabulary)
+        norm = float(np.sqrt(float(vec @ vec) + oov_sq))
+        if norm == 0.0:
+            return np.zeros(self.n_clusters, dtype=np.float32)
+        return (self.centroids @ vec) / norm
+
+    def assign_feature(self, feature: Dict) -> Tuple[int, float]:
+        """将页面特征路由到最近的簇
+
+        Returns:
+            (label, similarity)：label 为 -1 表示新布局（与所有簇都不够相似）
+        """
+        sims = self.similarities(feature)
+        if sims.size == 0:
+            return NOVEL_LABEL, 0.0
+
+        best = int(np.argmax(sims))
+        best_sim = float(sims[best])
+        # 只按聚类阈值接受：松散簇（成员间相似度低于阈值）不能放宽接受条件，否则会吸收陌生布局
+        if best_sim < self.threshold:
+            return NOVEL_LABEL, best_sim
+        return self.cluster_labels[best], best_sim
+
+    def assign(self, html: str) -> Tuple[int, float]:
+        """将 HTML 源码路由到最近的簇
+
+        Args:
+            html: HTML 源码字符串
+
+        Returns:
+            (label, similarity)：label 为 -1 表示新布局
+        """
+        return self.assign_feature(get_feature(html))
+
+    def to_dict(self) -> Dict:
+        """序列化为字典（中心以稀疏 [维度, 值] 对保存）"""
+        return {
+            'version': self.VERSION,
+            'threshold': self.threshold,
+            'layer_n': self.layer_n,
+            'k': self.k,
+            'vocabulary': self.vocabulary.tolist(),
+            'clusters': [
+                {
+                    'label': lbl,
+                    'size': size,
+                    'min_similarity': min_sim,
+                    'centroid': [[int(i), float(v)] for i, v in zip(np.flatnonzero(row), row[row != 0])],
+                }
+                for lbl, size, min_sim, row in zip(
+                    self.cluster_labels, self.cluster_sizes, self.min_similarities, self.centroids
+                )
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LayoutModel":
+        """从字典恢复模型（版本 1 的字符串特征名会换算为哈希 id）"""
+        version = data.get('version')
+        if version not in (1, cls.VERSION):
+            raise ValueError(f"不支持的布局模型版本: {version}")
+
+        vocabulary = data['vocabulary']
+        if version == 1:
+            vocabulary = [feature_id(name) for name in vocabulary]
+        vocabulary = np.asarray(vocabulary, dtype=np.int64)
+        order = np.argsort(vocabulary)
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+
+        clusters = data['clusters']
+        centroids = np.zeros((len(clusters), len(vocabulary)), dtype=np.float32)
+        for row, cluster in enumerate(clusters):
+            for i, v in cluster['centroid']:
+                centroids[row, position[i]] = v
+        vocabulary = vocabulary[order]
+
+        return cls(
+            vocabulary=vocabulary,
+            centroids=centroids,
+            cluster_labels=[c['label'] for c in clusters],
+            cluster_sizes=[c['size'] for c in clusters],
+            min_similarities=[c['min_similarity'] for c in clusters],
+            threshold=data['threshold'],
+            layer_n=data['layer_n'],
+            k=data.get('k', 0.7),
+        )
+
+    def save(self, path) -> str:
+        """保存为 JSON 文件"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        return str(path)
+
+    @classmethod
+    def load(cls, path) -> "LayoutModel":
+        """从 JSON 文件加载"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def fit_layout_model(
+    html_list: Iterable,
+    threshold: float = 0.9,
+    k: float = 0.7,
+    layer_n: Optional[int] = None,
+    min_samples: int = 3,
+    use_knn_graph: bool = True,
+    n_neighbors: int = 50,
+    show_progress: bool = False,
+    n_jobs: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    from_files: bool = False,
+    bucketed: Optional[bool] = None,
+    urls: Optional[List[str]] = None,
+) -> Tuple[LayoutModel, np.ndarray]:
+    """对 HTML 列表聚类并构建可持久化的布局模型
+
+    与 ``cluster_html_layouts_optimized`` 使用相同的聚类逻辑，只提取一次特征。
+    show_progress / n_jobs / cache_dir 透传给特征提取（为 None 时读取 settings 中对应配置）；
+    from_files=True 时 html_list 为文件路径，逐个读取并提取特征后即丢弃 HTML。
+    bucketed / urls 见 ``cluster_html_files``（两阶段分桶聚类，bucketed 为 None 时读取 settings.cluster_bucketing）。
+
+    Returns:
+        model: LayoutModel
+        labels: shape (n, )，每个 HTML 对应的簇编号，-1 表示噪声点
+    """
+    if from_files:
+        html_list = [str(p) for p in html_list]
+    features = _compute_features(
+        html_list,
+        show_progress=show_progress,
+        n_jobs=n_jobs,
+        cache_dir=cache_dir,
+        from_files=from_files,
+        compact=True,
+    )
+    if not features:
+        return LayoutModel.fit([], np.array([], dtype=int), threshold=threshold, layer_n=layer_n, k=k), np.array([], dtype=int)
+
+    if layer_n is None:
+        layer_n = _parse_valid_layer([f for f in features if f])
+
+    labels = _cluster_features(
+        features,
+        names=urls if urls is not None else (html_list if from_files else None),
+        bucketed=bucketed,
+        n_jobs=n_jobs,
+        threshold=threshold,
+        k=k,
+        layer_n=layer_n,
+        min_samples=min_samples,
+        use_knn_graph=use_knn_graph,
+        n_neighbors=n_neighbors,
+    )
+    model = LayoutModel.fit(features, labels, threshold=threshold, layer_n=layer_n, k=k)
+    return model, labels
+
+
+def _to_dense(ids: np.ndarray, values: np.ndarray, vocabulary: np.ndarray) -> Tuple[np.ndarray, float]:
+    """将特征 id/权重映射到模型词表空间，返回 (向量, 词表外特征的平方和)"""
+    vec = np.zeros(len(vocabulary), dtype=np.float32)
+    if len(vocabulary) == 0:
+        return vec, float(values @ values)
+
+    pos = np.searchsorted(vocabulary, ids)
+    pos_clipped = np.minimum(pos, len(vocabulary) - 1)
+    found = (pos < len(vocabulary)) & (vocabulary[pos_clipped] == ids)
+    vec[pos[found]] = values[found]
+    oov = values[~found]
+    return vec, float(oov @ oov)
+
+
+def _normalize(vec: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm > 0 else vec
@@ -0,0 +1,220 @@
+"""
+节点编号模式（SCHEMA_NODE_ID_MODE）
+给精简 HTML 中承载内容的元素加上紧凑的编号属性（data-w2j="17"），
+模型只需回答 字段 -> 节点编号，不再输出 xpath 和 value_sample：
+
+1. annotate_html：为有直接文本或 src/href 等取值属性的元素编号；
+2. 模型输出 {"字段": {"type", "description", "node_ids": [17]}}（预定义模式只输出 {"字段": [17]}）；
+3. schema_from_node_ids：在本地按编号找到节点，以 id/class、相邻标签文字、祖先锚点构造 xpath，
+   要求 xpath 在编号后的页面上选中这些节点，并优先选择在原始 HTML 上也取到相同值的写法；
+   value_sample 取自节点的实际文本。
+
+输出 token 大幅减少，xpath 的准确性也不再依赖模型的 XPath 书写能力。
+生成的 xpath 不引用编号属性，可直接用于精简 HTML 和原始 HTML。
+"""
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+from loguru import logger
+
+from web2json.tools.xpath_repair import (
+    element_anchors,
+    matches_sample,
+    parse_pages,
+    positional_anchor_path,
+    xpath_text,
+)
+
+NODE_ID_ATTR = "data-w2j"
+# 没有文本时从这些属性取值（图片、链接、时间等）
+VALUE_ATTRS = ("src", "href", "datetime", "content")
+# value_sample 的截断长度（与 xpath 模式下 Prompt 的要求一致）
+SAMPLE_LENGTH = 50
+# 列表字段的 value_sample 最多保留的项数
+MAX_LIST_SAMPLES = 3
+
+
+def _has_own_text(element: Any) -> bool:
+    if (element.text or "").strip():
+        return True
+    return any((child.tail or "").strip() for child in element)
+
+
+def annotate_html(html_content: str) -> Tuple[str, Any]:
+    """为承载内容的元素编号
+
+    Args:
+        html_content: 精简后的 HTML
+
+    Returns:
+        (带编号属性的 HTML, 带编号的页面树)
+    """
+    tree = lxml_html.fromstring(html_content)
+    next_id = 0
+    for element in tree.iter():
+        if not isinstance(element.tag, str):
+            continue
+        if _has_own_text(element) or any(element.get(attr) for attr in VALUE_ATTRS):
+            element.set(NODE_ID_ATTR, str(next_id))
+            next_id += 1
+    logger.debug(f"节点编号模式: 共编号 {next_id} 个节点")
+    return lxml_html.tostring(tree, encoding="unicode"), tree
+
+
+def _normalize_ids(value: Any) -> List[str]:
+    """模型给出的编号可能是整数、字符串或列表"""
+    if isinstance(value, dict):
+        value = value.get("node_ids", value.get("node_id"))
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    ids = []
+    for item in value:
+        text = str(item).strip().lstrip("#")
+        if text and text not in ids:
+            ids.append(text)
+    return ids
+
+
+def node_value(element: Any) -> Tuple[Optional[str], str]:
+    """节点的取值和对应的 xpath 后缀：叶子节点取 /text()，含子元素取 //text()，无文本时取属性"""
+    text = " ".join(element.text_content().split())
+    if text:
+        return text, "/text()" if len(element) == 0 else "//text()"
+    for attr in VALUE_ATTRS:
+        value = element.get(attr)
+        if value:
+            return value.strip(), f"/@{attr}"
+    return None, ""
+
+
+def _selects(tree: Any, xpath: str, nodes: List[Any]) -> bool:
+    """xpath 是否选中目标节点：单个节点要求恰好选中该节点，多个节点要求全部被选中"""
+    try:
+        result = tree.xpath(xpath)
+    except (etree.XPathError, ValueError):
+        return False
+    if not isinstance(result, list) or not result:
+        return False
+    if len(nodes) == 1:
+        return len(result) == 1 and result[0] is nodes[0]
+    selected = set(result)
+    return all(node in selected for node in nodes)
+
+
+def _candidates(tree: Any, nodes: List[Any], is_value: Optional[Callable[[Any], bool]] = None) -> List[str]:
+    first = nodes[0]
+    candidates = list(element_anchors(first, is_value))
+    if len(nodes) == 1:
+        anchored = positional_anchor_path(first)
+        if anchored:
+            candidates.append(anchored)
+    # 多个节点时补充公共的 class 写法
+    classes = (first.get("class") or "").split()
+    if len(nodes) > 1 and classes and "'" not in classes[0]:
+        if all(node.tag == first.tag and classes[0] in (node.get("class") or "").split() for node in nodes):
+            candidates.insert(0, f"//{first.tag}[contains(@class,'{classes[0]}')]")
+    # 兜底：绝对路径（位置下标会在 xpath 修复阶段按需放宽）
+    candidates.append(tree.getroottree().getpath(first))
+    return list(dict.fromkeys(candidates))
+
+
+def synthesize_xpath(
+    tree: Any,
+    nodes: List[Any],
+    original_tree: Any = None,
+    value_nodes: Optional[Set[Any]] = None,
+) -> Tuple[str, Any]:
+    """为选中的节点构造 xpath 并取出示例值
+
+    Args:
+        tree: 带编号的页面树
+        nodes: 字段对应的节点
+        original_tree: 原始 HTML 的页面树（可选），优先选择在原始页面上也取到相同值的 xpath
+        value_nodes: 所有字段选中的节点（可选），这些节点是其他字段的取值，不作为标签文字
+
+    Returns:
+        (xpath, value_sample)；无法构造时 xpath 为空字符串
+    """
+    values = []
+    suffix = ""
+    for node in nodes:
+        value, node_suffix = node_value(node)
+        if value:
+            values.append(value)
+            suffix = suffix or node_suffix
+    if len(nodes) > 1:
+        # 列表字段定位到列表项，由代码生成阶段决定如何取值
+        suffix = ""
+        sample = [value[:SAMPLE_LENGTH] for value in values[:MAX_LIST_SAMPLES]] or None
+    else:
+        sample = values[0][:SAMPLE_LENGTH] if values else None
+
+    is_value = (lambda element: element in value_nodes) if value_nodes else None
+    matched = [candidate for candidate in _candidates(tree, nodes, is_value) if _selects(tree, candidate, nodes)]
+    if not matched:
+        return "", sample
+    if original_tree is not None and sample:
+        for candidate in matched:
+            if matches_sample(xpath_text(original_tree, candidate + suffix), sample):
+                return candidate + suffix, sample
+    return matched[0] + suffix, sample
+
+
+def schema_from_node_ids(
+    result: Dict[str, Any],
+    tree: Any,
+    schema_template: Optional[Dict[str, Any]] = None,
+    original_html: Optional[str] = None,
+) -> Dict[str, Any]:
+    """把模型输出的 字段 -> 节点编号 转换为带 xpath 和 value_sample 的 Schema
+
+    Args:
+        result: 模型输出，{字段: {"type", "description", "node_ids"}} 或 {字段: [编号]}
+        tree: annotate_html 返回的带编号页面树
+        schema_template: 预定义模式的 Schema 模板（可选），保留模板中的字段和 type/description
+        original_html: 原始 HTML（可选），用于优先选择在原始页面上也可用的 xpath
+
+    Returns:
+        Schema 字典；自动模式下找不到节点的字段被丢弃，预定义模式下保留字段但 xpath 为空
+    """
+    if not isinstance(result, dict):
+        raise ValueError("节点编号模式的模型输出不是JSON对象")
+    index = {element.get(NODE_ID_ATTR): element for element in tree.iter(tag=etree.Element)
+             if element.get(NODE_ID_ATTR) is not None}
+    original_tree = parse_pages([original_html])[0] if original_html else None
+
+    schema: Dict[str, Any] = {}
+    fields = list(schema_template) if schema_template is not None else list(result)
+    value_nodes = {index[node_id] for name in fields for node_id in _normalize_ids(result.get(name)) if node_id in index}
+    for name in fields:
+        answer = result.get(name)
+        ids = _normalize_ids(answer)
+        nodes = [index[node_id] for node_id in ids if node_id in index]
+        if len(nodes) < len(ids):
+            logger.debug(f"  字段 {name} 的节点编号不存在: {[i for i in ids if i not in index]}")
+
+        if schema_template is not None:
+            definition = {
+                key: value for key, value in (schema_template.get(name) or {}).items()
+                if key not in ("xpath", "xpaths", "value_sample")
+            }
+        else:
+            if not nodes:
+                logger.debug(f"  字段 {name} 没有可用的节点编号，已丢弃")
+                continue
+            definition = {
+                key: value for key, value in (answer if isinstance(answer, dict) else {}).items()
+                if key not in ("node_ids", "node_id")
+            }
+
+        xpath, sample = synthesize_xpath(tree, nodes, original_tree, value_nodes) if nodes else ("", None)
+        definition["value_sample"] = sample
+        if schema_template is not None and "xpaths" in (schema_template.get(name) or {}):
+            definition["xpaths"] = [xpath] if xpath else []
+        else:
+            definition["xpath"] = xpath
+        schema[name] = definition
+    return schema
@@ -0,0 +1,266 @@
+"""
+学习样本选择器
+从待解析的 HTML 文件中挑选用于 Schema/代码迭代的样本：
+以布局特征为主、正文 SimHash 为辅，先选中心样本（medoid），再按最远点策略挑选差异最大的样本，
+并剔除正文近似重复的页面，用更少的 LLM 轮次覆盖更多的可选字段/布局变体。
+"""
+import hashlib
+import re
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from .html_layout_cosin import (
+    get_feature,
+    html_to_element,
+    fuse_features,
+    __parse_valid_layer as _parse_valid_layer,
+)
+
+
+RE_WORD = re.compile(r'[a-zA-Z0-9]+|[一-鿿]')
+
+# 正文内容距离在综合距离中的权重（布局相同的页面之间用于打破平局）
+CONTENT_WEIGHT = 0.1
+
+
+def page_tokens(html_source: str) -> List[str]:
+    """切分页面可见正文
+
+    英文/数字按单词、中文按相邻字二元组切分，忽略 script/style 中的文本。
+
+    Args:
+        html_source: HTML 源码字符串
+
+    Returns:
+        token 列表
+    """
+    try:
+        root = html_to_element(html_source)
+        texts = root.xpath('//body//text()[not(ancestor::script) and not(ancestor::style)]')
+    except Exception:
+        root = None
+        texts = [html_source]
+
+    words = RE_WORD.findall(' '.join(texts).lower())
+    tokens = [a + b if len(a) == 1 and len(b) == 1 else a for a, b in zip(words, words[1:] + [''])]
+    if not tokens and root is not None:
+        tokens = _structure_tokens(root)
+    return tokens
+
+
+def simhash(tokens: Iterable[str], bits: int = 64) -> int:
+    """计算 token 序列的 SimHash
+
+    Args:
+        tokens: token 序列
+        bits: 指纹位数
+
+    Returns:
+        int 指纹；没有 token 时为 0
+    """
+    weights = [0] * bits
+    for token in tokens:
+        h = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=bits // 8).digest(), 'big')
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+
+    fingerprint = 0
+    for i, w in enumerate(weights):
+        if w > 0:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def text_simhash(html_source: str, bits: int = 64) -> int:
+    """计算页面可见正文的 SimHash
+
+    页面没有可见正文时改用标签结构（标签名和属性值）计算，避免所有无正文页面的指纹都为 0、被当作重复剔除。
+
+    Args:
+        html_source: HTML 源码字符串
+        bits: 指纹位数
+
+    Returns:
+        int 指纹
+    """
+    return simhash(page_tokens(html_source), bits)
+
+
+def varying_fingerprints(token_lists: List[List[str]], bits: int = 64) -> List[int]:
+    """只用各页面之间变化的正文计算 SimHash
+
+    同一模板的页面共享导航、页脚等大量文本，对全部正文计算的指纹几乎相同，
+    不同的详情页也会被判为近似重复。出现在半数以上页面中的 token 视为模板文本，不参与计算；
+    去掉模板文本后没有剩余 token 的页面用完整正文的指纹。
+
+    Args:
+        token_lists: 各页面的 token 列表（page_tokens 的结果）
+        bits: 指纹位数
+
+    Returns:
+        与输入一一对应的指纹
+    """
+    document_frequency = Counter(token for tokens in token_lists for token in set(tokens))
+    limit = len(token_lists) / 2
+    fingerprints = []
+    for tokens in token_lists:
+        varying = [token for token in tokens if document_frequency[token] <= limit]
+        fingerprints.append(simhash(varying or tokens, bits))
+    return fingerprints
+
+
+def _structure_tokens(root) -> List[str]:
+    """无正文页面的指纹特征：各元素的标签名和属性值"""
+    tokens = []
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        tokens.append('<' + element.tag)
+        tokens.extend(f'{element.tag}@{name}={value}' for name, value in element.attrib.items())
+    return tokens
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def select_diverse_samples(
+    html_files: List[str],
+    n: int,
+    candidate_pool: int = 200,
+    near_duplicate_bits: int = 3,
+) -> List[str]:
+    """选择中心样本 + 差异最大的学习样本
+
+    1. 候选池：文件数超过 candidate_pool 时等间隔抽取候选，控制读取和计算开销；
+    2. 近似重复：去掉模板文本后的正文 SimHash 汉明距离 <= near_duplicate_bits 的页面视为重复，
+       优先选择不重复的页面，不足 n 个时再按距离从重复页面中补足；
+    3. 距离：融合布局向量的 cosine 距离 + CONTENT_WEIGHT * 正文 SimHash 归一化汉明距离；
+    4. 先选 medoid（到其余候选距离和最小），再反复选到已选样本最小距离最大的候选。
+
+    Args:
+        html_files: HTML 文件路径列表
+        n: 需要的样本数量
+        candidate_pool: 候选池大小上限
+        near_duplicate_bits: 判定近似重复的汉明距离阈值
+
+    Returns:
+        样本文件路径列表（medoid 在前）；可读取的候选不足 n 个时返回全部候选
+    """
+    if n <= 0 or not html_files:
+        return []
+
+    if len(html_files) > candidate_pool:
+        step = len(html_files) / candidate_pool
+        candidates = [html_files[int(i * step)] for i in range(candidate_pool)]
+    else:
+        candidates = list(html_files)
+
+    # 读取候选，提取布局特征和正文 token
+    kept_files: List[str] = []
+    features: List[dict] = []
+    token_lists: List[List[str]] = []
+    for path in candidates:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                html_source = f.read()
+        except Exception as e:
+            logger.warning(f"样本选择: 读取失败，跳过 {path}: {e}")
+            continue
+
+        feature = get_feature(html_source)
+        if not feature:
+            continue
+
+        kept_files.append(path)
+        features.append(feature)
+        token_lists.append(page_tokens(html_source))
+
+    if len(kept_files) <= 1:
+        return kept_files[:n]
+
+    # 按变化正文的指纹标记近似重复页面（每组只保留第一个）
+    fingerprints = varying_fingerprints(token_lists)
+    unique_fingerprints: List[int] = []
+    unique = np.zeros(len(kept_files), dtype=bool)
+    for i, fingerprint in enumerate(fingerprints):
+        if not any(hamming_distance(fingerprint, other) <= near_duplicate_bits for other in unique_fingerprints):
+            unique[i] = True
+            unique_fingerprints.append(fingerprint)
+
+    dist = _combined_distances(features, fingerprints)
+
+    # medoid + 最远点采样：先在去重后的页面中选择，不足 n 个时再从近似重复页面中按距离补足
+    unique_idx = np.flatnonzero(unique)
+    selected = [int(unique_idx[np.argmin(dist[np.ix_(unique_idx, unique_idx)].sum(axis=1))])]
+    min_dist = dist[selected[0]].copy()
+    while len(selected) < min(n, len(kept_files)):
+        candidates_dist = np.where(unique, min_dist, -1.0) if len(selected) < len(unique_idx) else min_dist.copy()
+        candidates_dist[selected] = -2.0
+        nxt = int(np.argmax(candidates_dist))
+        selected.append(nxt)
+        min_dist = np.minimum(min_dist, dist[nxt])
+
+    if len(selected) > len(unique_idx):
+        logger.info(f"样本选择: 去除近似重复后仅 {len(unique_idx)} 个差异页面，按距离补充 {len(selected) - len(unique_idx)} 个")
+    return [kept_files[i] for i in selected]
+
+
+def _combined_distances(features: List[dict], fingerprints: List[int]) -> np.ndarray:
+    """布局 cosine 距离 + 正文指纹距离的综合距离矩阵"""
+    layer_n = _parse_valid_layer(features)
+    vecs = fuse_features(features, layer_n=layer_n)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    vecs = vecs / np.where(norms > 0, norms, 1.0)
+    layout_dist = np.clip(1.0 - vecs @ vecs.T, 0.0, None)
+
+    m = len(fingerprints)
+    content_dist = np.zeros((m, m), dtype=np.float64)
+    for i in range(m):
+        for j in range(i + 1, m):
+            d = hamming_distance(fingerprints[i], fingerprints[j]) / 64.0
+            content_dist[i, j] = content_dist[j, i] = d
+
+    return layout_dist + CONTENT_WEIGHT * content_dist
+
+
+def select_samples(
+    html_files: List[str],
+    n: int,
+    strategy: Optional[str] = None,
+) -> List[str]:
+    """按配置的策略选择学习样本
+
+    Args:
+        html_files: HTML 文件路径列表
+        n: 需要的样本数量
+        strategy: diverse（多样性选择）/ first（取前 n 个），None 时读取 settings.sample_selection_strategy
+
+    Returns:
+        样本文件路径列表
+    """
+    from web2json.config.settings import settings
+
+    if strategy is None:
+        strategy = settings.sample_selection_strategy
+
+    if strategy == 'diverse' and len(html_files) > n:
+        try:
+            samples = select_diverse_samples(
+                html_files,
+                n,
+                candidate_pool=settings.sample_candidate_pool,
+            )
+            if samples:
+                # 部分文件无法读取时按原顺序补足
+                chosen = set(samples)
+                samples += [path for path in html_files if path not in chosen][:n - len(samples)]
+                return samples
+        except Exception as e:
+            logger.warning(f"多样性样本选择失败，回退为前 {n} 个文件: {e}")
+
+    return html_files[:n]
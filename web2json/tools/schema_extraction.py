@@ -4,14 +4,15 @@ Schema提取和合并工具
 """
 import json
 import re
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 from loguru import logger
-from langchain_openai import ChatOpenAI
-import os
 
 from web2json.config.settings import settings
 from web2json.prompts.schema_extraction import SchemaExtractionPrompts
 from web2json.prompts.schema_merge import SchemaMergePrompts
+from web2json.prompts.formatting import compact_json
+from web2json.tools.node_ids import annotate_html, schema_from_node_ids
+from web2json.tools.validators import ValidationFailed, validate_schema
 
 
 def _parse_llm_response(response: str) -> Dict:
@@ -80,14 +81,115 @@ def _parse_llm_response(response: str) -> Dict:
         raise Exception(f"解析模型响应失败: {str(e)}")
 
 
-def extract_schema_from_html(html_content: str) -> Dict:
+
+def _invoke_and_parse(
+    messages: List[Dict],
+    prompt_version: str,
+    temperature: float = 0.1,
+    html_content: Optional[str] = None,
+    transform: Optional[Callable[[Dict], Dict]] = None,
+) -> Dict:
+    """通过共享的 LLMClient 调用模型并解析JSON响应
+
+    与代码生成共用连接池、超时配置和 token 统计；启用 LLM 响应缓存时，
+    只有能成功解析的响应才会写入缓存，避免格式错误的响应在重试时被反复回放。
+    开启模型级联（LLM_CASCADE_ENABLED）时先用 DEFAULT_CASCADE_MODEL，输出不是有效的 Schema
+    或 xpath 在样本 HTML 上的命中率不足时再升级到 DEFAULT_MODEL。
+
+    Args:
+        messages: 消息列表
+        prompt_version: Prompt 版本（参与缓存键计算）
+        temperature: 温度参数
+        html_content: 样本的完整 HTML（可选），用于级联时校验 xpath
+        transform: 解析后的转换（可选），如节点编号模式下把节点编号转换为 xpath，校验作用于转换后的结果
+
+    Returns:
+        解析后的JSON字典
+    """
+    from web2json.utils.llm_cascade import cascade_completion
+
+    def check(schema: Dict):
+        if html_content is None:
+            if not isinstance(schema, dict) or not schema:
+                raise ValidationFailed("Schema为空或不是JSON对象")
+        else:
+            validate_schema(schema, html_content)
+
+    def parse(content: str) -> Dict:
+        result = _parse_llm_response(content)
+        return transform(result) if transform else result
+
+    _, result = cascade_completion(
+        "default",
+        messages,
+        parse=parse,
+        check=check,
+        temperature=temperature,
+        prompt_version=prompt_version,
+        stop_when="json",
+    )
+    return result
+
+
+def _locate_with_node_ids(
+    html_content: str,
+    schema_template: Optional[Dict] = None,
+    original_html: Optional[str] = None,
+    full_html: Optional[str] = None,
+) -> Dict:
+    """节点编号模式：模型回答 字段 -> 节点编号，在本地构造 xpath 和 value_sample
+
+    Args:
+        html_content: 精简后的 HTML（可能已折叠模板区域）
+        schema_template: 预定义模式的 Schema 模板（自动模式为 None）
+        original_html: 原始 HTML（可选），优先选择在原始页面上也可用的 xpath
+        full_html: 未折叠的精简 HTML（可选），级联时在其上校验 xpath
+
+    Returns:
+        dict: 包含xpath的Schema
+    """
+    annotated_html, tree = annotate_html(html_content[:50000])
+    if schema_template is None:
+        prompt = SchemaExtractionPrompts.get_node_id_extraction_prompt()
+        user_message = f"## HTML内容\n\n```html\n{annotated_html}\n```"
+    else:
+        prompt = SchemaExtractionPrompts.get_node_id_enrichment_prompt()
+        template = {
+            key: {k: v for k, v in (value or {}).items() if k in ("type", "description")}
+            for key, value in schema_template.items()
+        }
+        user_message = (
+            f"## Schema模板\n\n```json\n{compact_json(template)}\n```\n\n"
+            f"## HTML内容\n\n```html\n{annotated_html}\n```"
+        )
+
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": user_message}
+    ]
+    return _invoke_and_parse(
+        messages,
+        SchemaExtractionPrompts.NODE_ID_PROMPT_VERSION,
+        html_content=full_html or html_content[:50000],
+        transform=lambda result: schema_from_node_ids(result, tree, schema_template, original_html),
+    )
+
+
+def extract_schema_from_html(
+    html_content: str,
+    original_html: Optional[str] = None,
+    full_html: Optional[str] = None,
+) -> Dict:
     """
     从HTML内容中提取Schema
 
-    包含字段名、字段说明、字段值示例、xpath路径
+    包含字段名、字段说明、字段值示例、xpath路径。
+    开启 SCHEMA_NODE_ID_MODE 时模型只回答字段所在的节点编号，xpath 和示例值在本地生成。
 
     Args:
         html_content: HTML内容
+        original_html: 原始HTML（可选，节点编号模式下用于选择在原始页面上也可用的xpath）
+        full_html: 完整HTML（可选，html_content 为折叠模板区域后的 Prompt HTML 时传入，级联时在其上校验xpath）
 
     Returns:
         dict: 包含xpath的Schema
@@ -95,31 +197,21 @@ def extract_schema_from_html(html_content: str) -> Dict:
     try:
         logger.info("正在从HTML提取Schema...")
 
+        if settings.schema_node_id_mode:
+            return _locate_with_node_ids(html_content, original_html=original_html, full_html=full_html)
+
         # 1. 获取Prompt
         prompt = SchemaExtractionPrompts.get_html_extraction_prompt()
 
-        # 2. 调用LLM
-        model = ChatOpenAI(
-            model=settings.default_model,
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_BASE"),
-            temperature=0.1
-        )
-
+        # 2. 调用LLM并解析响应（静态 Prompt 作为系统消息在前，HTML 在后，便于命中服务端前缀缓存）
         messages = [
-            {"role": "system", "content": "你是一个专业的HTML分析专家。"},
-            {"role": "user", "content": f"{prompt}\n\n## HTML内容\n\n```html\n{html_content[:50000]}\n```"}
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": f"## HTML内容\n\n```html\n{html_content[:50000]}\n```"}
         ]
 
-        response = model.invoke(messages)
-
-        # 3. 解析响应
-        if hasattr(response, 'content'):
-            content = response.content
-        else:
-            content = str(response)
-
-        result = _parse_llm_response(content)
+        result = _invoke_and_parse(
+            messages, SchemaExtractionPrompts.PROMPT_VERSION, html_content=full_html or html_content[:50000]
+        )
 
         return result
 
@@ -149,28 +241,13 @@ def merge_multiple_schemas(schemas: List[Dict]) -> Dict:
         # 1. 获取Prompt
         prompt = SchemaMergePrompts.get_merge_multiple_schemas_prompt(schemas)
 
-        # 2. 调用LLM
-        model = ChatOpenAI(
-            model=settings.default_model,
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_BASE"),
-            temperature=0.1
-        )
-
+        # 2. 调用LLM并解析响应
         messages = [
-            {"role": "system", "content": "你是一个专业的Schema整合专家。"},
+            {"role": "system", "content": SchemaMergePrompts.get_merge_system_prompt()},
             {"role": "user", "content": prompt}
         ]
 
-        response = model.invoke(messages)
-
-        # 3. 解析响应
-        if hasattr(response, 'content'):
-            content = response.content
-        else:
-            content = str(response)
-
-        result = _parse_llm_response(content)
+        result = _invoke_and_parse(messages, SchemaMergePrompts.PROMPT_VERSION)
 
         return result
 
@@ -182,15 +259,23 @@ def merge_multiple_schemas(schemas: List[Dict]) -> Dict:
         raise Exception(error_msg)
 
 
-def enrich_schema_with_xpath(schema_template: Dict, html_content: str) -> Dict:
+def enrich_schema_with_xpath(
+    schema_template: Dict,
+    html_content: str,
+    original_html: Optional[str] = None,
+    full_html: Optional[str] = None,
+) -> Dict:
     """
     为预定义的Schema模板补充xpath和value_sample信息
 
-    用于预定义模式，保持用户定义的字段key不变，只补充技术细节
+    用于预定义模式，保持用户定义的字段key不变，只补充技术细节。
+    开启 SCHEMA_NODE_ID_MODE 时模型只回答字段所在的节点编号，xpath 和示例值在本地生成。
 
     Args:
         schema_template: 预定义的Schema模板（包含字段key、type、description）
         html_content: HTML内容
+        original_html: 原始HTML（可选，节点编号模式下用于选择在原始页面上也可用的xpath）
+        full_html: 完整HTML（可选，html_content 为折叠模板区域后的 Prompt HTML 时传入，级联时在其上校验xpath）
 
     Returns:
         dict: 补充了xpath和value_sample的完整Schema
@@ -198,18 +283,24 @@ def enrich_schema_with_xpath(schema_template: Dict, html_content: str) -> Dict:
     try:
         logger.info(f"正在为预定义Schema补充xpath信息（{len(schema_template)} 个字段）...")
 
+        if settings.schema_node_id_mode:
+            result = _locate_with_node_ids(html_content, schema_template, original_html, full_html)
+            logger.success(f"成功为预定义Schema补充xpath信息")
+            return result
+
         # 1. 获取Prompt
         prompt = SchemaExtractionPrompts.get_schema_enrichment_prompt()
 
         # 2. 构建消息
         # 确保中文字段名正确序列化
+        # 紧凑序列化：同一模板在各样本间字节相同，与系统消息一起构成可缓存的前缀
         try:
-            schema_str = json.dumps(schema_template, ensure_ascii=False, indent=2)
+            schema_str = compact_json(schema_template)
         except Exception as e:
             logger.warning(f"JSON序列化失败，尝试使用ASCII模式: {e}")
-            schema_str = json.dumps(schema_template, ensure_ascii=True, indent=2)
+            schema_str = json.dumps(schema_template, ensure_ascii=True, separators=(",", ":"))
 
-        user_message = f"{prompt}\n\n## Schema模板\n\n```json\n{schema_str}\n```\n\n## HTML内容\n\n```html\n{html_content[:50000]}\n```"
+        user_message = f"## Schema模板\n\n```json\n{schema_str}\n```\n\n## HTML内容\n\n```html\n{html_content[:50000]}\n```"
 
         # 确保消息内容是有效的UTF-8字符串
         try:
@@ -218,30 +309,17 @@ def enrich_schema_with_xpath(schema_template: Dict, html_content: str) -> Dict:
         except Exception as e:
             logger.warning(f"消息编码处理失败: {e}")
 
-        # 3. 调用LLM
-        model = ChatOpenAI(
-            model=settings.default_model,
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_API_BASE"),
-            temperature=0.1
-        )
-
+        # 3. 调用LLM并解析响应
         messages = [
-            {"role": "system", "content": "你是一个专业的HTML分析和XPath专家。"},
+            {"role": "system", "content": prompt},
             {"role": "user", "content": user_message}
         ]
 
-        response = model.invoke(messages)
-
-        # 4. 解析响应
-        if hasattr(response, 'content'):
-            content = response.content
-        else:
-            content = str(response)
-
-        result = _parse_llm_response(content)
+        result = _invoke_and_parse(
+            messages, SchemaExtractionPrompts.PROMPT_VERSION, html_content=full_html or html_content[:50000]
+        )
 
-        # 5. 验证返回的字段是否与模板一致
+        # 4. 验证返回的字段是否与模板一致
         template_keys = set(schema_template.keys())
         result_keys = set(result.keys())
         if template_keys != result_keys:
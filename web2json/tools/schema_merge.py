@@ -0,0 +1,220 @@
+"""
+本地确定性 Schema 合并
+大多数样本 Schema 的合并是机械性的：字段 key 相同，只需合并 xpath、选取示例值。
+本模块在本地完成这部分工作，只把真正有歧义的字段组交给 LLM：
+
+1. 分组：key 相同（忽略大小写和首尾空白）或 xpath 有重叠的字段归为一组；
+2. 投票：组内每个候选 xpath 在所有样本页面上运行，保留至少在一个页面上取到值的 xpath，按命中页面数排序；
+3. 合并：type 取多数，description 取最完整的一个，value_sample 取第一个非空值；
+4. 歧义：组内 key 不一致、type 冲突、没有任何 xpath 能取到值，
+   字段只出现在一个样本中且只在一个页面上取到值（可能是噪音），
+   或各样本的 value_sample 完全相同（可能是站点名、导航等模板内容）时，交给 LLM 判断。
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from lxml import html as lxml_html
+from loguru import logger
+
+from web2json.tools.validators import field_xpaths, is_filled, xpath_has_value
+
+# 视为同一类型的写法
+_TYPE_ALIASES = {
+    "str": "string",
+    "text": "string",
+    "list": "array",
+    "int": "number",
+    "integer": "number",
+    "float": "number",
+    "dict": "object",
+    "bool": "boolean",
+}
+
+
+@dataclass
+class FieldGroup:
+    """合并前的一组候选字段（来自不同样本）"""
+    entries: List[tuple] = field(default_factory=list)   # [(样本序号, key, 字段定义)]
+    xpath_hits: Dict[str, int] = field(default_factory=dict)  # 候选 xpath -> 取到值的页面数
+    reason: Optional[str] = None                          # 有歧义时的原因
+
+    @property
+    def keys(self) -> List[str]:
+        return list(dict.fromkeys(key for _, key, _ in self.entries))
+
+    @property
+    def samples(self) -> set:
+        return {idx for idx, _, _ in self.entries}
+
+
+@dataclass
+class LocalMergeResult:
+    """本地合并结果"""
+    schema: Dict[str, Any]                 # 已确定的字段
+    ambiguous: List[FieldGroup]            # 需要 LLM 判断的字段组
+
+    def ambiguous_schemas(self, sample_count: int) -> List[Dict[str, Any]]:
+        """只包含歧义字段的各样本 Schema（用于 LLM 合并，跳过没有歧义字段的样本）"""
+        schemas: List[Dict[str, Any]] = [{} for _ in range(sample_count)]
+        for group in self.ambiguous:
+            for idx, key, definition in group.entries:
+                schemas[idx][key] = definition
+        return [schema for schema in schemas if schema]
+
+
+def _normalize_key(key: str) -> str:
+    return str(key).strip().lower()
+
+
+def _normalize_type(value: Any) -> Optional[str]:
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip().lower()
+    return _TYPE_ALIASES.get(value, value)
+
+
+def group_fields(schemas: List[Dict[str, Any]]) -> List[FieldGroup]:
+    """按 key 和 xpath 重叠把各样本的字段分组（并查集），组顺序按字段首次出现的顺序"""
+    entries = [
+        (idx, key, definition)
+        for idx, schema in enumerate(schemas)
+        for key, definition in (schema or {}).items()
+    ]
+    parent = list(range(len(entries)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    first_by_key: Dict[str, int] = {}
+    first_by_xpath: Dict[str, int] = {}
+    for i, (_, key, definition) in enumerate(entries):
+        normalized = _normalize_key(key)
+        if normalized in first_by_key:
+            union(i, first_by_key[normalized])
+        else:
+            first_by_key[normalized] = i
+        for xpath in field_xpaths(definition):
+            if xpath in first_by_xpath:
+                union(i, first_by_xpath[xpath])
+            else:
+                first_by_xpath[xpath] = i
+
+    groups: Dict[int, FieldGroup] = {}
+    for i, entry in enumerate(entries):
+        groups.setdefault(find(i), FieldGroup()).entries.append(entry)
+    return [groups[root] for root in sorted(groups)]
+
+
+def _vote_xpaths(group: FieldGroup, trees: List[Any]):
+    """在所有样本页面上运行组内的候选 xpath，记录各自取到值的页面数"""
+    candidates = list(dict.fromkeys(
+        xpath for _, _, definition in group.entries for xpath in field_xpaths(definition)
+    ))
+    group.xpath_hits = {
+        xpath: sum(1 for tree in trees if tree is not None and xpath_has_value(tree, xpath))
+        for xpath in candidates
+    }
+
+
+def _ambiguity(group: FieldGroup, sample_count: int) -> Optional[str]:
+    """字段组是否需要 LLM 判断，返回原因"""
+    keys = group.keys
+    if len({_normalize_key(key) for key in keys}) > 1:
+        return f"字段名不一致: {', '.join(keys)}"
+    types = {
+        _normalize_type(definition.get("type"))
+        for _, _, definition in group.entries if isinstance(definition, dict)
+    }
+    types.discard(None)
+    if len(types) > 1:
+        return f"类型冲突: {', '.join(sorted(types))}"
+    best_hits = max(group.xpath_hits.values(), default=0)
+    if best_hits == 0:
+        return "没有任何xpath能在样本页面上取到值"
+    if sample_count > 1 and len(group.samples) == 1 and best_hits <= 1:
+        return "只在一个样本中出现"
+    values = {
+        " ".join(str(definition.get("value_sample")).split()).lower()
+        for _, _, definition in group.entries
+        if isinstance(definition, dict) and is_filled(definition.get("value_sample"))
+    }
+    if len(group.samples) > 1 and len(values) == 1:
+        return "各样本取值相同（可能是模板或导航内容）"
+    return None
+
+
+def _merge_group(group: FieldGroup) -> Dict[str, Any]:
+    """把一组字段合并为一个字段定义（格式与 LLM 合并的输出一致，xpath 统一为 xpaths 数组）"""
+    definitions = [definition for _, _, definition in group.entries if isinstance(definition, dict)]
+    first = definitions[0] if definitions else {}
+    merged = {key: value for key, value in first.items() if key not in ("xpath", "xpaths")}
+
+    types = Counter(definition.get("type") for definition in definitions if definition.get("type"))
+    if types:
+        merged["type"] = types.most_common(1)[0][0]
+    descriptions = [
+        definition.get("description") for definition in definitions if is_filled(definition.get("description"))
+    ]
+    if descriptions:
+        merged["description"] = max(descriptions, key=len)
+    samples = [
+        definition.get("value_sample") for definition in definitions if is_filled(definition.get("value_sample"))
+    ]
+    merged["value_sample"] = samples[0] if samples else None
+
+    # 取到值的 xpath 按命中页面数降序（相同时保持首次出现的顺序）
+    resolved = [xpath for xpath, hits in group.xpath_hits.items() if hits > 0]
+    merged["xpaths"] = sorted(resolved, key=lambda xpath: -group.xpath_hits[xpath])
+    return merged
+
+
+def merge_schemas_locally(schemas: List[Dict[str, Any]], html_contents: List[str]) -> LocalMergeResult:
+    """
+    在本地合并多个样本的 Schema
+
+    Args:
+        schemas: 各样本的 Schema
+        html_contents: 与 schemas 一一对应的样本 HTML（提取 Schema 时使用的内容）
+
+    Returns:
+        LocalMergeResult：已确定的字段和需要 LLM 判断的字段组
+    """
+    trees = []
+    for html_content in html_contents:
+        try:
+            trees.append(lxml_html.fromstring(html_content) if html_content else None)
+        except Exception as e:
+            logger.warning(f"样本HTML解析失败，不参与xpath投票: {e}")
+            trees.append(None)
+
+    merged: Dict[str, Any] = {}
+    ambiguous: List[FieldGroup] = []
+    for group in group_fields(schemas):
+        _vote_xpaths(group, trees)
+        group.reason = _ambiguity(group, len(schemas))
+        if group.reason:
+            ambiguous.append(group)
+        else:
+            merged[group.keys[0]] = _merge_group(group)
+    return LocalMergeResult(schema=merged, ambiguous=ambiguous)
+
+
+def resolve_locally(group: FieldGroup) -> Optional[tuple]:
+    """LLM 不可用时的兜底：歧义组取出现最多的 key 合并；没有任何可用 xpath 时丢弃
+
+    Returns:
+        (key, 字段定义) 或 None
+    """
+    if not any(hits > 0 for hits in group.xpath_hits.values()):
+        return None
+    key = Counter(key for _, key, _ in group.entries).most_common(1)[0][0]
+    return key, _merge_group(group)
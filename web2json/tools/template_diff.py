@@ -0,0 +1,143 @@
+"""
+模板区域与可变区域识别
+同一布局的页面共享大部分标记（页眉、导航、侧边栏、页脚等），数据只出现在少数可变区域。
+本模块对同一簇样本的精简 HTML 做子树对齐：
+
+1. 自底向上计算每个元素子树的指纹（标签、属性、规范化文本和子节点指纹）；
+2. 在所有样本中都出现的子树即为模板区域，其余为可变区域；
+3. 构造 Prompt 用的 HTML 时，足够大的模板区域只保留元素本身（标签和属性），
+   内容折叠为一条注释，可变区域保持完整。
+
+折叠后的元素仍在原位置，指向可变区域的 xpath（包括位置下标）在完整页面上同样有效；
+节点编号模式下折叠区域中没有可编号的节点，模型只会从可变区域中选择。
+"""
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+from loguru import logger
+
+from web2json.config.settings import settings
+
+# 折叠后替换模板区域内容的注释
+PLACEHOLDER = " 模板区域（各样本相同），已折叠 "
+# 不折叠的元素（折叠后页面将没有内容）
+_KEEP_TAGS = {"html", "body"}
+
+
+@dataclass
+class TemplateRegions:
+    """各样本共有的子树指纹"""
+    fingerprints: set = field(default_factory=set)
+    min_chars: int = 200
+
+    def collapse(self, html_content: str) -> str:
+        """折叠页面中的模板区域，返回用于 Prompt 的 HTML；解析失败时原样返回"""
+        try:
+            tree = lxml_html.fromstring(html_content)
+        except (etree.ParserError, ValueError) as e:
+            logger.debug(f"页面解析失败，不折叠模板区域: {e}")
+            return html_content
+
+        info = _fingerprint_tree(tree)
+        collapsed = 0
+        stack = [tree]
+        while stack:
+            element = stack.pop()
+            fingerprint, size = info.get(element, (None, 0))
+            if (
+                element.tag not in _KEEP_TAGS
+                and fingerprint in self.fingerprints
+                and size >= self.min_chars
+            ):
+                tail = element.tail
+                for child in list(element):
+                    element.remove(child)
+                element.text = None
+                element.append(etree.Comment(PLACEHOLDER))
+                element.tail = tail
+                collapsed += 1
+                continue
+            stack.extend(child for child in element if isinstance(child.tag, str))
+
+        if not collapsed:
+            return html_content
+        return lxml_html.tostring(tree, encoding="unicode")
+
+
+def _fingerprint_tree(tree: Any) -> Dict[Any, tuple]:
+    """自底向上计算每个元素的 (子树指纹, 内容长度)；注释等非元素节点不参与"""
+    info: Dict[Any, tuple] = {}
+    # 文档顺序中子节点总在父节点之后，倒序遍历即可保证先处理子节点
+    for element in reversed(list(tree.iter())):
+        if not isinstance(element.tag, str):
+            continue
+        attrs = "".join(f" {key}={value}" for key, value in sorted(element.attrib.items()))
+        text = " ".join((element.text or "").split())
+        parts = [f"<{element.tag}{attrs}>{text}"]
+        size = len(element.tag) + len(attrs) + len(text)
+        for child in element:
+            if isinstance(child.tag, str):
+                child_fingerprint, child_size = info[child]
+                parts.append(child_fingerprint)
+                size += child_size
+            tail = " ".join((child.tail or "").split())
+            if tail:
+                parts.append(tail)
+                size += len(tail)
+        digest = hashlib.sha1("".join(parts).encode("utf-8", errors="replace")).hexdigest()
+        info[element] = (digest, size)
+    return info
+
+
+def find_template_regions(html_contents: List[str], min_chars: Optional[int] = None) -> Optional[TemplateRegions]:
+    """
+    找出所有样本共有的子树
+
+    Args:
+        html_contents: 同一簇样本的精简 HTML
+        min_chars: 折叠的最小内容长度（可选，默认 TEMPLATE_MIN_REGION_CHARS），过小的公共子树（如字段标签）不折叠
+
+    Returns:
+        TemplateRegions；有效样本少于 2 个时返回 None
+    """
+    min_chars = settings.template_min_region_chars if min_chars is None else min_chars
+    per_sample = []
+    for html_content in html_contents:
+        if not html_content:
+            continue
+        try:
+            tree = lxml_html.fromstring(html_content)
+        except (etree.ParserError, ValueError) as e:
+            logger.debug(f"页面解析失败，不参与模板区域识别: {e}")
+            continue
+        per_sample.append({fingerprint for fingerprint, _ in _fingerprint_tree(tree).values()})
+
+    if len(per_sample) < 2:
+        return None
+    return TemplateRegions(fingerprints=set.intersection(*per_sample), min_chars=min_chars)
+
+
+def collapse_template_regions(html_contents: List[str], min_chars: Optional[int] = None) -> List[str]:
+    """
+    折叠各样本中的模板区域
+
+    Args:
+        html_contents: 同一簇样本的精简 HTML
+        min_chars: 折叠的最小内容长度（可选，默认 TEMPLATE_MIN_REGION_CHARS）
+
+    Returns:
+        与输入一一对应的 Prompt 用 HTML（无法识别模板区域时为原内容）
+    """
+    regions = find_template_regions(html_contents, min_chars)
+    if regions is None:
+        return list(html_contents)
+
+    collapsed = [regions.collapse(html_content) if html_content else html_content for html_content in html_contents]
+    before = sum(len(html_content or "") for html_content in html_contents)
+    after = sum(len(html_content or "") for html_content in collapsed)
+    if before:
+        logger.info(f"模板区域折叠: HTML 从 {before} 字符减少到 {after} 字符（-{1 - after / before:.0%}）")
+    return collapsed
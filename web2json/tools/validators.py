@@ -0,0 +1,278 @@
+"""
+LLM 输出的本地校验
+在不调用模型的前提下判断一次输出是否可用：
+- Schema：JSON 能解析，且字段的 xpath 能在样本 HTML 上取到值；
+- 解析代码：能编译、能实例化 WebPageParser，并在样本 HTML 上填充足够比例的字段；
+- 代码迭代：在所有样本上运行解析代码，与各样本 Schema 的 value_sample 逐字段比较。
+
+校验不通过时抛出 ValidationFailed，可直接作为 LLMClient.chat_completion 的 validator
+（不通过的响应不写入缓存），也用于模型级联时判断是否升级到更强的模型。
+"""
+import types
+from typing import Any, Dict, List, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+
+from web2json.config.settings import settings
+
+
+class ValidationFailed(ValueError):
+    """LLM 输出未通过本地校验"""
+
+
+def field_xpaths(field: Any) -> List[str]:
+    """取出 Schema 字段中的非空 xpath（兼容 xpath 字符串和 xpaths 列表两种格式）"""
+    if not isinstance(field, dict):
+        return []
+    xpaths = field.get("xpaths")
+    if xpaths is None:
+        xpaths = [field.get("xpath")]
+    elif isinstance(xpaths, str):
+        xpaths = [xpaths]
+    return [xpath.strip() for xpath in xpaths if isinstance(xpath, str) and xpath.strip()]
+
+
+def xpath_has_value(tree: Any, xpath: str) -> bool:
+    """xpath 在文档上是否取到非空值（非法 xpath 视为未取到）"""
+    try:
+        result = tree.xpath(xpath)
+    except (etree.XPathError, ValueError):
+        return False
+    if isinstance(result, list):
+        for item in result:
+            if isinstance(item, str):
+                if item.strip():
+                    return True
+            elif item is not None:
+                return True
+        return False
+    return bool(result)
+
+
+def xpath_hit_rate(schema: Dict[str, Any], html_content: str) -> Optional[float]:
+    """Schema 中带 xpath 的字段有多少比例能在样本上取到值
+
+    Args:
+        schema: Schema 字典
+        html_content: 样本 HTML
+
+    Returns:
+        命中比例；没有任何字段带 xpath 时返回 None
+    """
+    fields = [xpaths for xpaths in (field_xpaths(value) for value in schema.values()) if xpaths]
+    if not fields:
+        return None
+    tree = lxml_html.fromstring(html_content)
+    hits = sum(1 for xpaths in fields if any(xpath_has_value(tree, xpath) for xpath in xpaths))
+    return hits / len(fields)
+
+
+def validate_schema(schema: Any, html_content: str, min_hit_rate: Optional[float] = None):
+    """校验 Schema：非空字典，且 xpath 在样本上的命中比例不低于阈值
+
+    Args:
+        schema: 解析后的 Schema
+        html_content: 生成 Schema 时使用的样本 HTML
+        min_hit_rate: 最低命中比例（可选，默认 CASCADE_MIN_XPATH_HIT_RATE）
+
+    Raises:
+        ValidationFailed: 校验不通过
+    """
+    if not isinstance(schema, dict) or not schema:
+        raise ValidationFailed("Schema为空或不是JSON对象")
+    min_hit_rate = settings.cascade_min_xpath_hit_rate if min_hit_rate is None else min_hit_rate
+    hit_rate = xpath_hit_rate(schema, html_content)
+    if hit_rate is None:
+        raise ValidationFailed("Schema中没有任何可用的xpath")
+    if hit_rate < min_hit_rate:
+        raise ValidationFailed(f"xpath命中率 {hit_rate:.0%} 低于阈值 {min_hit_rate:.0%}")
+
+
+def clean_generated_code(content: str) -> str:
+    """去除模型输出中的 markdown 代码块标记"""
+    code = content.strip()
+
+    if code.startswith("```python"):
+        code = code[len("```python"):].strip()
+    elif code.startswith("```"):
+        code = code[3:].strip()
+
+    # 流式提前结束时，结束标记所在分片可能带有少量尾随内容
+    closing = code.find("\n```")
+    if closing >= 0:
+        code = code[:closing].strip()
+
+    if code.endswith("```"):
+        code = code[:-3].strip()
+    return code
+
+
+def run_parser_code(code: str, html_content: str) -> Dict[str, Any]:
+    """在独立的模块命名空间中执行解析代码，并用 WebPageParser 解析样本
+
+    Args:
+        code: 解析代码（已去除 markdown 标记）
+        html_content: 样本 HTML
+
+    Returns:
+        解析结果
+
+    Raises:
+        ValidationFailed: 代码无法执行、缺少 WebPageParser 或解析结果不是字典
+    """
+    module = types.ModuleType("web2json_candidate_parser")
+    try:
+        exec(compile(code, "<generated_parser>", "exec"), module.__dict__)
+    except Exception as e:
+        raise ValidationFailed(f"解析代码无法执行: {type(e).__name__}: {e}") from e
+    parser_cls = getattr(module, "WebPageParser", None)
+    if parser_cls is None:
+        raise ValidationFailed("解析代码中未找到WebPageParser类")
+    try:
+        result = parser_cls().parse(html_content)
+    except Exception as e:
+        raise ValidationFailed(f"解析样本失败: {type(e).__name__}: {e}") from e
+    if not isinstance(result, dict):
+        raise ValidationFailed(f"解析结果不是字典: {type(result).__name__}")
+    return result
+
+
+def is_filled(value: Any) -> bool:
+    """字段值是否非空（None、空字符串、空列表/字典视为未填充）"""
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return bool(value.strip())
+    if isinstance(value, (list, dict, tuple, set)):
+        return bool(value)
+    return True
+
+
+def field_fill_rate(result: Dict[str, Any], fields: List[str]) -> float:
+    """解析结果中 fields 的填充比例"""
+    if not fields:
+        return 1.0
+    return sum(1 for name in fields if is_filled(result.get(name))) / len(fields)
+
+
+def validate_parser_code(
+    code: str,
+    html_content: str,
+    target_json: Dict[str, Any],
+    min_fill_rate: Optional[float] = None,
+) -> Dict[str, Any]:
+    """校验解析代码：能运行，且在样本上填充的字段比例不低于阈值
+
+    Args:
+        code: 解析代码（已去除 markdown 标记，见 clean_generated_code）
+        html_content: 样本 HTML
+        target_json: 目标 Schema（取其字段名）
+        min_fill_rate: 最低填充比例（可选，默认 CASCADE_MIN_FIELD_FILL_RATE）
+
+    Returns:
+        解析结果
+
+    Raises:
+        ValidationFailed: 校验不通过
+    """
+    min_fill_rate = settings.cascade_min_field_fill_rate if min_fill_rate is None else min_fill_rate
+    result = run_parser_code(code, html_content)
+    fill_rate = field_fill_rate(result, list(target_json))
+    if fill_rate < min_fill_rate:
+        raise ValidationFailed(f"字段填充率 {fill_rate:.0%} 低于阈值 {min_fill_rate:.0%}")
+    return result
+
+
+def _flatten_text(value: Any) -> str:
+    """把字段值（字符串、数字、列表、字典）展开为用于比较的规范化文本"""
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return " ".join(_flatten_text(v) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return " ".join(_flatten_text(v) for v in value)
+    return " ".join(str(value).split())
+
+
+def value_matches(actual: Any, expected: Any) -> bool:
+    """解析结果是否与 value_sample 相符
+
+    value_sample 由模型从样本中摘录，可能被截断（以 ... 结尾）或只是列表的前几项，
+    因此要求解析结果包含 value_sample 的规范化文本（忽略空白差异和大小写）；
+    解析结果只是 value_sample 的一部分（如 "299" 对 "$1,299"）视为不相符。
+    """
+    expected_text = _flatten_text(expected).rstrip(".…").strip().lower()
+    actual_text = _flatten_text(actual).lower()
+    if not expected_text:
+        return True
+    if not actual_text:
+        return False
+    return expected_text in actual_text
+
+
+def compare_to_value_samples(result: Dict[str, Any], sample_schema: Dict[str, Any], fields: List[str]) -> Dict[str, Dict]:
+    """逐字段比较解析结果与样本 Schema 中的 value_sample
+
+    只检查样本 Schema 中有非空 value_sample 的字段（样本中不存在的可选字段无从校验）。
+
+    Args:
+        result: 解析器在该样本上的输出
+        sample_schema: 该样本提取的 Schema（含 value_sample）
+        fields: 需要检查的字段（最终 Schema 的字段名）
+
+    Returns:
+        未通过的字段 {字段名: {'expected': value_sample, 'actual': 解析结果}}
+    """
+    failed = {}
+    for name in fields:
+        field = sample_schema.get(name)
+        expected = field.get("value_sample") if isinstance(field, dict) else None
+        if not is_filled(expected):
+            continue
+        actual = result.get(name)
+        if not value_matches(actual, expected):
+            failed[name] = {"expected": expected, "actual": actual}
+    return failed
+
+
+def validate_parser_on_samples(code: str, samples: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """在所有样本上运行解析代码，并与各样本的 value_sample 逐字段比较
+
+    Args:
+        code: 解析代码（已去除 markdown 标记）
+        samples: [{'round': 样本序号, 'html_content': HTML, 'original_html': 原始 HTML（可选）, 'schema': 该样本的 Schema}]
+                 提供 original_html 时在原始 HTML 上运行（与最终批量解析的输入一致），否则使用 html_content
+        fields: 需要检查的字段
+
+    Returns:
+        每个样本的结果 [{'round', 'passed', 'failed_fields', 'checked_fields', 'result', 'error'}]
+    """
+    reports = []
+    for sample in samples:
+        schema = sample.get("schema") or {}
+        checked = [
+            name for name in fields
+            if isinstance(schema.get(name), dict) and is_filled(schema[name].get("value_sample"))
+        ]
+        report = {
+            "round": sample.get("round"),
+            "passed": False,
+            "failed_fields": {},
+            "checked_fields": len(checked),
+            "result": None,
+            "error": None,
+        }
+        try:
+            result = run_parser_code(code, sample.get("original_html") or sample["html_content"])
+        except ValidationFailed as e:
+            report["error"] = str(e)
+            report["failed_fields"] = {
+                name: {"expected": schema[name].get("value_sample"), "actual": None} for name in checked
+            }
+        else:
+            report["result"] = result
+            report["failed_fields"] = compare_to_value_samples(result, schema, fields)
+            report["passed"] = not report["failed_fields"]
+        reports.append(report)
+    return reports
@@ -0,0 +1,429 @@
+"""
+Schema xpath 的本地校验与修复
+LLM 给出的 xpath 常因位置下标、精简时去掉的节点/属性、tbody 差异等原因在原始页面上失效，
+这些失效的 xpath 进入代码生成 Prompt 后需要额外的迭代轮次来纠正。
+
+本模块在精简 HTML 上用 lxml 运行每个 xpath，并与字段的 value_sample 比较：
+不相符时依次尝试更宽松的写法（去掉 tbody、去掉 [n] 下标、class 等值改为包含），
+仍不行则在页面上定位 value_sample 所在节点（与原 xpath 的目标标签相同），
+以 id、class 或相邻的标签文字（th/dt/label 或以冒号结尾的文字）为锚点重新构造 xpath。
+
+- 原 xpath 在精简 HTML 上通过即保留，不因在原始 HTML 上取不到值而丢弃；
+- 修复得到的 xpath 优先选择在原始 HTML 上也通过的写法，并且必须在其他样本的页面上也能取到值，
+  避免以本页数据值为锚点、只在当前页面有效的写法。
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+from loguru import logger
+
+from web2json.tools.validators import field_xpaths, is_filled, value_matches
+
+# 锚点文字（如 "价格："）的最大长度
+MAX_LABEL_LENGTH = 30
+# 每个页面上用于构造锚点的候选节点数
+MAX_ANCHOR_NODES = 5
+# 作为相邻标签文字的元素（其余元素要求文字以冒号结尾）
+LABEL_TAGS = {"th", "dt", "label"}
+
+_POSITION_RE = re.compile(r"\[\d+\]")
+_LAST_STEP_RE = re.compile(r"(?:^|/)([\w-]+|\*)(?:\[[^\]]*\])*$")
+_CLASS_EQUALS_RE = re.compile(r"@class\s*=\s*(['\"])([^'\"]*)\1")
+_OTHER_ATTR = r"@(?!class\b|id\b)[\w:-]+(?:\s*=\s*(['\"])[^'\"]*\1)?"
+_OTHER_ATTR_RE = re.compile(rf"\[{_OTHER_ATTR}\]")
+_OTHER_ATTR_CLAUSE_RE = re.compile(rf"\s+and\s+{_OTHER_ATTR}|{_OTHER_ATTR}\s+and\s+")
+
+
+def parse_pages(html_contents: List[Optional[str]]) -> List[Any]:
+    """解析页面，空内容或解析失败的页面为 None"""
+    trees = []
+    for html_content in html_contents:
+        try:
+            trees.append(lxml_html.fromstring(html_content) if html_content else None)
+        except (etree.ParserError, ValueError) as e:
+            logger.debug(f"页面解析失败，跳过xpath校验: {e}")
+            trees.append(None)
+    return trees
+
+
+def xpath_text(tree: Any, xpath: str) -> Optional[str]:
+    """运行 xpath，返回取到的文本（元素取 text_content，空白规范化）；非法 xpath 返回 None"""
+    try:
+        result = tree.xpath(xpath)
+    except (etree.XPathError, ValueError):
+        return None
+    if not isinstance(result, list):
+        result = [result]
+    parts = []
+    for item in result:
+        if isinstance(item, etree._Element):
+            parts.append(item.text_content())
+        elif item is not None:
+            parts.append(str(item))
+    return " ".join(" ".join(parts).split())
+
+
+def _leaves(value: Any) -> List[str]:
+    if isinstance(value, dict):
+        return [leaf for v in value.values() for leaf in _leaves(v)]
+    if isinstance(value, (list, tuple)):
+        return [leaf for v in value for leaf in _leaves(v)]
+    return [str(value)] if is_filled(value) else []
+
+
+def matches_sample(text: Optional[str], expected: Any) -> bool:
+    """xpath 取到的文本是否与 value_sample 相符
+
+    列表/对象类型的 value_sample 要求前几个叶子值都出现在文本中；没有 value_sample 时只要求取到值。
+    """
+    if not text:
+        return False
+    if not is_filled(expected):
+        return True
+    if isinstance(expected, (list, tuple, dict)):
+        leaves = _leaves(expected)[:5]
+        return all(value_matches(text, leaf) for leaf in leaves) if leaves else True
+    return value_matches(text, expected)
+
+
+def _validates(
+    xpath: str,
+    pages: List[Tuple[Any, Any]],
+    max_length: Optional[int] = None,
+    single: bool = False,
+) -> bool:
+    """xpath 是否在所有页面上都取到与 value_sample 相符的值
+
+    Args:
+        xpath: 待校验的 xpath
+        pages: [(页面树, 该页面上的 value_sample)]
+        max_length: 取值的最大长度（可选），避免选中大段容器
+        single: 是否要求在每个页面上只选中一个节点（没有 value_sample 可比较时防止放宽成选中整列）
+    """
+    checked = False
+    for tree, expected in pages:
+        if tree is None:
+            continue
+        text = xpath_text(tree, xpath)
+        if not matches_sample(text, expected):
+            return False
+        if max_length is not None and len(text) > max_length:
+            return False
+        if single and _count_nodes(tree, xpath) != 1:
+            return False
+        checked = True
+    return checked
+
+
+def _count_nodes(tree: Any, xpath: str) -> int:
+    try:
+        result = tree.xpath(xpath)
+    except (etree.XPathError, ValueError):
+        return 0
+    return len(result) if isinstance(result, list) else 1
+
+
+def _max_length(pages: List[Tuple[Any, Any]]) -> Optional[int]:
+    """修复后的 xpath 允许的最大取值长度：与 value_sample 相当；没有 value_sample 时返回 None"""
+    lengths = [len(" ".join(_leaves(expected))) for tree, expected in pages if tree is not None and is_filled(expected)]
+    return 3 * max(lengths) + 50 if lengths else None
+
+
+def relaxed_xpaths(xpath: str) -> List[str]:
+    """由原 xpath 逐步放宽得到的候选（不含原 xpath）"""
+    candidates = []
+    base = re.sub(r"/tbody(?=/|\[|$)", "", xpath)
+    candidates.append(base)
+
+    # 逐个去掉位置下标（从最后一个开始），再全部去掉
+    positions = list(_POSITION_RE.finditer(base))
+    for match in reversed(positions):
+        candidates.append(base[:match.start()] + base[match.end():])
+    no_positions = _POSITION_RE.sub("", base)
+    candidates.append(no_positions)
+
+    # class 等值改为包含第一个 class，再去掉 class/id 以外的属性条件
+    def relax_class(match: re.Match) -> str:
+        tokens = match.group(2).split()
+        return f"contains(@class,'{tokens[0]}')" if tokens else match.group(0)
+
+    relaxed = _CLASS_EQUALS_RE.sub(relax_class, no_positions)
+    candidates.append(relaxed)
+    candidates.append(_OTHER_ATTR_CLAUSE_RE.sub("", _OTHER_ATTR_RE.sub("", relaxed)))
+    return [c for c in dict.fromkeys(candidates) if c and c != xpath]
+
+
+def _suffix(xpath: str) -> Optional[str]:
+    """原 xpath 的取值后缀：//text()、/text() 或空（取元素）；取属性的 xpath 返回 None（不做锚点修复）"""
+    stripped = xpath.rstrip()
+    if re.search(r"/@[\w:-]+$", stripped):
+        return None
+    if stripped.endswith("//text()"):
+        return "//text()"
+    if stripped.endswith("/text()"):
+        return "/text()"
+    return ""
+
+
+def _quotable(text: str) -> bool:
+    return "'" not in text
+
+
+def _stable_name(value: str) -> bool:
+    """id/class 是否适合作为锚点：含数字的多为记录编号（如 id="5"、item_1024），只在当前页面有效"""
+    return bool(value) and _quotable(value) and not any(ch.isdigit() for ch in value)
+
+
+def _attr_anchor(element: Any) -> Optional[str]:
+    """以元素自身的 id 或第一个稳定的 class 为条件的定位步骤"""
+    element_id = element.get("id")
+    if element_id and _stable_name(element_id):
+        return f"{element.tag}[@id='{element_id}']"
+    classes = [name for name in (element.get("class") or "").split() if _stable_name(name)]
+    if classes:
+        return f"{element.tag}[contains(@class,'{classes[0]}')]"
+    return None
+
+
+def _label_text(label: Any, is_value: Optional[Callable[[Any], bool]] = None) -> Optional[str]:
+    """相邻元素作为标签时的文字：th/dt/label 或以冒号结尾的短文字，且本身不是字段取值"""
+    if label is None or not isinstance(label.tag, str) or len(label):
+        return None
+    text = " ".join(label.text_content().split())
+    if not 0 < len(text) <= MAX_LABEL_LENGTH or not _quotable(text):
+        return None
+    if label.tag not in LABEL_TAGS and not text.endswith((":", "：")):
+        return None
+    if is_value is not None and is_value(label):
+        return None
+    return text
+
+
+def element_anchors(element: Any, is_value: Optional[Callable[[Any], bool]] = None) -> List[str]:
+    """定位到元素的候选 xpath（不含取值后缀）：自身的 id/class、相邻的标签文字、最近的带 id/class 的祖先
+
+    Args:
+        element: 目标元素
+        is_value: 判断元素是否为字段取值的函数（可选），取值元素不作为标签文字
+    """
+    tag = element.tag
+    candidates = []
+    own = _attr_anchor(element)
+    if own:
+        candidates.append(f"//{own}")
+    # 相邻的标签文字（如 <th>价格</th><td>100</td>、<span>作者:</span><a>张三</a>）
+    for node in (element, element.getparent()):
+        if node is None:
+            continue
+        label = node.getprevious()
+        label_text = _label_text(label, is_value)
+        if label_text:
+            path = f"//{label.tag}[normalize-space()='{label_text}']/following-sibling::{node.tag}[1]"
+            if node is not element:
+                path += f"//{tag}"
+            candidates.append(path)
+
+    for ancestor in element.iterancestors():
+        anchor = _attr_anchor(ancestor)
+        if anchor:
+            candidates.append(f"//{anchor}//{own or tag}")
+            break
+    return candidates
+
+
+def positional_anchor_path(element: Any) -> Optional[str]:
+    """从最近的带 id/class 的祖先出发、带位置下标的路径（如 //div[contains(@class,'info')]/span[2]）；
+    没有这样的祖先时返回 None"""
+    root = element.getroottree()
+    element_path = root.getpath(element)
+    for ancestor in element.iterancestors():
+        anchor = _attr_anchor(ancestor)
+        if anchor:
+            ancestor_path = root.getpath(ancestor)
+            if element_path.startswith(ancestor_path + "/"):
+                return f"//{anchor}{element_path[len(ancestor_path):]}"
+            return None
+    return None
+
+
+def _target_tag(xpath: str) -> Optional[str]:
+    """原 xpath 最后一步定位的标签名（去掉取值后缀）；无法判断或为 * 时返回 None"""
+    path = re.sub(r"/(?:/?text\(\)|@[\w:-]+)\s*$", "", xpath.strip())
+    match = _LAST_STEP_RE.search(path)
+    if not match or match.group(1) == "*":
+        return None
+    return match.group(1).lower()
+
+
+def anchored_xpaths(
+    tree: Any,
+    expected: Any,
+    suffix: str,
+    tag: Optional[str] = None,
+    is_value: Optional[Callable[[Any], bool]] = None,
+) -> List[str]:
+    """在页面上找到 value_sample 所在的节点，以 id/class（自身或最近的祖先）或相邻标签文字为锚点构造 xpath
+
+    Args:
+        tree: 页面树
+        expected: value_sample
+        suffix: 取值后缀
+        tag: 目标标签（可选，只考虑与原 xpath 目标标签相同的节点，避免换到恰好含相同文字的其他元素）
+        is_value: 判断元素是否为字段取值的函数（可选），取值元素不作为标签文字
+    """
+    if isinstance(expected, (list, tuple)) and expected:
+        expected = expected[0]
+    if not isinstance(expected, str):
+        return []
+    target = " ".join(expected.rstrip(".…").split()).lower()
+    if len(target) < 2:
+        return []
+
+    nodes = []
+    for element in tree.iter():
+        if not isinstance(element.tag, str) or (tag and element.tag != tag):
+            continue
+        own_text = " ".join((element.text or "").split()).lower()
+        if own_text and target in own_text:
+            nodes.append(element)
+            if len(nodes) >= MAX_ANCHOR_NODES:
+                break
+
+    candidates = [path + suffix for element in nodes for path in element_anchors(element, is_value)]
+    return list(dict.fromkeys(candidates))
+
+
+def _generalizes(xpath: str, others: List[Any], max_length: Optional[int], single: bool) -> bool:
+    """修复得到的 xpath 是否在其他样本的页面上也能取到值（至少半数页面），且取值长度不超过上限"""
+    trees = [tree for tree in others if tree is not None]
+    if not trees:
+        return True
+    hits = 0
+    for tree in trees:
+        text = xpath_text(tree, xpath)
+        if not text:
+            continue
+        if max_length is not None and len(text) > max_length:
+            return False
+        if single and _count_nodes(tree, xpath) != 1:
+            return False
+        hits += 1
+    return hits * 2 >= len(trees)
+
+
+def repair_xpath(
+    xpath: str,
+    pages: List[Tuple[Any, Any]],
+    preferred: Optional[List[Tuple[Any, Any]]] = None,
+    others: Optional[List[Any]] = None,
+    is_value: Optional[Callable[[Any], bool]] = None,
+) -> Tuple[Optional[str], str]:
+    """校验并修复单个 xpath
+
+    Args:
+        xpath: 原 xpath
+        pages: [(页面树, 该页面上的 value_sample)]，xpath 需在这些页面上通过（精简 HTML）
+        preferred: 同样格式的页面（可选，如原始 HTML），修复时优先选择在这些页面上也通过的写法
+        others: 其他样本的页面树（可选），修复得到的 xpath 需在其中至少半数页面上取到值
+        is_value: 判断元素是否为字段取值的函数（可选），取值元素不作为锚点的标签文字
+
+    Returns:
+        (通过校验的 xpath 或 None, 状态: valid / repaired / dropped)
+    """
+    if _validates(xpath, pages):
+        return xpath, "valid"
+
+    # 修复得到的 xpath 只接受取值长度与 value_sample 相当的结果，避免放宽后选中整列或大段容器；
+    # 没有 value_sample 时要求只选中一个节点
+    max_length = _max_length(pages)
+    single = max_length is None
+    fallback = None
+    for candidate in _repair_candidates(xpath, pages, max_length, is_value):
+        if not _validates(candidate, pages, max_length=max_length, single=single):
+            continue
+        if not _generalizes(candidate, others or [], max_length, single):
+            continue
+        if not preferred or _validates(candidate, preferred, max_length=max_length, single=single):
+            return candidate, "repaired"
+        fallback = fallback or candidate
+    if fallback:
+        return fallback, "repaired"
+    return None, "dropped"
+
+
+def _repair_candidates(xpath: str, pages: List[Tuple[Any, Any]], max_length: Optional[int], is_value):
+    """依次产生放宽写法和锚点写法的候选"""
+    yield from relaxed_xpaths(xpath)
+
+    suffix = _suffix(xpath)
+    if suffix is None or max_length is None:
+        return
+    tag = _target_tag(xpath)
+    for tree, expected in pages:
+        if tree is None or not is_filled(expected):
+            continue
+        yield from anchored_xpaths(tree, expected, suffix, tag=tag, is_value=is_value)
+
+
+def _value_checker(schema: Dict[str, Any]) -> Callable[[Any], bool]:
+    """元素文字与 Schema 中某个字段的 value_sample 相同时视为取值（不作为标签文字）"""
+    values = set()
+    for definition in schema.values():
+        if isinstance(definition, dict):
+            values.update(" ".join(leaf.split()).lower() for leaf in _leaves(definition.get("value_sample")))
+    values.discard("")
+
+    def is_value(element: Any) -> bool:
+        return " ".join(element.text_content().split()).lower() in values
+
+    return is_value
+
+
+def repair_schema_xpaths(
+    schema: Dict[str, Any],
+    html_contents: List[Optional[str]],
+    other_contents: Optional[List[Optional[str]]] = None,
+) -> Dict[str, int]:
+    """校验并修复 Schema 中所有字段的 xpath（原地修改），只保留通过校验的 xpath
+
+    Args:
+        schema: 单个样本的 Schema（字段含 xpath 或 xpaths，以及 value_sample）
+        html_contents: 同一样本的页面内容，第一个（精简 HTML）为必须通过的页面，
+                       其余（如原始 HTML）只用于修复时优先选择
+        other_contents: 其他样本的精简 HTML（可选），修复得到的 xpath 需在其中至少半数页面上取到值
+
+    Returns:
+        {'valid': 原样通过数, 'repaired': 修复数, 'dropped': 丢弃数}
+    """
+    stats = {"valid": 0, "repaired": 0, "dropped": 0}
+    trees = parse_pages(html_contents)
+    if not trees or trees[0] is None:
+        return stats
+    others = parse_pages(other_contents or [])
+    is_value = _value_checker(schema)
+
+    for name, definition in schema.items():
+        xpaths = field_xpaths(definition)
+        if not xpaths:
+            continue
+        sample = definition.get("value_sample")
+        pages = [(trees[0], sample)]
+        preferred = [(tree, sample) for tree in trees[1:] if tree is not None]
+        validated = []
+        for xpath in xpaths:
+            repaired, status = repair_xpath(xpath, pages, preferred, others, is_value)
+            stats[status] += 1
+            if status == "repaired":
+                logger.debug(f"  字段 {name} 的xpath已修复: {xpath} -> {repaired}")
+            elif status == "dropped":
+                logger.debug(f"  字段 {name} 的xpath未通过校验，已丢弃: {xpath}")
+            if repaired and repaired not in validated:
+                validated.append(repaired)
+
+        if "xpaths" in definition:
+            definition["xpaths"] = validated
+        else:
+            definition["xpath"] = validated[0] if validated else ""
+    return stats
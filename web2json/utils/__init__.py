@@ -1,8 +1,28 @@
+from .artifact_store import ArtifactStore, FileSystemArtifactStore, InMemoryArtifactStore
 from .llm_client import LLMClient
+from .llm_cache import LLMCache, LLMCacheMiss, get_llm_cache
+from .llm_cascade import cascade_completion
+from .llm_context import LLMCancelled, llm_task_context
+from .rate_limiter import RateLimiter, get_rate_limiter
 from .schema_editor import SchemaEditor
+from .usage_tracker import UsageTracker, llm_phase, track_usage
 
 __all__ = [
+    "ArtifactStore",
+    "FileSystemArtifactStore",
+    "InMemoryArtifactStore",
     "LLMClient",
+    "LLMCache",
+    "LLMCacheMiss",
+    "get_llm_cache",
+    "cascade_completion",
+    "LLMCancelled",
+    "llm_task_context",
+    "RateLimiter",
+    "get_rate_limiter",
     "SchemaEditor",
+    "UsageTracker",
+    "llm_phase",
+    "track_usage",
 ]
 
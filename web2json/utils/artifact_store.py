@@ -0,0 +1,149 @@
+"""
+中间产物存储
+Agent 运行过程中的原始/精简 HTML、各轮 Schema、解析器代码、解析结果和断点清单都通过 ArtifactStore 读写。
+key 为相对输出目录的路径（如 "schemas/final_schema.json"），结果中记录的路径为 root / key，
+读取时既可以传 key，也可以传这样的路径。
+
+- FileSystemArtifactStore：写入输出目录（目录在首次写入时才创建）；指定 persist 时只有匹配的 key 落盘，
+  其余内容只保存在内存中（按需持久化，如只保存最终 Schema 和解析器）；
+- InMemoryArtifactStore：全部保存在内存中，不读写磁盘（API 服务、大批量运行等不需要保存中间结果的场景）。
+"""
+import fnmatch
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+
+class ArtifactStore(ABC):
+    """中间产物存储基类：不落盘的内容保存在内存中，落盘策略由子类决定"""
+
+    def __init__(self, root: Union[str, Path]):
+        """
+        Args:
+            root: 输出目录（内存存储中只用于生成结果中记录的路径）
+        """
+        self.root = Path(root)
+        self._memory: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def persists(self, key: str) -> bool:
+        """该 key 是否写入磁盘"""
+
+    def path(self, key: str) -> str:
+        """key 对应的路径（结果中记录的位置）"""
+        return str(self.root / key)
+
+    def _key(self, ref: Union[str, Path]) -> Optional[str]:
+        """把 key 或 root 下的路径转换为 key；root 之外的绝对路径返回 None"""
+        path = Path(ref)
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return None if path.is_absolute() else path.as_posix()
+
+    def put_text(self, key: str, text: str) -> str:
+        """
+        保存文本（落盘时先写临时文件再替换，中断不会留下半个文件）
+
+        Args:
+            key: 相对输出目录的路径
+            text: 内容
+
+        Returns:
+            key 对应的路径
+        """
+        if self.persists(key):
+            file_path = self.root / key
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = file_path.with_name(f"{file_path.name}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, file_path)
+        else:
+            with self._lock:
+                self._memory[key] = text
+        return self.path(key)
+
+    def put_json(self, key: str, data: Any) -> str:
+        """保存 JSON（缩进、保留中文），返回 key 对应的路径"""
+        return self.put_text(key, json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+    def get_text(self, ref: Union[str, Path]) -> Optional[str]:
+        """读取文本，不存在时返回 None"""
+        key = self._key(ref)
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        if self.persists(key):
+            try:
+                return (self.root / key).read_text(encoding="utf-8")
+            except OSError:
+                return None
+        return None
+
+    def get_json(self, ref: Union[str, Path]) -> Optional[Any]:
+        """读取 JSON，不存在时返回 None"""
+        text = self.get_text(ref)
+        return json.loads(text) if text is not None else None
+
+    def exists(self, ref: Union[str, Path]) -> bool:
+        """是否存在"""
+        key = self._key(ref)
+        if key is None:
+            return False
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.persists(key) and (self.root / key).is_file()
+
+    def keys(self, prefix: str = "") -> List[str]:
+        """列出以 prefix 开头的 key（按名称排序）"""
+        with self._lock:
+            keys = {key for key in self._memory if key.startswith(prefix)}
+        if self._may_persist() and self.root.is_dir():
+            for file_path in self.root.rglob("*"):
+                key = file_path.relative_to(self.root).as_posix()
+                if file_path.is_file() and key.startswith(prefix) and self.persists(key):
+                    keys.add(key)
+        return sorted(keys)
+
+    def _may_persist(self) -> bool:
+        """是否可能有内容落盘（内存存储返回 False，列出 key 时不访问磁盘）"""
+        return True
+
+
+class FileSystemArtifactStore(ArtifactStore):
+    """文件系统存储：默认全部写入输出目录，指定 persist 时只落盘匹配的 key"""
+
+    def __init__(self, root: Union[str, Path], persist: Optional[Iterable[str]] = None):
+        """
+        Args:
+            root: 输出目录
+            persist: 需要落盘的 key 模式（fnmatch，如 "schemas/final_schema.json"、"result/*"）；
+                     None 表示全部落盘
+        """
+        super().__init__(root)
+        self.persist = None if persist is None else list(persist)
+
+    def persists(self, key: str) -> bool:
+        if self.persist is None:
+            return True
+        return any(fnmatch.fnmatch(key, pattern) for pattern in self.persist)
+
+
+class InMemoryArtifactStore(ArtifactStore):
+    """内存存储：不读写磁盘"""
+
+    def __init__(self, root: Union[str, Path] = "memory"):
+        super().__init__(root)
+
+    def persists(self, key: str) -> bool:
+        return False
+
+    def _may_persist(self) -> bool:
+        return False
@@ -0,0 +1,273 @@
+"""
+LLM 响应磁盘缓存
+按 (模型, 温度, 消息, Prompt版本) 的内容哈希缓存模型响应，
+相同样本重复运行（Agent 重跑、SWDE 重新评测、API 重试）时直接返回缓存结果，不消耗 token。
+
+模式:
+    off        不使用缓存（默认）
+    readwrite  命中直接返回，未命中调用模型后写入缓存
+    replay     只读回放：命中直接返回，未命中抛出 LLMCacheMiss，不调用模型也不写入缓存
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from web2json.config.settings import settings
+
+# 缓存文件格式版本，格式变化时提升即可让旧缓存自然失效
+CACHE_FORMAT_VERSION = 1
+
+CACHE_MODES = ("off", "readwrite", "replay")
+
+# 每写入多少条缓存检查一次容量上限
+EVICT_CHECK_INTERVAL = 100
+
+
+class LLMCacheMiss(LookupError):
+    """replay 模式下缓存未命中（回放不允许请求模型）"""
+
+
+def make_cache_key(
+    model: str,
+    temperature: Optional[float],
+    messages: List[Any],
+    prompt_version: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """计算缓存键
+
+    Args:
+        model: 模型名称
+        temperature: 温度参数
+        messages: 消息列表（dict 或 LangChain 消息对象）
+        prompt_version: Prompt 版本（Prompt 文本之外影响结果的版本号）
+        extra: 其他影响响应的参数（如 max_tokens、extra_body）
+
+    Returns:
+        sha256 十六进制字符串
+    """
+    payload = {
+        "model": model,
+        "temperature": temperature,
+        "messages": [_normalize_message(m) for m in messages],
+        "prompt_version": prompt_version,
+        "extra": extra or {},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+def _normalize_message(message: Any) -> Dict[str, Any]:
+    """把 dict / LangChain 消息对象统一为 {'role', 'content'}"""
+    if isinstance(message, dict):
+        return {"role": message.get("role"), "content": message.get("content")}
+    return {"role": getattr(message, "type", None), "content": getattr(message, "content", str(message))}
+
+
+class LLMCache:
+    """LLM 响应缓存
+
+    目录结构::
+
+        <cache_dir>/v<CACHE_FORMAT_VERSION>/<key[:2]>/<key>.json
+
+    过期（TTL）的条目在读取时删除；总大小超过上限时按最近访问时间（mtime）淘汰最旧的条目，
+    命中时会刷新 mtime，因此淘汰顺序近似 LRU。
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        mode: str = "readwrite",
+        ttl_seconds: float = 0,
+        max_size_bytes: int = 0,
+    ):
+        """
+        初始化 LLM 响应缓存
+
+        Args:
+            cache_dir: 缓存根目录
+            mode: off / readwrite / replay
+            ttl_seconds: 条目有效期（秒），0 表示永不过期
+            max_size_bytes: 缓存总大小上限（字节），0 表示不限制
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"不支持的 LLM 缓存模式: {mode}，可选: {', '.join(CACHE_MODES)}")
+
+        self.root = Path(cache_dir) / f"v{CACHE_FORMAT_VERSION}"
+        self.mode = mode
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def writable(self) -> bool:
+        return self.mode == "readwrite"
+
+    @property
+    def replay_only(self) -> bool:
+        return self.mode == "replay"
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，未命中或已过期返回 None
+
+        Returns:
+            {'response': str, 'usage': dict, 'created_at': float, ...}
+        """
+        if not self.enabled:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"LLM缓存读取失败，将重新请求: {path} ({e})")
+            self._count(hit=False)
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            self._count(hit=False)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self._count(hit=True)
+        return entry
+
+    def put(self, key: str, response: str, usage: Optional[Dict[str, int]] = None, meta: Optional[Dict] = None):
+        """写入缓存条目（replay 模式下忽略）
+
+        Args:
+            key: 缓存键
+            response: 模型响应文本
+            usage: 原始请求的 token 用量（仅用于统计节省量）
+            meta: 附加信息（模型名等，便于人工排查）
+        """
+        if not self.writable:
+            return
+
+        path = self._path(key)
+        entry = {
+            "response": response,
+            "usage": usage or {},
+            "meta": meta or {},
+            "created_at": time.time(),
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"LLM缓存写入失败: {path} ({e})")
+            return
+
+        with self._lock:
+            self._puts += 1
+            check = self.max_size_bytes and self._puts % EVICT_CHECK_INTERVAL == 1
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """删除过期条目，并在超过容量上限时按 mtime 从旧到新淘汰
+
+        Returns:
+            删除的条目数
+        """
+        if not self.root.exists():
+            return 0
+
+        now = time.time()
+        entries = []
+        removed = 0
+        for path in self.root.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            # 创建时间不晚于 mtime，mtime 已超期的条目必然过期
+            if self.ttl_seconds and now - stat.st_mtime > self.ttl_seconds:
+                removed += self._remove(path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        if self.max_size_bytes:
+            total = sum(size for _, size, _ in entries)
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_size_bytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+
+        if removed:
+            logger.debug(f"LLM缓存淘汰 {removed} 条")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """命中统计"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @staticmethod
+    def _remove(path: Path) -> int:
+        try:
+            path.unlink()
+            return 1
+        except OSError:
+            return 0
+
+
+_cache_instance: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """按全局配置返回进程内共享的 LLM 缓存，未启用时返回 None"""
+    global _cache_instance
+
+    mode = (settings.llm_cache_mode or "off").lower()
+    if mode == "off":
+        return None
+
+    with _cache_lock:
+        if _cache_instance is None or _cache_instance.mode != mode:
+            _cache_instance = LLMCache(
+                settings.llm_cache_dir,
+                mode=mode,
+                ttl_seconds=settings.llm_cache_ttl_hours * 3600,
+                max_size_bytes=settings.llm_cache_max_size_mb * 1024 * 1024,
+            )
+            logger.info(f"LLM响应缓存已启用 - 模式: {mode}, 目录: {settings.llm_cache_dir}")
+        return _cache_instance
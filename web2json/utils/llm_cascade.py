@@ -0,0 +1,106 @@
+"""
+模型级联
+先用廉价模型生成，输出经本地校验（JSON 有效、xpath 能在样本上取到值、解析器能运行并填充字段）通过即采用，
+不通过时再升级到该场景的主模型；主模型的输出按原有方式采用，不做额外校验。
+未开启 LLM_CASCADE_ENABLED 或未配置廉价模型时等同于直接调用主模型。
+
+升级次数按阶段记录在当前任务的 UsageTracker 中（summary()['cascade']），
+进程内累计次数见 LLMTelemetry 的 cascade_calls / cascade_escalations。
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from web2json.utils.llm_client import LLMClient, ScenarioType
+from web2json.utils.llm_context import LLMCancelled
+from web2json.utils.llm_retry import LLMTelemetry
+from web2json.utils.usage_tracker import record_cascade
+
+
+def cascade_completion(
+    scenario: ScenarioType,
+    messages: List[Dict[str, Any]],
+    parse: Callable[[str], Any],
+    check: Optional[Callable[[Any], Any]] = None,
+    temperature: Optional[float] = None,
+    **kwargs,
+) -> Tuple[str, Any]:
+    """按级联策略调用模型，返回第一个可用的输出
+
+    廉价模型的输出需要 parse 成功且通过 check；主模型的输出只需 parse 成功（与不开启级联时的行为一致）。
+
+    Args:
+        scenario: 使用场景（default / code_gen / agent）
+        messages: 消息列表
+        parse: 解析函数，输入模型响应文本，返回解析结果，失败时抛出异常
+        check: 本地质量校验（可选），输入解析结果，不通过时抛出异常并升级到下一个模型
+        temperature: 温度参数（可选）
+        **kwargs: 传给 chat_completion 的其他参数（max_tokens、prompt_version、stop_when 等）
+
+    Returns:
+        (模型响应文本, parse 的返回值)
+
+    Raises:
+        主模型调用或解析失败时的异常
+    """
+    clients = LLMClient.cascade_for_scenario(scenario)
+
+    for index, client in enumerate(clients):
+        is_last = index == len(clients) - 1
+        # 作为 chat_completion 的 validator：未通过的响应不写入缓存
+        accept = _memoized(parse if is_last or check is None else _checked(parse, check))
+        try:
+            content = client.chat_completion(messages, temperature=temperature, validator=accept, **kwargs)
+            result = accept(content)
+        except LLMCancelled:
+            raise
+        except Exception as e:
+            if is_last:
+                _record(clients, escalated=index > 0)
+                raise
+            logger.warning(
+                f"模型级联: {client.model} 的输出未通过校验（{type(e).__name__}: {e}），"
+                f"升级到 {clients[index + 1].model}"
+            )
+            continue
+
+        _record(clients, escalated=index > 0)
+        return content, result
+
+
+def _record(clients: List[LLMClient], escalated: bool):
+    """只统计真正发生级联（配置了廉价模型）的调用"""
+    if len(clients) < 2:
+        return
+    LLMTelemetry.incr("cascade_calls")
+    if escalated:
+        LLMTelemetry.incr("cascade_escalations")
+    record_cascade(escalated)
+
+
+def _checked(parse: Callable[[str], Any], check: Callable[[Any], Any]) -> Callable[[str], Any]:
+    def wrapper(content: str) -> Any:
+        result = parse(content)
+        check(result)
+        return result
+
+    return wrapper
+
+
+def _memoized(accept: Callable[[str], Any]) -> Callable[[str], Any]:
+    """缓存最近一次校验结果，避免写缓存前和返回前对同一响应重复校验（如重复运行解析代码）"""
+    last: Dict[str, Any] = {}
+
+    def wrapper(content: str) -> Any:
+        if last.get("content") != content:
+            last.clear()
+            try:
+                last["result"] = accept(content)
+            except Exception as e:
+                last["error"] = e
+            last["content"] = content
+        if "error" in last:
+            raise last["error"]
+        return last["result"]
+
+    return wrapper
@@ -3,27 +3,88 @@ LLM客户端封装 - 使用 LangChain 1.0
 支持基于场景的模型配置和 Token 追踪
 """
 import os
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Literal
+from typing import List, Dict, Any, Optional, Literal, Callable, Tuple
 
+import httpx
 import tiktoken
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from loguru import logger
 from web2json.config.settings import settings
+from web2json.utils.llm_cache import LLMCache, LLMCacheMiss, get_llm_cache, make_cache_key
+from web2json.utils.rate_limiter import DEFAULT_COMPLETION_ESTIMATE, get_rate_limiter
+from web2json.utils.llm_retry import LLMTelemetry, acall_with_retry, call_with_retry
+from web2json.utils.llm_context import LLMCancelled, check_cancelled, report_tokens
+from web2json.utils.llm_stream import get_stop_detector
+from web2json.utils.usage_tracker import prompt_cache_hit_rate, record_llm_call
 
 # 加载项目根目录的 .env 文件
 project_root = Path(__file__).parent.parent
 env_path = project_root / ".env"
 load_dotenv(env_path)
 
-# 验证
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError(f".env 文件路径: {env_path}, API Key未加载")
-
 # 定义场景类型
 ScenarioType = Literal["default", "code_gen", "agent"]
 
+# 进程内共享的 HTTP 连接池（所有 LLMClient 实例共用）
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = threading.Lock()
+
+
+def _pool_size() -> int:
+    """连接池大小：显式配置优先，否则按并发配置估算"""
+    if settings.llm_max_connections > 0:
+        return settings.llm_max_connections
+    return max(settings.max_concurrent_extractions, settings.max_concurrent_merges, 1) * 2
+
+
+def _request_timeout() -> httpx.Timeout:
+    """统一的请求超时配置"""
+    return httpx.Timeout(settings.llm_request_timeout, connect=settings.llm_connect_timeout)
+
+
+def _pool_limits() -> httpx.Limits:
+    """同步/异步连接池共用的连接数限制"""
+    size = _pool_size()
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=60)
+
+
+def get_shared_http_client() -> httpx.Client:
+    """获取进程内共享的 keep-alive HTTP 客户端
+
+    连接池大小与配置的并发数匹配，并行 Schema 提取时复用已建立的 TCP/TLS 连接，
+    不再为每次调用重新握手。
+
+    Returns:
+        httpx.Client 实例
+    """
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(limits=_pool_limits(), timeout=_request_timeout())
+            logger.debug(f"已创建共享HTTP连接池 - 最大连接数: {_pool_size()}")
+        return _http_client
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """获取进程内共享的 keep-alive 异步 HTTP 客户端
+
+    异步调用（ainvoke/astream）使用，连接数限制和超时与同步连接池一致。
+
+    Returns:
+        httpx.AsyncClient 实例
+    """
+    global _async_http_client
+    with _http_client_lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            _async_http_client = httpx.AsyncClient(limits=_pool_limits(), timeout=_request_timeout())
+            logger.debug(f"已创建共享异步HTTP连接池 - 最大连接数: {_pool_size()}")
+        return _async_http_client
+
 
 class LLMClient:
     """LLM客户端封装类 - 基于 LangChain 1.0
@@ -41,6 +102,11 @@ class LLMClient:
     _global_total_completion_tokens = 0
     _global_total_tokens = 0
     _global_request_count = 0
+    _global_cache_hits = 0
+    # 命中服务端前缀缓存的输入 token 数
+    _global_cached_input_tokens = 0
+    # 全局统计会被多个线程同时更新
+    _usage_lock = threading.Lock()
     
     # 单例字典，按 (model, api_base) 作为键
     _instances: Dict[tuple, "LLMClient"] = {}
@@ -81,7 +147,11 @@ class LLMClient:
         if self._initialized:
             return
 
-        self.api_key = api_key or settings.openai_api_key
+        # 首次创建客户端时才检查 API Key，导入模块本身不依赖密钥（便于离线测试和基准）
+        self.api_key = api_key or settings.openai_api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError(f".env 文件路径: {env_path}, API Key未加载")
+
         self.api_base = api_base or settings.openai_api_base
         self.model = model or settings.default_model
         self.temperature = temperature
@@ -91,14 +161,23 @@ class LLMClient:
             self.tokenizer = tiktoken.encoding_for_model(self.model)
         except KeyError:
             # 如果模型不在 tiktoken 的预设中，使用 cl100k_base 作为默认
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+            self.tokenizer = _load_default_tokenizer()
+        except Exception as e:
+            # 无法下载编码文件（离线环境）时退化为按字符估算
+            logger.warning(f"tiktoken 编码加载失败，token 数将按字符估算: {e}")
+            self.tokenizer = _ApproxTokenizer()
 
         # 构建 ChatOpenAI 参数
         client_kwargs = {
             "model": self.model,
             "api_key": self.api_key,
             "base_url": self.api_base,
-            "temperature": self.temperature
+            "temperature": self.temperature,
+            "timeout": _request_timeout(),
+            "http_client": get_shared_http_client(),
+            "http_async_client": get_shared_async_http_client(),
+            # 重试由 call_with_retry 统一处理（退避、截止时间、对冲）
+            "max_retries": 0,
         }
 
         # 如果启用了禁用思考模式选项，直接传递 extra_body 参数
@@ -194,101 +273,508 @@ class LLMClient:
             return 0
         return len(self.tokenizer.encode(text))
 
-    def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
+    def update_token_count(self, input_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0) -> None:
         """更新 token 计数并打印统计信息
 
         Args:
             input_tokens: 输入 token 数
             completion_tokens: 输出 token 数
+            cached_tokens: 输入中命中服务端前缀缓存的 token 数
         """
         # 更新全局统计
-        LLMClient._global_total_input_tokens += input_tokens
-        LLMClient._global_total_completion_tokens += completion_tokens
-        LLMClient._global_total_tokens = (
-            LLMClient._global_total_input_tokens + 
-            LLMClient._global_total_completion_tokens
-        )
-        LLMClient._global_request_count += 1
+        with LLMClient._usage_lock:
+            LLMClient._global_cached_input_tokens += cached_tokens
+            LLMClient._global_total_input_tokens += input_tokens
+            LLMClient._global_total_completion_tokens += completion_tokens
+            LLMClient._global_total_tokens = (
+                LLMClient._global_total_input_tokens + 
+                LLMClient._global_total_completion_tokens
+            )
+            LLMClient._global_request_count += 1
+            cumulative_input = LLMClient._global_total_input_tokens
+            cumulative_completion = LLMClient._global_total_completion_tokens
+            cumulative_total = LLMClient._global_total_tokens
 
         # 按照指定格式打印 token 消耗
         logger.info(
             f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
-            f"Cumulative Input={LLMClient._global_total_input_tokens}, "
-            f"Cumulative Completion={LLMClient._global_total_completion_tokens}, "
+            f"Cumulative Input={cumulative_input}, "
+            f"Cumulative Completion={cumulative_completion}, "
             f"Total={input_tokens + completion_tokens}, "
-            f"Cumulative Total={LLMClient._global_total_tokens}"
+            f"Cumulative Total={cumulative_total}"
+            + (f", Cached Input={cached_tokens}" if cached_tokens else "")
         )
 
+    def _message_text(self, messages: List[Any]) -> str:
+        """拼接消息文本（用于 token 估算）"""
+        parts = []
+        for msg in messages:
+            if isinstance(msg, dict) and 'content' in msg:
+                parts.append(str(msg['content']))
+            elif hasattr(msg, 'content'):
+                parts.append(str(msg.content))
+        return "".join(parts)
+
+    def estimate_tokens(self, messages: List[Any], max_tokens: Optional[int] = None) -> int:
+        """用 tiktoken 预估一次请求的 token 消耗（输入 + 预留输出），供限流器预留 TPM 额度
+
+        Args:
+            messages: 消息列表
+            max_tokens: 最大输出 token 数（未指定时按 DEFAULT_COMPLETION_ESTIMATE 预留）
+
+        Returns:
+            预估 token 数
+        """
+        return self.count_tokens(self._message_text(messages)) + (max_tokens or DEFAULT_COMPLETION_ESTIMATE)
+
+    def _prepare_call(
+        self,
+        messages: List[Any],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        prompt_version: Optional[str],
+    ) -> Tuple[Dict[str, Any], Optional[LLMCache], Optional[str], Optional[str]]:
+        """构建调用参数并查询缓存
+
+        Returns:
+            (invoke 参数, 缓存对象, 缓存键, 命中的缓存响应)
+
+        Raises:
+            LLMCacheMiss: replay 模式下缓存未命中
+        """
+        actual_temperature = self.temperature if temperature is None else temperature
+        call_kwargs = {"temperature": actual_temperature}
+        if max_tokens:
+            call_kwargs["max_tokens"] = max_tokens
+
+        cache = get_llm_cache()
+        cache_key = None
+        if cache:
+            cache_key = make_cache_key(
+                self.model, actual_temperature, messages, prompt_version,
+                extra={"max_tokens": max_tokens, "disable_thinking_mode": settings.disable_thinking_mode},
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                with LLMClient._usage_lock:
+                    LLMClient._global_cache_hits += 1
+                    cache_hits = LLMClient._global_cache_hits
+                logger.info(f"LLM缓存命中 - 模型: {self.model}，跳过请求（累计命中 {cache_hits} 次）")
+                return call_kwargs, cache, cache_key, cached["response"]
+            if cache.replay_only:
+                raise LLMCacheMiss(
+                    f"LLM缓存未命中（replay 模式不请求模型）- 模型: {self.model}, 缓存键: {cache_key}"
+                )
+
+        return call_kwargs, cache, cache_key, None
+
+    def _record_usage(self, messages: List[Any], response: Any) -> Tuple[int, int, int]:
+        """记录一次请求的 token 用量
+
+        Returns:
+            (输入 token 数, 输出 token 数, 命中前缀缓存的输入 token 数)
+        """
+        # 从响应中提取 token 使用情况
+        if hasattr(response, 'response_metadata') and 'token_usage' in response.response_metadata:
+            usage = response.response_metadata['token_usage']
+            prompt_tokens = usage.get('prompt_tokens', 0)
+            completion_tokens = usage.get('completion_tokens', 0)
+            cached_tokens = _cached_prompt_tokens(usage)
+        else:
+            # 如果无法从响应中获取，尝试估算
+            logger.warning("无法从响应中获取 token 使用信息，将进行估算")
+            prompt_tokens = self.count_tokens(self._message_text(messages))
+            completion_tokens = self.count_tokens(response.content)
+            cached_tokens = 0
+
+        # 更新并打印 token 统计
+        self.update_token_count(prompt_tokens, completion_tokens, cached_tokens)
+        return prompt_tokens, completion_tokens, cached_tokens
+
+    def _store_cache(
+        self,
+        response: Any,
+        cache: Optional[LLMCache],
+        cache_key: Optional[str],
+        prompt_version: Optional[str],
+        validator: Optional[Callable[[str], Any]],
+    ):
+        """响应通过校验时写入缓存"""
+        if cache and _passes(validator, response.content):
+            usage = getattr(response, 'response_metadata', {}).get('token_usage', {}) or {}
+            cache.put(
+                cache_key, response.content,
+                usage=usage,
+                meta={"model": self.model, "prompt_version": prompt_version},
+            )
+
+    def _stream(
+        self,
+        messages: List[Any],
+        request_kwargs: Dict[str, Any],
+        stop_detector: Optional[Callable[[str], bool]],
+    ) -> "_StreamedResponse":
+        """流式接收一次响应
+
+        每收到一段内容就检查取消信号并报告 token 进度；内容满足 stop_detector 时关闭流（不再读取尾随内容）。
+        """
+        collector = _StreamCollector(self, messages, stop_detector)
+        stream = self.client.stream(messages, stream_usage=True, **request_kwargs)
+        try:
+            for chunk in stream:
+                if collector.feed(chunk):
+                    break
+        finally:
+            # 提前结束或取消时关闭生成器，底层 HTTP 流随之关闭
+            stream.close()
+        return collector.result()
+
+    async def _astream(
+        self,
+        messages: List[Any],
+        request_kwargs: Dict[str, Any],
+        stop_detector: Optional[Callable[[str], bool]],
+    ) -> "_StreamedResponse":
+        """_stream 的异步版本"""
+        collector = _StreamCollector(self, messages, stop_detector)
+        stream = self.client.astream(messages, stream_usage=True, **request_kwargs)
+        try:
+            async for chunk in stream:
+                if collector.feed(chunk):
+                    break
+        finally:
+            await stream.aclose()
+        return collector.result()
+
+    @classmethod
+    def cascade_for_scenario(cls, scenario: ScenarioType = "default") -> List["LLMClient"]:
+        """按场景创建模型级联使用的客户端列表（从廉价到强）
+
+        开启 LLM_CASCADE_ENABLED 且该场景配置了与主模型不同的廉价模型时返回 [廉价模型, 主模型]，
+        否则只返回 [主模型]。两者使用相同的温度。
+
+        Args:
+            scenario: 使用场景（同 for_scenario）
+
+        Returns:
+            LLMClient 实例列表
+        """
+        primary = cls.for_scenario(scenario)
+        cascade_models = {
+            "default": settings.default_cascade_model,
+            "code_gen": settings.code_gen_cascade_model,
+            "agent": settings.agent_cascade_model,
+        }
+        cheap_model = cascade_models.get(scenario, cascade_models["default"])
+        if not settings.llm_cascade_enabled or not cheap_model or cheap_model == primary.model:
+            return [primary]
+        cheap = cls(
+            api_key=settings.openai_api_key,
+            api_base=settings.openai_api_base,
+            model=cheap_model,
+            temperature=primary.temperature,
+        )
+        return [cheap, primary]
+
     def chat_completion(
         self,
         messages: List[Dict[str, Any]],
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        prompt_version: Optional[str] = None,
+        validator: Optional[Callable[[str], Any]] = None,
+        deadline: Optional[float] = None,
+        stop_when: Optional[str] = None,
         **kwargs
     ) -> str:
         """调用聊天完成API
 
+        启用 LLM 响应缓存（LLM_CACHE_MODE）时先查缓存，命中则直接返回，不消耗 token；
+        未命中时每次请求先经过该模型的全局限流器（LLM_RPM_LIMIT / LLM_TPM_LIMIT / LLM_MAX_IN_FLIGHT），
+        可重试错误按指数退避重试（LLM_MAX_RETRIES），开启 LLM_HEDGE_ENABLED 时慢请求会触发对冲请求。
+        开启 LLM_STREAMING 时以流式接收：按 stop_when 在内容完整后提前结束，向任务上下文报告 token 进度，
+        任务取消（llm_task_context 的 cancel_event）时立即中止。
+
         Args:
             messages: 消息列表
-            temperature: 温度参数（可选）
+            temperature: 温度参数（可选，默认使用客户端的温度）
             max_tokens: 最大token数（可选）
+            prompt_version: Prompt 版本，参与缓存键计算（可选）
+            validator: 响应校验函数（可选），抛出异常时响应不写入缓存
+            deadline: 本次调用（含重试）的总截止时间，单位秒（可选，默认 LLM_CALL_DEADLINE）
+            stop_when: 流式接收的提前结束条件（可选）: code（闭合代码块）/ json（完整顶层 JSON 对象）
             **kwargs: 其他参数
 
         Returns:
             模型响应文本
         """
+        check_cancelled()
+        started_at = time.monotonic()
+        call_kwargs, cache, cache_key, cached = self._prepare_call(messages, temperature, max_tokens, prompt_version)
+        if cached is not None:
+            record_llm_call(self.model, 0, 0, started_at, cache_hit=True)
+            return cached
+
+        limiter = get_rate_limiter(self.model)
+        estimated = self.estimate_tokens(messages, max_tokens)
+        stop_detector = get_stop_detector(stop_when)
+        # 每次尝试（含重试、对冲）的 (输入, 输出, 缓存命中输入) token 数
+        attempt_usage: List[Tuple[int, int, int]] = []
+
+        def attempt(timeout: Optional[float]):
+            reserved = limiter.acquire(estimated)
+            actual_tokens = None
+            try:
+                check_cancelled()
+                request_kwargs = _with_timeout(call_kwargs, timeout)
+                if settings.llm_streaming:
+                    response = self._stream(messages, request_kwargs, stop_detector)
+                else:
+                    # 使用 LangChain 1.0 的 invoke 方法
+                    response = self.client.invoke(messages, **request_kwargs)
+                usage = self._record_usage(messages, response)
+                attempt_usage.append(usage)
+                actual_tokens = usage[0] + usage[1]
+                return response
+            finally:
+                limiter.release(reserved, actual_tokens)
+
+        success = False
         try:
-            # 使用 LangChain 1.0 的 invoke 方法
-            response = self.client.invoke(messages)
-            
-            # 从响应中提取 token 使用情况
-            if hasattr(response, 'response_metadata') and 'token_usage' in response.response_metadata:
-                usage = response.response_metadata['token_usage']
-                prompt_tokens = usage.get('prompt_tokens', 0)
-                completion_tokens = usage.get('completion_tokens', 0)
-                
-                # 更新并打印 token 统计
-                self.update_token_count(prompt_tokens, completion_tokens)
-            else:
-                # 如果无法从响应中获取，尝试估算
-                logger.warning("无法从响应中获取 token 使用信息，将进行估算")
-                # 估算输入 token
-                input_text = ""
-                for msg in messages:
-                    if isinstance(msg, dict) and 'content' in msg:
-                        input_text += str(msg['content'])
-                input_tokens = self.count_tokens(input_text)
-                
-                # 估算输出 token
-                completion_tokens = self.count_tokens(response.content)
-                
-                self.update_token_count(input_tokens, completion_tokens)
-            
-            return response.content
+            response = call_with_retry(attempt, self.model, deadline)
+            success = True
+        except LLMCancelled:
+            logger.info("任务已取消，LLM调用中止")
+            raise
+        except Exception as e:
+            logger.error(f"LLM调用失败: {e}")
+            raise
+        finally:
+            record_llm_call(
+                self.model,
+                sum(u[0] for u in attempt_usage),
+                sum(u[1] for u in attempt_usage),
+                started_at,
+                cached_tokens=sum(u[2] for u in attempt_usage),
+                success=success,
+            )
+
+        self._store_cache(response, cache, cache_key, prompt_version, validator)
+        return response.content
+
+    async def achat_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        prompt_version: Optional[str] = None,
+        validator: Optional[Callable[[str], Any]] = None,
+        deadline: Optional[float] = None,
+        stop_when: Optional[str] = None,
+        **kwargs
+    ) -> str:
+        """异步调用聊天完成API（基于 ainvoke），参数与 chat_completion 相同
 
+        与同步调用共用缓存、限流器、重试策略和 token 统计；限流等待期间不阻塞事件循环，
+        对冲请求中较慢的一个会被取消；流式接收与 chat_completion 相同。
+
+        Returns:
+            模型响应文本
+        """
+        check_cancelled()
+        started_at = time.monotonic()
+        call_kwargs, cache, cache_key, cached = self._prepare_call(messages, temperature, max_tokens, prompt_version)
+        if cached is not None:
+            record_llm_call(self.model, 0, 0, started_at, cache_hit=True)
+            return cached
+
+        limiter = get_rate_limiter(self.model)
+        estimated = self.estimate_tokens(messages, max_tokens)
+        stop_detector = get_stop_detector(stop_when)
+        # 每次尝试（含重试、对冲）的 (输入, 输出, 缓存命中输入) token 数
+        attempt_usage: List[Tuple[int, int, int]] = []
+
+        async def attempt(timeout: Optional[float]):
+            reserved = await limiter.aacquire(estimated)
+            actual_tokens = None
+            try:
+                check_cancelled()
+                request_kwargs = _with_timeout(call_kwargs, timeout)
+                if settings.llm_streaming:
+                    response = await self._astream(messages, request_kwargs, stop_detector)
+                else:
+                    response = await self.client.ainvoke(messages, **request_kwargs)
+                usage = self._record_usage(messages, response)
+                attempt_usage.append(usage)
+                actual_tokens = usage[0] + usage[1]
+                return response
+            finally:
+                limiter.release(reserved, actual_tokens)
+
+        success = False
+        try:
+            response = await acall_with_retry(attempt, self.model, deadline)
+            success = True
+        except LLMCancelled:
+            logger.info("任务已取消，LLM调用中止")
+            raise
         except Exception as e:
             logger.error(f"LLM调用失败: {e}")
             raise
+        finally:
+            record_llm_call(
+                self.model,
+                sum(u[0] for u in attempt_usage),
+                sum(u[1] for u in attempt_usage),
+                started_at,
+                cached_tokens=sum(u[2] for u in attempt_usage),
+                success=success,
+            )
+
+        self._store_cache(response, cache, cache_key, prompt_version, validator)
+        return response.content
+
+    @classmethod
+    def get_telemetry(cls) -> Dict[str, Any]:
+        """获取 LLM 调用遥测（尝试/重试/对冲/超时次数与各模型 p50/p95 延迟）"""
+        return LLMTelemetry.snapshot()
 
     @classmethod
     def get_total_usage(cls) -> Dict[str, int]:
-        """获取全局累计token使用统计
+        """获取全局累计token使用统计（进程内所有任务之和，按任务/阶段统计见 usage_tracker.track_usage）
 
         Returns:
             包含统计信息的字典
         """
-        return {
-            "request_count": cls._global_request_count,
-            "total_input_tokens": cls._global_total_input_tokens,
-            "total_completion_tokens": cls._global_total_completion_tokens,
-            "total_tokens": cls._global_total_tokens
-        }
+        with cls._usage_lock:
+            return {
+                "request_count": cls._global_request_count,
+                "total_input_tokens": cls._global_total_input_tokens,
+                "total_completion_tokens": cls._global_total_completion_tokens,
+                "total_tokens": cls._global_total_tokens,
+                "cache_hits": cls._global_cache_hits,
+                "cached_input_tokens": cls._global_cached_input_tokens,
+                "prompt_cache_hit_rate": prompt_cache_hit_rate(
+                    cls._global_cached_input_tokens, cls._global_total_input_tokens
+                ),
+            }
 
     @classmethod
     def reset_usage(cls):
         """重置全局token使用统计"""
-        cls._global_total_input_tokens = 0
-        cls._global_total_completion_tokens = 0
-        cls._global_total_tokens = 0
-        cls._global_request_count = 0
+        with cls._usage_lock:
+            cls._global_total_input_tokens = 0
+            cls._global_total_completion_tokens = 0
+            cls._global_total_tokens = 0
+            cls._global_request_count = 0
+            cls._global_cache_hits = 0
+            cls._global_cached_input_tokens = 0
+        LLMTelemetry.reset()
         logger.info("Token使用统计已重置")
+
+
+class _StreamedResponse:
+    """流式响应汇总结果（与 invoke 返回的消息对象接口一致：content / response_metadata）"""
+
+    def __init__(self, content: str, token_usage: Optional[Dict[str, int]] = None, stopped_early: bool = False):
+        self.content = content
+        self.response_metadata = {"token_usage": token_usage} if token_usage else {}
+        self.stopped_early = stopped_early
+
+
+class _StreamCollector:
+    """累积流式分片，负责取消检查、token 进度报告和提前结束判断"""
+
+    # 只有新分片包含这些字符时才重新判断是否可以提前结束，避免每个分片都全量扫描
+    STOP_TRIGGER_CHARS = "}`"
+
+    def __init__(self, client: "LLMClient", messages: List[Any], stop_detector: Optional[Callable[[str], bool]]):
+        self.client = client
+        self.messages = messages
+        self.stop_detector = stop_detector
+        self.parts: List[str] = []
+        self.usage: Optional[Dict[str, int]] = None
+        self.stopped_early = False
+
+    def feed(self, chunk: Any) -> bool:
+        """处理一个分片，返回 True 表示应停止读取"""
+        check_cancelled()
+
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            self.usage = {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "prompt_tokens_details": {
+                    "cached_tokens": (usage.get("input_token_details") or {}).get("cache_read", 0),
+                },
+            }
+
+        text = chunk.content if isinstance(chunk.content, str) else ""
+        if not text:
+            return False
+        self.parts.append(text)
+        report_tokens(self.client.count_tokens(text))
+
+        if self.stop_detector and any(c in text for c in self.STOP_TRIGGER_CHARS):
+            if self.stop_detector("".join(self.parts)):
+                self.stopped_early = True
+                return True
+        return False
+
+    def result(self) -> _StreamedResponse:
+        content = "".join(self.parts)
+        usage = self.usage
+        if usage is None:
+            # 提前结束时读不到末尾的用量分片，按本地分词估算
+            usage = {
+                "prompt_tokens": self.client.count_tokens(self.client._message_text(self.messages)),
+                "completion_tokens": self.client.count_tokens(content),
+            }
+        if self.stopped_early:
+            logger.debug(f"流式响应已完整，提前结束读取（{len(content)} 字符）")
+        return _StreamedResponse(content, usage, self.stopped_early)
+
+
+class _ApproxTokenizer:
+    """离线环境下的近似 tokenizer：约 4 个字符计 1 个 token"""
+
+    def encode(self, text: str) -> List[int]:
+        return [0] * ((len(text) + 3) // 4)
+
+
+def _load_default_tokenizer():
+    """加载 cl100k_base 编码，失败时退化为近似估算"""
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken 编码加载失败，token 数将按字符估算: {e}")
+        return _ApproxTokenizer()
+
+
+def _cached_prompt_tokens(usage: Dict[str, Any]) -> int:
+    """输入中命中服务端前缀缓存的 token 数（OpenAI: prompt_tokens_details.cached_tokens，
+    DeepSeek: prompt_cache_hit_tokens），服务端不返回时为 0"""
+    details = usage.get('prompt_tokens_details') or {}
+    cached = details.get('cached_tokens') if isinstance(details, dict) else None
+    if cached is None:
+        cached = usage.get('prompt_cache_hit_tokens')
+    return int(cached or 0)
+
+
+def _with_timeout(call_kwargs: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    """为单次尝试附加超时（受截止时间约束时）"""
+    if timeout is None:
+        return call_kwargs
+    return {**call_kwargs, "timeout": min(timeout, settings.llm_request_timeout)}
+
+
+def _passes(validator: Optional[Callable[[str], Any]], content: str) -> bool:
+    """响应是否通过校验（没有校验函数时视为通过）"""
+    if validator is None:
+        return True
+    try:
+        validator(content)
+        return True
+    except Exception:
+        return False
@@ -0,0 +1,79 @@
+"""
+LLM 调用的任务上下文
+通过 contextvars 在一次任务（如一个 API 任务）内传递取消信号和 token 进度回调，
+同一任务中的所有 LLM 调用（包括线程池和 asyncio 中的调用）都能感知到。
+
+用法：
+    cancel_event = threading.Event()
+    with llm_task_context(cancel_event=cancel_event, token_callback=on_tokens):
+        agent.generate_parser(...)
+
+注意 ThreadPoolExecutor 不会自动复制上下文，提交任务时请使用 submit_with_context；
+asyncio.to_thread 和 asyncio 任务会自动复制当前上下文。
+"""
+import contextvars
+import threading
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class LLMCancelled(Exception):
+    """任务已取消，LLM 调用被中止"""
+
+
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    "web2json_llm_cancel_event", default=None
+)
+_token_callback: contextvars.ContextVar[Optional[Callable[[int], None]]] = contextvars.ContextVar(
+    "web2json_llm_token_callback", default=None
+)
+
+
+@contextmanager
+def llm_task_context(
+    cancel_event: Optional[threading.Event] = None,
+    token_callback: Optional[Callable[[int], None]] = None,
+):
+    """在当前上下文中设置取消信号和 token 进度回调
+
+    Args:
+        cancel_event: 取消信号，set() 后正在进行的流式调用立即中止，后续调用直接抛出 LLMCancelled
+        token_callback: token 进度回调 callback(new_tokens)，流式接收到新内容时调用
+    """
+    cancel_token = _cancel_event.set(cancel_event)
+    callback_token = _token_callback.set(token_callback)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(cancel_token)
+        _token_callback.reset(callback_token)
+
+
+def is_cancelled() -> bool:
+    """当前任务是否已被取消"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def check_cancelled():
+    """当前任务已取消时抛出 LLMCancelled"""
+    if is_cancelled():
+        raise LLMCancelled("任务已取消")
+
+
+def report_tokens(new_tokens: int):
+    """向当前任务报告新接收到的 token 数（回调异常不影响调用本身）"""
+    callback = _token_callback.get()
+    if callback is None or new_tokens <= 0:
+        return
+    try:
+        callback(new_tokens)
+    except Exception:
+        pass
+
+
+def submit_with_context(executor: Executor, fn: Callable, *args, **kwargs) -> Future:
+    """在线程池中执行函数，并携带当前 contextvars 上下文（取消信号、token 回调、用量统计等）"""
+    ctx = contextvars.copy_context()
+    return executor.submit(ctx.run, fn, *args, **kwargs)
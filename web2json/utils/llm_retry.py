@@ -0,0 +1,310 @@
+"""
+LLM 调用重试、截止时间与对冲请求
+- 可重试错误（限流、超时、连接错误、5xx）按指数退避 + 随机抖动（full jitter）重试，优先遵循 Retry-After；
+- 每次调用可设置总截止时间，每次尝试的超时不超过剩余时间；
+- 可选对冲：请求耗时超过该模型近期 p95 延迟时再发一个相同请求，取先返回的结果；
+- 重试、超时、对冲次数和延迟分位数记录在 LLMTelemetry 中，供执行总结输出。
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+import openai
+from loguru import logger
+
+from web2json.config.settings import settings
+from web2json.utils.llm_context import check_cancelled, submit_with_context
+
+# 可重试的 HTTP 状态码
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# 每个模型保留的最近延迟样本数
+LATENCY_WINDOW = 200
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """LLM 调用超过截止时间"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """判断异常是否值得重试（限流、超时、连接错误、服务端错误）"""
+    if isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)):
+        return not isinstance(exc, LLMDeadlineExceeded)
+    return False
+
+
+def retry_delay(attempt: int, exc: Optional[BaseException] = None) -> float:
+    """计算第 attempt 次重试前的等待时间（秒）
+
+    服务端返回 Retry-After 时优先使用，否则为 [0, min(最大延迟, 基础延迟 * 2^attempt)] 内的随机值。
+
+    Args:
+        attempt: 已失败的次数（从 0 开始）
+        exc: 触发重试的异常
+
+    Returns:
+        等待秒数
+    """
+    retry_after = _retry_after(exc)
+    if retry_after is not None:
+        return min(retry_after, settings.llm_retry_max_delay)
+    cap = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def _retry_after(exc: Optional[BaseException]) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMTelemetry:
+    """进程内 LLM 调用遥测（线程安全）"""
+
+    _lock = threading.Lock()
+    _counters: Dict[str, int] = {}
+    _latencies: Dict[str, Deque[float]] = {}
+
+    @classmethod
+    def incr(cls, name: str, value: int = 1):
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + value
+
+    @classmethod
+    def record_latency(cls, model: str, seconds: float):
+        with cls._lock:
+            cls._latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    @classmethod
+    def latency_quantile(cls, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """某模型最近延迟的分位数，样本不足时返回 None"""
+        with cls._lock:
+            samples = sorted(cls._latencies.get(model, ()))
+        if len(samples) < max(min_samples, 1):
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        """当前统计快照"""
+        with cls._lock:
+            counters = dict(cls._counters)
+            models = list(cls._latencies)
+        latency = {}
+        for model in models:
+            p50 = cls.latency_quantile(model, 0.5)
+            p95 = cls.latency_quantile(model, 0.95)
+            latency[model] = {
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+            }
+        return {**counters, "latency": latency}
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._counters.clear()
+            cls._latencies.clear()
+
+
+# 对冲请求使用的共享线程池（同步调用）
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    """对冲触发延迟：未开启或样本不足时返回 None"""
+    if not settings.llm_hedge_enabled:
+        return None
+    return LLMTelemetry.latency_quantile(model, settings.llm_hedge_quantile, settings.llm_hedge_min_samples)
+
+
+def _remaining(deadline_at: Optional[float]) -> Optional[float]:
+    if deadline_at is None:
+        return None
+    remaining = deadline_at - time.monotonic()
+    if remaining <= 0:
+        LLMTelemetry.incr("deadline_exceeded")
+        raise LLMDeadlineExceeded("LLM调用超过截止时间")
+    return remaining
+
+
+def call_with_retry(
+    attempt_fn: Callable[[Optional[float]], Any],
+    model: str,
+    deadline: Optional[float] = None,
+) -> Any:
+    """按重试/截止时间/对冲策略执行一次同步 LLM 调用
+
+    Args:
+        attempt_fn: 执行单次请求的函数，参数为本次尝试的超时秒数（None 表示使用默认超时）
+        model: 模型名称（用于延迟统计和对冲阈值）
+        deadline: 总截止时间（秒），None 时使用 LLM_CALL_DEADLINE，0 表示不限制
+
+    Returns:
+        attempt_fn 的返回值
+    """
+    deadline = settings.llm_call_deadline if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline if deadline else None
+
+    attempt = 0
+    while True:
+        check_cancelled()
+        timeout = _remaining(deadline_at)
+        try:
+            return _hedged_call(attempt_fn, model, timeout)
+        except Exception as e:
+            if not is_retryable(e) or attempt >= settings.llm_max_retries:
+                raise
+            delay = retry_delay(attempt, e)
+            if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                LLMTelemetry.incr("deadline_exceeded")
+                raise
+            attempt += 1
+            LLMTelemetry.incr("retries")
+            logger.warning(f"LLM调用失败（{type(e).__name__}: {e}），{delay:.1f}s 后第 {attempt} 次重试")
+            time.sleep(delay)
+
+
+def _hedged_call(attempt_fn: Callable[[Optional[float]], Any], model: str, timeout: Optional[float]) -> Any:
+    """执行一次尝试；耗时超过 p95 时发出对冲请求，取先成功的结果"""
+    LLMTelemetry.incr("attempts")
+    hedge_after = _hedge_delay(model)
+    start = time.monotonic()
+
+    if hedge_after is None or (timeout is not None and hedge_after >= timeout):
+        result = attempt_fn(timeout)
+        LLMTelemetry.record_latency(model, time.monotonic() - start)
+        return result
+
+    executor = _get_hedge_executor()
+    primary = submit_with_context(executor, attempt_fn, timeout)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        result = primary.result()
+        LLMTelemetry.record_latency(model, time.monotonic() - start)
+        return result
+
+    LLMTelemetry.incr("hedges")
+    logger.debug(f"LLM请求超过 p95 延迟 {hedge_after:.1f}s，发出对冲请求 - {model}")
+    hedge_timeout = None if timeout is None else max(timeout - hedge_after, 0.001)
+    hedge = submit_with_context(executor, attempt_fn, hedge_timeout)
+
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            LLMTelemetry.incr("deadline_exceeded")
+            raise LLMDeadlineExceeded("LLM调用超过截止时间")
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    LLMTelemetry.incr("hedges_won")
+                LLMTelemetry.record_latency(model, time.monotonic() - start)
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+async def acall_with_retry(
+    attempt_fn: Callable[[Optional[float]], Awaitable[Any]],
+    model: str,
+    deadline: Optional[float] = None,
+) -> Any:
+    """call_with_retry 的异步版本，对冲请求中较慢的一个会被取消
+
+    Args:
+        attempt_fn: 执行单次请求的协程函数，参数为本次尝试的超时秒数
+        model: 模型名称
+        deadline: 总截止时间（秒），None 时使用 LLM_CALL_DEADLINE，0 表示不限制
+
+    Returns:
+        attempt_fn 的返回值
+    """
+    deadline = settings.llm_call_deadline if deadline is None else deadline
+    deadline_at = time.monotonic() + deadline if deadline else None
+
+    attempt = 0
+    while True:
+        check_cancelled()
+        timeout = _remaining(deadline_at)
+        try:
+            return await _ahedged_call(attempt_fn, model, timeout)
+        except Exception as e:
+            if not is_retryable(e) or attempt >= settings.llm_max_retries:
+                raise
+            delay = retry_delay(attempt, e)
+            if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+                LLMTelemetry.incr("deadline_exceeded")
+                raise
+            attempt += 1
+            LLMTelemetry.incr("retries")
+            logger.warning(f"LLM调用失败（{type(e).__name__}: {e}），{delay:.1f}s 后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+
+async def _ahedged_call(
+    attempt_fn: Callable[[Optional[float]], Awaitable[Any]],
+    model: str,
+    timeout: Optional[float],
+) -> Any:
+    LLMTelemetry.incr("attempts")
+    hedge_after = _hedge_delay(model)
+    start = time.monotonic()
+
+    primary = asyncio.ensure_future(attempt_fn(timeout))
+    tasks = {primary}
+    try:
+        if hedge_after is not None and (timeout is None or hedge_after < timeout):
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                LLMTelemetry.incr("hedges")
+                logger.debug(f"LLM请求超过 p95 延迟 {hedge_after:.1f}s，发出对冲请求 - {model}")
+                hedge_timeout = None if timeout is None else max(timeout - hedge_after, 0.001)
+                tasks.add(asyncio.ensure_future(attempt_fn(hedge_timeout)))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            remaining = None if timeout is None else max(timeout - (time.monotonic() - start), 0)
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                LLMTelemetry.incr("deadline_exceeded")
+                raise LLMDeadlineExceeded("LLM调用超过截止时间")
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        LLMTelemetry.incr("hedges_won")
+                    LLMTelemetry.record_latency(model, time.monotonic() - start)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
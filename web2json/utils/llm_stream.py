@@ -0,0 +1,80 @@
+"""
+流式响应的提前结束判断
+流式接收模型输出时，一旦需要的内容已经完整（闭合的代码块、完整的顶层 JSON 对象）就停止读取，
+节省等待时间，也不再为模型的尾随说明付费。
+"""
+import json
+from typing import Callable, Dict, Optional
+
+
+def code_block_complete(text: str) -> bool:
+    """第一个 ``` 代码块是否已经闭合（代码块前可以有说明文字）"""
+    start = text.find("```")
+    if start < 0:
+        return False
+    first_newline = text.find("\n", start)
+    if first_newline < 0:
+        return False
+    return text.find("\n```", first_newline) >= 0
+
+
+_JSON_FENCE = "```json"
+
+
+def json_object_complete(text: str) -> bool:
+    """响应开头的 JSON 对象是否已经完整
+
+    只处理以 { 或 ```json 代码块开头的响应（前面的说明文字中可能有花括号，无法判断边界，读到结束）；
+    按括号深度扫描（忽略字符串中的括号），回到顶层时还要求这段内容能解析为 JSON 对象。
+    """
+    stripped = text.lstrip()
+    if stripped[:len(_JSON_FENCE)].lower() == _JSON_FENCE:
+        stripped = stripped[len(_JSON_FENCE):].lstrip()
+    if not stripped.startswith("{"):
+        return False
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index, ch in enumerate(stripped):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                try:
+                    return isinstance(json.loads(stripped[:index + 1]), dict)
+                except ValueError:
+                    return False
+    return False
+
+
+STOP_DETECTORS: Dict[str, Callable[[str], bool]] = {
+    "code": code_block_complete,
+    "json": json_object_complete,
+}
+
+
+def get_stop_detector(stop_when: Optional[str]) -> Optional[Callable[[str], bool]]:
+    """根据名称获取提前结束判断函数（None 表示读到结束）
+
+    Args:
+        stop_when: code（闭合代码块）/ json（完整顶层 JSON 对象）/ None
+
+    Returns:
+        判断函数或 None
+    """
+    if stop_when is None:
+        return None
+    if stop_when not in STOP_DETECTORS:
+        raise ValueError(f"不支持的提前结束条件: {stop_when}，可选: {', '.join(STOP_DETECTORS)}")
+    return STOP_DETECTORS[stop_when]
@@ -0,0 +1,191 @@
+"""
+LLM 调用限流器
+按模型维护进程内共享的令牌桶，同时限制每分钟请求数（RPM）、每分钟 token 数（TPM）
+和同时在途的请求数，所有 API 任务、XPath 请求和聚类流程共用，避免并发叠加触发 429。
+
+同步调用（线程）和异步调用（asyncio）共用同一组计数：
+    limiter.acquire(tokens) / limiter.release(reserved, actual)
+    await limiter.aacquire(tokens) / limiter.release(reserved, actual)
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+from web2json.config.settings import settings
+
+# 未指定 max_tokens 时，为响应预留的 token 数（请求完成后按实际用量校正）
+DEFAULT_COMPLETION_ESTIMATE = 2048
+
+# 仅因在途请求数受限而等待时的轮询间隔（秒）
+IN_FLIGHT_POLL_INTERVAL = 0.05
+
+
+class RateLimiter:
+    """令牌桶限流器（线程安全，可同时用于同步和异步调用）
+
+    - 请求桶容量为 rpm，按 rpm/60 每秒补充；
+    - token 桶容量为 tpm，按 tpm/60 每秒补充，单次预留超过容量时按容量计；
+    - 请求完成后用实际 token 用量校正预留量，低估的部分会在后续请求中补扣。
+
+    任一限制为 0 表示不限制该项。
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_in_flight: int = 0, name: str = ""):
+        """
+        初始化限流器
+
+        Args:
+            rpm: 每分钟请求数上限
+            tpm: 每分钟 token 数上限
+            max_in_flight: 同时在途请求数上限
+            name: 名称（一般为模型名，用于日志）
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self.name = name
+
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._in_flight = 0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.throttled_count = 0
+        self.total_wait_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """尝试预留一次请求，成功返回 0，否则返回建议等待的秒数"""
+        with self._lock:
+            self._refill(time.monotonic())
+
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                return IN_FLIGHT_POLL_INTERVAL
+
+            wait = 0.0
+            if self.rpm and self._requests < 1:
+                wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+            if self.tpm and self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+            if wait > 0:
+                return wait
+
+            if self.rpm:
+                self._requests -= 1
+            if self.tpm:
+                self._tokens -= tokens
+            self._in_flight += 1
+            return 0.0
+
+    def _reserve_size(self, tokens: int) -> int:
+        return min(max(int(tokens), 0), self.tpm) if self.tpm else max(int(tokens), 0)
+
+    def _record_wait(self, waited: float):
+        if waited > 0:
+            with self._lock:
+                self.throttled_count += 1
+                self.total_wait_seconds += waited
+            logger.debug(f"限流等待 {waited:.2f}s - {self.name}")
+
+    def acquire(self, tokens: int = 0) -> int:
+        """阻塞直到可以发送请求（同步/线程调用）
+
+        Args:
+            tokens: 预估的 token 消耗（输入 + 预留输出）
+
+        Returns:
+            实际预留的 token 数，请求结束后传给 release
+        """
+        reserved = self._reserve_size(tokens)
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(reserved)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        self._record_wait(waited)
+        return reserved
+
+    async def aacquire(self, tokens: int = 0) -> int:
+        """等待直到可以发送请求（asyncio 调用，等待期间不阻塞事件循环）
+
+        Args:
+            tokens: 预估的 token 消耗（输入 + 预留输出）
+
+        Returns:
+            实际预留的 token 数，请求结束后传给 release
+        """
+        reserved = self._reserve_size(tokens)
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(reserved)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        self._record_wait(waited)
+        return reserved
+
+    def release(self, reserved: int = 0, actual_tokens: Optional[int] = None):
+        """请求结束后释放在途名额，并按实际用量校正 token 桶
+
+        Args:
+            reserved: acquire 返回的预留 token 数
+            actual_tokens: 实际消耗的 token 数（未知时不校正）
+        """
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self.tpm and actual_tokens is not None:
+                self._tokens = min(float(self.tpm), self._tokens + reserved - actual_tokens)
+
+    def stats(self) -> Dict[str, float]:
+        """限流统计"""
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "throttled_count": self.throttled_count,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """获取某个模型的进程内共享限流器（限制值读取 LLM_RPM_LIMIT / LLM_TPM_LIMIT / LLM_MAX_IN_FLIGHT）
+
+    Args:
+        model: 模型名称
+
+    Returns:
+        RateLimiter 实例
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = RateLimiter(
+                rpm=settings.llm_rpm_limit,
+                tpm=settings.llm_tpm_limit,
+                max_in_flight=settings.llm_max_in_flight,
+                name=model,
+            )
+            _limiters[model] = limiter
+            if limiter.rpm or limiter.tpm or limiter.max_in_flight:
+                logger.info(
+                    f"LLM限流已启用 - 模型: {model}, RPM: {limiter.rpm or '不限'}, "
+                    f"TPM: {limiter.tpm or '不限'}, 最大在途: {limiter.max_in_flight or '不限'}"
+                )
+        return limiter
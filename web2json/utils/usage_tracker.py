@@ -0,0 +1,253 @@
+"""
+LLM 用量统计（按任务、阶段、轮次）
+通过 contextvars 把统计对象和当前阶段传给任务内的所有 LLM 调用（线程池中需使用 submit_with_context，
+asyncio 任务会自动复制上下文），并发运行的多个任务各自统计、互不混淆。
+
+每次 LLMClient 调用记录一条：阶段、轮次、模型、输入/输出 token、耗时、是否命中缓存，
+以及输入中命中服务端前缀缓存（prompt caching）的 token 数；开启模型级联时还按阶段统计
+廉价模型输出未通过本地校验、升级到主模型的比例。
+
+用法：
+    with track_usage() as tracker:
+        with llm_phase("schema_extraction", round=1):
+            llm_client.chat_completion(...)
+    tracker.summary()
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+# 未在 llm_phase 中发起的调用归入此阶段
+UNKNOWN_PHASE = "other"
+
+
+@dataclass
+class LLMCallRecord:
+    """一次 LLM 调用的用量记录"""
+    phase: str                      # 所属阶段（schema_extraction / schema_merge / code_iteration ...）
+    round: Optional[int]            # 轮次（样本序号或代码迭代轮次，无则为 None）
+    model: str                      # 模型名称
+    prompt_tokens: int              # 输入 token 数（含重试和对冲请求）
+    completion_tokens: int          # 输出 token 数（含重试和对冲请求）
+    latency_seconds: float          # 调用耗时（含限流等待和重试）
+    cache_hit: bool                 # 是否命中响应缓存
+    success: bool = True            # 是否成功返回
+    cached_tokens: int = 0          # 输入中命中服务端前缀缓存的 token 数
+
+
+class UsageTracker:
+    """一次任务的 LLM 用量统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records: List[LLMCallRecord] = []
+        # 阶段 -> [级联调用次数, 升级次数]
+        self._cascade: Dict[str, List[int]] = {}
+
+    def record(self, record: LLMCallRecord):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> List[LLMCallRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def record_cascade(self, phase: str, escalated: bool):
+        """记录一次模型级联调用及是否升级到了主模型"""
+        with self._lock:
+            stats = self._cascade.setdefault(phase, [0, 0])
+            stats[0] += 1
+            stats[1] += int(escalated)
+
+    def cascade_summary(self) -> Dict[str, Dict[str, Any]]:
+        """按阶段汇总模型级联的升级率"""
+        with self._lock:
+            cascade = {phase: list(stats) for phase, stats in self._cascade.items()}
+        return {
+            phase: {
+                'calls': calls,
+                'escalations': escalations,
+                'escalation_rate': round(escalations / calls, 4) if calls else 0.0,
+            }
+            for phase, (calls, escalations) in cascade.items()
+        }
+
+    def activate(self) -> contextvars.Token:
+        """在当前上下文启用此统计对象，返回的 token 用于 deactivate"""
+        return _current_tracker.set(self)
+
+    @staticmethod
+    def deactivate(token: contextvars.Token):
+        """恢复启用前的统计对象"""
+        _current_tracker.reset(token)
+
+    def summary(self) -> Dict[str, Any]:
+        """按阶段、模型汇总
+
+        Returns:
+            {
+                'total': {calls, prompt_tokens, completion_tokens, total_tokens, cache_hits, failed_calls,
+                          latency_seconds, cached_tokens, prompt_cache_hit_rate},
+                'by_phase': {阶段: 同上},
+                'by_model': {模型: 同上},
+                'cascade': {阶段: {calls, escalations, escalation_rate}}（仅在发生模型级联时）,
+                'calls': [每次调用的记录],
+            }
+
+            latency_seconds 为各调用耗时之和，阶段内并发调用时会大于该阶段的墙钟耗时。
+        """
+        records = self.records()
+        by_phase: Dict[str, Dict[str, Any]] = {}
+        by_model: Dict[str, Dict[str, Any]] = {}
+        for record in records:
+            _accumulate(by_phase.setdefault(record.phase, _empty_totals()), record)
+            _accumulate(by_model.setdefault(record.model, _empty_totals()), record)
+
+        total = _empty_totals()
+        for record in records:
+            _accumulate(total, record)
+
+        summary = {
+            'total': _rounded(total),
+            'by_phase': {phase: _rounded(v) for phase, v in by_phase.items()},
+            'by_model': {model: _rounded(v) for model, v in by_model.items()},
+            'calls': [asdict(record) for record in records],
+        }
+        cascade = self.cascade_summary()
+        if cascade:
+            summary['cascade'] = cascade
+        return summary
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        'calls': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'total_tokens': 0,
+        'cache_hits': 0,
+        'failed_calls': 0,
+        'latency_seconds': 0.0,
+        'cached_tokens': 0,
+    }
+
+
+def _accumulate(totals: Dict[str, Any], record: LLMCallRecord):
+    totals['calls'] += 1
+    totals['prompt_tokens'] += record.prompt_tokens
+    totals['completion_tokens'] += record.completion_tokens
+    totals['total_tokens'] += record.prompt_tokens + record.completion_tokens
+    totals['cache_hits'] += int(record.cache_hit)
+    totals['failed_calls'] += int(not record.success)
+    totals['latency_seconds'] += record.latency_seconds
+    totals['cached_tokens'] += record.cached_tokens
+
+
+def _rounded(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **totals,
+        'latency_seconds': round(totals['latency_seconds'], 3),
+        'prompt_cache_hit_rate': prompt_cache_hit_rate(totals['cached_tokens'], totals['prompt_tokens']),
+    }
+
+
+def prompt_cache_hit_rate(cached_tokens: int, prompt_tokens: int) -> float:
+    """服务端前缀缓存命中率：命中缓存的输入 token 占全部输入 token 的比例"""
+    return round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+
+
+_current_tracker: contextvars.ContextVar[Optional[UsageTracker]] = contextvars.ContextVar(
+    "web2json_usage_tracker", default=None
+)
+_current_phase: contextvars.ContextVar[str] = contextvars.ContextVar("web2json_llm_phase", default=UNKNOWN_PHASE)
+_current_round: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("web2json_llm_round", default=None)
+
+
+@contextmanager
+def track_usage(tracker: Optional[UsageTracker] = None):
+    """在当前上下文中统计 LLM 用量
+
+    Args:
+        tracker: 统计对象（可选，默认新建）
+
+    Yields:
+        UsageTracker
+    """
+    tracker = tracker or UsageTracker()
+    token = tracker.activate()
+    try:
+        yield tracker
+    finally:
+        tracker.deactivate(token)
+
+
+@contextmanager
+def llm_phase(phase: str, round: Optional[int] = None):
+    """标记当前上下文中 LLM 调用所属的阶段和轮次
+
+    Args:
+        phase: 阶段名称（与进度回调的阶段名一致）
+        round: 轮次（可选）
+    """
+    phase_token = _current_phase.set(phase)
+    round_token = _current_round.set(round)
+    try:
+        yield
+    finally:
+        _current_phase.reset(phase_token)
+        _current_round.reset(round_token)
+
+
+def get_current_tracker() -> Optional[UsageTracker]:
+    """当前上下文的统计对象（未启用统计时为 None）"""
+    return _current_tracker.get()
+
+
+def record_llm_call(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    started_at: float,
+    cache_hit: bool = False,
+    success: bool = True,
+    cached_tokens: int = 0,
+):
+    """向当前上下文的统计对象记录一次调用（未启用统计时忽略）
+
+    Args:
+        model: 模型名称
+        prompt_tokens: 输入 token 数
+        completion_tokens: 输出 token 数
+        started_at: 调用开始时间（time.monotonic()）
+        cache_hit: 是否命中缓存
+        success: 是否成功
+        cached_tokens: 输入中命中服务端前缀缓存的 token 数
+    """
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return
+    tracker.record(LLMCallRecord(
+        phase=_current_phase.get(),
+        round=_current_round.get(),
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        latency_seconds=time.monotonic() - started_at,
+        cache_hit=cache_hit,
+        success=success,
+        cached_tokens=cached_tokens,
+    ))
+
+
+def record_cascade(escalated: bool):
+    """向当前上下文的统计对象记录一次模型级联调用（未启用统计时忽略）
+
+    Args:
+        escalated: 是否因廉价模型输出未通过校验而升级到了主模型
+    """
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        tracker.record_cascade(_current_phase.get(), escalated)
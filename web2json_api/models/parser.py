@@ -98,6 +98,7 @@ class TaskStatus(BaseModel):
     completed_at: Optional[float] = Field(None, description="完成时间（Unix时间戳）")
     result: Optional[Dict[str, Any]] = Field(None, description="结果数据（仅completed状态）")
     error: Optional[str] = Field(None, description="错误信息（仅failed状态）")
+    usage: Optional[Dict[str, Any]] = Field(None, description="本任务的LLM用量（total/by_phase/by_model/calls，运行中实时更新）")
 
     class Config:
         json_schema_extra = {
@@ -124,8 +125,9 @@ class ProgressMessage(BaseModel):
     - result: 最终结果
     - error: 错误消息
     - complete: 完成通知
+    - token: LLM 流式接收进度（不进入重连缓冲）
     """
-    type: Literal["progress", "log", "result", "error", "complete"] = Field(
+    type: Literal["progress", "log", "result", "error", "complete", "token"] = Field(
         ...,
         description="消息类型"
     )
@@ -147,6 +149,9 @@ class ProgressMessage(BaseModel):
     # error类型字段
     error: Optional[str] = Field(None, description="错误信息")
 
+    # token类型字段
+    tokens: Optional[int] = Field(None, description="任务开始以来流式接收的 completion token 数")
+
     class Config:
         json_schema_extra = {
             "examples": [
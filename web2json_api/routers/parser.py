@@ -373,6 +373,7 @@ async def generate_preliminary_schema(request: ParserGenerateRequest):
     """
     from web2json.agent.orchestrator import ParserAgent
     from web2json.agent.planner import AgentPlanner
+    from web2json.utils.artifact_store import InMemoryArtifactStore
     import tempfile
     import shutil
 
@@ -394,10 +395,11 @@ async def generate_preliminary_schema(request: ParserGenerateRequest):
                 detail="At least one HTML source is required"
             )
 
-        # 创建Agent（使用auto模式）
+        # 创建Agent（使用auto模式，中间结果只保存在内存中）
         agent = ParserAgent(
             output_dir=str(temp_dir),
-            schema_mode="auto"
+            schema_mode="auto",
+            artifact_store=InMemoryArtifactStore(temp_dir)
         )
 
         # 只执行schema阶段
@@ -8,15 +8,21 @@
 """
 import time
 import asyncio
+import threading
 from pathlib import Path
 from typing import Dict, Optional, List
 import logging
 
 from web2json.agent.orchestrator import ParserAgent
+from web2json.utils.llm_context import LLMCancelled, llm_task_context
+from web2json.utils.usage_tracker import track_usage
 from web2json_api.models.parser import ParserGenerateRequest
 
 logger = logging.getLogger(__name__)
 
+# token 进度消息的最小发送间隔（秒）
+TOKEN_PROGRESS_INTERVAL = 0.5
+
 
 class ParserService:
     """
@@ -105,6 +111,10 @@ class ParserService:
 
             return result
 
+        except LLMCancelled:
+            # 交给 TaskManager 按取消处理
+            raise asyncio.CancelledError()
+
         except Exception as e:
             logger.error(f"Parser generation failed for task {task_id}: {e}", exc_info=True)
 
@@ -170,18 +180,42 @@ class ParserService:
                 except Exception as e:
                     logger.warning(f"进度回调失败: {e}")
 
+            # token 进度回调：流式接收时由各 LLM 调用线程触发，按时间间隔节流后异步广播（不等待发送完成）
+            token_lock = threading.Lock()
+            token_state = {"total": 0, "last_sent": 0.0}
+
+            def token_callback(new_tokens: int):
+                with token_lock:
+                    token_state["total"] += new_tokens
+                    now = time.monotonic()
+                    if now - token_state["last_sent"] < TOKEN_PROGRESS_INTERVAL:
+                        return
+                    token_state["last_sent"] = now
+                    total = token_state["total"]
+                asyncio.run_coroutine_threadsafe(self.task_manager.broadcast_tokens(task_id, total), loop)
+
             # 更新 agent 的回调函数
             agent.progress_callback = progress_callback
             agent.executor.progress_callback = progress_callback
 
-            # 调用ParserAgent的generate_parser方法
-            result = agent.generate_parser(
-                html_files=html_files,
-                domain=request.domain or "web_parser",
-                iteration_rounds=request.iteration_rounds or 3,
-                schema_mode=request.schema_mode,
-                schema_template=self._build_schema_template(request) if request.schema_mode == "predefined" else None
-            )
+            task = self.task_manager.tasks.get(task_id)
+            cancel_event = task.cancel_event if task else None
+            usage_tracker = task.usage_tracker if task else None
+
+            # 调用ParserAgent的generate_parser方法（LLM 用量记录到任务自己的统计对象）
+            with llm_task_context(cancel_event=cancel_event, token_callback=token_callback), \
+                    track_usage(usage_tracker):
+                result = agent.generate_parser(
+                    html_files=html_files,
+                    domain=request.domain or "web_parser",
+                    iteration_rounds=request.iteration_rounds or 3,
+                    schema_mode=request.schema_mode,
+                    schema_template=self._build_schema_template(request) if request.schema_mode == "predefined" else None
+                )
+
+            # 阶段处理器会捕获 LLM 调用异常，取消后 Agent 仍可能正常返回（失败结果）
+            if cancel_event is not None and cancel_event.is_set():
+                raise LLMCancelled("任务已取消")
 
             # 检查执行结果
             if not result.get("success", False):
@@ -198,6 +232,10 @@ class ParserService:
                 "parsed_files": self._get_parsed_files_info(result.get("results_dir", ""))
             }
 
+        except LLMCancelled:
+            logger.info(f"ParserAgent cancelled: {task_id}")
+            raise
+
         except Exception as e:
             logger.error(f"ParserAgent execution failed: {e}", exc_info=True)
 
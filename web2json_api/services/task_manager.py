@@ -9,6 +9,7 @@
 """
 import uuid
 import asyncio
+import threading
 import time
 import shutil
 from typing import Dict, List, Optional
@@ -17,6 +18,7 @@ from pathlib import Path
 from fastapi import WebSocket
 import logging
 
+from web2json.utils.usage_tracker import UsageTracker
 from web2json_api.models.parser import (
     ParserGenerateRequest,
     TaskStatus as TaskStatusModel,
@@ -39,6 +41,10 @@ class Task:
     started_at: Optional[float] = None
     completed_at: Optional[float] = None
     cancel_flag: bool = False
+    # 取消信号，通过 llm_task_context 传给任务内的所有 LLM 调用，set() 后正在进行的流式请求立即中止
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    # 本任务的 LLM 用量统计（与其他并发任务互不混淆）
+    usage_tracker: UsageTracker = field(default_factory=UsageTracker)
     output_dir: Optional[Path] = None
     message_buffer: List[ProgressMessage] = field(default_factory=list)
 
@@ -222,6 +228,7 @@ class TaskManager:
             return False
 
         task.cancel_flag = True
+        task.cancel_event.set()
         logger.info(f"Cancel flag set for task: {task_id}")
         return True
 
@@ -247,7 +254,8 @@ class TaskManager:
             started_at=task.started_at,
             completed_at=task.completed_at,
             result=task.result,
-            error=task.error
+            error=task.error,
+            usage=task.usage_tracker.summary()
         )
 
     async def add_websocket(self, task_id: str, websocket: WebSocket):
@@ -375,17 +383,34 @@ class TaskManager:
 
         await self._broadcast_message(task_id, message)
 
-    async def _broadcast_message(self, task_id: str, message: ProgressMessage):
+    async def broadcast_tokens(self, task_id: str, tokens: int):
+        """
+        广播 LLM 流式接收进度（高频消息，不进入重连缓冲）
+
+        Args:
+            task_id: 任务ID
+            tokens: 任务开始以来接收的 completion token 数
+        """
+        message = ProgressMessage(
+            type="token",
+            timestamp=time.time(),
+            tokens=tokens
+        )
+
+        await self._broadcast_message(task_id, message, buffer=False)
+
+    async def _broadcast_message(self, task_id: str, message: ProgressMessage, buffer: bool = True):
         """
         内部方法：广播消息到所有连接的WebSocket
 
         Args:
             task_id: 任务ID
             message: 进度消息
+            buffer: 是否加入重连缓冲
         """
         # 添加到缓冲区
         task = self.tasks.get(task_id)
-        if task:
+        if task and buffer:
             task.message_buffer.append(message)
             # 限制缓冲区大小
             if len(task.message_buffer) > self.buffer_size:
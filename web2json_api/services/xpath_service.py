@@ -6,7 +6,9 @@ XPath生成服务
 from typing import List, Dict, Optional
 from loguru import logger
 
+from web2json.config.settings import settings
 from web2json.tools.schema_extraction import enrich_schema_with_xpath, merge_multiple_schemas
+from web2json.tools.xpath_repair import repair_schema_xpaths
 from web2json_api.models.field import FieldInput, FieldOutput
 
 
@@ -67,7 +69,7 @@ class XPathService:
         使用多样本迭代生成XPath
 
         流程：
-        1. 对每个样本调用enrich_schema_with_xpath
+        1. 对每个样本调用enrich_schema_with_xpath，并在该样本上校验/修复xpath（XPATH_REPAIR_ENABLED）
         2. 合并所有schema
         3. 提取最优XPath
 
@@ -105,10 +107,15 @@ class XPathService:
             for i, html_content in enumerate(html_samples[:iteration_rounds]):
                 logger.info(f"处理第 {i+1}/{iteration_rounds} 个样本...")
 
-                enriched_schema = enrich_schema_with_xpath.invoke({
-                    "schema_template": schema_template,
-                    "html_content": html_content
-                })
+                enriched_schema = enrich_schema_with_xpath(
+                    schema_template=schema_template,
+                    html_content=html_content
+                )
+                if settings.xpath_repair_enabled:
+                    stats = repair_schema_xpaths(enriched_schema, [html_content])
+                    logger.info(
+                        f"xpath校验: 通过 {stats['valid']} 个，修复 {stats['repaired']} 个，丢弃 {stats['dropped']} 个"
+                    )
 
                 enriched_schemas.append(enriched_schema)
                 logger.success(f"第 {i+1} 个样本处理完成")
@@ -120,9 +127,7 @@ class XPathService:
             else:
                 # 5. 合并多个schema
                 logger.info(f"合并 {len(enriched_schemas)} 个schema...")
-                final_schema = merge_multiple_schemas.invoke({
-                    "schemas": enriched_schemas
-                })
+                final_schema = merge_multiple_schemas(schemas=enriched_schemas)
                 logger.success("Schema合并完成")
 
             # 6. 转换回前端格式